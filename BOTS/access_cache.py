@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Cached admin/permission snapshot for the admin-managed bots.
+
+Each bot's admins collection is small and only changes through that bot's
+own add/remove, role, permission and lock handlers, so authorization checks
+read an in-memory copy instead of MongoDB. Handlers call `invalidate()` after
+a write; otherwise the snapshot reloads every ACCESS_CACHE_TTL seconds as a
+safety net for edits made outside the bot (restores, manual fixes).
+"""
+import logging
+import os
+import time
+
+ACCESS_CACHE_TTL = int(os.getenv("ACCESS_CACHE_TTL", 120))
+
+
+def as_user_id(raw):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdminSnapshot:
+    """In-memory admin docs of one bot, keyed by int user_id."""
+
+    def __init__(self, collection, ttl: int = ACCESS_CACHE_TTL):
+        # `collection` is a callable so a reconnect that rebinds the bot's
+        # collection global is picked up on the next reload.
+        self._collection = collection
+        self.ttl = ttl
+        self._dirty = True
+        self._loaded_at = 0.0
+        self._admins = {}
+        self.reloads = 0
+        self.lookups = 0
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _reload(self):
+        admins = {}
+        col = self._collection()
+        if col is not None:
+            for doc in col.find({}):
+                uid = as_user_id(doc.get("user_id"))
+                if uid is not None:
+                    admins.setdefault(uid, doc)   # int and legacy str IDs collapse to one entry
+        self._admins = admins
+
+    def _ensure(self):
+        if not self._dirty and (time.time() - self._loaded_at) < self.ttl:
+            return
+        try:
+            self._reload()
+            self._dirty = False
+            self._loaded_at = time.time()
+            self.reloads += 1
+        except Exception as e:
+            # Keep the last good snapshot; retry in ~10s instead of on every check
+            logging.error(f"Admin snapshot reload failed: {e}")
+            self._dirty = False
+            self._loaded_at = time.time() - self.ttl + 10
+
+    def admin_doc(self, user_id):
+        self._ensure()
+        self.lookups += 1
+        return self._admins.get(as_user_id(user_id))
+
+    def admins(self):
+        """All admin docs, in collection order."""
+        self._ensure()
+        return list(self._admins.values())
+
+    def stats(self):
+        return {
+            "admins": len(self._admins),
+            "lookups": self.lookups,
+            "reloads": self.reloads,
+            "age_s": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+        }
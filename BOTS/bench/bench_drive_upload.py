@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Offline Drive upload benchmark for bot4, against drive_fake.FakeDriveService.
+
+    before  the original upload_to_drive: list/create YEAR and MONTH folders
+            on every call, one-shot media upload, one permission call each
+    after   bot4.upload_to_drive: cached folder IDs, resumable upload,
+            public-read grants flushed as batch requests
+
+Each variant uploads the same PDFs into a fresh fake Drive, once one at a
+time and once from concurrent threads (finalize_pdf runs uploads with
+asyncio.to_thread, so several blueprints can finish together). Every Drive
+round-trip sleeps `latency` ms. Imports bot4 like the bots do (same .env /
+MONGO_URI / tokens) with MSANODE_HOSTED=1.
+
+    python BOTS/bench/bench_drive_upload.py [uploads] [latency_ms] [threads]
+
+Results (Linux container, Python 3.12.1, 10 x 40 KB, 80 ms per round-trip,
+5 threads, 3 runs):
+    sequential  before 3402-3463 ms  42 round-trips
+                after  1970-2042 ms  24 round-trips   (1.7x)
+    5 threads   before  821-837 ms   50 round-trips
+                after   658-679 ms   24 round-trips   (1.25x)
+Folder lookups drop from 4 per upload to 4 per cold month. With threads
+the old code also raced on the empty month and created duplicate YEAR /
+MONTH folders; the extra round-trips are those creates.
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault("MSANODE_HOSTED", "1")
+
+import bot4  # noqa: E402
+from drive_fake import FakeDriveService  # noqa: E402
+
+
+def legacy_ensure_folder(service, folder_name, parent_id=None):
+    """bot4's _ensure_drive_folder before the change (listing on every call)."""
+    query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+    if parent_id:
+        query += f" and '{parent_id}' in parents"
+    folders = service.files().list(q=query, fields="files(id)", supportsAllDrives=True,
+                                   includeItemsFromAllDrives=True).execute().get('files', [])
+    if folders:
+        return folders[0]['id']
+    metadata = {'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'}
+    if parent_id:
+        metadata['parents'] = [parent_id]
+    return service.files().create(body=metadata, fields='id', supportsAllDrives=True).execute().get('id')
+
+
+def legacy_upload(filename, data):
+    """upload_to_drive before the change, minus its logging."""
+    service = bot4.get_drive_service()
+    root_id = bot4.PARENT_FOLDER_ID or None
+    year_id = legacy_ensure_folder(service, datetime.now().strftime('%Y'), root_id)
+    month_id = legacy_ensure_folder(service, datetime.now().strftime('%B').upper(), year_id)
+    media = bot4.MediaIoBaseUpload(io.BytesIO(data), mimetype='application/pdf')
+    file = service.files().create(body={'name': filename, 'parents': [month_id]}, media_body=media,
+                                  fields='id, webViewLink', supportsAllDrives=True).execute()
+    service.permissions().create(fileId=file.get('id'), body={'type': 'anyone', 'role': 'reader'}).execute()
+    return file.get('webViewLink', '')
+
+
+def run(upload, pdf, uploads, latency, threads):
+    with tempfile.TemporaryDirectory() as tmp:
+        service = FakeDriveService(tmp, latency)
+        bot4.get_drive_service = lambda: service
+        bot4._drive_folder_cache_drop(bot4.PARENT_FOLDER_ID or "root")
+        if bot4.PARENT_FOLDER_ID:
+            service._files[bot4.PARENT_FOLDER_ID] = {"id": bot4.PARENT_FOLDER_ID, "name": "ROOT",
+                                                     "mimeType": FakeDriveService.FOLDER_MIME, "parents": []}
+        names = [f"BENCH{i:03d}.pdf" for i in range(uploads)]
+        started = time.perf_counter()
+        if threads > 1:
+            with ThreadPoolExecutor(threads) as pool:
+                links = list(pool.map(lambda n: upload(n, pdf), names))
+        else:
+            links = [upload(n, pdf) for n in names]
+        elapsed = time.perf_counter() - started
+        public = sum(1 for m in service._files.values() if m.get("permissions"))
+        assert all(links) and public == uploads, (links, public)
+        return elapsed, service.calls
+
+
+def main():
+    uploads = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    bot4._load_drive_stack()
+    pdf = bot4._render_pdf_job("BENCHMARK BLUEPRINT\n\n" + "Step 1 - keep the float in one sheet. " * 2000,
+                               "BENCH.pdf")["pdf"]
+    print(f"{uploads} uploads x {len(pdf) / 1024:.0f} KB, {latency} ms per round-trip")
+    for label, workers in (("sequential", 1), (f"{threads} threads", threads)):
+        for name, upload in (("before", legacy_upload), ("after", bot4.upload_to_drive)):
+            elapsed, calls = run(upload, pdf, uploads, latency, workers)
+            print(f"{label:>12} {name:<6} {elapsed * 1000:7.0f} ms  {calls:3d} round-trips")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Failover benchmark for bot5's Gemini routing, against gemini_fake.
+
+    before  the original fixed walk: from the last good key, try every
+            model in pool order, then the next key (no memory of failures)
+    after   bot5.generate_draft() through GeminiRouter (health-scored plan,
+            circuit breakers), exactly as the bot runs it with GEMINI_FAKE=1
+
+Scenarios (key / model names pick the fake's behaviour):
+    cold     keys [dead, quota, ok, ok], models [missing, flash, pro];
+             the first choice is bad, later generations reuse the route
+             that worked
+    decay    four good keys; every 5 generations the key in use gets
+             revoked (403) for the rest of the run
+
+Counts model calls (each one is a network round-trip in production) and
+wall time at `latency` ms per call. The old walk also sent the owner a
+Telegram status message before every attempt; that is not counted.
+Imports bot5 like the bots do (same .env / MONGO_URI / tokens) with
+MSANODE_HOSTED=1.
+
+    python BOTS/bench/bench_gemini_router.py [generations] [latency_ms]
+
+Results (Linux container, Python 3.12.1, 20 generations, 50 ms per call,
+3 runs):
+                  all 20 generations        first generation
+    cold   before 1362-1401 ms  27 calls     404-408 ms  8 calls
+           after  1254-1269 ms  24 calls     289-294 ms  5 calls
+    decay  before 1311-1326 ms  26 calls
+           after  1169-1175 ms  23 calls   (-11%)
+Both variants stick to the last good route, so steady state costs one call
+either way. The savings are the failures: one 403 parks the key and one
+404 parks the model for the rest of the generation, where the old walk
+tried every remaining model on a dead key. Quota (429) is per key and
+model, so a rate-limited key is still tried once per model.
+"""
+import asyncio
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault("MSANODE_HOSTED", "1")
+os.environ["GEMINI_FAKE"] = "1"
+
+import bot5  # noqa: E402
+from gemini_fake import FakeGeminiClient  # noqa: E402
+
+SCENARIOS = {
+    "cold": (["key-dead-0001", "key-quota-0002", "key-ok-0003", "key-ok-0004"],
+             ["gemini-missing", "gemini-2.0-flash", "gemini-1.5-pro"], 0),
+    "decay": (["key-ok-0001", "key-ok-0002", "key-ok-0003", "key-ok-0004"],
+              ["gemini-2.0-flash", "gemini-1.5-pro"], 5),
+}
+
+
+class Clients(dict):
+    """One fake client per key, shared by both variants' bookkeeping."""
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def __missing__(self, key):
+        cli = self[key] = FakeGeminiClient(key, self.latency)
+        return cli
+
+    def revoke(self, key):
+        self[key].api_key = key + "-dead"
+
+    @property
+    def calls(self):
+        return sum(c.calls for c in self.values())
+
+
+async def legacy_generate(state, clients, prompt):
+    """The pre-router walk, condensed: key order from the last success, all models per key."""
+    keys, pool = state["keys"], state["models"]
+    for k_off in range(len(keys)):
+        k_idx = (state["key"] + k_off) % len(keys)
+        models = pool[state["model"]:] + pool[:state["model"]] if state["model"] < len(pool) else list(pool)
+        for model in models:
+            model = bot5.normalize_model_name(model)
+            try:
+                for attempt in range(2):
+                    try:
+                        response = await clients[keys[k_idx]].aio.models.generate_content(model=model, contents=[prompt])
+                        break
+                    except Exception as e:
+                        if bot5.classify_gemini_error(str(e)) != "transient" or attempt:
+                            raise
+                        await asyncio.sleep(1)
+                state["key"] = k_idx
+                if model in pool:
+                    state["model"] = pool.index(model)
+                return response.text
+            except Exception as e:
+                if bot5.classify_gemini_error(str(e)) == "model" and model in pool:
+                    pool[:] = [m for m in pool if m != model]
+    return None
+
+
+async def router_generate(_state, _clients, prompt):
+    content, _model, c_type = await bot5.generate_draft(prompt)
+    return None if c_type == "CRITICAL_ERROR" else content
+
+
+async def run(generate, scenario, generations, latency):
+    keys, models, decay = SCENARIOS[scenario]
+    clients = Clients(latency)
+    state = {"keys": list(keys), "models": list(models), "key": 0, "model": 0}
+    bot5.API_KEY_POOL[:] = keys
+    bot5.MODEL_POOL = list(models)
+    bot5.CURRENT_API_INDEX = bot5.CURRENT_MODEL_INDEX = 0
+    bot5.gemini_router = bot5.GeminiRouter()
+    bot5.gemini_router._clients = clients
+    failed = 0
+    first = None
+    started = time.perf_counter()
+    for i in range(generations):
+        if decay and i and i % decay == 0:
+            in_use = keys[state["key"]] if generate is legacy_generate else keys[bot5.CURRENT_API_INDEX]
+            clients.revoke(in_use)
+        if not await generate(state, clients, f"Topic {i}"):
+            failed += 1
+        if first is None:
+            first = ((time.perf_counter() - started) * 1000, clients.calls)
+    return time.perf_counter() - started, clients.calls, failed, first
+
+
+async def main():
+    generations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    async def _quiet(*_a, **_kw):
+        return None
+    bot5.bot.send_message = _quiet
+    bot5.notify_error = _quiet
+    bot5.console_out = lambda *_a, **_kw: None
+    bot5._load_genai()
+
+    print(f"{generations} generations, {latency} ms per model call")
+    for scenario in SCENARIOS:
+        for name, generate in (("before", legacy_generate), ("after", router_generate)):
+            elapsed, calls, failed, first = await run(generate, scenario, generations, latency)
+            print(f"{scenario:>6} {name:<6} {elapsed * 1000:7.0f} ms  {calls:3d} calls  {failed} failed"
+                  f"  | first generation {first[0]:5.0f} ms  {first[1]} calls")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
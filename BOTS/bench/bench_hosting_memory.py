@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Memory benchmark: bots as separate processes vs hosted by main.py.
+
+Each bot is imported in its own fresh interpreter (what `python botN.py`
+pays before polling starts) and its RSS recorded; then all of them are
+loaded together through main.Host.load(). Uses the same environment as the
+bots (.env / MONGO_URI / tokens).
+
+    python BOTS/bench/bench_hosting_memory.py [bot1 bot2 ...]
+
+Results (Linux container, Python 3.12.1, requirements.txt, all five bots,
+RSS after import, 3 runs; no MongoDB server was reachable so pymongo was
+backed by mongomock, which leaves the imported library set unchanged):
+    standalone  bot1 120.9, bot2 122.5-122.8, bot3 121.4-121.6,
+                bot4 121.3-121.5, bot5 121.4-121.5   sum 607.8-607.9 MB
+    hosted      131.1-131.3 MB (library base 117.3-117.5 MB)
+    saved       476.5-476.8 MB (78%); main.py's own estimate 469-470 MB
+Each bot adds 4-5 MB on top of a ~117 MB interpreter + aiogram/pymongo/
+aiohttp base that every standalone process pays again. Runtime growth
+(caches, bot4's render workers when standalone) is not included.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BOTS_DIR = os.path.dirname(HERE)
+
+# Results go through a file: the bots' background threads print while importing
+STANDALONE = """
+import importlib, json, os, psutil
+importlib.import_module({name!r})
+with open({result!r}, "w") as f:
+    json.dump(round(psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024, 1), f)
+"""
+
+HOSTED = """
+import json, main
+host = main.Host({names!r})
+host.load()
+with open({result!r}, "w") as f:
+    json.dump({{"memory": host.memory, "loaded": sorted(host.bots), "failed": host.failed}}, f)
+"""
+
+
+def _run(template, **fields):
+    env = {k: v for k, v in os.environ.items() if k != "MSANODE_HOSTED"}
+    with tempfile.TemporaryDirectory() as tmp:
+        result = os.path.join(tmp, "result.json")
+        out = subprocess.run([sys.executable, "-c", template.format(result=result, **fields)],
+                             cwd=BOTS_DIR, env=env, capture_output=True, text=True, timeout=600)
+        if not os.path.exists(result):
+            raise RuntimeError(f"no result (exit {out.returncode}): {out.stderr.strip()[-500:]}")
+        with open(result) as f:
+            return json.load(f)
+
+
+def main():
+    names = sys.argv[1:] or ["bot1", "bot2", "bot3", "bot4", "bot5"]
+    standalone = {}
+    for name in names:
+        try:
+            standalone[name] = _run(STANDALONE, name=name)
+        except Exception as e:
+            print(f"{name}: standalone run failed: {e}")
+    hosted = _run(HOSTED, names=[n for n in names if n in standalone])
+
+    print(f"{'bot':<8}{'standalone MB':>15}")
+    for name, mb in standalone.items():
+        print(f"{name:<8}{mb:>15.1f}")
+    total = sum(standalone.values())
+    mem = hosted["memory"]
+    print(f"{'sum':<8}{total:>15.1f}")
+    print(f"hosted ({', '.join(hosted['loaded'])}): {mem['hosted_mb']:.1f} MB "
+          f"(base {mem['base_mb']:.1f} MB)")
+    print(f"saved: {total - mem['hosted_mb']:.1f} MB ({(1 - mem['hosted_mb'] / total) * 100:.0f}%), "
+          f"main.py estimate {mem['saved_estimate_mb']:.1f} MB")
+    if hosted["failed"]:
+        print(f"not hosted: {hosted['failed']}")
+
+
+if __name__ == "__main__":
+    main()
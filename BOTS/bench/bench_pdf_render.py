@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprint render benchmark for bot4: a 50-page script, before vs after the
+single-pass encryption change.
+
+    before  create_goldmine_pdf() to a file on disk, then the old
+            _encrypt_pdf() pass (pypdf re-reads every page and re-writes
+            the whole file encrypted)
+    after   _render_pdf_job(): one reportlab build into BytesIO with
+            StandardEncryption applied while the document is written
+
+Imports bot4 like the bots do (same .env / MONGO_URI / tokens) with
+MSANODE_HOSTED=1 so the terminal capture stays off. The "before" pass needs
+pypdf, which was never in requirements.txt; without it the old code shipped
+the PDF unencrypted and only the render half is timed.
+
+    python BOTS/bench/bench_pdf_render.py [pages] [runs]
+
+Results (Linux container, Python 3.12.1, 50 pages / 126 KB, median of
+5-9 runs, 4 invocations):
+    before  render 1059-1209ms + pypdf encrypt 46-64ms = 1137-1273ms
+    after   render+encrypt 1123-1208ms                  (0.98-1.06x)
+The render itself dominates; reportlab's in-build encryption costs about
+what the extra pypdf pass did, so the win is the dropped temp file and
+re-read (0-71ms, within run-to-run noise), plus the PDF now actually being
+encrypted when pypdf is absent.
+"""
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ.setdefault("MSANODE_HOSTED", "1")
+
+import bot4  # noqa: E402
+
+PAGE_RE = re.compile(rb"/Type /Page\b(?!s)")
+
+SECTION = """SECTION {n}: CASH FLOW PLAYBOOK {n}
+
+Step {n}.1 - Open a zero-fee account and park ₹5,000 as the base float. Track every inflow in one sheet so the weekly review takes minutes, not hours.
+Step {n}.2 - Split the float 60/30/10 across operations, reserve and experiments. Rebalance on the first Monday of the month and log the reason for every move.
+• Check the reserve covers three months of fixed costs before adding risk.
+• Cap any single experiment at 10% of the float → kill it after two flat weeks.
+• Record the result (✓ kept / ✗ dropped) with one line of evidence.
+
+Step {n}.3 - Review pricing: compare the last 30 days against the previous period, note the top three drivers, and write the next action with an owner and a date. Repeat until the margin target (≥ 22%) holds for two cycles in a row.
+"""
+
+
+def build_script(sections):
+    return "\n".join(SECTION.format(n=i) for i in range(1, sections + 1))
+
+
+def page_count(pdf):
+    return len(PAGE_RE.findall(pdf))
+
+
+def legacy_encrypt_pdf(filepath):
+    """bot4's _encrypt_pdf before the change, kept verbatim for comparison."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(filepath)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    if reader.metadata:
+        writer.add_metadata(dict(reader.metadata))
+    writer.encrypt(
+        user_password="",
+        owner_password="MSANODEVault@2025!",
+        use_128bit=False,
+        permissions_flag=4,
+    )
+    tmp = filepath + ".enc"
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    os.replace(tmp, filepath)
+
+
+def script_for(pages):
+    """Grow the script until the rendered blueprint reaches `pages` pages."""
+    sections = max(1, pages * 2)
+    while True:
+        job = bot4._render_pdf_job(build_script(sections), "BENCH.pdf")
+        got = page_count(job["pdf"])
+        if got >= pages:
+            return build_script(sections), got
+        sections = int(sections * pages / max(got, 1)) + 1
+
+
+def run_before(script, tmp, encrypt):
+    path = os.path.join(tmp, "BENCH.pdf")
+    started = time.perf_counter()
+    bot4.create_goldmine_pdf(script, "BENCH.pdf", output=path)
+    rendered = time.perf_counter()
+    if encrypt:
+        legacy_encrypt_pdf(path)
+    with open(path, "rb") as f:
+        size = len(f.read())
+    done = time.perf_counter()
+    os.remove(path)
+    return (rendered - started) * 1000, (done - rendered) * 1000, size
+
+
+def run_after(script):
+    started = time.perf_counter()
+    job = bot4._render_pdf_job(script, "BENCH.pdf")
+    return (time.perf_counter() - started) * 1000, len(job["pdf"])
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    try:
+        import pypdf  # noqa: F401
+        encrypt = True
+    except ImportError:
+        encrypt = False
+        print("pypdf not installed: 'before' times the render only (old code skipped encryption)")
+
+    script, got = script_for(pages)
+    print(f"script: {len(script)} chars -> {got} pages, {runs} runs")
+
+    before, after = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs):
+            before.append(run_before(script, tmp, encrypt))
+            after.append(run_after(script))
+
+    render = statistics.median(b[0] for b in before)
+    enc = statistics.median(b[1] for b in before)
+    total_before = statistics.median(b[0] + b[1] for b in before)
+    total_after = statistics.median(a[0] for a in after)
+    print(f"before: render {render:.0f}ms + encrypt {enc:.0f}ms = {total_before:.0f}ms, "
+          f"{before[0][2] / 1024:.0f} KB on disk")
+    print(f"after:  render+encrypt {total_after:.0f}ms, {after[0][1] / 1024:.0f} KB in memory "
+          f"({total_before / total_after:.2f}x, {total_before - total_after:.0f}ms saved)")
+
+
+if __name__ == "__main__":
+    main()
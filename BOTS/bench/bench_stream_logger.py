@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Logging-throughput micro-benchmark for bot4's terminal capture.
+
+Compares print() through the original StreamLogger (timestamp formatted and
+write+flush on every write() call) with stream_capture.StreamLogger
+(batched pass-through, lazy stamps). Output goes to a real temp file so the
+write/flush syscalls are counted.
+
+    python BOTS/bench/bench_stream_logger.py [lines]
+
+Results (Linux container, Python 3.12.1, 200000 lines, 5 runs):
+    before: 2.26-2.99s   67-89k lines/s
+    after:  0.94-1.23s   163-213k lines/s   (2.2-2.9x)
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import stream_capture  # noqa: E402
+
+LEGACY_BUFFER = deque(maxlen=50)
+
+
+class LegacyStreamLogger:
+    """bot4's capture before the change, kept verbatim for comparison."""
+    def __init__(self, original):
+        self.original = original
+
+    def write(self, message):
+        if message.strip():
+            ts = datetime.now().strftime('%I:%M:%S %p')
+            LEGACY_BUFFER.append(f"[{ts}] {message.strip()}")
+        self.original.write(message)
+        self.original.flush()
+
+    def flush(self):
+        self.original.flush()
+
+
+def run(make_logger, lines):
+    with tempfile.TemporaryFile("w", encoding="utf-8") as sink:
+        logger = make_logger(sink)
+        started = time.perf_counter()
+        for i in range(lines):
+            print(f"✅ Render job {i} finished in 42ms (pid 1234)", file=logger)
+        if hasattr(logger, "drain"):
+            logger.drain()
+        elapsed = time.perf_counter() - started
+        sink.flush()
+        written = sink.tell()
+    return elapsed, written
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    before, size_before = run(LegacyStreamLogger, lines)
+    after, size_after = run(stream_capture.StreamLogger, lines)
+    assert size_before == size_after, "both loggers must pass through the same bytes"
+    print(f"lines:  {lines}")
+    print(f"before: {before:.2f}s  {lines / before / 1000:.0f}k lines/s")
+    print(f"after:  {after:.2f}s  {lines / after / 1000:.0f}k lines/s  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
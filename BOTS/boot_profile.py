@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start profiling shared by the MSANODE bots.
+
+Import this before anything heavy. Each `mark()` records the time spent since
+the previous mark; with STARTUP_PROFILE=1 every phase is printed as it
+completes. Slow, non-critical setup (index builds) goes through `background()`
+so it never delays polling. The first update handled is compared against
+STARTUP_BUDGET_MS, measured from process creation, and always logged.
+"""
+import os
+import threading
+import time
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+STARTUP_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", 8000))
+
+
+def _process_started():
+    """Wall-clock creation time of this process (falls back to now)."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).create_time()
+    except Exception:
+        return time.time()
+
+
+class BootProfiler:
+    def __init__(self, name):
+        self.name = name
+        self.started = _process_started()
+        self.last = self.started
+        self.phases = []           # [(phase, ms)]
+        self.background_jobs = {}  # label -> ms, or "failed: ..."
+        self.ready_ms = None
+        self.first_update_ms = None
+        self.mark("interpreter")
+
+    def _since_start_ms(self, now=None):
+        return int(((now or time.time()) - self.started) * 1000)
+
+    def mark(self, phase):
+        now = time.time()
+        ms = int((now - self.last) * 1000)
+        self.last = now
+        self.phases.append((phase, ms))
+        if STARTUP_PROFILE:
+            print(f"[BOOT] {self.name} {phase}: {ms}ms (t+{self._since_start_ms(now)}ms)", flush=True)
+        return ms
+
+    def background(self, label, fn, *args):
+        """Run `fn(*args)` in a daemon thread and record how long it took."""
+        def runner():
+            t0 = time.time()
+            try:
+                fn(*args)
+                self.background_jobs[label] = int((time.time() - t0) * 1000)
+                if STARTUP_PROFILE:
+                    print(f"[BOOT] {self.name} {label} (background): {self.background_jobs[label]}ms", flush=True)
+            except Exception as e:
+                self.background_jobs[label] = f"failed: {e}"
+                print(f"[BOOT] {self.name} {label} (background) failed: {e}", flush=True)
+
+        thread = threading.Thread(target=runner, name=f"boot-{label}", daemon=True)
+        thread.start()
+        return thread
+
+    def ready(self):
+        """Call right before polling / the webhook server starts."""
+        self.mark("ready")
+        self.ready_ms = self._since_start_ms()
+        slowest = sorted(self.phases, key=lambda p: -p[1])[:3]
+        print(f"[BOOT] {self.name} ready in {self.ready_ms}ms "
+              f"(slowest: {', '.join(f'{p} {ms}ms' for p, ms in slowest)})", flush=True)
+        return self.ready_ms
+
+    async def first_update_middleware(self, handler, event, data):
+        """aiogram outer middleware: times the first update against the budget."""
+        if self.first_update_ms is None:
+            self.first_update_ms = self._since_start_ms()
+            verdict = "within" if self.first_update_ms <= STARTUP_BUDGET_MS else "OVER"
+            print(f"[BOOT] {self.name} first update at {self.first_update_ms}ms "
+                  f"({verdict} {STARTUP_BUDGET_MS}ms budget)", flush=True)
+        return await handler(event, data)
@@ -1,17 +1,25 @@
+from boot_profile import BootProfiler
+boot = BootProfiler("bot1")
+
 import asyncio
 import functools
 import logging
 import os
-import pymongo
 import random
 import re
 import secrets
 import string
+import threading
 import time
 import traceback
 import sys
+from collections import deque
 from datetime import datetime, timedelta
 from pymongo.errors import DuplicateKeyError
+from index_migrations import IndexRegistry
+from hosting import HOSTED, telegram_session
+from mongo_client import get_client, pool_stats, pool_summary
+from telegram_governor import governor_for, governor_summary
 
 # Fix Windows console encoding for emojis (prevents UnicodeEncodeError with cp1252)
 if sys.platform == 'win32':
@@ -37,6 +45,7 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter, TelegramNetworkError, TelegramUnauthorizedError
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+boot.mark("imports")
 
 
 
@@ -172,8 +181,9 @@ logging.getLogger("pymongo.client").setLevel(logging.CRITICAL)
 logging.getLogger("pymongo.pool").setLevel(logging.CRITICAL)
 logging.getLogger("pymongo.topology").setLevel(logging.CRITICAL)
 
-bot = Bot(token=BOT_TOKEN)
+bot = Bot(token=BOT_TOKEN, session=telegram_session())
 dp = Dispatcher(storage=MemoryStorage())
+dp.update.outer_middleware(boot.first_update_middleware)
 
 # ==========================================
 # 🖥️ BOT 1(8) LIVE TERMINAL MIDDLEWARE
@@ -224,18 +234,8 @@ health_stats = {
 # 📊 DATABASE CONNECTION  
 # ==========================================
 try:
-    client = pymongo.MongoClient(
-        MONGO_URI,
-        maxPoolSize=50,          # Up to 50 concurrent connections
-        minPoolSize=5,           # Keep 5 always alive
-        maxIdleTimeMS=30000,     # Close idle connections after 30 s
-        serverSelectionTimeoutMS=5000,  # Fail fast on unavailable
-        connectTimeoutMS=10000,
-        socketTimeoutMS=30000,
-        retryWrites=True,
-        retryReads=True,
-        w="majority",            # Write concern – durable
-    )
+    # Pool sizing, timeouts, compression and write concern: see mongo_client.py
+    client = get_client(MONGO_URI, app="bot1")
     db = client[MONGO_DB_NAME]
     # Guard: refuse to start if pointed at the wrong database
     if db.name != "MSANodeDB":
@@ -255,81 +255,65 @@ try:
     col_bot8_backups = db["bot8_backups"]         # Bot 1 auto-backups (12h, cloud-safe)
     col_bot8_restore_data = db["bot8_restore_data"]  # Bot 1 latest restorable snapshot (always-replaced)
     col_broadcasts = db["bot10_broadcasts"]        # Broadcasts sent via Bot 2 (read-only here)
+    col_click_rollups = db["bot3_click_rollups"]   # Hourly/daily click buckets per item + source (read by Bot 3)
     logger.info("✅ MongoDB connected successfully")
-    
-    # ==========================================
-    # 🔍 CREATE DATABASE INDEXES (Performance)
-    # ==========================================
-    try:
-        col_user_verification.create_index("user_id", unique=True)
-        col_msa_ids.create_index("user_id", unique=True)
-        col_msa_ids.create_index("msa_number")
-        col_pdfs.create_index("ig_start_code")
-        col_pdfs.create_index("yt_start_code")
-        col_pdfs.create_index("index")
-        col_ig_content.create_index("cc_code")
-        col_ig_content.create_index("start_code")
-        col_support_tickets.create_index("user_id")
-        col_support_tickets.create_index("status")
-        # Enterprise extra indexes
-        col_banned_users.create_index("user_id", unique=True)
-        col_banned_users.create_index("ban_expires")  # TTL hint only
-        col_support_tickets.create_index([("user_id", 1), ("status", 1)])
-        col_support_tickets.create_index("created_at")
-        col_support_tickets.create_index([("resolved_at", 1)], sparse=True)  # plain index only — no TTL, tickets are permanent
-        db["bot10_user_tracking"].create_index("user_id", unique=True)
-        db["bot8_state_persistence"].create_index("key", unique=True)
-        col_bot8_backups.create_index([("backup_date", -1)])
-        col_bot8_backups.create_index([("backup_type", 1)])
-        col_broadcasts.create_index([("index", -1)])
-        col_broadcasts.create_index("broadcast_id", unique=True)
-        # ── Unique dedup index: prevents duplicate click-tracking rows even under concurrent load
-        db["bot3_user_activity"].create_index(
-            [("user_id", 1), ("item_id", 1), ("click_type", 1)],
-            unique=True,
-            name="unique_user_item_click"
-        )
-        logger.info("✅ Database indexes created/verified")
-    except Exception as idx_error:
-        logger.warning(f"⚠️ Index creation warning: {idx_error}")
-
-    # ── Drop any legacy TTL index on resolved_at (was 30-day auto-delete, now removed) ─
-    try:
-        try:
-            col_support_tickets.drop_index("resolved_at_1")
-        except Exception:
-            pass
-        logger.info("✅ Ticket TTL cleared — tickets are permanent, no auto-deletion")
-    except Exception as ttl_err:
-        logger.warning(f"⚠️ Ticket TTL drop warning: {ttl_err}")
-
-    # ── Partial unique: prevent duplicate open tickets per user ──────────
-    try:
-        col_support_tickets.create_index(
-            [("user_id", 1)],
-            unique=True,
-            partialFilterExpression={"status": "open"},
-            name="unique_open_ticket_per_user"
-        )
-        logger.info("✅ Unique partial index: one open ticket per user enforced")
-    except Exception as uniq_err:
-        logger.warning(f"⚠️ Partial unique index warning (may already exist): {uniq_err}")
-
-    # ── Backup dedup index: one backup summary per bot/window key ───────────
-    try:
-        col_bot8_backups.create_index(
-            [("bot", 1), ("window_key", 1)],
-            unique=True,
-            sparse=True,
-            name="unique_bot_window_key"
-        )
-        logger.info("✅ Backup dedup index active: unique (bot, window_key)")
-    except Exception as bidx_err:
-        logger.warning(f"⚠️ Backup dedup index warning: {bidx_err}")
-
 except Exception as e:
     logger.error(f"❌ MongoDB connection failed: {e}")
     sys.exit(1)
+boot.mark("mongo")
+
+# ==========================================
+# 🔍 CREATE DATABASE INDEXES (Performance)
+# ==========================================
+# Declared once; index_migrations applies only entries that are new or changed
+# since the last boot (recorded in MongoDB), in a background thread.
+indexes = IndexRegistry(db, "bot1")
+indexes.index(col_user_verification, "user_id", unique=True)
+indexes.index(col_msa_ids, "user_id", unique=True)
+indexes.index(col_msa_ids, "msa_number")
+indexes.index(col_pdfs, "ig_start_code")
+indexes.index(col_pdfs, "yt_start_code")
+indexes.index(col_pdfs, "index")
+indexes.index(col_ig_content, "cc_code")
+indexes.index(col_ig_content, "start_code")
+indexes.index(col_support_tickets, "user_id")
+indexes.index(col_support_tickets, "status")
+# Enterprise extra indexes
+indexes.index(col_banned_users, "user_id", unique=True)
+indexes.index(col_banned_users, "ban_expires")  # TTL hint only
+indexes.index(col_support_tickets, [("user_id", 1), ("status", 1)])
+indexes.index(col_support_tickets, "created_at")
+# Legacy 30-day TTL on resolved_at dropped — tickets are permanent; plain index only
+indexes.drop(col_support_tickets, "resolved_at_1")
+indexes.index(col_support_tickets, [("resolved_at", 1)], sparse=True)
+indexes.index(db["bot10_user_tracking"], "user_id", unique=True)
+indexes.index(db["bot8_state_persistence"], "key", unique=True)
+indexes.index(col_bot8_backups, [("backup_date", -1)])
+indexes.index(col_bot8_backups, [("backup_type", 1)])
+indexes.index(col_broadcasts, [("index", -1)])
+indexes.index(col_broadcasts, "broadcast_id", unique=True)
+# Unique dedup index: prevents duplicate click-tracking rows even under concurrent load
+indexes.index(db["bot3_user_activity"], [("user_id", 1), ("item_id", 1), ("click_type", 1)],
+              unique=True, name="unique_user_item_click")
+# Click rollups: one bucket per (item, source, granularity, bucket start)
+indexes.index(col_click_rollups, [("item_id", 1), ("source", 1), ("granularity", 1), ("bucket", 1)],
+              unique=True, name="unique_click_rollup_bucket")
+indexes.index(col_click_rollups, [("granularity", 1), ("bucket", -1)], name="click_rollup_granularity_bucket")
+indexes.index(col_click_rollups, "expire_at", expireAfterSeconds=0, sparse=True, name="click_rollup_hourly_ttl")
+# Partial unique: one open ticket per user
+indexes.index(col_support_tickets, [("user_id", 1)], unique=True,
+              partialFilterExpression={"status": "open"}, name="unique_open_ticket_per_user")
+# Backup dedup: one backup summary per bot/window key
+indexes.index(col_bot8_backups, [("bot", 1), ("window_key", 1)], unique=True, sparse=True,
+              name="unique_bot_window_key")
+# Vault leave pipeline (reminders, phase counts, ghost cleanup)
+indexes.index(col_user_verification, [("vault_joined", 1), ("vault_left_at", 1)])
+
+# Hot queries that must stay index-backed (reported by the audit if not)
+indexes.expect(col_user_verification, "vault_left_at", "vault_joined")
+indexes.expect(db["bot10_user_tracking"], "source")
+
+boot.background("indexes", indexes.apply)
 
 # ==========================================
 # 🖥️ LIVE TERMINAL LOGGER (shared with Bot 2)
@@ -365,32 +349,6 @@ def log_to_terminal(action_type: str, user_id: int, details: str = ""):
 # USER SOURCE TRACKING (permanent first-source lock)
 # ==========================================
 
-def _is_new_unique_click(user_id: int, item_id, click_type: str) -> bool:
-    """
-    Per-user click deduplication — race-condition-proof.
-    Uses upsert + unique index instead of find_one+insert_one so concurrent
-    clicks can never produce a duplicate row, even under high load.
-    Returns True on the FIRST click, False on every subsequent click.
-    """
-    try:
-        from pymongo.errors import DuplicateKeyError
-        col_dedup = db["bot3_user_activity"]
-        key = {"user_id": user_id, "item_id": str(item_id), "click_type": click_type}
-        result = col_dedup.update_one(
-            key,
-            {"$setOnInsert": {**key, "first_click_at": now_local()}},
-            upsert=True
-        )
-        # upserted_id is set ONLY when a new doc was inserted (first click)
-        return result.upserted_id is not None
-    except Exception as e:
-        # DuplicateKeyError = race lost = already exists = not a new click
-        from pymongo.errors import DuplicateKeyError
-        if isinstance(e, DuplicateKeyError):
-            return False
-        logger.warning(f"Dedup check failed ({click_type}): {e}; allowing increment")
-        return True  # On any other error, fail-open (never block a user)
-
 def track_user_source(user_id: int, source: str, username: str, first_name: str, msa_id: str):
     """
     Record traffic source PERMANENTLY on first start only.
@@ -431,6 +389,259 @@ def track_user_source(user_id: int, source: str, username: str, first_name: str,
             )
     except Exception as e:
         logger.error(f"Warning: track_user_source failed: {e}")
+
+# ==========================================
+# 📈 CLICK EVENT PIPELINE (batched $inc + time-bucketed rollups)
+# ==========================================
+# Deep-link handlers only enqueue an event; a background flusher drains the queue
+# every CLICK_FLUSH_INTERVAL seconds (or once CLICK_FLUSH_BATCH events are waiting)
+# and applies the whole batch with a handful of unordered bulk_write calls:
+#   1. per-user dedup upserts into bot3_user_activity (first click only counts)
+#   2. one aggregated $inc per content item on bot3_pdfs / bot3_ig_content
+#   3. hourly + daily buckets per item and source in bot3_click_rollups
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", 2.0))   # seconds
+CLICK_FLUSH_BATCH = int(os.getenv("CLICK_FLUSH_BATCH", 500))           # events per flush
+CLICK_QUEUE_MAX = int(os.getenv("CLICK_QUEUE_MAX", 50_000))            # backpressure limit
+CLICK_OVERFLOW_MAX = int(os.getenv("CLICK_OVERFLOW_MAX", 50_000))      # side buffer once the queue is full
+CLICK_HOURLY_RETENTION_DAYS = int(os.getenv("CLICK_HOURLY_RETENTION_DAYS", 30))
+CLICK_INC_RETRIES = int(os.getenv("CLICK_INC_RETRIES", 10))            # flushes a failed counter $inc is retried for
+
+# click_type → (content collection, counter increments, "last clicked" timestamp fields)
+_CLICK_TYPES = {
+    "ig_start": ("pdf", {"ig_start_clicks": 1, "clicks": 1}, ("last_ig_click", "last_clicked_at")),
+    "yt_start": ("pdf", {"yt_start_clicks": 1, "clicks": 1}, ("last_yt_click", "last_clicked_at")),
+    "yt_code":  ("pdf", {"yt_code_clicks": 1, "clicks": 1},  ("last_yt_code_click", "last_clicked_at")),
+    "ig_cc":    ("ig",  {"ig_cc_clicks": 1},                 ("last_ig_cc_click",)),
+}
+
+_click_queue: asyncio.Queue = asyncio.Queue(maxsize=CLICK_QUEUE_MAX)
+_click_overflow: deque = deque()   # spill-over while the queue is full; refilled into it by the flusher
+click_pipeline_stats = {
+    "enqueued": 0,
+    "flushed": 0,
+    "unique": 0,
+    "batches": 0,
+    "overflowed": 0,
+    "dropped": 0,
+    "last_flush_ms": 0.0,
+    "total_flush_ms": 0.0,
+}
+
+# Counter increments whose bulk_write failed. Their first-click markers are
+# already in bot3_user_activity, so re-running the events would dedup them
+# away; the aggregated $inc itself is kept and merged into the next flush.
+_click_inc_retry: dict = {}   # (content, item_id) -> {"inc", "last", "ts_fields", "tries"}
+_click_inc_lock = threading.Lock()
+
+def _merge_click_inc(target: dict, key, entry: dict):
+    merged = target.setdefault(key, {"inc": {}, "last": entry["last"], "ts_fields": set(), "tries": 0})
+    for field, n in entry["inc"].items():
+        merged["inc"][field] = merged["inc"].get(field, 0) + n
+    merged["last"] = max(merged["last"], entry["last"])
+    merged["ts_fields"].update(entry["ts_fields"])
+    merged["tries"] = max(merged.get("tries", 0), entry.get("tries", 0))
+
+def _flush_click_events(events: list) -> int:
+    """
+    Apply a batch of (user_id, item_id, click_type, clicked_at) events.
+    Runs in a worker thread (pymongo is synchronous). Returns the number of
+    events that were first-time (counted) clicks.
+    """
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+
+    # ── 1. Dedup: collapse repeats inside the batch, then one unordered bulk upsert ──
+    first_seen: dict = {}
+    for user_id, item_id, click_type, clicked_at in events:
+        first_seen.setdefault((user_id, str(item_id), click_type), clicked_at)
+    dedup_keys = list(first_seen)
+    new_keys = set()
+    dedup_ops = [
+        UpdateOne(
+            {"user_id": uid, "item_id": iid, "click_type": ctype},
+            {"$setOnInsert": {"user_id": uid, "item_id": iid, "click_type": ctype, "first_click_at": first_seen[(uid, iid, ctype)]}},
+            upsert=True
+        )
+        for uid, iid, ctype in dedup_keys
+    ]
+    if dedup_ops:
+        try:
+            result = db["bot3_user_activity"].bulk_write(dedup_ops, ordered=False)
+            new_idx = set(result.upserted_ids)
+        except BulkWriteError as bwe:
+            # DuplicateKeyError = race lost to a concurrent upsert = not a new click
+            new_idx = {u["index"] for u in bwe.details.get("upserted", [])}
+        except Exception as e:
+            logger.warning(f"Click dedup batch failed: {e}; allowing increments")
+            new_idx = set(range(len(dedup_keys)))  # fail-open (never lose a user's first click)
+        new_keys = {dedup_keys[i] for i in new_idx}
+
+    # ── 2. Aggregate counter increments per content item ──
+    content_inc: dict = {}
+    hour_buckets: dict = {}
+    day_buckets: dict = {}
+    counted = set()
+    for user_id, item_id, click_type, clicked_at in events:
+        content, inc_fields, ts_fields = _CLICK_TYPES[click_type]
+        key = (user_id, str(item_id), click_type)
+        is_unique = key in new_keys and key not in counted
+        if is_unique:
+            counted.add(key)
+            entry = content_inc.setdefault((content, item_id), {"inc": {}, "last": clicked_at, "ts_fields": set()})
+            for field, n in inc_fields.items():
+                entry["inc"][field] = entry["inc"].get(field, 0) + n
+            entry["last"] = max(entry["last"], clicked_at)
+            entry["ts_fields"].update(ts_fields)
+
+        # ── 3. Rollups count every click (raw) plus the counted (unique) ones ──
+        hour = clicked_at.replace(minute=0, second=0, microsecond=0)
+        for buckets, bucket in ((hour_buckets, hour), (day_buckets, hour.replace(hour=0))):
+            b = buckets.setdefault((content, str(item_id), click_type, bucket), [0, 0])
+            b[0] += 1
+            b[1] += 1 if is_unique else 0
+
+    # Increments that failed on an earlier flush ride along with this one
+    with _click_inc_lock:
+        for key, entry in _click_inc_retry.items():
+            _merge_click_inc(content_inc, key, entry)
+        _click_inc_retry.clear()
+
+    ops = {"pdf": ([], []), "ig": ([], [])}   # content -> (UpdateOnes, matching content_inc keys)
+    for key, entry in content_inc.items():
+        op = UpdateOne(
+            {"_id": key[1]},
+            {"$inc": entry["inc"], "$max": {f: entry["last"] for f in entry["ts_fields"]}}
+        )
+        ops[key[0]][0].append(op)
+        ops[key[0]][1].append(key)
+    failed = []
+    for content, collection in (("pdf", col_pdfs), ("ig", col_ig_content)):
+        content_ops, keys = ops[content]
+        if not content_ops:
+            continue
+        try:
+            collection.bulk_write(content_ops, ordered=False)
+        except BulkWriteError as bwe:
+            failed += [keys[err["index"]] for err in bwe.details.get("writeErrors", [])]
+        except Exception as e:
+            logger.warning(f"Click counter batch failed ({content}): {e}")
+            failed += keys
+    if failed:
+        with _click_inc_lock:
+            for key in failed:
+                entry = content_inc[key]
+                entry["tries"] = entry.get("tries", 0) + 1
+                if entry["tries"] > CLICK_INC_RETRIES:
+                    logger.error(f"⚠️ Dropping click counters for {key} after {CLICK_INC_RETRIES} retries: {entry['inc']}")
+                    continue
+                _merge_click_inc(_click_inc_retry, key, entry)
+        logger.warning(f"Click counters for {len(failed)} item(s) kept for the next flush")
+
+    rollup_ops = []
+    for granularity, buckets in (("hour", hour_buckets), ("day", day_buckets)):
+        for (content, item_id, click_type, bucket), (raw, unique) in buckets.items():
+            on_insert = {"content": content}
+            if granularity == "hour":
+                on_insert["expire_at"] = bucket + timedelta(days=CLICK_HOURLY_RETENTION_DAYS)
+            rollup_ops.append(UpdateOne(
+                {"item_id": item_id, "source": click_type, "granularity": granularity, "bucket": bucket},
+                {"$inc": {"clicks": raw, "unique_clicks": unique}, "$setOnInsert": on_insert},
+                upsert=True
+            ))
+    if rollup_ops:
+        try:
+            col_click_rollups.bulk_write(rollup_ops, ordered=False)
+        except Exception as e:
+            logger.warning(f"Click rollup batch failed: {e}")
+
+    return len(counted)
+
+def record_click_event(user_id: int, item_id, click_type: str):
+    """
+    Queue a deep-link click for batched ingestion. O(1) on the handler path.
+    If the queue is full (flusher stalled or a spike), the event waits in a
+    bounded side buffer that the flusher feeds back into the queue; past
+    CLICK_OVERFLOW_MAX it is dropped and counted.
+    """
+    event = (user_id, item_id, click_type, now_local())
+    try:
+        _click_queue.put_nowait(event)
+        click_pipeline_stats["enqueued"] += 1
+    except asyncio.QueueFull:
+        if len(_click_overflow) >= CLICK_OVERFLOW_MAX:
+            click_pipeline_stats["dropped"] += 1
+            if click_pipeline_stats["dropped"] % 1000 == 1:
+                logger.warning(f"⚠️ Click pipeline saturated: {click_pipeline_stats['dropped']} clicks dropped")
+            return
+        _click_overflow.append(event)
+        click_pipeline_stats["overflowed"] += 1
+
+def _refill_click_queue():
+    """Move spilled events back into the queue as flushes free up space."""
+    while _click_overflow and not _click_queue.full():
+        _click_queue.put_nowait(_click_overflow.popleft())
+
+async def _drain_click_queue(max_items: int) -> list:
+    batch = []
+    while len(batch) < max_items:
+        try:
+            batch.append(_click_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    return batch
+
+async def _flush_click_batch(batch: list):
+    started = time.perf_counter()
+    unique = await asyncio.to_thread(_flush_click_events, batch)
+    if not batch:
+        return  # counter retry only
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    click_pipeline_stats["flushed"] += len(batch)
+    click_pipeline_stats["unique"] += unique
+    click_pipeline_stats["batches"] += 1
+    click_pipeline_stats["last_flush_ms"] = elapsed_ms
+    click_pipeline_stats["total_flush_ms"] += elapsed_ms
+
+async def click_event_flusher():
+    """Background task: flush queued click events in bulk_write batches."""
+    logger.info(f"📈 Click pipeline started (flush every {CLICK_FLUSH_INTERVAL}s or {CLICK_FLUSH_BATCH} events)")
+    held = []   # taken off the queue but not yet handed to a flush
+    try:
+        while True:
+            try:
+                first = await asyncio.wait_for(_click_queue.get(), timeout=CLICK_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                if _click_inc_retry:
+                    try:
+                        await _flush_click_batch([])
+                    except Exception as e:
+                        logger.error(f"⚠️ Click counter retry failed: {e}")
+                continue
+            held = [first]
+            # Give a burst a moment to accumulate, unless the batch is already full
+            if _click_queue.qsize() < CLICK_FLUSH_BATCH - 1:
+                await asyncio.sleep(min(CLICK_FLUSH_INTERVAL, 0.5))
+            batch = held + await _drain_click_queue(CLICK_FLUSH_BATCH - 1)
+            held = []
+            _refill_click_queue()
+            try:
+                await _flush_click_batch(batch)
+            except Exception as e:
+                logger.error(f"⚠️ Click batch flush failed ({len(batch)} events): {e}")
+                await asyncio.sleep(5)
+    except asyncio.CancelledError:
+        # Shutdown: persist whatever is still queued before exiting
+        remaining = held + await _drain_click_queue(CLICK_QUEUE_MAX) + list(_click_overflow)
+        _click_overflow.clear()
+        if remaining or _click_inc_retry:
+            try:
+                for i in range(0, max(len(remaining), 1), CLICK_FLUSH_BATCH):
+                    await _flush_click_batch(remaining[i:i + CLICK_FLUSH_BATCH])
+                logger.info(f"📈 Click pipeline drained {len(remaining)} events on shutdown")
+            except Exception as e:
+                logger.error(f"⚠️ Click pipeline shutdown drain failed: {e}")
+        raise
+
 async def check_channel_membership(user_id: int) -> bool:
     """Check if user is a member of the vault channel"""
     try:
@@ -2411,26 +2622,12 @@ async def cmd_start(message: types.Message, state: FSMContext):
                 
                 if source == "ig":
                     # Deduplicated IG start click — only count each user once per PDF
-                    if _is_new_unique_click(user_id, pdf_data["_id"], "ig_start"):
-                        col_pdfs.update_one(
-                            {"_id": pdf_data["_id"]},
-                            {
-                                "$inc": {"ig_start_clicks": 1, "clicks": 1},
-                                "$set": {"last_ig_click": now_local(), "last_clicked_at": now_local()}
-                            }
-                        )
+                    record_click_event(user_id, pdf_data["_id"], "ig_start")
                     # Source locked permanently on first click — never overwritten
                     track_user_source(user_id, "IG", username, first_name, msa_id or "")
                 elif source == "yt":
                     # Deduplicated YT start click — only count each user once per PDF
-                    if _is_new_unique_click(user_id, pdf_data["_id"], "yt_start"):
-                        col_pdfs.update_one(
-                            {"_id": pdf_data["_id"]},
-                            {
-                                "$inc": {"yt_start_clicks": 1, "clicks": 1},
-                                "$set": {"last_yt_click": now_local(), "last_clicked_at": now_local()}
-                            }
-                        )
+                    record_click_event(user_id, pdf_data["_id"], "yt_start")
                     # Source locked permanently on first click — never overwritten
                     track_user_source(user_id, "YT", username, first_name, msa_id or "")
                 logger.info(f"📊 Analytics: User {user_id} clicked {source.upper()} link for PDF '{pdf_data.get('name')}'")
@@ -2824,14 +3021,7 @@ async def cmd_start(message: types.Message, state: FSMContext):
                     msa_id = allocate_msa_id(user_id, username, first_name)
                 
                 # Deduplicated IG CC click — only count each user once per IG content
-                if _is_new_unique_click(user_id, ig_content["_id"], "ig_cc"):
-                    col_ig_content.update_one(
-                        {"_id": ig_content["_id"]},
-                        {
-                            "$inc": {"ig_cc_clicks": 1},
-                            "$set": {"last_ig_cc_click": now_local()}
-                        }
-                    )
+                record_click_event(user_id, ig_content["_id"], "ig_cc")
                 
                 # Source locked permanently on first click — never overwritten
                 track_user_source(user_id, "IGCC", username, first_name, msa_id or "")
@@ -4129,14 +4319,7 @@ async def process_search_code(message: types.Message, state: FSMContext):
     try:
         yt_uid = message.from_user.id
         # Deduplicated YT code click — only count each user once per PDF
-        if _is_new_unique_click(yt_uid, pdf_doc["_id"], "yt_code"):
-            col_pdfs.update_one(
-                {"_id": pdf_doc["_id"]},
-                {
-                    "$inc": {"yt_code_clicks": 1, "clicks": 1},
-                    "$set": {"last_yt_code_click": now_local(), "last_clicked_at": now_local()}
-                }
-            )
+        record_click_event(yt_uid, pdf_doc["_id"], "yt_code")
         # Track user source permanently
         yt_username = message.from_user.username or "unknown"
         yt_firstname = message.from_user.first_name or "User"
@@ -6729,6 +6912,10 @@ async def cmd_bot_health(message: types.Message):
         healed = health_stats["auto_healed"]
         success_rate = (healed / total_errors * 100) if total_errors > 0 else 100
         
+        # Click pipeline throughput (amortized DB time per click)
+        flushed = click_pipeline_stats["flushed"]
+        per_click_ms = (click_pipeline_stats["total_flush_ms"] / flushed) if flushed else 0.0
+        
         await message.answer(
             f"🏥 **BOT HEALTH STATUS**\n"
             f"━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
@@ -6748,6 +6935,14 @@ async def cmd_bot_health(message: types.Message):
             f"• Owner Alerts: `{health_stats['owner_notified']}`\n\n"
             f"**🕐 Last Error:**\n"
             f"• {last_error_info}\n\n"
+            f"**📈 Click Pipeline:**\n"
+            f"• Queued: `{_click_queue.qsize()}` | Flushed: `{flushed}` in `{click_pipeline_stats['batches']}` batches\n"
+            f"• Counted (unique): `{click_pipeline_stats['unique']}` | Overflowed: `{click_pipeline_stats['overflowed']}` | Dropped: `{click_pipeline_stats['dropped']}` | Counter retries: `{len(_click_inc_retry)}`\n"
+            f"• Amortized: `{per_click_ms:.3f} ms`/click | Last batch: `{click_pipeline_stats['last_flush_ms']:.1f} ms`\n\n"
+            f"**🔌 Mongo Pool:**\n"
+            f"• `{pool_summary()}`\n\n"
+            f"**📨 Telegram Queue:**\n"
+            f"• `{governor_summary(BOT_TOKEN)}`\n\n"
             f"━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
             f"_Health checks run automatically every hour_",
             parse_mode=ParseMode.MARKDOWN
@@ -6898,6 +7093,7 @@ async def reset_select_target(message: types.Message, state: FSMContext):
             "• `bot8_settings`\n"
             "• `live_terminal_logs`\n"
             "• `bot3_user_activity`\n"
+            "• `bot3_click_rollups`\n"
             "• `bot8_state_persistence`\n"
         )
     elif text == "🤖 RESET BOT 2 DATA":
@@ -7019,6 +7215,7 @@ async def reset_confirm2(message: types.Message, state: FSMContext):
             results["bot8_settings"]      = col_bot8_settings.delete_many({}).deleted_count
             results["live_terminal_logs"] = col_live_logs.delete_many({}).deleted_count
             results["bot3_user_activity"] = db["bot3_user_activity"].delete_many({}).deleted_count
+            results["bot3_click_rollups"] = col_click_rollups.delete_many({}).deleted_count
             results["bot8_state_persist"] = db["bot8_state_persistence"].delete_many({}).deleted_count
 
         else:  # bot10
@@ -7712,7 +7909,6 @@ async def _send_col_json(col_name: str, unique_key: str, now, dest_id: int) -> t
         )
         await bot.send_document(dest_id, BufferedInputFile(data, filename=fname), caption=cap, parse_mode="HTML")
         total_bytes += len(data)
-        await asyncio.sleep(0.5)
 
     return len(records), total_bytes
 
@@ -8089,11 +8285,15 @@ async def _health_handler(request: aiohttp_web.Request) -> aiohttp_web.Response:
         "uptime": f"{h}h {m}m",
         "errors_caught": health_stats["errors_caught"],
         "auto_healed": health_stats["auto_healed"],
+        "mongo_pool": pool_stats(),
+        "telegram_queue": governor_for(BOT_TOKEN).stats(),
     })
 
 
 async def start_health_server():
     """Start the lightweight aiohttp web server for Render health checks + webhook."""
+    if HOSTED:
+        return None  # main.py serves /health and the webhook route
     if "PORT" not in os.environ:
         logger.info("🌐 Health server skipped (PORT not set — local dev mode)")
         return None
@@ -8115,6 +8315,8 @@ async def start_health_server():
     return runner
 
 
+boot.mark("handlers")
+
 # ==========================================
 # 🚀 MAIN FUNCTION — Enterprise Launch
 # ==========================================
@@ -8150,6 +8352,8 @@ async def main():
             )
             raise
 
+        boot.mark("telegram auth")
+
         # ── Start Render health check web server ─────────────────
         health_runner = await start_health_server()
 
@@ -8161,6 +8365,7 @@ async def main():
             asyncio.create_task(periodic_state_saver(),    name="state_saver"),
             asyncio.create_task(inactive_member_monitor(),    name="inactive_member_monitor"),
             asyncio.create_task(broadcast_live_sync(),        name="broadcast_live_sync"),
+            asyncio.create_task(click_event_flusher(),        name="click_event_flusher"),
         ]
         
         # ── NEW: Unified weekly backup (stores in DB, no delivery) ──
@@ -8223,13 +8428,15 @@ async def main():
             await bot.delete_webhook(drop_pending_updates=True)
             await bot.set_webhook(_WEBHOOK_URL)
             logger.info(f"✅ Webhook set: {_WEBHOOK_URL}")
+            boot.ready()
             # Webhook handler is registered in start_health_server()
             # Just keep alive — aiohttp serves incoming Telegram updates
             await asyncio.Event().wait()
         else:
             # ── POLLING MODE (local dev fallback) ──────────────────────────
             logger.info("ℹ️ No RENDER_EXTERNAL_URL — using polling (local dev mode)")
-            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+            boot.ready()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), handle_signals=not HOSTED)
 
     except TelegramUnauthorizedError as e:
         logger.critical(f"💥 Fatal startup error: {e}")
@@ -1,3 +1,6 @@
+from boot_profile import BootProfiler
+boot = BootProfiler("bot2")
+
 import asyncio
 import os
 import sys
@@ -12,7 +15,11 @@ from aiogram.filters import Command
 from aiogram.types import ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton, BufferedInputFile, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from pymongo import MongoClient
+from index_migrations import IndexRegistry
+from hosting import HOSTED, telegram_session
+from mongo_client import get_client, analytics, pool_stats, pool_summary
+from access_cache import AdminSnapshot
+from telegram_governor import governor_for, governor_summary
 from bson.objectid import ObjectId
 from aiogram.fsm.storage.memory import MemoryStorage
 import aiohttp
@@ -20,6 +27,7 @@ from aiogram.exceptions import TelegramNetworkError, TelegramServerError, Telegr
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiogram.types import TelegramObject
 from typing import Callable, Dict, Any, Awaitable
+boot.mark("imports")
 
 # Fix Windows console encoding for emojis
 if sys.platform == 'win32':
@@ -121,18 +129,8 @@ print(f"🤖 Bot 2 Token: {BOT_TOKEN[:20]}...")
 print(f"🤖 Bot 1 Token: {BOT_8_TOKEN[:20]}...")
 
 # MongoDB Connection — Single database: MSANodeDB (shared by bot8, bot9, bot10)
-client = MongoClient(
-    MONGO_URI,
-    maxPoolSize=50,
-    minPoolSize=5,
-    maxIdleTimeMS=30000,
-    serverSelectionTimeoutMS=5000,
-    connectTimeoutMS=10000,
-    socketTimeoutMS=30000,
-    retryWrites=True,
-    retryReads=True,
-    w="majority",
-)
+# Pool sizing, timeouts, compression and write concern: see mongo_client.py
+client = get_client(MONGO_URI, app="bot2")
 db = client[MONGO_DB_NAME]  # MSANodeDB on Render
 # Guard: refuse to start if pointed at the wrong database
 if db.name != "MSANodeDB":
@@ -170,153 +168,87 @@ print(f"💾 Connected to MongoDB: {MONGO_DB_NAME} (single shared database for B
 print(f"📁 Collections: msa_ids, user_verification, banned_users, suspended_features, support_tickets,")
 print(f"               bot10_user_tracking, bot3_pdfs, bot3_ig_content, bot8_offline_log, bot3_tutorials")
 
-# Create unique indexes to prevent duplicates
-try:
-    col_broadcasts.create_index("broadcast_id", unique=True)
-    col_broadcasts.create_index("index", unique=True)
-    col_user_tracking.create_index("user_id", unique=True)  # One user = one record
-    
-    # Support tickets performance indexes (CRITICAL for scaling to millions of users)
-    col_support_tickets.create_index([("status", 1), ("created_at", -1)])  # List by status
-    col_support_tickets.create_index([("user_id", 1), ("created_at", -1)])  # User lookups
-    col_support_tickets.create_index([("msa_id", 1)])  # MSA ID lookups
-    col_support_tickets.create_index([("status", 1), ("resolved_at", 1)])  # Cleanup queries
-    col_support_tickets.create_index([("user_name", "text"), ("username", "text")])  # Text search
-    
-    # Cleanup collection indexes
-    col_cleanup_backups.create_index([("backup_date", -1)])  # Latest backup queries
-    col_cleanup_logs.create_index([("cleanup_date", -1)])  # Latest log queries
-    
-    # Bot 2 backups collection indexes
-    col_bot10_backups.create_index([("backup_date", -1)])  # Latest backup first
-    col_bot10_backups.create_index([("backup_type", 1)])  # Filter by type
-
-    # Bot 1 backups collection indexes
-    col_bot8_backups.create_index([("backup_date", -1)])
-    col_bot8_backups.create_index([("backup_type", 1)])
-    col_bot8_backups.create_index([("bot", 1)])
-
-    # Bot 1 offline log index
-    col_offline_log.create_index([("triggered_at", -1)])   # Latest events first
-
-    # Permanently banned MSA index
-    col_permanently_banned_msa.create_index("user_id")
-    col_permanently_banned_msa.create_index("msa_id")
-
-    # Banned users — enforce one record per user_id at DB level
-    col_banned_users.create_index("user_id", unique=True)
-
-    # Suspended features — matches upsert logic, one doc per user_id
-    col_suspended_features.create_index("user_id", unique=True)
-    
-    # Admin collection indexes
-    col_admins.create_index("user_id", unique=True)  # One admin record per user
-    col_admins.create_index([("added_at", -1)])  # Latest admins first
-    
-    # Access attempts indexes for spam detection
-    col_access_attempts.create_index([("user_id", 1), ("attempted_at", -1)])  # Spam queries
-    col_access_attempts.create_index([("attempted_at", -1)])  # Cleanup old attempts
-    
-    # Runtime state index (restart recovery)
-    db["bot10_runtime_state"].create_index("state_key", unique=True)
-    
-    # ── TTL AUTO-EXPIRY INDEXES ────────────────────────────────────────────────
-    # These prevent unbounded growth in log/attempt collections.
-    # Each is in its own try/except so a failure never blocks startup.
-    # Drop-before-create avoids the "already exists with different options" error on redeploy.
-
-    # bot10_access_attempts — auto-delete after 7 days
-    try:
-        try:
-            col_access_attempts.drop_index("attempted_at_ttl_7d")
-        except Exception:
-            pass
-        col_access_attempts.create_index(
-            [("attempted_at", 1)],
-            expireAfterSeconds=604_800,   # 7 days
-            sparse=True,
-            name="attempted_at_ttl_7d"
-        )
-        print("✅ TTL index set: bot10_access_attempts → 7-day auto-purge")
-    except Exception as _ttl_err:
-        print(f"⚠️ TTL index warning (access_attempts): {_ttl_err}")
-
-    # cleanup_logs — auto-delete after 30 days
-    try:
-        try:
-            col_cleanup_logs.drop_index("cleanup_date_ttl_30d")
-        except Exception:
-            pass
-        col_cleanup_logs.create_index(
-            [("cleanup_date", 1)],
-            expireAfterSeconds=2_592_000,  # 30 days
-            sparse=True,
-            name="cleanup_date_ttl_30d"
-        )
-        print("✅ TTL index set: cleanup_logs → 30-day auto-purge")
-    except Exception as _ttl_err:
-        print(f"⚠️ TTL index warning (cleanup_logs): {_ttl_err}")
-
-    # bot8_offline_log — auto-delete after 90 days (maintenance ON/OFF events)
-    try:
-        try:
-            col_offline_log.drop_index("triggered_at_ttl_90d")
-        except Exception:
-            pass
-        col_offline_log.create_index(
-            [("triggered_at", 1)],
-            expireAfterSeconds=7_776_000,  # 90 days
-            sparse=True,
-            name="triggered_at_ttl_90d"
-        )
-        print("✅ TTL index set: bot8_offline_log → 90-day auto-purge")
-    except Exception as _ttl_err:
-        print(f"⚠️ TTL index warning (offline_log): {_ttl_err}")
-
-    # bot3_user_activity (click dedup) — auto-delete after 180 days
-    # Without this, every user×item click accumulates permanently → millions of records
-    try:
-        try:
-            db["bot3_user_activity"].drop_index("first_click_at_ttl_180d")
-        except Exception:
-            pass
-        db["bot3_user_activity"].create_index(
-            [("first_click_at", 1)],
-            expireAfterSeconds=15_552_000,  # 180 days
-            sparse=True,
-            name="first_click_at_ttl_180d"
-        )
-        print("✅ TTL index set: bot3_user_activity → 180-day auto-purge")
-    except Exception as _ttl_err:
-        print(f"⚠️ TTL index warning (user_activity): {_ttl_err}")
-
-    # live_terminal_logs — auto-delete after 3 days
-    # Bot1 middleware logs EVERY message here; adding TTL prevents unbounded growth
-    # on top of the existing manual trim (belt and suspenders)
-    try:
-        _live_logs_col = db["live_terminal_logs"]  # col_live_logs defined later — use db[] directly here
-        try:
-            _live_logs_col.drop_index("created_at_ttl_3d")
-        except Exception:
-            pass
-        _live_logs_col.create_index(
-            [("created_at", 1)],
-            expireAfterSeconds=259_200,  # 3 days
-            sparse=True,
-            name="created_at_ttl_3d"
-        )
-        print("✅ TTL index set: live_terminal_logs → 3-day auto-purge")
-    except Exception as _ttl_err:
-        print(f"⚠️ TTL index warning (live_terminal_logs): {_ttl_err}")
-
-    print("✅ Database indexes created for optimal performance")
-except Exception as e:
-    print(f"⚠️ Index creation warning: {str(e)}")  # May already exist
+boot.mark("mongo")
+
+# Indexes are declared once; index_migrations applies only entries that are new
+# or changed since the last boot (recorded in MongoDB), in a background thread.
+indexes = IndexRegistry(db, "bot2")
+indexes.index(col_broadcasts, "broadcast_id", unique=True)
+indexes.index(col_broadcasts, "index", unique=True)
+indexes.index(col_user_tracking, "user_id", unique=True)  # One user = one record
+indexes.index(col_user_tracking, "source")                # Broadcast categories / source counts
+
+# Support tickets performance indexes (CRITICAL for scaling to millions of users)
+indexes.index(col_support_tickets, [("status", 1), ("created_at", -1)])  # List by status
+indexes.index(col_support_tickets, [("user_id", 1), ("created_at", -1)])  # User lookups
+indexes.index(col_support_tickets, [("msa_id", 1)])  # MSA ID lookups
+indexes.index(col_support_tickets, [("status", 1), ("resolved_at", 1)])  # Cleanup queries
+indexes.index(col_support_tickets, [("user_name", "text"), ("username", "text")])  # Text search
+
+# Cleanup collection indexes
+indexes.index(col_cleanup_backups, [("backup_date", -1)])  # Latest backup queries
+indexes.index(col_cleanup_logs, [("cleanup_date", -1)])  # Latest log queries
+
+# Bot 2 backups collection indexes
+indexes.index(col_bot10_backups, [("backup_date", -1)])  # Latest backup first
+indexes.index(col_bot10_backups, [("backup_type", 1)])  # Filter by type
+
+# Bot 1 backups collection indexes
+indexes.index(col_bot8_backups, [("backup_date", -1)])
+indexes.index(col_bot8_backups, [("backup_type", 1)])
+indexes.index(col_bot8_backups, [("bot", 1)])
+
+# Bot 1 offline log index
+indexes.index(col_offline_log, [("triggered_at", -1)])   # Latest events first
+
+# Permanently banned MSA index
+indexes.index(col_permanently_banned_msa, "user_id")
+indexes.index(col_permanently_banned_msa, "msa_id")
+
+# Banned users — enforce one record per user_id at DB level
+indexes.index(col_banned_users, "user_id", unique=True)
+
+# Suspended features — matches upsert logic, one doc per user_id
+indexes.index(col_suspended_features, "user_id", unique=True)
+
+# Admin collection indexes
+indexes.index(col_admins, "user_id", unique=True)  # One admin record per user
+indexes.index(col_admins, [("added_at", -1)])  # Latest admins first
+
+# Access attempts indexes for spam detection
+indexes.index(col_access_attempts, [("user_id", 1), ("attempted_at", -1)])  # Spam queries
+indexes.index(col_access_attempts, [("attempted_at", -1)])  # Cleanup old attempts
+
+# Runtime state index (restart recovery)
+indexes.index(db["bot10_runtime_state"], "state_key", unique=True)
+
+# ── TTL AUTO-EXPIRY INDEXES ────────────────────────────────────────────────
+# These prevent unbounded growth in log/attempt collections. Changing a TTL
+# here changes the spec hash, so the registry rebuilds that one index.
+indexes.index(col_access_attempts, [("attempted_at", 1)], expireAfterSeconds=604_800,       # 7 days
+              sparse=True, replace=True, name="attempted_at_ttl_7d")
+indexes.index(col_cleanup_logs, [("cleanup_date", 1)], expireAfterSeconds=2_592_000,        # 30 days
+              sparse=True, replace=True, name="cleanup_date_ttl_30d")
+indexes.index(col_offline_log, [("triggered_at", 1)], expireAfterSeconds=7_776_000,         # 90 days
+              sparse=True, replace=True, name="triggered_at_ttl_90d")
+# Without this, every user×item click accumulates permanently → millions of records
+indexes.index(db["bot3_user_activity"], [("first_click_at", 1)], expireAfterSeconds=15_552_000,  # 180 days
+              sparse=True, replace=True, name="first_click_at_ttl_180d")
+# Bot1 middleware logs EVERY message here (on top of the manual trim)
+indexes.index(db["live_terminal_logs"], [("created_at", 1)], expireAfterSeconds=259_200,    # 3 days
+              sparse=True, replace=True, name="created_at_ttl_3d")
+
+# Hot queries that must stay index-backed (reported by the audit if not)
+indexes.expect(col_user_tracking, "source")
+indexes.expect(col_user_verification, "vault_left_at", "vault_joined")
+
+boot.background("indexes", indexes.apply)
 
 # Initialize bot and dispatcher
-bot = Bot(token=BOT_TOKEN)  # Bot 2 - Admin interface
-bot_8 = Bot(token=BOT_8_TOKEN)  # Bot 1 - Message delivery
+bot = Bot(token=BOT_TOKEN, session=telegram_session())  # Bot 2 - Admin interface
+bot_8 = Bot(token=BOT_8_TOKEN, session=telegram_session())  # Bot 1 - Message delivery
 dp = Dispatcher(storage=MemoryStorage())
+dp.update.outer_middleware(boot.first_update_middleware)
 
 
 class Bot2BanBlockMiddleware(BaseMiddleware):
@@ -741,12 +673,17 @@ def get_terminal_logs(bot="bot2", limit=50):
 # ACCESS CONTROL FUNCTIONS
 # ==========================================
 
+# bot10_admins only changes through the admin handlers below, so role,
+# permission and lock checks read this snapshot; every write calls
+# admin_snapshot.invalidate() and the TTL catches out-of-band edits.
+admin_snapshot = AdminSnapshot(lambda: col_admins)
+
 async def is_admin(user_id: int) -> bool:
     """Check if user is an admin or the master admin AND is unlocked"""
     if user_id == MASTER_ADMIN_ID:
         return True
     
-    admin = col_admins.find_one({"user_id": user_id})
+    admin = admin_snapshot.admin_doc(user_id)
     if not admin:
         return False
     
@@ -793,7 +730,7 @@ async def has_permission(user_id: int, permission: str) -> bool:
     if user_id == MASTER_ADMIN_ID:
         return True
     
-    admin = col_admins.find_one({"user_id": user_id})
+    admin = admin_snapshot.admin_doc(user_id)
     if not admin:
         return False
 
@@ -823,7 +760,7 @@ async def get_main_menu(user_id: int = None):
         return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
     
     # Get user permissions
-    admin = col_admins.find_one({"user_id": user_id})
+    admin = admin_snapshot.admin_doc(user_id)
     if not admin:
         # Not an admin - show stripped minimal menu
         keyboard = [[KeyboardButton(text="📖 GUIDE")]]
@@ -872,7 +809,7 @@ async def get_main_menu(user_id: int = None):
 async def _push_instant_user_menu_refresh(user_id: int, context: str = "updated"):
     """Push the current effective menu to a user immediately after role/permission/lock changes."""
     try:
-        admin_doc = col_admins.find_one({"user_id": user_id})
+        admin_doc = admin_snapshot.admin_doc(user_id)
         if not admin_doc or admin_doc.get("locked", False):
             await bot.send_message(
                 user_id,
@@ -1311,7 +1248,7 @@ async def cmd_start(message: types.Message, state: FSMContext):
         return
     
     # 3. Unauthorized /start attempt (non-admin OR locked admin)
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     is_locked_admin = bool(admin_doc and admin_doc.get("locked", False))
     attempt_type = "LOCKED ADMIN" if is_locked_admin else "NON-ADMIN"
 
@@ -1503,6 +1440,9 @@ async def cmd_health(message: types.Message):
         f"• Owner Alerts: `{bot10_health['owner_notified']}`\n"
         f"• Consecutive Fails: `{bot10_health['consecutive_failures']}`\n\n"
         f"🕐 **Last Error:** {bot10_health['last_error'].strftime('%b %d %I:%M %p') if bot10_health['last_error'] else 'None'}\n\n"
+        f"🔌 **Mongo Pool:** `{pool_summary()}`\n"
+        f"📨 **Telegram Queue (Bot 2):** `{governor_summary(BOT_TOKEN)}`\n"
+        f"📨 **Telegram Queue (Bot 1 delivery):** `{governor_summary(BOT_8_TOKEN)}`\n\n"
         f"━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
         f"_Health checks every hour | Reports at 8:40 AM & PM_",
         parse_mode="Markdown"
@@ -1825,8 +1765,7 @@ async def _b8_execute_toggle(message: types.Message, state: FSMContext, directio
         for _attempt in range(3):
             try:
                 await bot_8.send_message(uid, broadcast_text, parse_mode="Markdown", reply_markup=_broadcast_kb)
-                sent += 1
-                await asyncio.sleep(0.04)  # ~25 msgs/sec — within Telegram rate limits
+                sent += 1  # paced by the session's rate governor
                 break
             except TelegramRetryAfter as rafe:
                 await asyncio.sleep(rafe.retry_after + 1)
@@ -1887,8 +1826,7 @@ async def _b8_execute_toggle_from_callback(callback: types.CallbackQuery, state:
         for _attempt in range(3):
             try:
                 await bot_8.send_message(uid, broadcast_text, parse_mode="Markdown", reply_markup=_broadcast_kb)
-                sent += 1
-                await asyncio.sleep(0.04)  # ~25 msgs/sec — within Telegram rate limits
+                sent += 1  # paced by the session's rate governor
                 break
             except TelegramRetryAfter as rafe:
                 await asyncio.sleep(rafe.retry_after + 1)
@@ -2314,8 +2252,7 @@ async def process_direct_broadcast(message: types.Message, state: FSMContext):
                         sent_msg = await bot_8.send_message(user_id, _chunk)
                     sent_message_ids[str(user_id)] = sent_msg.message_id
 
-                success_count += 1
-                await asyncio.sleep(0.04)  # ~25 msgs/sec — within Telegram rate limits
+                success_count += 1  # paced by the session's rate governor
                 break  # success — exit retry loop
 
             except TelegramRetryAfter as rafe:
@@ -2883,7 +2820,6 @@ async def process_edit_confirm(message: types.Message, state: FSMContext):
 
             edited_count += 1
             print(f"✅ Edited message for user {user_id}")
-            await asyncio.sleep(0.03)  # mild rate-limit throttle
 
         except TelegramRetryAfter as rafe:
             await asyncio.sleep(rafe.retry_after + 1)
@@ -3117,7 +3053,6 @@ async def confirm_delete_broadcast(message: types.Message, state: FSMContext):
                     await bot_8.delete_message(chat_id=int(user_id), message_id=message_id)
                     deleted_messages_count += 1
                     print(f"✅ Deleted message {message_id} from user {user_id}")
-                    await asyncio.sleep(0.03)  # gentle rate-limit
                 except Exception as e:
                     failed_message_deletes += 1
                     print(f"⚠️ Could not delete msg {message_id} for user {user_id}: {str(e)[:60]}")
@@ -3677,8 +3612,7 @@ async def confirm_button_broadcast(message: types.Message, state: FSMContext):
 
                     if sent_msg:
                         sent_message_ids[str(user_id)] = sent_msg.message_id
-                    success += 1
-                    await asyncio.sleep(0.04)  # ~25 msgs/sec
+                    success += 1  # paced by the session's rate governor
                     break  # success — exit retry loop
 
                 except TelegramRetryAfter as rafe:
@@ -4014,11 +3948,7 @@ async def process_send_broadcast(message: types.Message, state: FSMContext):
             else:
                 await bot_8.send_message(user_id, _rsnd_full_text)
             
-            success_count += 1
-            
-            # Small delay to avoid rate limits
-            if len(target_users) > 10:
-                await asyncio.sleep(0.1)  # 100ms delay for large broadcasts
+            success_count += 1  # paced by the session's rate governor
         except Exception as e:
             failed_count += 1
             error_msg = str(e)
@@ -5825,7 +5755,7 @@ async def process_ban_id(message: types.Message, state: FSMContext):
             return
 
         # Check if user is an admin — warn but still allow ban (admin record auto-removed on confirm)
-        admin_doc = col_admins.find_one({"user_id": user_id})
+        admin_doc = admin_snapshot.admin_doc(user_id)
         is_admin_user = bool(admin_doc)
         admin_role = admin_doc.get('role', 'Admin') if admin_doc else None
 
@@ -5894,6 +5824,7 @@ async def process_ban_confirm(message: types.Message, state: FSMContext):
             # If target is an admin, remove their admin record first
             if is_admin_user:
                 col_admins.delete_one({"user_id": user_id})
+                admin_snapshot.invalidate()
 
             # Add to banned_users collection
             col_banned_users.insert_one({
@@ -8346,7 +8277,7 @@ async def statistics_handler(message: types.Message, state: FSMContext):
         {"$sort": {"count": -1}},
         {"$limit": 5}
     ]
-    top_users = list(col_support_tickets.aggregate(pipeline))
+    top_users = list(analytics(col_support_tickets).aggregate(pipeline))
     
     # Average resolution time (for resolved tickets)
     resolved_tickets = list(col_support_tickets.find({
@@ -9600,6 +9531,9 @@ async def json_restore_receive(message: types.Message, state: FSMContext):
         total_upserted += upserted
         total_errors   += errors
 
+    if "bot10_admins" in results:
+        admin_snapshot.invalidate()
+
     # ── Build result message ──────────────────────────────────────────────────
     lines = ["✅ <b>JSON RESTORE COMPLETE</b>\n"]
     for col_name, r in results.items():
@@ -10144,7 +10078,7 @@ async def process_new_admin_id(message: types.Message, state: FSMContext):
         return
     
     # Check if already admin
-    existing = col_admins.find_one({"user_id": user_id})
+    existing = admin_snapshot.admin_doc(user_id)
     if existing:
         await message.answer(
             f"⚠️ User `{user_id}` is already an admin!\n\n"
@@ -10211,6 +10145,7 @@ async def process_new_admin_id(message: types.Message, state: FSMContext):
     
     try:
         col_admins.insert_one(admin_doc)
+        admin_snapshot.invalidate()
         log_action("➕ ADMIN ADDED", message.from_user.id, 
                   f"New Admin: {user_id}")
         
@@ -10380,7 +10315,7 @@ async def process_remove_admin_id(message: types.Message, state: FSMContext):
         return
     
     # Check if admin exists
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if not admin_doc:
         await message.answer(
             f"⚠️ User `{user_id}` is not an admin.",
@@ -10441,6 +10376,7 @@ async def process_remove_confirm(message: types.Message, state: FSMContext):
     
     try:
         result = col_admins.delete_one({"user_id": user_id})
+        admin_snapshot.invalidate()
         
         if result.deleted_count > 0:
             log_action("➖ ADMIN REMOVED", message.from_user.id, f"Removed admin: {user_id}")
@@ -10591,7 +10527,7 @@ async def process_permission_admin_id(message: types.Message, state: FSMContext)
         await message.answer("⚠️ Invalid User ID.")
         return
 
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if not admin_doc:
         await message.answer(f"⚠️ User {user_id} is not an admin.")
         return
@@ -10689,13 +10625,14 @@ async def process_permission_toggle(message: types.Message, state: FSMContext):
     # Handle SAVE CHANGES — permissions can always be saved, even while locked.
     # Locked admins won't have these active until unlocked.
     if message.text == "💾 SAVE CHANGES":
-        admin_doc = col_admins.find_one({"user_id": user_id})
+        admin_doc = admin_snapshot.admin_doc(user_id)
         is_locked = admin_doc.get("locked", False) if admin_doc else False
         try:
             col_admins.update_one(
                 {"user_id": user_id},
                 {"$set": {"permissions": current_perms, "updated_at": now_local()}}
             )
+            admin_snapshot.invalidate()
             log_action("🔐 PERMISSIONS UPDATED", message.from_user.id,
                       f"Updated permissions for {user_id} (locked={is_locked})")
             _perm_labels = {
@@ -10983,7 +10920,7 @@ async def process_role_admin_id(message: types.Message, state: FSMContext):
         await message.answer("⚠️ Invalid selection.")
         return
 
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if not admin_doc:
         await message.answer(f"⚠️ User {user_id} is not an admin.")
         return
@@ -11140,13 +11077,13 @@ async def process_role_selection(message: types.Message, state: FSMContext):
             return
 
         if ban_action == "ban":
-            admin_doc = col_admins.find_one({"user_id": user_id})
+            admin_doc = admin_snapshot.admin_doc(user_id)
             if not admin_doc:
                 await message.answer(f"⚠️ User {user_id} is not an admin.")
                 return
 
             # ── BLOCK: must remove admin first ──
-            is_still_admin = col_admins.find_one({"user_id": user_id}) is not None
+            is_still_admin = admin_snapshot.admin_doc(user_id) is not None
             if is_still_admin and user_id != MASTER_ADMIN_ID:
                 await message.answer(
                     f"🚫 **CANNOT BAN AN ACTIVE ADMIN**\n\n"
@@ -11260,7 +11197,7 @@ async def process_role_selection(message: types.Message, state: FSMContext):
         return
 
     # ── REGULAR ROLE UPDATE ──
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if not admin_doc:
         await message.answer("⚠️ Admin not found. Session expired.", reply_markup=get_admin_menu())
         await state.clear()
@@ -11276,6 +11213,7 @@ async def process_role_selection(message: types.Message, state: FSMContext):
         update_dict["permissions"] = _ROLE_PERMISSION_TEMPLATES.get(new_role, [])
 
     col_admins.update_one({"user_id": user_id}, {"$set": update_dict})
+    admin_snapshot.invalidate()
     log_action("👔 ROLE CHANGED", message.from_user.id, f"Changed {user_id} to {new_role} (mode={role_type})")
 
     # ── If admin is LOCKED — save silently, show pending note ──
@@ -11473,6 +11411,7 @@ async def owner_transfer_step3(message: types.Message, state: FSMContext):
         {"user_id": target_id},
         {"$set": {"role": "Owner", "updated_at": now_local()}}
     )
+    admin_snapshot.invalidate()
     log_action("👑 OWNERSHIP TRANSFERRED", message.from_user.id, f"Transferred ownership to {target_id}")
 
     try:
@@ -11595,7 +11534,7 @@ async def process_lock_admin_selection(message: types.Message, state: FSMContext
         await message.answer("🚫 You cannot lock or unlock the Master Admin.")
         return
     
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if not admin_doc:
         await message.answer(f"⚠️ User {user_id} is not an admin.")
         return
@@ -11646,7 +11585,7 @@ async def execute_lock_action(message: types.Message, state: FSMContext):
         await state.clear()
         return
         
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if not admin_doc:
         await message.answer(f"⚠️ User {user_id} is no longer an admin.")
         return
@@ -11674,6 +11613,7 @@ async def execute_lock_action(message: types.Message, state: FSMContext):
         {"user_id": user_id},
         {"$set": {"locked": new_lock, "updated_at": now_local()}}
     )
+    admin_snapshot.invalidate()
     
     status_text = "LOCKED (Inactive)" if new_lock else "UNLOCKED (Active)"
     icon = "🔒" if new_lock else "🔓"
@@ -11871,7 +11811,7 @@ async def process_ban_choice(message: types.Message, state: FSMContext):
                 {"user_id": uid, "scope": "bot2"},
                 sort=[("banned_at", -1)]
             ) or {}
-            admin_doc = col_admins.find_one({"user_id": uid}) or {}
+            admin_doc = admin_snapshot.admin_doc(uid) or {}
             name = admin_doc.get("name", str(uid))
             role = admin_doc.get("role", "User")
             banned_at = ban_doc.get("banned_at")
@@ -11936,7 +11876,7 @@ async def process_ban_choice(message: types.Message, state: FSMContext):
         # Build selection list (name from admin record when available)
         unban_items = []
         for uid in banned_user_ids:
-            admin_doc = col_admins.find_one({"user_id": uid})
+            admin_doc = admin_snapshot.admin_doc(uid)
             name = admin_doc.get("name", str(uid)) if admin_doc else str(uid)
             unban_items.append({"user_id": uid, "name": name})
 
@@ -12011,7 +11951,7 @@ async def process_ban_choice(message: types.Message, state: FSMContext):
                 {"user_id": user_id, "scope": "bot2"},
                 sort=[("banned_at", -1)]
             ) or {}
-            admin_doc = col_admins.find_one({"user_id": user_id}) or {}
+            admin_doc = admin_snapshot.admin_doc(user_id) or {}
             name = admin_doc.get("name", str(user_id))
             role = admin_doc.get("role", "User")
             banned_at = ban_doc.get("banned_at")
@@ -12092,7 +12032,7 @@ async def process_ban_config_id(message: types.Message, state: FSMContext):
         return
 
     # Is this user an active admin?
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if admin_doc:
         admin_role = admin_doc.get("role", "Admin")
         admin_locked = admin_doc.get("locked", False)
@@ -13867,7 +13807,6 @@ async def _send_col_json_bot2(col_name: str, unique_key: str, now) -> tuple:
             parse_mode="HTML",
         )
         total_bytes += len(data)
-        await asyncio.sleep(0.5)
 
     return len(records), total_bytes
 
@@ -14266,11 +14205,16 @@ async def _health_handler_bot10(request: aiohttp_web.Request) -> aiohttp_web.Res
         "uptime": f"{h}h {m}m",
         "errors_caught": bot10_health["errors_caught"],
         "auto_healed": bot10_health["auto_healed"],
+        "mongo_pool": pool_stats(),
+        "telegram_queue": {"bot2": governor_for(BOT_TOKEN).stats(), "bot1_delivery": governor_for(BOT_8_TOKEN).stats()},
+        "admin_cache": admin_snapshot.stats(),
     })
 
 
 async def start_health_server_bot10():
     """Start the lightweight aiohttp web server for Render health checks + webhook."""
+    if HOSTED:
+        return None  # main.py serves /health and the webhook route
     if "PORT" not in os.environ:
         print("🌐 Health server skipped (PORT not set — local dev mode)")
         return None
@@ -14292,6 +14236,8 @@ async def start_health_server_bot10():
     return runner
 
 
+boot.mark("handlers")
+
 # ==========================================
 # MAIN EXECUTION — ENTERPRISE READY
 # ==========================================
@@ -14339,6 +14285,7 @@ async def main():
     # ── 3. Register global error handler ──
     dp.errors.register(bot10_global_error_handler)
     print("🏥 Auto-healer registered — all errors will be caught and handled")
+    boot.mark("restore state")
 
     try:
         # ── 3b. Start Render health check web server ──
@@ -14424,6 +14371,7 @@ async def main():
             print("🔄 Broadcasts reindexed on startup — all indices are sequential.")
         except Exception as e:
             print(f"⚠️ Broadcast reindex on startup failed: {e}")
+        boot.mark("startup tasks")
 
         # ── 7. Start webhook or polling ──────────────────────────────────────────
         print("\n✅ All systems started...\n")
@@ -14433,12 +14381,14 @@ async def main():
             await bot.delete_webhook(drop_pending_updates=True)
             await bot.set_webhook(_WEBHOOK_URL)
             print(f"✅ Webhook set: {_WEBHOOK_URL}")
+            boot.ready()
             # Webhook handler registered in start_health_server_bot10()
             await asyncio.Event().wait()
         else:
             # ── POLLING MODE (local dev fallback) ───────────────────────────
             print("ℹ️ No RENDER_EXTERNAL_URL — using polling (local dev mode)")
-            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+            boot.ready()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), handle_signals=not HOSTED)
 
     except Exception as e:
         print(f"❌ FATAL ERROR during startup: {e}")
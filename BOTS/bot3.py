@@ -1,3 +1,6 @@
+from boot_profile import BootProfiler
+boot = BootProfiler("bot3")
+
 import logging
 import asyncio
 import os
@@ -19,19 +22,25 @@ from aiogram.filters import Command, StateFilter
 from aiogram.types import ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import pymongo
-from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure, DuplicateKeyError
+from index_migrations import IndexRegistry
+from hosting import HOSTED, telegram_session
+from mongo_client import get_client, analytics, pool_stats, pool_summary, MONGO_MIN_POOL_SIZE, MONGO_MAX_POOL_SIZE
+from telegram_governor import governor_for
+from access_cache import AdminSnapshot
 import re
 import string
 import random
+import time
 from bson.objectid import ObjectId
 import pytz
 from zoneinfo import ZoneInfo
 from logging.handlers import RotatingFileHandler
+from collections import deque
 from aiohttp import web
 import html as _html
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+boot.mark("imports")
 
 # Load environment variables.
 # Priority:
@@ -77,11 +86,16 @@ except ImportError:
 
 # Database Configuration
 MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME", "MSANodeDB")  # Single database — all bots use MSANodeDB
-MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
-MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 10))
-MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 10000))
 ALLOW_DB_FINGERPRINT_CHANGE = os.environ.get("ALLOW_DB_FINGERPRINT_CHANGE", "false").lower() == "true"
 
+# MSA Code Allocator Configuration
+# Auto IDs start in the 4-digit tier (MSA1000..MSA9999). Once a tier passes the
+# expand threshold, new codes are drawn from the next wider tier (MSA10000..MSA99999,
+# ...) up to MSA_CODE_MAX_DIGITS. Keep MSA_CODE_MAX_DIGITS=4 for the strict legacy pool.
+MSA_CODE_MIN_DIGITS = 4
+MSA_CODE_MAX_DIGITS = max(MSA_CODE_MIN_DIGITS, int(os.environ.get("MSA_CODE_MAX_DIGITS", 4)))
+MSA_POOL_EXPAND_THRESHOLD = float(os.environ.get("MSA_POOL_EXPAND_THRESHOLD", 0.90))
+
 # Security Configuration
 RATE_LIMIT_SPAM_THRESHOLD = int(os.environ.get("RATE_LIMIT_SPAM_THRESHOLD", 10))
 RATE_LIMIT_SPAM_WINDOW_SECONDS = int(os.environ.get("RATE_LIMIT_SPAM_WINDOW_SECONDS", 30))
@@ -126,6 +140,11 @@ TRACK_MEMORY_USAGE = os.environ.get("TRACK_MEMORY_USAGE", "true").lower() == "tr
 TRACK_CPU_USAGE = os.environ.get("TRACK_CPU_USAGE", "true").lower() == "true"
 ALERT_HIGH_MEMORY_MB = int(os.environ.get("ALERT_HIGH_MEMORY_MB", 500))
 ALERT_HIGH_CPU_PERCENT = int(os.environ.get("ALERT_HIGH_CPU_PERCENT", 80))
+TERMINAL_BUFFER_LINES = int(os.environ.get("TERMINAL_BUFFER_LINES", 500))  # In-memory log lines kept for 🖥️ TERMINAL
+
+# Analytics Leaderboard Configuration
+LEADERBOARD_REFRESH_MINUTES = int(os.environ.get("LEADERBOARD_REFRESH_MINUTES", 10))
+LEADERBOARD_TOP_K = int(os.environ.get("LEADERBOARD_TOP_K", 200))
 
 # ==========================================
 # ENTERPRISE LOGGING SETUP
@@ -156,6 +175,43 @@ error_handler.setLevel(logging.ERROR)
 console_handler = logging.StreamHandler(sys.stdout)
 console_handler.setLevel(logging.INFO)
 
+class RingBufferLogHandler(logging.Handler):
+    """Keeps the most recent formatted log records in memory for the TERMINAL view."""
+
+    def __init__(self, capacity: int = 500):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        # WARNING+ kept separately so the WARN/ERROR filters reach further back
+        # than the INFO traffic in `records` would allow
+        self.warnings = deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            entry = (record.levelno, self.format(record))
+            self.records.append(entry)
+            if record.levelno >= logging.WARNING:
+                self.warnings.append(entry)
+        except Exception:
+            self.handleError(record)
+
+    def tail(self, lines_count: int, min_level: int = logging.NOTSET, keyword: str = None) -> list:
+        """Newest-last list of up to lines_count matching lines."""
+        keyword = keyword.lower() if keyword else None
+        matched = []
+        source = self.warnings if min_level >= logging.WARNING else self.records
+        for levelno, line in reversed(source):
+            if levelno < min_level or (keyword and keyword not in line.lower()):
+                continue
+            matched.append(line)
+            if len(matched) >= lines_count:
+                break
+        matched.reverse()
+        return matched
+
+# In-memory terminal buffer — TERMINAL refreshes are served from here without file I/O
+terminal_buffer_handler = RingBufferLogHandler(capacity=TERMINAL_BUFFER_LINES)
+terminal_buffer_handler.setLevel(logging.INFO)
+
 # Formatter
 formatter = logging.Formatter(
     '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
@@ -164,11 +220,12 @@ formatter = logging.Formatter(
 main_handler.setFormatter(formatter)
 error_handler.setFormatter(formatter)
 console_handler.setFormatter(formatter)
+terminal_buffer_handler.setFormatter(formatter)
 
 # Configure root logger
 logging.basicConfig(
     level=logging.INFO,
-    handlers=[main_handler, error_handler, console_handler]
+    handlers=[main_handler, error_handler, console_handler, terminal_buffer_handler]
 )
 logger = logging.getLogger(__name__)
 
@@ -202,6 +259,8 @@ class HealthMonitor:
         # Consecutive high-resource counters
         self.consecutive_cpu_high: int = 0
         self.consecutive_mem_high: int = 0
+        # Mongo pool checkouts that had already timed out at the last check
+        self.failed_checkouts_seen: int = 0
         self.system_metrics = {
             "uptime_start": now_local(),
             "total_requests": 0,
@@ -257,6 +316,15 @@ class HealthMonitor:
                     )
                     await self.auto_heal_database()
             
+            # Pool starvation: checkouts that timed out waiting for a connection
+            failed_checkouts = pool_stats()["failed_checkouts"]
+            if failed_checkouts > self.failed_checkouts_seen:
+                await self.send_alert(
+                    "WARNING",
+                    f"MongoDB pool starvation: {failed_checkouts - self.failed_checkouts_seen} checkout(s) timed out ({pool_summary()})"
+                )
+            self.failed_checkouts_seen = failed_checkouts
+            
             self.last_health_check = now_local()
             
         except Exception as e:
@@ -267,7 +335,7 @@ class HealthMonitor:
         """Attempt to auto-heal database connection (CRITICAL: Only on confirmed failures)"""
         try:
             logger.info("🔧 Attempting database auto-heal...")
-            global client, db, col_pdfs, col_ig_content, col_logs, col_admins, col_banned_users, col_user_activity, col_settings, col_backups
+            global client, db, col_pdfs, col_ig_content, col_logs, col_admins, col_banned_users, col_user_activity, col_settings, col_backups, col_leaderboards, col_click_rollups
             
             # SAFETY: Verify old collections still work before healing
             try:
@@ -277,21 +345,17 @@ class HealthMonitor:
             except:
                 logger.error("✅ Confirmed: Database connection is truly broken. Proceeding with auto-heal.")
             
-            # Close existing connection
-            try:
-                client.close()
-                logger.info("✅ Old connection closed")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not close old connection: {e}")
+            # Close existing connection. Hosted by main.py the client is shared
+            # with the other bots, so it is kept (pymongo reconnects on its own).
+            if not HOSTED:
+                try:
+                    client.close()
+                    logger.info("✅ Old connection closed")
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not close old connection: {e}")
             
             # Reconnect
-            new_client = pymongo.MongoClient(
-                MONGO_URI,
-                serverSelectionTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
-                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
-                maxPoolSize=MONGO_MAX_POOL_SIZE,
-                minPoolSize=MONGO_MIN_POOL_SIZE
-            )
+            new_client = get_client(MONGO_URI, app="bot3", fresh=not HOSTED)
             new_db = new_client[MONGO_DB_NAME]
             
             # Verify credentials and database name BEFORE reinitializing
@@ -316,6 +380,8 @@ class HealthMonitor:
             col_banned_users = db["bot3_banned_users"]
             col_user_activity = db["bot3_user_activity"]
             col_backups = db["bot3_backups"]
+            col_leaderboards = db["bot3_leaderboards"]
+            col_click_rollups = db["bot3_click_rollups"]
             
             # Verify collections are responsive
             try:
@@ -551,13 +617,17 @@ ROLES = {
     ]
 }
 
+# Admin docs (lock, owner flag, permissions) are read from this snapshot on
+# every message; admin handlers call admin_snapshot.invalidate() after writes.
+admin_snapshot = AdminSnapshot(lambda: col_admins)
+
 def is_admin(user_id: int) -> bool:
     """Check if user is MASTER_ADMIN or in bot3_admins collection"""
     global MASTER_ADMIN_ID # Allow global update
     if user_id == MASTER_ADMIN_ID:
         return True
     
-    admin = col_admins.find_one({"user_id": user_id})
+    admin = admin_snapshot.admin_doc(user_id)
     if admin:
         # CRITICAL FIX: Respect Lock Status
         if admin.get("is_locked", False):
@@ -579,7 +649,7 @@ def has_permission(user_id: int, required_perm: str) -> bool:
     if user_id == MASTER_ADMIN_ID:
         return True
         
-    admin = col_admins.find_one({"user_id": user_id})
+    admin = admin_snapshot.admin_doc(user_id)
     if not admin:
         return False
         
@@ -742,7 +812,7 @@ async def check_authorization_user(user: types.User, message: types.Message, act
     if user_id == MASTER_ADMIN_ID or user_id == OWNER_ID:
         return True
 
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
     if admin_doc:
         if admin_doc.get("is_locked", False):
             return False
@@ -781,7 +851,7 @@ async def check_authorization(message: types.Message, action_name: str = "access
         return True
     
     # 1. Fetch Admin Doc ONCE
-    admin_doc = col_admins.find_one({"user_id": user_id})
+    admin_doc = admin_snapshot.admin_doc(user_id)
 
     # 2. Process Admin
     if admin_doc:
@@ -797,14 +867,13 @@ async def check_authorization(message: types.Message, action_name: str = "access
         
         if current_name != message.from_user.full_name or current_username != message.from_user.username:
             try:
-                col_admins.update_one(
-                    {"user_id": user_id},
-                    {"$set": {
-                        "full_name": message.from_user.full_name,
-                        "username": message.from_user.username,
-                        "last_active": now_local()
-                    }}
-                )
+                fresh_info = {
+                    "full_name": message.from_user.full_name,
+                    "username": message.from_user.username,
+                    "last_active": now_local()
+                }
+                col_admins.update_one({"user_id": user_id}, {"$set": fresh_info})
+                admin_doc.update(fresh_info)  # keep the cached doc in step, no reload needed
             except Exception as e:
                 logger.error(f"Failed to update admin info: {e}")
 
@@ -852,21 +921,15 @@ async def check_authorization(message: types.Message, action_name: str = "access
 # ==========================================
 
 # Bot Setup
-bot = Bot(token=BOT_TOKEN)
+bot = Bot(token=BOT_TOKEN, session=telegram_session())
 dp = Dispatcher()
+dp.update.outer_middleware(boot.first_update_middleware)
 
 # Database Connection with Enterprise Configuration
 try:
     print("🔌 Connecting to MongoDB...")
-    client = pymongo.MongoClient(
-        MONGO_URI,
-        serverSelectionTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
-        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
-        maxPoolSize=MONGO_MAX_POOL_SIZE,
-        minPoolSize=MONGO_MIN_POOL_SIZE,
-        retryWrites=True,
-        retryReads=True
-    )
+    # Pool sizing, timeouts, compression and read preferences: see mongo_client.py
+    client = get_client(MONGO_URI, app="bot3")
     db = client[MONGO_DB_NAME]
     
     # Bot9 Management Collections
@@ -878,6 +941,8 @@ try:
     col_banned_users = db["bot3_banned_users"]
     col_user_activity = db["bot3_user_activity"]
     col_backups = db["bot3_backups"]  # Backup history collection
+    col_leaderboards = db["bot3_leaderboards"]  # Materialized analytics top-K snapshots
+    col_click_rollups = db["bot3_click_rollups"]  # Hourly/daily click buckets (written by bot1's click pipeline)
     
     # Test connection
     client.admin.command('ping')
@@ -952,125 +1017,6 @@ try:
         print(f"⚠️ DB fingerprint guard warning: {_fp_err}")
     # -- END DB FINGERPRINT GUARD --
 
-    # Create indexes for better performance (idempotent - skips if exists)
-    def create_index_safe(collection, keys, **kwargs):
-        """Helper to create index safely, ignoring if already exists"""
-        try:
-            collection.create_index(keys, **kwargs)
-        except Exception as e:
-            # Ignore if index already exists with different options
-            if "already exists" not in str(e).lower() and "indexkeyspecsconflict" not in str(e).lower():
-                raise
-    
-    try:
-        print("🔍 Creating database indexes...")
-        # Basic indexes with explicit names to avoid conflicts
-        create_index_safe(col_pdfs, "index", unique=True, name="pdf_index_unique")
-        create_index_safe(col_pdfs, "created_at", name="pdf_created_at")
-        create_index_safe(col_pdfs, "msa_code", sparse=True, name="pdf_msa_code")
-        create_index_safe(col_ig_content, "created_at", name="ig_created_at")
-        create_index_safe(col_ig_content, "cc_number", unique=True, name="ig_cc_number_unique")
-        create_index_safe(col_logs, "timestamp", name="log_timestamp")
-        
-        # Ban and activity tracking indexes (security)
-        create_index_safe(col_banned_users, "user_id", unique=True, name="banned_user_id_unique")
-        create_index_safe(col_user_activity, [("user_id", 1), ("timestamp", -1)], name="activity_user_time")
-        create_index_safe(col_user_activity, [("timestamp", -1)], name="activity_timestamp")
-        
-        # Analytics performance indexes (for scalability with millions of records)
-        create_index_safe(col_pdfs, [("clicks", -1)], sparse=True, name="pdf_clicks_desc")
-        create_index_safe(col_pdfs, [("affiliate_clicks", -1)], sparse=True, name="pdf_aff_clicks_desc")
-        create_index_safe(col_pdfs, [("ig_start_clicks", -1)], sparse=True, name="pdf_ig_clicks_desc")
-        create_index_safe(col_pdfs, [("yt_start_clicks", -1)], sparse=True, name="pdf_yt_clicks_desc")
-        create_index_safe(col_pdfs, [("yt_code_clicks", -1)], sparse=True, name="pdf_yt_code_clicks_desc")
-        create_index_safe(col_ig_content, [("ig_cc_clicks", -1)], sparse=True, name="ig_cc_clicks_desc")
-        
-        # Compound indexes for filtered analytics queries
-        create_index_safe(col_pdfs, [("affiliate_link", 1), ("affiliate_clicks", -1)], name="pdf_aff_link_clicks")
-        create_index_safe(col_pdfs, [("ig_start_code", 1), ("ig_start_clicks", -1)], name="pdf_ig_code_clicks")
-        create_index_safe(col_pdfs, [("yt_link", 1), ("yt_start_clicks", -1)], name="pdf_yt_link_clicks")
-        create_index_safe(col_pdfs, [("msa_code", 1), ("yt_code_clicks", -1)], name="pdf_msa_yt_clicks")
-        
-        # Backup collection indexes
-        create_index_safe(col_backups, "created_at", name="backup_created_at")
-        create_index_safe(col_backups, "filename", name="backup_filename")
-        
-        # Admin collection indexes
-        create_index_safe(col_admins, "user_id", unique=True, name="admin_user_id_unique")
-
-        # Settings collection — key field is the natural primary key
-        create_index_safe(col_settings, "key", unique=True, name="settings_key_unique")
-
-        # PDF lookup by yt_start_code (used by bot1 on every user click)
-        create_index_safe(col_pdfs, "yt_start_code", sparse=True, name="pdf_yt_start_code")
-        
-        print("✅ Database indexes created (optimized for millions of records)")
-    except Exception as idx_err:
-        print(f"⚠️ Warning: Some indexes could not be created: {idx_err}")
-        print("   Bot will continue, existing indexes will be used")
-
-    # ── TTL AUTO-EXPIRY INDEXES ────────────────────────────────────────────────
-    # Prevent unbounded growth of activity + log collections.
-    # Each block is independent — a failure in one never blocks the others or startup.
-    # Drop-before-create avoids "index already exists with different options" on re-deploy.
-
-    # bot3_user_activity — auto-delete rows after 7 days
-    try:
-        try:
-            col_user_activity.drop_index("activity_timestamp_ttl_7d")
-        except Exception:
-            pass
-        col_user_activity.create_index(
-            [("timestamp", 1)],
-            expireAfterSeconds=604_800,   # 7 days
-            sparse=True,
-            name="activity_timestamp_ttl_7d"
-        )
-        print("✅ TTL index set: bot3_user_activity → 7-day auto-purge")
-    except Exception as _ttl_err:
-        print(f"⚠️ TTL index warning (bot3_user_activity): {_ttl_err}")
-
-    # bot3_logs — auto-delete log rows after 7 days
-    try:
-        try:
-            col_logs.drop_index("log_timestamp_ttl_7d")
-        except Exception:
-            pass
-        col_logs.create_index(
-            [("timestamp", 1)],
-            expireAfterSeconds=604_800,   # 7 days
-            sparse=True,
-            name="log_timestamp_ttl_7d"
-        )
-        print("✅ TTL index set: bot3_logs → 7-day auto-purge")
-    except Exception as _ttl_err:
-        print(f"⚠️ TTL index warning (bot3_logs): {_ttl_err}")
-    
-    # Initialize click tracking fields for existing documents (migration)
-    try:
-        print("🔄 Initializing click tracking fields...")
-        # Update PDFs without click fields
-        pdf_updated = col_pdfs.update_many(
-            {"clicks": {"$exists": False}},
-            {"$set": {
-                "clicks": 0,
-                "affiliate_clicks": 0,
-                "ig_start_clicks": 0,
-                "yt_start_clicks": 0,
-                "yt_code_clicks": 0
-            }}
-        )
-        
-        # Update IG content without click fields
-        ig_updated = col_ig_content.update_many(
-            {"ig_cc_clicks": {"$exists": False}},
-            {"$set": {"ig_cc_clicks": 0}}
-        )
-        
-        print(f"✅ Click tracking initialized (PDFs: {pdf_updated.modified_count}, IG: {ig_updated.modified_count})")
-    except Exception as migration_err:
-        print(f"⚠️ Warning: Could not initialize click fields: {migration_err}")
-    
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     print("✅ DATABASE READY FOR ENTERPRISE SCALE")
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
@@ -1087,6 +1033,99 @@ except Exception as e:
     print("  3. Network connectivity")
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     sys.exit(1)
+boot.mark("mongo")
+
+def backfill_click_fields():
+    """Initialize click tracking fields for existing documents (one-shot migration)."""
+    print("🔄 Initializing click tracking fields...")
+    # Update PDFs without click fields
+    pdf_updated = col_pdfs.update_many(
+        {"clicks": {"$exists": False}},
+        {"$set": {
+            "clicks": 0,
+            "affiliate_clicks": 0,
+            "ig_start_clicks": 0,
+            "yt_start_clicks": 0,
+            "yt_code_clicks": 0
+        }}
+    )
+
+    # Update IG content without click fields
+    ig_updated = col_ig_content.update_many(
+        {"ig_cc_clicks": {"$exists": False}},
+        {"$set": {"ig_cc_clicks": 0}}
+    )
+
+    print(f"✅ Click tracking initialized (PDFs: {pdf_updated.modified_count}, IG: {ig_updated.modified_count})")
+
+
+# Indexes are declared once; index_migrations applies only entries that are new
+# or changed since the last boot (recorded in MongoDB), in a background thread.
+indexes = IndexRegistry(db, "bot3")
+# Basic indexes with explicit names to avoid conflicts
+indexes.index(col_pdfs, "index", unique=True, name="pdf_index_unique")
+indexes.index(col_pdfs, "created_at", name="pdf_created_at")
+indexes.index(col_ig_content, "created_at", name="ig_created_at")
+indexes.index(col_ig_content, "cc_number", unique=True, name="ig_cc_number_unique")
+indexes.index(col_logs, "timestamp", name="log_timestamp")
+
+# MSA codes are unique at DB level. The old non-unique index has the same key,
+# and missing/duplicate codes are repaired before the unique build.
+indexes.drop(col_pdfs, "pdf_msa_code")
+indexes.drop(col_pdfs, "pdf_msa_code_1")
+indexes.index(col_pdfs, "msa_code", unique=True, sparse=True, name="pdf_msa_code_unique", replace=True,
+              prepare=lambda: repair_missing_duplicate_msa_codes())
+
+# Ban and activity tracking indexes (security)
+indexes.index(col_banned_users, "user_id", unique=True, name="banned_user_id_unique")
+indexes.index(col_user_activity, [("user_id", 1), ("timestamp", -1)], name="activity_user_time")
+indexes.index(col_user_activity, [("timestamp", -1)], name="activity_timestamp")
+
+# Analytics performance indexes (for scalability with millions of records)
+indexes.index(col_pdfs, [("clicks", -1)], sparse=True, name="pdf_clicks_desc")
+indexes.index(col_pdfs, [("affiliate_clicks", -1)], sparse=True, name="pdf_aff_clicks_desc")
+indexes.index(col_pdfs, [("ig_start_clicks", -1)], sparse=True, name="pdf_ig_clicks_desc")
+indexes.index(col_pdfs, [("yt_start_clicks", -1)], sparse=True, name="pdf_yt_clicks_desc")
+indexes.index(col_pdfs, [("yt_code_clicks", -1)], sparse=True, name="pdf_yt_code_clicks_desc")
+indexes.index(col_ig_content, [("ig_cc_clicks", -1)], sparse=True, name="ig_cc_clicks_desc")
+
+# Compound indexes for filtered analytics queries
+indexes.index(col_pdfs, [("affiliate_link", 1), ("affiliate_clicks", -1)], name="pdf_aff_link_clicks")
+indexes.index(col_pdfs, [("ig_start_code", 1), ("ig_start_clicks", -1)], name="pdf_ig_code_clicks")
+indexes.index(col_pdfs, [("yt_link", 1), ("yt_start_clicks", -1)], name="pdf_yt_link_clicks")
+indexes.index(col_pdfs, [("msa_code", 1), ("yt_code_clicks", -1)], name="pdf_msa_yt_clicks")
+
+# Backup collection indexes
+indexes.index(col_backups, "created_at", name="backup_created_at")
+indexes.index(col_backups, "filename", name="backup_filename")
+
+# Admin collection indexes
+indexes.index(col_admins, "user_id", unique=True, name="admin_user_id_unique")
+
+# Settings collection — key field is the natural primary key
+indexes.index(col_settings, "key", unique=True, name="settings_key_unique")
+
+# PDF lookup by yt_start_code (used by bot1 on every user click)
+indexes.index(col_pdfs, "yt_start_code", sparse=True, name="pdf_yt_start_code")
+
+# Leaderboard snapshots — one document per analytics category
+indexes.index(col_leaderboards, "category", unique=True, name="leaderboard_category_unique")
+
+# ── TTL AUTO-EXPIRY INDEXES ────────────────────────────────────────────────
+# Prevent unbounded growth of activity + log collections (7 days each).
+indexes.index(col_user_activity, [("timestamp", 1)], expireAfterSeconds=604_800,
+              sparse=True, replace=True, name="activity_timestamp_ttl_7d")
+indexes.index(col_logs, [("timestamp", 1)], expireAfterSeconds=604_800,
+              sparse=True, replace=True, name="log_timestamp_ttl_7d")
+
+indexes.step("click_tracking_fields", backfill_click_fields)
+
+# Hot queries that must stay index-backed (startup log + system health check)
+indexes.expect(col_pdfs, "msa_code")
+indexes.expect(col_pdfs, "yt_start_code")
+indexes.expect(col_user_activity, "user_id", "timestamp")
+
+boot.background("indexes", indexes.apply)
 
 # --- FSM States ---
 class PDFStates(StatesGroup):
@@ -1291,16 +1330,25 @@ async def get_next_pdf_index():
     latest = col_pdfs.find_one(sort=[("index", -1)])
     return (latest["index"] + 1) if latest else 1
 
+MSA_CODE_PATTERN = rf"^MSA\d{{{MSA_CODE_MIN_DIGITS},{MSA_CODE_MAX_DIGITS}}}$"
+
+def is_valid_msa_code_format(code) -> bool:
+    """True if code is MSA + 4..MSA_CODE_MAX_DIGITS digits."""
+    return bool(re.fullmatch(MSA_CODE_PATTERN, (code or "").strip().upper()))
+
 def validate_msa_code(code):
     """
-    Validates MSA code format: MSA + exactly 4 digits.
+    Validates MSA code format: MSA + exactly 4 digits (or up to MSA_CODE_MAX_DIGITS
+    digits when the wider code space is enabled).
     Returns (is_valid: bool, error_msg: str)
     """
     code = (code or "").strip().upper()
     if not code:
         return False, "⚠️ Code cannot be empty."
     
-    if not re.fullmatch(r'^MSA\d{4}$', code):
+    if not is_valid_msa_code_format(code):
+        if MSA_CODE_MAX_DIGITS > MSA_CODE_MIN_DIGITS:
+            return False, f"⚠️ Invalid format. Use {MSA_CODE_MIN_DIGITS}-{MSA_CODE_MAX_DIGITS} digits, e.g. MSA1234"
         return False, "⚠️ Invalid format. Use exactly 4 digits, e.g. MSA1234"
     
     return True, ""
@@ -1317,17 +1365,90 @@ def is_msa_code_duplicate(code, exclude_pdf_id=None):
     
     return col_pdfs.find_one(query) is not None
 
-def generate_unique_msa_code():
-    """Generate a random unique MSA code (non-sequential, no repeats)."""
+def _msa_tier_bounds(digits: int) -> tuple:
+    """Numeric range of one auto-ID tier, e.g. 4 -> (1000, 9999)."""
+    return 10 ** (digits - 1), 10 ** digits - 1
+
+def load_used_msa_codes() -> set:
+    """Fetch every assigned MSA code with a single projected read."""
+    return {
+        (doc.get("msa_code") or "").strip().upper()
+        for doc in col_pdfs.find({"msa_code": {"$regex": "^MSA"}}, {"_id": 0, "msa_code": 1})
+    }
+
+def get_msa_pool_usage(used_codes: set = None) -> list:
+    """
+    Per-tier utilization of the auto-ID code space.
+    Returns one dict per tier: digits, label, size, used, available, pct_used.
+    """
+    if used_codes is None:
+        used_codes = load_used_msa_codes()
+
+    used_per_tier = {d: 0 for d in range(MSA_CODE_MIN_DIGITS, MSA_CODE_MAX_DIGITS + 1)}
+    for code in used_codes:
+        digits = code[3:]
+        if digits.isdigit() and digits[0] != "0" and len(digits) in used_per_tier:
+            used_per_tier[len(digits)] += 1
+
+    tiers = []
+    for digits, used in used_per_tier.items():
+        lo, hi = _msa_tier_bounds(digits)
+        size = hi - lo + 1
+        tiers.append({
+            "digits": digits,
+            "label": f"MSA{lo}-MSA{hi}",
+            "size": size,
+            "used": used,
+            "available": max(0, size - used),
+            "pct_used": used / size * 100,
+        })
+    return tiers
+
+def _pick_msa_tier(tiers: list):
+    """Narrowest tier still under the expand threshold, else narrowest with any free code."""
+    for tier in tiers:
+        if tier["pct_used"] < MSA_POOL_EXPAND_THRESHOLD * 100:
+            return tier
+    for tier in tiers:
+        if tier["available"] > 0:
+            return tier
+    return None
+
+def generate_unique_msa_code(used_codes: set = None):
+    """
+    Generate a random unique MSA code (non-sequential, no repeats).
+
+    The used set is loaded with one projected read (or passed in by bulk callers,
+    which get it updated in place), so allocation never probes the DB per candidate.
+    Sparse tiers are rejection-sampled in memory; dense tiers sample directly from
+    the computed free set.
+    """
     rng = random.SystemRandom()
+    if used_codes is None:
+        used_codes = load_used_msa_codes()
+
+    tiers = get_msa_pool_usage(used_codes)
+    tier = _pick_msa_tier(tiers)
+    if tier is None:
+        raise RuntimeError(f"MSA code pool exhausted (MSA{_msa_tier_bounds(MSA_CODE_MIN_DIGITS)[0]}-"
+                           f"MSA{_msa_tier_bounds(MSA_CODE_MAX_DIGITS)[1]})")
+    if tier["digits"] > MSA_CODE_MIN_DIGITS and tiers[0]["available"] > 0:
+        logger.info(f"MSA pool past {MSA_POOL_EXPAND_THRESHOLD:.0%} — allocating from {tier['label']}")
+
+    lo, hi = _msa_tier_bounds(tier["digits"])
+    code = None
+    for _ in range(64):
+        candidate = f"MSA{rng.randint(lo, hi)}"
+        if candidate not in used_codes:
+            code = candidate
+            break
 
-    # Strict pool: 4-digit auto IDs (MSA1000..MSA9999).
-    for _ in range(30000):
-        code = f"MSA{rng.randint(1000, 9999)}"
-        if not is_msa_code_duplicate(code):
-            return code
+    if code is None:
+        free = [n for n in range(lo, hi + 1) if f"MSA{n}" not in used_codes]
+        code = f"MSA{rng.choice(free)}"
 
-    raise RuntimeError("MSA code pool exhausted (MSA1000-MSA9999)")
+    used_codes.add(code)
+    return code
 
 def repair_missing_duplicate_msa_codes():
     """Backfill missing/invalid/duplicate MSA codes at startup."""
@@ -1335,16 +1456,17 @@ def repair_missing_duplicate_msa_codes():
     seen = set()
 
     docs = list(col_pdfs.find({}, {"_id": 1, "msa_code": 1}))
+    used_codes = {(doc.get("msa_code") or "").strip().upper() for doc in docs}
     for doc in docs:
         code = (doc.get("msa_code") or "").strip().upper()
-        valid = bool(re.fullmatch(r"^MSA\d{4}$", code))
+        valid = is_valid_msa_code_format(code)
 
         if valid and code not in seen:
             seen.add(code)
             continue
 
         for _ in range(20):
-            new_code = generate_unique_msa_code()
+            new_code = generate_unique_msa_code(used_codes)
             try:
                 res = col_pdfs.update_one(
                     {"_id": doc["_id"]},
@@ -1360,12 +1482,15 @@ def repair_missing_duplicate_msa_codes():
     return repaired
 
 def randomize_non_4_digit_msa_codes():
-    """Replace non-4-digit legacy MSA IDs with strict random 4-digit IDs."""
+    """Replace legacy MSA IDs outside the allowed digit range with strict random IDs."""
     migrated = 0
-    docs = list(col_pdfs.find({"msa_code": {"$exists": True, "$not": {"$regex": r"^MSA\d{4}$"}}}, {"_id": 1, "msa_code": 1}))
+    docs = list(col_pdfs.find({"msa_code": {"$exists": True, "$not": {"$regex": MSA_CODE_PATTERN}}}, {"_id": 1, "msa_code": 1}))
+    if not docs:
+        return 0
+    used_codes = load_used_msa_codes()
     for doc in docs:
         for _ in range(20):
-            new_code = generate_unique_msa_code()
+            new_code = generate_unique_msa_code(used_codes)
             try:
                 res = col_pdfs.update_one({"_id": doc["_id"]}, {"$set": {"msa_code": new_code}})
                 if res.modified_count:
@@ -1766,7 +1891,7 @@ def get_main_menu(user_id: int):
         return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
 
     # 2. Check Admin Permissions
-    admin = col_admins.find_one({"user_id": user_id})
+    admin = admin_snapshot.admin_doc(user_id)
     if not admin:
         # Fallback for non-admins (Access Control should block them anyway)
         return ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="📚 BOT GUIDE")]], resize_keyboard=True)
@@ -1965,7 +2090,7 @@ async def ensure_pdf_codes(pdf):
 async def ensure_pdf_msa_code(pdf) -> str:
     """Ensure a PDF has a valid unique MSA code and return it."""
     code = (pdf.get("msa_code") or "").strip().upper()
-    is_valid = bool(re.fullmatch(r"^MSA\d{4}$", code))
+    is_valid = is_valid_msa_code_format(code)
 
     if is_valid and not is_msa_code_duplicate(code, exclude_pdf_id=str(pdf.get("_id"))):
         return code
@@ -2226,7 +2351,7 @@ async def process_new_admin_id(message: types.Message, state: FSMContext):
         return
     
     # Check for duplicates
-    existing = col_admins.find_one({"user_id": new_admin_id})
+    existing = admin_snapshot.admin_doc(new_admin_id)
     if existing:
         await message.answer(
             f"⚠️ <b>Admin Already Exists</b>\n\n"
@@ -2256,6 +2381,7 @@ async def process_new_admin_id(message: types.Message, state: FSMContext):
         "username": admin_username,
         "is_locked": True       # Must be explicitly unlocked before they can use bot
     })
+    admin_snapshot.invalidate()
     
     await state.clear()
     await message.answer(
@@ -2392,6 +2518,7 @@ async def process_admin_removal(message: types.Message, state: FSMContext):
         try:
             # Remove from database
             result = col_admins.delete_one({"user_id": target_id})
+            admin_snapshot.invalidate()
             
             if result.deleted_count > 0:
                 await state.clear()
@@ -4847,7 +4974,7 @@ async def process_pdf_search(message: types.Message, state: FSMContext):
     if query.isdigit():
         pdf = col_pdfs.find_one({"index": int(query)})
     # Try by MSA code
-    elif re.fullmatch(r"^MSA\d{4}$", query.upper()):
+    elif is_valid_msa_code_format(query):
         pdf = col_pdfs.find_one({"msa_code": query.upper()})
     # Try by name
     else:
@@ -5141,7 +5268,7 @@ async def diagnosis_handler(message: types.Message, state: FSMContext):
         required_indexes = {
             "pdf_index_unique": (col_pdfs, "index", {"unique": True, "name": "pdf_index_unique"}),
             "pdf_created_at": (col_pdfs, "created_at", {"name": "pdf_created_at"}),
-            "pdf_msa_code": (col_pdfs, "msa_code", {"sparse": True, "name": "pdf_msa_code"}),
+            "pdf_msa_code_unique": (col_pdfs, "msa_code", {"unique": True, "sparse": True, "name": "pdf_msa_code_unique"}),
         }
 
         current_names = [idx["name"] for idx in col_pdfs.list_indexes()]
@@ -5168,6 +5295,10 @@ async def diagnosis_handler(message: types.Message, state: FSMContext):
             if failed:
                 warnings.append(f"⚠️ Index create errors: {len(failed)}")
 
+        # Hot-query audit from the last index registry run
+        for coll_name, fields in indexes.audit():
+            warnings.append(f"⚠️ Hot query without index: {coll_name} ({', '.join(fields)})")
+
         checks_passed += 1
             
     except Exception as e:
@@ -5632,46 +5763,115 @@ async def diagnosis_prev_page_handler(message: types.Message, state: FSMContext)
         parse_mode="HTML",
     )
 
-def get_recent_logs(lines_count=30):
-    """Refactored log reader"""
+_LOG_LEVEL_RE = re.compile(r" - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - ")
+
+TERMINAL_FILTERS = {
+    "": ("ALL", logging.NOTSET),
+    "WARNING": ("⚠️ WARN+", logging.WARNING),
+    "ERROR": ("❌ ERRORS", logging.ERROR),
+}
+
+def tail_log_file(path: str, lines_count: int, block_size: int = 8192) -> list:
+    """
+    Return the last lines_count lines of a file by reading fixed-size blocks
+    backwards from the end — cost is proportional to the tail, not the file size.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        # +1: the first line found in the buffer is usually partial
+        while pos > 0 and data.count(b"\n") <= lines_count:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-lines_count:]
+
+def _log_file_lines(log_file: str, lines_count: int, min_level: int, keyword: str = None) -> list:
+    """Filtered tail of the log file (blocking; run in a worker thread)."""
+    # Filtered views scan a deeper tail so enough lines survive the filter
+    scan = lines_count if (min_level == logging.NOTSET and not keyword) else lines_count * 25
+    file_lines = tail_log_file(log_file, scan)
+    if min_level > logging.NOTSET:
+        file_lines = [
+            ln for ln in file_lines
+            if (m := _LOG_LEVEL_RE.search(ln)) and logging.getLevelName(m.group(1)) >= min_level
+        ]
+    if keyword:
+        file_lines = [ln for ln in file_lines if keyword.lower() in ln.lower()]
+    return file_lines[-lines_count:]
+
+async def get_recent_logs(lines_count=30, level: str = "", keyword: str = None):
+    """
+    Recent log lines for the TERMINAL view, optionally filtered by minimum level
+    and keyword. Served from the in-memory ring buffer; logs/bot3.log is only
+    read (in a worker thread) while the buffer is still empty after a restart.
+    """
+    min_level = TERMINAL_FILTERS.get(level, TERMINAL_FILTERS[""])[1]
+    lines = terminal_buffer_handler.tail(lines_count, min_level, keyword)
+
     # Logs are written to logs/bot3.log by the RotatingFileHandler
     log_file = "logs/bot3.log"
-    if not os.path.exists(log_file):
-        # Fallback: try Render's stdout capture via /proc/1/fd/1 is not readable,
-        # so we read from the rotating log file only.
-        return "⚠️ No logs found yet. (Log file not created - bot may have just started)"
-    try:
-        with open(log_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            content = "".join(lines[-lines_count:])
-            if len(content) > 3500:
-                content = content[-3500:]
-                content = "..." + content
-            import html
-            return html.escape(content) if content.strip() else "No recent logs."
-    except Exception as e:
-        return f"Error reading logs: {e}"
+    if not terminal_buffer_handler.records:
+        if not os.path.exists(log_file):
+            return "⚠️ No logs found yet. (Log file not created - bot may have just started)"
+        try:
+            lines = await asyncio.to_thread(_log_file_lines, log_file, lines_count, min_level, keyword)
+        except Exception as e:
+            return f"Error reading logs: {e}"
+
+    content = "\n".join(lines)
+    if len(content) > 3500:
+        content = content[-3500:]
+        content = "..." + content
+    return _html.escape(content) if content.strip() else "No recent logs."
+
+async def _terminal_view(level: str = "", keyword: str = None):
+    """Render the TERMINAL message text and its filter keyboard."""
+    logs = await get_recent_logs(lines_count=40, level=level, keyword=keyword)
+    label = TERMINAL_FILTERS.get(level, TERMINAL_FILTERS[""])[0]
+    filter_line = f"🔎 Filter: {label}" + (f" | <code>{_html.escape(keyword)}</code>" if keyword else "")
+    text = f"🖥️ <b>LIVE TERMINAL OUTPUT</b>\n{filter_line}\n━━━━━━━━━━━━━━━━━━━━\n<pre><code class=\"language-python\">{logs}</code></pre>\n━━━━━━━━━━━━━━━━━━━━"
+    kb = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 REFRESH", callback_data=f"refresh_terminal:{level}")],
+        [
+            InlineKeyboardButton(text=lbl, callback_data=f"refresh_terminal:{key}")
+            for key, (lbl, _) in TERMINAL_FILTERS.items() if key != level
+        ],
+    ])
+    return text, kb
 
 @dp.message(F.text == "🖥️ TERMINAL")
 async def terminal_handler(message: types.Message):
     if not await check_authorization(message, "Terminal", "can_view_analytics"):
         return
     log_user_action(message.from_user, "Viewed Terminal")
-    logs = get_recent_logs(lines_count=40)
-    text = f"🖥️ <b>LIVE TERMINAL OUTPUT</b>\n━━━━━━━━━━━━━━━━━━━━\n<pre><code class=\"language-python\">{logs}</code></pre>\n━━━━━━━━━━━━━━━━━━━━"
-    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔄 REFRESH", callback_data="refresh_terminal")]])
+    text, kb = await _terminal_view()
     await message.answer(text, parse_mode="HTML", reply_markup=kb)
 
-@dp.callback_query(F.data == "refresh_terminal")
+@dp.message(Command("logs"))
+async def terminal_search_handler(message: types.Message):
+    """/logs <keyword> — TERMINAL view filtered to lines containing keyword."""
+    if not await check_authorization(message, "Terminal", "can_view_analytics"):
+        return
+    keyword = (message.text or "").partition(" ")[2].strip()
+    if not keyword:
+        await message.answer("Usage: <code>/logs keyword</code>", parse_mode="HTML")
+        return
+    text, _ = await _terminal_view(keyword=keyword[:50])
+    await message.answer(text, parse_mode="HTML")
+
+@dp.callback_query(F.data.startswith("refresh_terminal"))
 async def refresh_terminal_callback(callback: types.CallbackQuery):
     # Use check_authorization_user so we check the human who clicked (callback.from_user),
     # NOT callback.message.from_user which points to the bot itself.
     if not await check_authorization_user(callback.from_user, callback.message, "Refresh Terminal", "can_view_analytics"):
          await callback.answer("⛔ Access Denied", show_alert=True)
          return
-    logs = get_recent_logs(lines_count=40)
-    text = f"🖥️ <b>LIVE TERMINAL OUTPUT</b>\n━━━━━━━━━━━━━━━━━━━━\n<pre><code class=\"language-python\">{logs}</code></pre>\n━━━━━━━━━━━━━━━━━━━━"
-    kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔄 REFRESH", callback_data="refresh_terminal")]])
+    level = callback.data.partition(":")[2]
+    text, kb = await _terminal_view(level=level if level in TERMINAL_FILTERS else "")
     
     try:
         await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
@@ -5888,6 +6088,187 @@ async def guide_prev_handler(message: types.Message, state: FSMContext):
 # 📊 ANALYTICS HANDLERS
 # ==========================================
 
+# Per-category analytics definitions shared by the live views and the leaderboard builder
+ANALYTICS_CATEGORIES = {
+    "pdf": {
+        "source": "pdfs",
+        "title": "📄 TOP CLICKED PDFs",
+        "click_field": "clicks",
+        "last_field": "last_clicked_at",
+        # Show all PDFs that have a link configured
+        "query": {"link": {"$exists": True}},
+        "empty_msg": "No items configured yet.",
+    },
+    "affiliate": {
+        "source": "pdfs",
+        "title": "💸 TOP CLICKED AFFILIATES",
+        "click_field": "affiliate_clicks",
+        "last_field": "last_affiliate_click",
+        # Show only PDFs that have affiliate link configured
+        "query": {"affiliate_link": {"$exists": True, "$ne": ""}},
+        "empty_msg": "No PDFs with affiliate links configured yet.",
+    },
+    "ig_start": {
+        "source": "pdfs",
+        "title": "📸 TOP CLICKED IG START LINKS",
+        "click_field": "ig_start_clicks",
+        "last_field": "last_ig_click",
+        # Show only PDFs that have IG start code configured
+        "query": {"ig_start_code": {"$exists": True, "$ne": ""}},
+        "empty_msg": "No PDFs with IG start codes configured yet.",
+    },
+    "yt_start": {
+        "source": "pdfs",
+        "title": "▶️ TOP CLICKED YT START LINKS",
+        "click_field": "yt_start_clicks",
+        "last_field": "last_yt_click",
+        # Show only PDFs that have YT link configured
+        "query": {"yt_link": {"$exists": True, "$ne": ""}},
+        "empty_msg": "No PDFs with YT links configured yet.",
+    },
+    "ig_cc_start": {
+        "source": "ig",
+        "title": "📸 TOP CLICKED IG CC START LINKS",
+        "click_field": "ig_cc_clicks",
+        "last_field": "last_ig_cc_click",
+        # Show all IG content (all have CC codes)
+        "query": {"cc_code": {"$exists": True}},
+        "empty_msg": "No IG content configured yet.",
+    },
+    "yt_code_start": {
+        "source": "pdfs",
+        "title": "🔑 TOP CLICKED YT CODE START LINKS",
+        "click_field": "yt_code_clicks",
+        "last_field": "last_yt_code_click",
+        # Show only PDFs that have MSA code configured
+        "query": {"msa_code": {"$exists": True, "$ne": ""}},
+        "empty_msg": "No PDFs with MSA codes configured yet.",
+    },
+}
+
+def _analytics_collection(cfg: dict):
+    """Resolve at call time so auto-heal reconnects are picked up."""
+    return col_ig_content if cfg["source"] == "ig" else col_pdfs
+
+def refresh_leaderboards() -> int:
+    """
+    Materialize the top-K ranking of every analytics category into bot3_leaderboards.
+
+    Each category document keeps the previous day's final ranking as its baseline,
+    so views can show click and rank deltas since yesterday without extra queries.
+    An "overview" document holds the catalog-wide click totals.
+    Returns the number of categories refreshed.
+    """
+    now = now_local()
+    today = now.strftime("%Y-%m-%d")
+    refreshed = 0
+
+    for category, cfg in ANALYTICS_CATEGORIES.items():
+        # Ranking scans tolerate replication lag; the snapshot writes stay on the primary
+        collection = analytics(_analytics_collection(cfg))
+        click_field = cfg["click_field"]
+        projection = {"name": 1, "cc_code": 1, click_field: 1, cfg["last_field"]: 1}
+
+        total_items = collection.count_documents(cfg["query"])
+        docs = list(collection.find(cfg["query"], projection).sort(click_field, -1).limit(LEADERBOARD_TOP_K))
+
+        prev = col_leaderboards.find_one(
+            {"category": category},
+            {"entries": 1, "baseline": 1, "baseline_date": 1}
+        ) or {}
+        if prev.get("baseline_date") == today:
+            baseline = prev.get("baseline", {})
+        else:
+            # Day rolled over: yesterday's last snapshot becomes today's baseline
+            baseline = {
+                e["id"]: {"rank": e["rank"], "clicks": e["clicks"]}
+                for e in prev.get("entries", [])
+            }
+
+        entries = []
+        for rank, doc in enumerate(docs, start=1):
+            key = str(doc["_id"])
+            clicks = doc.get(click_field, 0) or 0
+            base = baseline.get(key)
+            entries.append({
+                "id": key,
+                "rank": rank,
+                "name": doc.get("name", "Unnamed"),
+                "cc_code": doc.get("cc_code"),
+                "clicks": clicks,
+                "last_clicked": doc.get(cfg["last_field"]),
+                "delta_clicks": (clicks - base["clicks"]) if base else None,
+                "delta_rank": (base["rank"] - rank) if base else None,
+            })
+
+        col_leaderboards.update_one(
+            {"category": category},
+            {"$set": {
+                "category": category,
+                "generated_at": now,
+                "total_items": total_items,
+                "entries": entries,
+                "baseline": baseline,
+                "baseline_date": today,
+            }},
+            upsert=True
+        )
+        refreshed += 1
+
+    pdf_stats = list(analytics(col_pdfs).aggregate([
+        {"$group": {
+            "_id": None,
+            "pdf_clicks": {"$sum": {"$ifNull": ["$clicks", 0]}},
+            "aff_clicks": {"$sum": {"$ifNull": ["$affiliate_clicks", 0]}},
+            "ig_clicks": {"$sum": {"$ifNull": ["$ig_start_clicks", 0]}},
+            "yt_clicks": {"$sum": {"$ifNull": ["$yt_start_clicks", 0]}},
+            "yt_code_clicks": {"$sum": {"$ifNull": ["$yt_code_clicks", 0]}}
+        }}
+    ]))
+    ig_stats = list(analytics(col_ig_content).aggregate([
+        {"$group": {
+            "_id": None,
+            "ig_cc_clicks": {"$sum": {"$ifNull": ["$ig_cc_clicks", 0]}}
+        }}
+    ]))
+    totals = {k: v for k, v in (pdf_stats[0] if pdf_stats else {}).items() if k != "_id"}
+    totals["ig_cc_clicks"] = ig_stats[0].get("ig_cc_clicks", 0) if ig_stats else 0
+    col_leaderboards.update_one(
+        {"category": "overview"},
+        {"$set": {"category": "overview", "generated_at": now, "totals": totals}},
+        upsert=True
+    )
+
+    return refreshed
+
+def get_leaderboard_snapshot(category: str):
+    """Return the materialized snapshot for a category, or None if missing/stale."""
+    try:
+        snap = col_leaderboards.find_one({"category": category})
+    except Exception as e:
+        logger.warning(f"Leaderboard read failed ({category}): {e}")
+        return None
+    if not snap or not snap.get("generated_at"):
+        return None
+    # Stale after 3 missed refresh cycles — callers fall back to a live query
+    if now_local() - snap["generated_at"] > timedelta(minutes=LEADERBOARD_REFRESH_MINUTES * 3):
+        return None
+    return snap
+
+async def leaderboard_refresh_task():
+    """Background task that keeps the analytics leaderboards materialized"""
+    logger.info(f"✅ Leaderboard refresh task started (Interval: {LEADERBOARD_REFRESH_MINUTES} min, Top-K: {LEADERBOARD_TOP_K})")
+
+    while True:
+        try:
+            started = time.perf_counter()
+            count = await asyncio.to_thread(refresh_leaderboards)
+            logger.info(f"📊 Leaderboards refreshed ({count} categories) in {(time.perf_counter() - started) * 1000:.0f} ms")
+            await asyncio.sleep(LEADERBOARD_REFRESH_MINUTES * 60)
+        except Exception as e:
+            logger.error(f"Leaderboard refresh task error: {e}")
+            await asyncio.sleep(60)
+
 @dp.message(F.text == "📊 ANALYTICS")
 async def analytics_menu_handler(message: types.Message, state: FSMContext):
     if not await check_authorization(message, "Analytics Menu", "can_view_analytics"):
@@ -5911,32 +6292,43 @@ async def analytics_overview_handler(message: types.Message):
     total_pdfs = col_pdfs.count_documents({})
     total_ig_content = col_ig_content.count_documents({"cc_code": {"$exists": True}})
     
-    # Use aggregation pipeline for efficient click totals (single query)
-    pdf_stats = list(col_pdfs.aggregate([
-        {"$group": {
-            "_id": None,
-            "pdf_clicks": {"$sum": {"$ifNull": ["$clicks", 0]}},
-            "aff_clicks": {"$sum": {"$ifNull": ["$affiliate_clicks", 0]}},
-            "ig_clicks": {"$sum": {"$ifNull": ["$ig_start_clicks", 0]}},
-            "yt_clicks": {"$sum": {"$ifNull": ["$yt_start_clicks", 0]}},
-            "yt_code_clicks": {"$sum": {"$ifNull": ["$yt_code_clicks", 0]}}
-        }}
-    ]))
-    
-    ig_stats = list(col_ig_content.aggregate([
-        {"$group": {
-            "_id": None,
-            "ig_cc_clicks": {"$sum": {"$ifNull": ["$ig_cc_clicks", 0]}}
-        }}
-    ]))
-    
-    # Extract values (default to 0 if no data)
-    pdf_clicks = pdf_stats[0].get("pdf_clicks", 0) if pdf_stats else 0
-    aff_clicks = pdf_stats[0].get("aff_clicks", 0) if pdf_stats else 0
-    ig_clicks = pdf_stats[0].get("ig_clicks", 0) if pdf_stats else 0
-    yt_clicks = pdf_stats[0].get("yt_clicks", 0) if pdf_stats else 0
-    yt_code_clicks = pdf_stats[0].get("yt_code_clicks", 0) if pdf_stats else 0
-    ig_cc_clicks = ig_stats[0].get("ig_cc_clicks", 0) if ig_stats else 0
+    # Click totals come from the materialized overview snapshot when fresh;
+    # otherwise fall back to a live aggregation (single query per collection)
+    overview_snap = get_leaderboard_snapshot("overview")
+    if overview_snap:
+        totals = overview_snap.get("totals", {})
+        pdf_clicks = totals.get("pdf_clicks", 0)
+        aff_clicks = totals.get("aff_clicks", 0)
+        ig_clicks = totals.get("ig_clicks", 0)
+        yt_clicks = totals.get("yt_clicks", 0)
+        yt_code_clicks = totals.get("yt_code_clicks", 0)
+        ig_cc_clicks = totals.get("ig_cc_clicks", 0)
+    else:
+        pdf_stats = list(analytics(col_pdfs).aggregate([
+            {"$group": {
+                "_id": None,
+                "pdf_clicks": {"$sum": {"$ifNull": ["$clicks", 0]}},
+                "aff_clicks": {"$sum": {"$ifNull": ["$affiliate_clicks", 0]}},
+                "ig_clicks": {"$sum": {"$ifNull": ["$ig_start_clicks", 0]}},
+                "yt_clicks": {"$sum": {"$ifNull": ["$yt_start_clicks", 0]}},
+                "yt_code_clicks": {"$sum": {"$ifNull": ["$yt_code_clicks", 0]}}
+            }}
+        ]))
+        
+        ig_stats = list(analytics(col_ig_content).aggregate([
+            {"$group": {
+                "_id": None,
+                "ig_cc_clicks": {"$sum": {"$ifNull": ["$ig_cc_clicks", 0]}}
+            }}
+        ]))
+        
+        # Extract values (default to 0 if no data)
+        pdf_clicks = pdf_stats[0].get("pdf_clicks", 0) if pdf_stats else 0
+        aff_clicks = pdf_stats[0].get("aff_clicks", 0) if pdf_stats else 0
+        ig_clicks = pdf_stats[0].get("ig_clicks", 0) if pdf_stats else 0
+        yt_clicks = pdf_stats[0].get("yt_clicks", 0) if pdf_stats else 0
+        yt_code_clicks = pdf_stats[0].get("yt_code_clicks", 0) if pdf_stats else 0
+        ig_cc_clicks = ig_stats[0].get("ig_cc_clicks", 0) if ig_stats else 0
     
     total_clicks = pdf_clicks + aff_clicks + ig_clicks + yt_clicks + ig_cc_clicks + yt_code_clicks
     
@@ -5946,29 +6338,25 @@ async def analytics_overview_handler(message: types.Message):
     pdfs_with_yt = col_pdfs.count_documents({"yt_link": {"$exists": True, "$ne": ""}})
     pdfs_with_msa = col_pdfs.count_documents({"msa_code": {"$exists": True, "$ne": ""}})
     
-    # Top 5 performers overall using optimized aggregation
+    # Top 5 performers overall — read from the precomputed leaderboards
     all_items = []
-    
-    # Get top PDFs (only fetch name and clicks fields)
-    for pdf in col_pdfs.find(
-        {"link": {"$exists": True}, "clicks": {"$gt": 0}},
-        {"name": 1, "clicks": 1, "_id": 0}
-    ).sort("clicks", -1).limit(20):
-        all_items.append({"name": pdf.get("name", "Unnamed"), "clicks": pdf.get("clicks", 0), "type": "📄 PDF"})
-    
-    # Get top Affiliates (only fetch name and affiliate_clicks fields)
-    for pdf in col_pdfs.find(
-        {"affiliate_link": {"$exists": True, "$ne": ""}, "affiliate_clicks": {"$gt": 0}},
-        {"name": 1, "affiliate_clicks": 1, "_id": 0}
-    ).sort("affiliate_clicks", -1).limit(20):
-        all_items.append({"name": pdf.get("name", "Unnamed"), "clicks": pdf.get("affiliate_clicks", 0), "type": "💸 Affiliate"})
-    
-    # Get top IG CC (only fetch name and ig_cc_clicks fields)
-    for ig in col_ig_content.find(
-        {"ig_cc_clicks": {"$gt": 0}},
-        {"name": 1, "ig_cc_clicks": 1, "_id": 0}
-    ).sort("ig_cc_clicks", -1).limit(20):
-        all_items.append({"name": ig.get("name", "Unnamed"), "clicks": ig.get("ig_cc_clicks", 0), "type": "📸 IG CC"})
+    for category, type_label in (("pdf", "📄 PDF"), ("affiliate", "💸 Affiliate"), ("ig_cc_start", "📸 IG CC")):
+        snap = get_leaderboard_snapshot(category)
+        if snap:
+            ranked = snap.get("entries", [])[:20]
+        else:
+            cfg = ANALYTICS_CATEGORIES[category]
+            click_field = cfg["click_field"]
+            ranked = [
+                {"name": doc.get("name", "Unnamed"), "clicks": doc.get(click_field, 0)}
+                for doc in analytics(_analytics_collection(cfg)).find(
+                    {**cfg["query"], click_field: {"$gt": 0}},
+                    {"name": 1, click_field: 1, "_id": 0}
+                ).sort(click_field, -1).limit(20)
+            ]
+        for entry in ranked:
+            if entry.get("clicks", 0) > 0:
+                all_items.append({"name": entry.get("name") or "Unnamed", "clicks": entry["clicks"], "type": type_label})
     
     # Sort all items by clicks and get top 5
     all_items.sort(key=lambda x: x["clicks"], reverse=True)
@@ -5976,7 +6364,7 @@ async def analytics_overview_handler(message: types.Message):
     
     # ── Source tracking from bot10_user_tracking (permanent first-source lock) ──
     try:
-        tracking_col = db["bot10_user_tracking"]
+        tracking_col = analytics(db["bot10_user_tracking"])
         source_pipeline = [
             {"$group": {"_id": "$source", "count": {"$sum": 1}}},
             {"$sort": {"count": -1}}
@@ -5991,6 +6379,32 @@ async def analytics_overview_handler(message: types.Message):
     except Exception:
         total_tracked_users = src_ig = src_yt = src_igcc = src_ytcode = src_other = 0
 
+    # ── Click trend from bot1's time-bucketed rollups (daily buckets, last 7 days) ──
+    trend_days = []
+    clicks_24h = unique_24h = 0
+    try:
+        today_start = now_local().replace(hour=0, minute=0, second=0, microsecond=0)
+        daily = {
+            doc["_id"]: doc
+            for doc in analytics(col_click_rollups).aggregate([
+                {"$match": {"granularity": "day", "bucket": {"$gte": today_start - timedelta(days=6)}}},
+                {"$group": {"_id": "$bucket", "clicks": {"$sum": "$clicks"}, "unique": {"$sum": "$unique_clicks"}}}
+            ])
+        }
+        for offset in range(6, -1, -1):
+            day = today_start - timedelta(days=offset)
+            doc = daily.get(day, {})
+            trend_days.append((day, doc.get("clicks", 0), doc.get("unique", 0)))
+        last_24h = list(analytics(col_click_rollups).aggregate([
+            {"$match": {"granularity": "hour", "bucket": {"$gte": now_local() - timedelta(hours=24)}}},
+            {"$group": {"_id": None, "clicks": {"$sum": "$clicks"}, "unique": {"$sum": "$unique_clicks"}}}
+        ]))
+        if last_24h:
+            clicks_24h = last_24h[0].get("clicks", 0)
+            unique_24h = last_24h[0].get("unique", 0)
+    except Exception as trend_err:
+        logger.warning(f"Click trend read failed: {trend_err}")
+
     # Build overview message
     text = "📊 <b>ANALYTICS OVERVIEW</b>\n"
     text += "═══════════════════════\n\n"
@@ -6005,6 +6419,14 @@ async def analytics_overview_handler(message: types.Message):
     text += f"├ 📸 IG CC: {ig_cc_clicks:,}\n"
     text += f"└ 🔑 YT Code: {yt_code_clicks:,}\n\n"
 
+    if any(raw for _, raw, _ in trend_days):
+        peak = max(raw for _, raw, _ in trend_days)
+        text += f"<b>📈 CLICK TREND (7 days):</b> {clicks_24h:,} in last 24h ({unique_24h:,} new)\n"
+        for day, raw, unique in trend_days:
+            bar = "█" * max(1, round(raw / peak * 10)) if raw else "·"
+            text += f"<code>{day.strftime('%a %d')}</code> {bar} {raw:,} ({unique:,} new)\n"
+        text += "\n"
+
     text += "<b>📡 TRAFFIC SOURCES (Unique Users — Permanently Locked):</b>\n"
     text += f"├ 👥 Total Tracked Users: {total_tracked_users:,}\n"
     text += f"├ 📸 IG Start: {src_ig:,} users\n"
@@ -6045,6 +6467,8 @@ async def analytics_overview_handler(message: types.Message):
         text += f"✅ <b>Setup Completion:</b> {completion_rate:.1f}% ({complete_pdfs}/{total_pdfs} fully configured)\n"
     
     text += "\n═══════════════════════\n"
+    if overview_snap:
+        text += f"🕒 Rankings as of {overview_snap['generated_at'].strftime('%I:%M %p')}\n"
     text += "💡 Select a category below for detailed analytics."
     
     await send_chunked_message(
@@ -6060,104 +6484,48 @@ async def send_analytics_view(message: types.Message, category: str, page: int =
     items_per_page = 10
     skip = page * items_per_page
     
-    # Determine collection, fields, and query based on category
-    if category == "pdf":
-        collection = col_pdfs
-        title = "📄 TOP CLICKED PDFs"
-        name_field = "name"
-        click_field = "clicks"
-        # Show all PDFs that have a link configured
-        query = {"link": {"$exists": True}}
-    elif category == "affiliate":
-        collection = col_pdfs
-        title = "💸 TOP CLICKED AFFILIATES"
-        name_field = "name"
-        click_field = "affiliate_clicks"
-        # Show only PDFs that have affiliate link configured
-        query = {"affiliate_link": {"$exists": True, "$ne": ""}}
-    elif category == "ig_start":
-        collection = col_pdfs
-        title = "📸 TOP CLICKED IG START LINKS"
-        name_field = "name"
-        click_field = "ig_start_clicks"
-        # Show only PDFs that have IG start code configured
-        query = {"ig_start_code": {"$exists": True, "$ne": ""}}
-    elif category == "yt_start":
-        collection = col_pdfs
-        title = "▶️ TOP CLICKED YT START LINKS"
-        name_field = "name"
-        click_field = "yt_start_clicks"
-        # Show only PDFs that have YT link configured
-        query = {"yt_link": {"$exists": True, "$ne": ""}}
-    elif category == "ig_cc_start":
-        collection = col_ig_content
-        title = "📸 TOP CLICKED IG CC START LINKS"
-        name_field = "name"
-        click_field = "ig_cc_clicks"
-        # Show all IG content (all have CC codes)
-        query = {"cc_code": {"$exists": True}}
-    elif category == "yt_code_start":
-        collection = col_pdfs
-        title = "🔑 TOP CLICKED YT CODE START LINKS"
-        name_field = "name"
-        click_field = "yt_code_clicks"
-        # Show only PDFs that have MSA code configured
-        query = {"msa_code": {"$exists": True, "$ne": ""}}
-    else:
+    cfg = ANALYTICS_CATEGORIES.get(category)
+    if not cfg:
         await message.answer("⚠️ Invalid category")
         return
-    
-    # Count total items matching criteria
-    total_items = collection.count_documents(query)
+    title = cfg["title"]
+    click_field = cfg["click_field"]
+    last_click_field = cfg["last_field"]
+    
+    # Serve from the materialized leaderboard while the page is inside the top-K;
+    # deeper pages (or a missing/stale snapshot) fall back to a live sorted query.
+    snapshot = get_leaderboard_snapshot(category)
+    if snapshot and skip + items_per_page <= LEADERBOARD_TOP_K:
+        total_items = snapshot.get("total_items", 0)
+        items = [
+            {
+                "name": e.get("name"),
+                "cc_code": e.get("cc_code"),
+                click_field: e.get("clicks", 0),
+                last_click_field: e.get("last_clicked"),
+                "delta_clicks": e.get("delta_clicks"),
+                "delta_rank": e.get("delta_rank"),
+            }
+            for e in snapshot.get("entries", [])[skip:skip + items_per_page]
+        ]
+    else:
+        snapshot = None
+        collection = _analytics_collection(cfg)
+        total_items = collection.count_documents(cfg["query"])
+        items = []
+        if total_items:
+            projection = {"name": 1, "cc_code": 1, click_field: 1, last_click_field: 1, "_id": 0}
+            items = list(collection.find(cfg["query"], projection).sort(click_field, -1).skip(skip).limit(items_per_page))
     
     if total_items == 0:
-        # Determine empty message based on category
-        if category == "affiliate":
-            empty_msg = "No PDFs with affiliate links configured yet."
-        elif category == "ig_start":
-            empty_msg = "No PDFs with IG start codes configured yet."
-        elif category == "yt_start":
-            empty_msg = "No PDFs with YT links configured yet."
-        elif category == "yt_code_start":
-            empty_msg = "No PDFs with MSA codes configured yet."
-        elif category == "ig_cc_start":
-            empty_msg = "No IG content configured yet."
-        else:
-            empty_msg = "No items configured yet."
-            
         await message.answer(
             f"{title}\n\n"
-            f"📭 {empty_msg}",
+            f"📭 {cfg['empty_msg']}",
             reply_markup=get_analytics_menu(),
             parse_mode="HTML"
         )
         return
     
-    # Fetch top items for current page with field projection (only needed fields)
-    projection = {name_field: 1, click_field: 1, "index": 1, "cc_code": 1, "_id": 0}
-    if category in ["pdf", "affiliate", "ig_start", "yt_start", "yt_code_start"]:
-        projection["link"] = 1
-        projection["affiliate_link"] = 1
-        projection["ig_start_code"] = 1
-        projection["yt_link"] = 1
-        projection["msa_code"] = 1
-    
-    # Add timestamp fields for last clicked info
-    if category == "pdf":
-        projection["last_clicked_at"] = 1
-    elif category == "affiliate":
-        projection["last_affiliate_click"] = 1
-    elif category == "ig_start":
-        projection["last_ig_click"] = 1
-    elif category == "yt_start":
-        projection["last_yt_click"] = 1
-    elif category == "ig_cc_start":
-        projection["last_ig_cc_click"] = 1
-    elif category == "yt_code_start":
-        projection["last_yt_code_click"] = 1
-    
-    items = list(collection.find(query, projection).sort(click_field, -1).skip(skip).limit(items_per_page))
-    
     if not items:
         await message.answer(
             "⚠️ No more items on this page.",
@@ -6172,21 +6540,10 @@ async def send_analytics_view(message: types.Message, category: str, page: int =
     for idx, item in enumerate(items, start=skip + 1):
         # For IG CC: show only cc_code (not full content text)
         if category == "ig_cc_start":
-            item_name = item.get("cc_code", "Unknown")
+            item_name = item.get("cc_code") or "Unknown"
         else:
-            item_name = item.get(name_field, "Unnamed")
-        clicks = item.get(click_field, 0)
-        
-        # Get last clicked timestamp
-        last_click_field = {
-            "clicks": "last_clicked_at",
-            "affiliate_clicks": "last_affiliate_click",
-            "ig_start_clicks": "last_ig_click",
-            "yt_start_clicks": "last_yt_click",
-            "ig_cc_clicks": "last_ig_cc_click",
-            "yt_code_clicks": "last_yt_code_click"
-        }.get(click_field, "last_clicked_at")
-        
+            item_name = item.get("name") or "Unnamed"
+        clicks = item.get(click_field, 0) or 0
         last_clicked = item.get(last_click_field)
         
         # Performance indicator
@@ -6205,7 +6562,6 @@ async def send_analytics_view(message: types.Message, category: str, page: int =
         text += f"   🔢 Clicks: <b>{clicks:,}</b>"
         
         if last_clicked:
-            from datetime import datetime, timedelta
             now = now_local()
             time_diff = now - last_clicked
             
@@ -6222,10 +6578,27 @@ async def send_analytics_view(message: types.Message, category: str, page: int =
         elif clicks > 0:
             text += f" | 🕐 timestamp missing"
         
+        # Delta since yesterday's final ranking (leaderboard snapshot only)
+        if snapshot:
+            delta_clicks = item.get("delta_clicks")
+            delta_rank = item.get("delta_rank")
+            if delta_clicks is None:
+                text += "\n   🆕 New in ranking"
+            else:
+                if delta_rank > 0:
+                    rank_move = f"▲{delta_rank}"
+                elif delta_rank < 0:
+                    rank_move = f"▼{-delta_rank}"
+                else:
+                    rank_move = "＝"
+                text += f"\n   📈 +{delta_clicks:,} today | {rank_move}"
+        
         text += "\n\n"
     
     text += f"━━━━━━━━━━━━━━━━━━━━\n"
     text += f"📊 Showing {skip + 1}-{skip + len(items)} of {total_items} items\n"
+    if snapshot:
+        text += f"🕒 Rankings as of {snapshot['generated_at'].strftime('%I:%M %p')}\n"
 
     # Pagination buttons
     keyboard = []
@@ -6344,22 +6717,21 @@ async def msa_id_pool_handler(message: types.Message):
         unique_codes = unique_count_docs[0]["n"] if unique_count_docs else 0
         duplicate_assignments = max(0, with_code - unique_codes)
 
-        valid_format_count = col_pdfs.count_documents({"msa_code": {"$regex": r"^MSA\d{4}$"}})
+        valid_format_count = col_pdfs.count_documents({"msa_code": {"$regex": MSA_CODE_PATTERN}})
         invalid_format_count = max(0, with_code - valid_format_count)
 
-        # Auto-generated pool uses strict 4-digit IDs: MSA1000..MSA9999
-        auto_unique_docs = list(col_pdfs.aggregate([
-            {"$match": {"msa_code": {"$regex": r"^MSA\d{4}$"}}},
-            {"$group": {"_id": "$msa_code"}},
-            {"$count": "n"},
-        ]))
-        auto_unique_used = auto_unique_docs[0]["n"] if auto_unique_docs else 0
+        # Auto-generated pool: MSA1000..MSA9999, plus wider tiers when MSA_CODE_MAX_DIGITS > 4
+        used_codes = await asyncio.to_thread(load_used_msa_codes)
+        tiers = get_msa_pool_usage(used_codes)
+        active_tier = _pick_msa_tier(tiers)
+        base_tier = tiers[0]
+        auto_unique_used = base_tier["used"]
 
-        non_4_digit_count = col_pdfs.count_documents({"msa_code": {"$exists": True, "$not": {"$regex": r"^MSA\d{4}$"}}})
+        non_4_digit_count = col_pdfs.count_documents({"msa_code": {"$exists": True, "$not": {"$regex": MSA_CODE_PATTERN}}})
 
-        AUTO_POOL_SIZE = 9_000
-        available = max(0, AUTO_POOL_SIZE - auto_unique_used)
-        pct_used = (auto_unique_used / AUTO_POOL_SIZE * 100) if AUTO_POOL_SIZE else 0
+        AUTO_POOL_SIZE = base_tier["size"]
+        available = base_tier["available"]
+        pct_used = base_tier["pct_used"]
         filled = round(pct_used / 5)  # 20-block bar (each block = 5%)
         bar = "█" * filled + "░" * (20 - filled)
 
@@ -6374,6 +6746,19 @@ async def msa_id_pool_handler(message: types.Message):
 
         integrity = "✅ CLEAN" if duplicate_assignments == 0 and invalid_format_count == 0 else "⚠️ REVIEW NEEDED"
 
+        tier_lines = ""
+        if len(tiers) > 1:
+            tier_lines = "🧩 <b>Code Space Tiers:</b>\n" + "".join(
+                f"  • <code>{t['label']}</code>: {t['used']:,}/{t['size']:,} ({t['pct_used']:.2f}%)"
+                f"{' ◀ active' if active_tier and t['digits'] == active_tier['digits'] else ''}\n"
+                for t in tiers
+            ) + f"↗️ <b>Expand Threshold:</b> {MSA_POOL_EXPAND_THRESHOLD:.0%}\n\n"
+        elif pct_used >= MSA_POOL_EXPAND_THRESHOLD * 100:
+            tier_lines = (
+                f"↗️ <b>Pool past {MSA_POOL_EXPAND_THRESHOLD:.0%}</b> — set "
+                f"<code>MSA_CODE_MAX_DIGITS=5</code> to enable MSA10000-MSA99999\n\n"
+            )
+
         text = (
             "🆔 <b>MSA NODE ID POOL STATUS</b>\n"
             "━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
@@ -6383,12 +6768,13 @@ async def msa_id_pool_handler(message: types.Message):
             f"🟢 <b>Code Integrity:</b> {integrity}\n"
             f"⚠️ <b>Duplicate Assignments:</b> {duplicate_assignments:,}\n"
             f"⚠️ <b>Invalid Format Codes:</b> {invalid_format_count:,}\n\n"
-            f"📊 <b>Auto-ID Pool (MSA1000-MSA9999):</b> {AUTO_POOL_SIZE:,}\n"
+            f"📊 <b>Auto-ID Pool ({base_tier['label']}):</b> {AUTO_POOL_SIZE:,}\n"
             f"🔢 <b>Unique Auto IDs Used:</b> {auto_unique_used:,}\n"
             f"🟢 <b>Available Auto IDs:</b> {available:,}\n"
             f"🧹 <b>Non-4-digit Legacy IDs:</b> {non_4_digit_count:,}\n"
             f"📈 <b>Pool Usage:</b>\n<code>[{bar}]</code>\n"
             f"<code>{pct_used:.6f}%</code> used — {risk}\n\n"
+            f"{tier_lines}"
             f"━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
             f"🕒 {now_local().strftime('%B %d, %Y  %I:%M:%S %p')}"
         )
@@ -6490,6 +6876,8 @@ async def process_reset_final(message: types.Message, state: FSMContext):
             "bot3_banned_users",
             "bot3_user_activity",
             "bot3_state",
+            "bot3_leaderboards",
+            "bot3_click_rollups",
         ]
         wiped = []
         for coll_name in collections_to_wipe:
@@ -6516,6 +6904,9 @@ async def process_reset_final(message: types.Message, state: FSMContext):
             }},
             upsert=True
         )
+        admin_snapshot.invalidate()
+        # drop_collection took the indexes with it; rebuild them now rather than at next boot
+        await asyncio.to_thread(indexes.apply)
 
         wiped_str = "\n".join([f"• <code>{c}</code>" for c in wiped])
         await message.answer(
@@ -8382,7 +8773,7 @@ async def role_admin_selected(message: types.Message, state: FSMContext):
         return
         
     # Verify admin exists (Direct DB check to allow managing locked admins)
-    admin_doc = col_admins.find_one({"user_id": target_admin_id})
+    admin_doc = admin_snapshot.admin_doc(target_admin_id)
     if not admin_doc and target_admin_id != MASTER_ADMIN_ID:
         await message.answer(f"⚠️ User {target_admin_id} is not an admin.", reply_markup=get_admin_config_menu())
         await state.clear()
@@ -8406,6 +8797,7 @@ async def role_admin_selected(message: types.Message, state: FSMContext):
         # Instantly toggle lock status and stay on the same paginated keyboard
         new_lock_state = not is_locked
         col_admins.update_one({"user_id": target_admin_id}, {"$set": {"is_locked": new_lock_state}})
+        admin_snapshot.invalidate()
         
         status_text = "LOCKED (Inactive)" if new_lock_state else "UNLOCKED (Active)"
         icon = "🔒" if new_lock_state else "🔓"
@@ -8471,13 +8863,14 @@ async def role_selected_process(message: types.Message, state: FSMContext):
     # Handle Lock/Unlock
     elif "🔒 LOCK" in selected_role:
         # Check if already locked
-        admin_doc = col_admins.find_one({"user_id": target_admin_id})
+        admin_doc = admin_snapshot.admin_doc(target_admin_id)
         if admin_doc and admin_doc.get("is_locked", False):
             await message.answer(f"⚠️ <b>Admin {target_admin_id} is ALREADY LOCKED.</b>", reply_markup=get_admin_config_menu(), parse_mode="HTML")
             await state.clear()
             return
 
         col_admins.update_one({"user_id": target_admin_id}, {"$set": {"is_locked": True}})
+        admin_snapshot.invalidate()
         log_user_action(message.from_user, "ADMIN LOCKED", f"Locked {target_admin_id}")
         await state.clear()
         await message.answer(
@@ -8488,13 +8881,14 @@ async def role_selected_process(message: types.Message, state: FSMContext):
         
     elif "🔓 UNLOCK" in selected_role:
         # Check if already unlocked
-        admin_doc = col_admins.find_one({"user_id": target_admin_id})
+        admin_doc = admin_snapshot.admin_doc(target_admin_id)
         if admin_doc and not admin_doc.get("is_locked", False):
             await message.answer(f"⚠️ <b>Admin {target_admin_id} is ALREADY UNLOCKED.</b>", reply_markup=get_admin_config_menu(), parse_mode="HTML")
             await state.clear()
             return
 
         col_admins.update_one({"user_id": target_admin_id}, {"$set": {"is_locked": False}})
+        admin_snapshot.invalidate()
         log_user_action(message.from_user, "ADMIN UNLOCKED", f"Unlocked {target_admin_id}")
         
         # Send Role Message on Unlock
@@ -8554,12 +8948,13 @@ async def role_selected_process(message: types.Message, state: FSMContext):
         {"user_id": target_admin_id},
         {"$set": {"permissions": new_perms}}
     )
+    admin_snapshot.invalidate()
     
     # LOG
     log_user_action(message.from_user, "ROLE UPDATE", f"Set {target_admin_id} to {role_key}")
     
     # Notify Target Admin (Premium Message) ONLY if not locked
-    admin_doc = col_admins.find_one({"user_id": target_admin_id})
+    admin_doc = admin_snapshot.admin_doc(target_admin_id)
     if admin_doc and not admin_doc.get("is_locked", False) and "UNLOCK" not in selected_role:
         try:
             caps_list = []
@@ -8671,6 +9066,7 @@ async def process_owner_second_confirm(message: types.Message, state: FSMContext
                     "is_owner": False
                 }}
             )
+        admin_snapshot.invalidate()
         
         # 3. Update Global Cache & env file permanently
         MASTER_ADMIN_ID = target_admin_id
@@ -8768,7 +9164,7 @@ async def permission_admin_selected(message: types.Message, state: FSMContext):
         return
         
     target_id = int(message.text)
-    admin = col_admins.find_one({"user_id": target_id})
+    admin = admin_snapshot.admin_doc(target_id)
     
     if not admin:
         await message.answer("⚠️ Admin not found.", reply_markup=get_admin_config_menu())
@@ -8779,6 +9175,8 @@ async def permission_admin_selected(message: types.Message, state: FSMContext):
     current_perms = admin.get("permissions")
     if current_perms is None:
         current_perms = [] # Start blank so you explicitly grant what is needed
+    else:
+        current_perms = list(current_perms)  # toggles must not edit the cached admin doc before SAVE
         
     # Save partial state
     await state.update_data(target_admin_id=target_id, current_perms=current_perms)
@@ -8838,6 +9236,7 @@ async def permission_message_handler(message: types.Message, state: FSMContext):
             {"user_id": target_id},
             {"$set": {"permissions": current_perms}}
         )
+        admin_snapshot.invalidate()
         await state.clear()
         await message.answer(f"✅ <b>PERMISSIONS SAVED</b> for Admin `{target_id}`", reply_markup=get_admin_config_menu(), parse_mode="HTML")
         return
@@ -8876,7 +9275,7 @@ async def permission_message_handler(message: types.Message, state: FSMContext):
     await state.update_data(current_perms=current_perms)
     
     # Re-send menu to update button states
-    admin = col_admins.find_one({"user_id": target_id})
+    admin = admin_snapshot.admin_doc(target_id)
     admin_name = admin.get("full_name", "Admin") if admin else "Admin"
     await send_permission_toggles(message, target_id, current_perms, admin_name)
 
@@ -9175,7 +9574,10 @@ async def health_check_endpoint(request):
             "memory_mb": round(memory_mb, 2),
             "total_requests": health_monitor.system_metrics["total_requests"],
             "total_errors": health_monitor.system_metrics["total_errors"],
-            "is_healthy": health_monitor.is_healthy
+            "is_healthy": health_monitor.is_healthy,
+            "mongo_pool": pool_stats(),
+            "telegram_queue": governor_for(BOT_TOKEN).stats(),
+            "admin_cache": admin_snapshot.stats()
         })
     except Exception as e:
         logger.error(f"Health check endpoint error: {e}")
@@ -9601,6 +10003,8 @@ async def debug_catch_all(message: types.Message):
 async def start_health_server():
     """Start health check web server for Render/Railway + optional webhook"""
     global health_server_runner
+    if HOSTED:
+        return  # main.py serves /health and the webhook route
     try:
         app = web.Application()
         app.router.add_get('/health', health_check_endpoint)
@@ -9695,14 +10099,8 @@ async def main():
         else:
             print("ℹ️ No previous state found (fresh start)")
 
-    print("\n🔑 Verifying MSA code integrity...")
-    try:
-        repaired_count = await asyncio.to_thread(repair_missing_duplicate_msa_codes)
-        await asyncio.to_thread(ensure_unique_msa_code_index)
-        print(f"  ✅ MSA integrity ready (repaired: {repaired_count})")
-    except Exception as msa_err:
-        logger.error(f"MSA integrity check failed: {msa_err}")
-        print(f"  ⚠️ MSA integrity warning: {msa_err}")
+    # MSA code repair + unique index are part of the index registry (background)
+    boot.mark("restore state")
     
     # Start background tasks
     print("\n🔧 Starting background services...")
@@ -9716,6 +10114,9 @@ async def main():
     asyncio.create_task(state_persistence_task())
     print(f"  ✅ State persistence ({STATE_BACKUP_INTERVAL_MINUTES} min interval)")
     
+    asyncio.create_task(leaderboard_refresh_task())
+    print(f"  ✅ Analytics leaderboards ({LEADERBOARD_REFRESH_MINUTES} min interval, top {LEADERBOARD_TOP_K})")
+    
     # ── NEW: Unified weekly backup (stores in DB, no delivery) ──
     if weekly_backup_scheduler:
         asyncio.create_task(
@@ -9844,6 +10245,7 @@ async def main():
         print(f"⚠️  WARNING: MASTER_ADMIN_ID is 0 - update {ACTIVE_ENV_FILE} with your Telegram user ID")
         print("   Get your ID from: @userinfobot on Telegram")
     
+    boot.mark("startup tasks")
     print("\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     print("✅ BOT 3 IS NOW ONLINE AND READY!")
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n")
@@ -9856,12 +10258,14 @@ async def main():
             await bot.delete_webhook(drop_pending_updates=True)
             await bot.set_webhook(_WEBHOOK_URL)
             logger.info(f"✅ Webhook set: {_WEBHOOK_URL}")
+            boot.ready()
             # Health server (with webhook route) started above via create_task
             await asyncio.Event().wait()
         else:
             # ── POLLING MODE (local dev fallback) ──────────────────────────
             logger.info("ℹ️ No RENDER_EXTERNAL_URL — using polling (local dev mode)")
-            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+            boot.ready()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), handle_signals=not HOSTED)
     finally:
         # Cleanup on shutdown
         await cleanup_on_shutdown()
@@ -1,3 +1,6 @@
+from boot_profile import BootProfiler
+boot = BootProfiler("bot4")
+
 import asyncio
 import logging
 import os
@@ -6,46 +9,40 @@ import io
 import pickle
 import pymongo
 import re
+from index_migrations import IndexRegistry
+from hosting import HOSTED, telegram_session
+from mongo_client import get_client
+from access_cache import ACCESS_CACHE_TTL, AdminSnapshot, as_user_id
+from telegram_governor import governor_summary
+from stream_capture import terminal_lines, install as capture_streams
 import threading
 import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from aiohttp import web
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 import shutil
 import base64
+import zipfile
+import gzip
+import contextlib
 import json
 import time
 from datetime import datetime, timedelta
 from aiogram import Bot, Dispatcher, types, F, BaseMiddleware
-from aiogram.exceptions import TelegramRetryAfter
+from aiogram.exceptions import TelegramRetryAfter, TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import FSInputFile, ReplyKeyboardMarkup, KeyboardButton, BotCommand, ReplyKeyboardRemove
+from aiogram.types import FSInputFile, BufferedInputFile, ReplyKeyboardMarkup, KeyboardButton, BotCommand, ReplyKeyboardRemove
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
-from collections import deque
+from collections import deque, OrderedDict
 
 # ==========================================
 # 📡 LIVE TERMINAL CAPTURE
 # ==========================================
-LOG_BUFFER = deque(maxlen=50)
-
-class StreamLogger:
-    """Redirects stdout/stderr to a memory buffer for live bot viewing"""
-    def __init__(self, original):
-        self.original = original
-    
-    def write(self, message):
-        if message.strip():
-            # Get timestamp
-            ts = datetime.now().strftime('%I:%M:%S %p')
-            # Add to buffer
-            LOG_BUFFER.append(f"[{ts}] {message.strip()}")
-        # Pass to original stream
-        self.original.write(message)
-        self.original.flush()
-        
-    def flush(self):
-        self.original.flush()
+# stdout/stderr are teed into stream_capture.LOG_BUFFER for the terminal view.
 
 # Fix Windows console encoding for emoji support
 if sys.platform == 'win32':
@@ -54,9 +51,9 @@ if sys.platform == 'win32':
     except AttributeError:
         pass
 
-# Redirect Streams
-sys.stdout = StreamLogger(sys.stdout)
-sys.stderr = StreamLogger(sys.stderr)
+# Redirect Streams (standalone only: under main.py sys.stdout is shared by every hosted bot)
+if not HOSTED:
+    capture_streams()
 
 # ── Render secret-file restore ────────────────────────────────────────────────
 # On Render the disk is ephemeral (wiped on every redeploy).
@@ -99,20 +96,45 @@ def now_local() -> datetime:
         return datetime.now(_BOT4_TZ).replace(tzinfo=None)
     return datetime.now()
 
-# ReportLab & Google Imports
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import Color, gray, black, HexColor
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, HRFlowable, Table, TableStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
+boot.mark("imports")
+
+# ReportLab & Google Imports — loaded on first use (PDF render / Drive access).
+# Together they are most of bot4's import time and most updates need neither.
+_PDF_STACK_LOADED = False
+_DRIVE_STACK_LOADED = False
+
+
+def _load_pdf_stack():
+    global _PDF_STACK_LOADED, letter, canvas, Color, gray, black, HexColor, getSampleStyleSheet, ParagraphStyle
+    global SimpleDocTemplate, Paragraph, Spacer, PageBreak, HRFlowable, Table, TableStyle, inch
+    global TA_LEFT, TA_CENTER, TA_JUSTIFY, pdfmetrics, TTFont, StandardEncryption
+    if _PDF_STACK_LOADED:
+        return
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.colors import Color, gray, black, HexColor
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, HRFlowable, Table, TableStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.lib.pdfencrypt import StandardEncryption
+    _PDF_STACK_LOADED = True
+    _register_unicode_font()
+
+
+def _load_drive_stack():
+    global _DRIVE_STACK_LOADED, InstalledAppFlow, Request, build
+    global MediaIoBaseUpload, MediaIoBaseDownload, MediaUploadProgress, HttpError
+    if _DRIVE_STACK_LOADED:
+        return
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload, MediaUploadProgress
+    from googleapiclient.errors import HttpError
+    _DRIVE_STACK_LOADED = True
 
 # ── Unicode font registration (for ₹, €, £ etc. in PDFs) ──────────────────
 # Try several locations in order; Render (Debian/Ubuntu) ships DejaVuSans.
@@ -190,8 +212,6 @@ def _register_unicode_font():
     except Exception as e:
         print(f"⚠️ Unicode font registration failed: {e} — falling back to Helvetica")
 
-_register_unicode_font()
-
 # ==========================================
 # ⚡ CONFIGURATION
 # ==========================================
@@ -276,6 +296,11 @@ BOT_TOKEN, OWNER_ID = load_secrets_from_env()
 PARENT_FOLDER_ID = os.getenv("PARENT_FOLDER_ID", "")
 CREDENTIALS_FILE = "credentials.json"
 TOKEN_FILE        = "token.pickle"
+DRIVE_UPLOAD_CHUNK_MB = max(1, int(os.getenv("DRIVE_UPLOAD_CHUNK_MB", 4)))   # resumable upload chunk size
+DRIVE_UPLOAD_RETRIES  = int(os.getenv("DRIVE_UPLOAD_RETRIES", 5))            # resume attempts per upload
+DRIVE_FAKE_DIR        = os.getenv("DRIVE_FAKE_DIR", "")                      # set → offline Drive stand-in
+DRIVE_FAKE_LATENCY_MS = int(os.getenv("DRIVE_FAKE_LATENCY_MS", 0))           # simulated round-trip time
+DRIVE_SYNC_INTERVAL_MINUTES = int(os.getenv("DRIVE_SYNC_INTERVAL_MINUTES", 30))  # incremental Drive→DB sync, 0 = off
 ADMIN_PASSWORD   = os.getenv("ADMIN_PASSWORD", "")   # Set on Render; never hardcode here
 
 # In-memory set of owner IDs that have completed password auth this session
@@ -292,14 +317,16 @@ START_TIME = time.time()
 # 🛠 SETUP
 # ==========================================
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-bot = Bot(token=BOT_TOKEN)
+bot = Bot(token=BOT_TOKEN, session=telegram_session())
 dp = Dispatcher()
+dp.update.outer_middleware(boot.first_update_middleware)
 col_pdfs = None
 col_trash = None
 col_locked = None
 col_trash_locked = None
 col_admins = None
 col_bot4_state = None
+col_tg_files = None
 db_client = None
 
 # ── Unified weekly backup system ──
@@ -331,20 +358,10 @@ _WEBHOOK_URL = f"{_WEBHOOK_BASE_URL}{_WEBHOOK_PATH}" if _WEBHOOK_BASE_URL else "
 # NOTE: start_web_server is defined once near the bottom of this file (canonical version).
 
 def connect_db():
-    global col_pdfs, col_trash, col_locked, col_trash_locked, col_admins, col_banned, col_bot4_state, db_client
+    global col_pdfs, col_trash, col_locked, col_trash_locked, col_admins, col_banned, col_bot4_state, col_tg_files, db_client
     try:
-        db_client = pymongo.MongoClient(
-            MONGO_URI,
-            serverSelectionTimeoutMS=10000,
-            maxPoolSize=10,       # Reduced pool — fewer idle sockets to maintain
-            minPoolSize=1,        # Keep only 1 connection alive when idle
-            maxIdleTimeMS=30000,  # Drop idle connections after 30s
-            socketTimeoutMS=20000,
-            connectTimeoutMS=10000,
-            heartbeatFrequencyMS=60000,  # Check server health every 60s (default 10s) — reduces background noise
-            retryWrites=True,
-            retryReads=True
-        )
+        # Shared tuned client (mongo_client.py); size this service's pool with MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE
+        db_client = get_client(MONGO_URI, app="bot4")
         db = db_client[MONGO_DB_NAME]
         col_pdfs = db["pdf_library"]
         col_trash = db["recycle_bin"]
@@ -353,77 +370,7 @@ def connect_db():
         col_admins = db["admins_bot4"]
         col_banned = db["banned_list"]
         col_bot4_state = db["bot4_state"]
-
-        # Startup DB hygiene: dedupe records while preserving data (move duplicates to recycle_bin)
-        try:
-            raw_docs = list(col_pdfs.find().sort("timestamp", -1))
-            seen_codes = set()
-            seen_drive_ids = set()
-            deduped = 0
-            normalized = 0
-            for doc in raw_docs:
-                _id = doc.get("_id")
-                raw_code = (doc.get("code") or "")
-                code = raw_code.strip().upper()
-                link = (doc.get("link") or "").strip()
-                fid = (doc.get("drive_file_id") or "").strip()
-                if not fid and link:
-                    m = re.search(r'/file/d/([^/?\s]+)', link) or re.search(r'[?&]id=([^&\s]+)', link)
-                    if m:
-                        fid = m.group(1)
-
-                if code and code != raw_code:
-                    col_pdfs.update_one({"_id": _id}, {"$set": {"code": code}})
-                    normalized += 1
-                if fid and not doc.get("drive_file_id"):
-                    col_pdfs.update_one({"_id": _id}, {"$set": {"drive_file_id": fid}})
-
-                dup_code = bool(code and code in seen_codes)
-                dup_drive = bool(fid and fid in seen_drive_ids)
-
-                if dup_code or dup_drive:
-                    doc["deleted_at"] = datetime.now()
-                    doc["dedupe_reason"] = "startup_cleanup"
-                    col_trash.insert_one(doc)
-                    col_pdfs.delete_one({"_id": _id})
-                    deduped += 1
-                    continue
-
-                if code:
-                    seen_codes.add(code)
-                if fid:
-                    seen_drive_ids.add(fid)
-
-            if deduped or normalized:
-                print(f"🧹 PDF library cleanup: normalized={normalized}, deduped={deduped}")
-        except Exception as clean_err:
-            logging.warning(f"Startup PDF dedupe cleanup failed: {clean_err}")
-
-        try:
-            col_pdfs.create_index("code", unique=True, name="uniq_code")
-        except Exception as idx_err:
-            logging.warning(f"Index uniq_code not enforced (likely duplicates exist): {idx_err}")
-        col_pdfs.create_index("timestamp", name="idx_timestamp")
-        col_pdfs.create_index("drive_file_id", sparse=True, name="idx_drive_file_id")
-        col_trash.create_index("code", name="idx_trash_code")
-
-        # Admin / ban / backup integrity indexes (warn-only if legacy conflicts exist)
-        try:
-            col_admins.create_index("user_id", unique=True, name="uniq_admin_user_id")
-        except Exception as idx_err:
-            logging.warning(f"Index uniq_admin_user_id not enforced: {idx_err}")
-        try:
-            col_banned.create_index("user_id", unique=True, name="uniq_banned_user_id")
-        except Exception as idx_err:
-            logging.warning(f"Index uniq_banned_user_id not enforced: {idx_err}")
-        try:
-            db["bot4_backups"].create_index([("date", 1), ("type", 1)], unique=True, name="uniq_backup_date_type")
-        except Exception as idx_err:
-            logging.warning(f"Index uniq_backup_date_type not enforced: {idx_err}")
-        try:
-            db["bot4_monthly_backups"].create_index("month_key", unique=True, name="uniq_backup_month_key")
-        except Exception as idx_err:
-            logging.warning(f"Index uniq_backup_month_key not enforced: {idx_err}")
+        col_tg_files = db["bot4_tg_file_cache"]
 
         db_client.server_info()
         print("✅ Connected to MongoDB successfully")
@@ -433,6 +380,78 @@ def connect_db():
         print(f"❌ Failed to connect to MongoDB: {e}")
         return False
 
+def dedupe_pdf_library():
+    """Startup DB hygiene: dedupe records while preserving data (move duplicates to recycle_bin)."""
+    try:
+        raw_docs = list(col_pdfs.find().sort("timestamp", -1))
+        seen_codes = set()
+        seen_drive_ids = set()
+        deduped = 0
+        normalized = 0
+        for doc in raw_docs:
+            _id = doc.get("_id")
+            raw_code = (doc.get("code") or "")
+            code = raw_code.strip().upper()
+            link = (doc.get("link") or "").strip()
+            fid = (doc.get("drive_file_id") or "").strip()
+            if not fid and link:
+                m = re.search(r'/file/d/([^/?\s]+)', link) or re.search(r'[?&]id=([^&\s]+)', link)
+                if m:
+                    fid = m.group(1)
+
+            if code and code != raw_code:
+                col_pdfs.update_one({"_id": _id}, {"$set": {"code": code}})
+                normalized += 1
+            if fid and not doc.get("drive_file_id"):
+                col_pdfs.update_one({"_id": _id}, {"$set": {"drive_file_id": fid}})
+
+            dup_code = bool(code and code in seen_codes)
+            dup_drive = bool(fid and fid in seen_drive_ids)
+
+            if dup_code or dup_drive:
+                doc["deleted_at"] = datetime.now()
+                doc["dedupe_reason"] = "startup_cleanup"
+                col_trash.insert_one(doc)
+                col_pdfs.delete_one({"_id": _id})
+                deduped += 1
+                continue
+
+            if code:
+                seen_codes.add(code)
+            if fid:
+                seen_drive_ids.add(fid)
+
+        if deduped or normalized:
+            print(f"🧹 PDF library cleanup: normalized={normalized}, deduped={deduped}")
+    except Exception as clean_err:
+        logging.warning(f"Startup PDF dedupe cleanup failed: {clean_err}")
+
+
+def build_index_registry():
+    """Indexes are declared here; index_migrations applies only new or changed ones."""
+    db = db_client[MONGO_DB_NAME]
+    indexes = IndexRegistry(db, "bot4")
+    indexes.index(col_pdfs, "code", unique=True, name="uniq_code")  # needs dedupe_pdf_library() first
+    indexes.index(col_pdfs, "timestamp", name="idx_timestamp")
+    indexes.index(col_pdfs, "drive_file_id", sparse=True, name="idx_drive_file_id")
+    indexes.index(col_trash, "code", name="idx_trash_code")
+    indexes.index(col_tg_files, "code", name="idx_tg_file_code")
+    # Admin / ban / backup integrity indexes (failures are logged and retried next boot)
+    indexes.index(col_admins, "user_id", unique=True, name="uniq_admin_user_id")
+    indexes.index(col_banned, "user_id", unique=True, name="uniq_banned_user_id")
+    indexes.index(db["bot4_backups"], [("date", 1), ("type", 1)], unique=True, name="uniq_backup_date_type")
+    indexes.index(db["bot4_monthly_backups"], "month_key", unique=True, name="uniq_backup_month_key")
+    return indexes
+
+
+def startup_db_maintenance():
+    """Library dedupe, then the index registry. Runs in a background thread once the bot is up."""
+    if col_pdfs is None:
+        return
+    dedupe_pdf_library()
+    build_index_registry().apply()
+
+
 # Initialize database collections with safe fallback
 col_pdfs = None
 col_trash = None
@@ -441,18 +460,56 @@ col_trash_locked = None
 col_admins = None
 col_banned = None
 col_bot4_state = None
+col_tg_files = None
 db_client = None
 
 # Attempt connection
 if not connect_db():
     print("⚠️ WARNING: Bot starting without database connection!")
     print("⚠️ Database-dependent features will be disabled until connection is restored.")
+boot.mark("mongo")
     
 # SECURITY GLOBALS
 SECURITY_COOLDOWN = {}
-SPAM_TRACKER = {} # Middleware: List of timestamps [t1, t2...]
+SPAM_TRACKER = OrderedDict() # Middleware: uid -> deque of recent timestamps (LRU-evicted)
 START_TRACKER = {} # Start Handler: [timestamp, count]
 
+# ACCESS SNAPSHOT + FLOOD LIMITER
+# admins_bot4 / banned_list are tiny and only change through bot4's own
+# handlers, so they are held in memory and reloaded only after a write
+# (access_snapshot.invalidate()) or every ACCESS_CACHE_TTL seconds.
+SPAM_WINDOW = 2.0          # seconds
+SPAM_LIMIT = 5             # messages allowed per window
+SPAM_TRACKER_MAX = 5000    # users tracked before least-recently-seen are evicted
+
+
+class AccessSnapshot(AdminSnapshot):
+    """Admin docs (by int user_id) plus banned user IDs."""
+
+    def __init__(self, ttl: int):
+        super().__init__(lambda: col_admins, ttl)
+        self._banned = set()
+
+    def mark_banned(self, user_id):
+        self._banned.add(user_id)
+
+    def _reload(self):
+        banned = set()
+        if col_banned is not None:
+            for doc in col_banned.find({}, {"user_id": 1}):
+                uid = as_user_id(doc.get("user_id"))
+                if uid is not None:
+                    banned.add(uid)
+        super()._reload()
+        self._banned = banned
+
+    def is_banned(self, user_id):
+        self._ensure()
+        return as_user_id(user_id) in self._banned
+
+
+access_snapshot = AccessSnapshot(ACCESS_CACHE_TTL)
+
 # PERMISSION MAPPING
 # Text Trigger -> Internal Key
 PERMISSION_MAP = {
@@ -477,35 +534,12 @@ DEFAULT_PERMISSIONS = list(PERMISSION_MAP.values())
 def is_admin(user_id):
     """Checks if user is Owner or in Admin DB (and NOT locked)."""
     if user_id == OWNER_ID: return True
-    
-    try:
-        if col_admins is None:
-            return False  # If DB not connected, only owner has admin rights
-        
-        # Check int
-        doc = col_admins.find_one({"user_id": user_id})
-        if doc: return not doc.get('locked', False)
-        
-        # Check str
-        doc = col_admins.find_one({"user_id": str(user_id)})
-        if doc: return not doc.get('locked', False)
-    except Exception as e:
-        logging.error(f"is_admin check failed: {e}")
-        return False  # On error, don't grant admin access
-    
-    return False
+    doc = access_snapshot.admin_doc(user_id)
+    return bool(doc) and not doc.get('locked', False)
 
 def is_banned(user_id):
     """Checks if user is in Banned DB."""
-    try:
-        if col_banned is None:
-            return False  # If DB not connected, allow access
-        if col_banned.find_one({"user_id": user_id}): 
-            return True
-        return False
-    except Exception as e:
-        logging.error(f"is_banned check failed: {e}")
-        return False  # On error, don't block user
+    return access_snapshot.is_banned(user_id)
 
 class SecurityMiddleware(BaseMiddleware):
     async def __call__(self, handler, event: types.Message, data: dict):
@@ -524,13 +558,20 @@ class SecurityMiddleware(BaseMiddleware):
 
         # 2. ANTI-SPAM (Rate Limit: 5 msgs in 2s)
         now = time.time()
-        if uid not in SPAM_TRACKER: SPAM_TRACKER[uid] = []
+        hits = SPAM_TRACKER.get(uid)
+        if hits is None:
+            hits = SPAM_TRACKER[uid] = deque(maxlen=SPAM_LIMIT + 1)
+            while len(SPAM_TRACKER) > SPAM_TRACKER_MAX:
+                SPAM_TRACKER.popitem(last=False)   # evict least-recently-seen user
+        else:
+            SPAM_TRACKER.move_to_end(uid)
         
         # Prune old timestamps
-        SPAM_TRACKER[uid] = [t for t in SPAM_TRACKER[uid] if now - t < 2.0]
-        SPAM_TRACKER[uid].append(now)
+        while hits and now - hits[0] >= SPAM_WINDOW:
+            hits.popleft()
+        hits.append(now)
         
-        if len(SPAM_TRACKER[uid]) > 5:
+        if len(hits) > SPAM_LIMIT:
             if not is_admin(uid): # Don't ban admins
                  # Auto-Ban Logic
                  try:
@@ -540,6 +581,7 @@ class SecurityMiddleware(BaseMiddleware):
                             "reason": "Auto-Ban: Spamming (Flood)", 
                             "timestamp": datetime.now()
                          })
+                     access_snapshot.mark_banned(uid)
                  except Exception as e:
                      logging.error(f"Auto-ban insert failed: {e}")
                  # Notify Owner
@@ -577,9 +619,8 @@ class SecurityMiddleware(BaseMiddleware):
             if cleaned_text in PERMISSION_MAP:
                 required_perm = PERMISSION_MAP[cleaned_text]
                 
-                # Check Admin DB
-                admin_doc = col_admins.find_one({"user_id": uid})
-                if not admin_doc: admin_doc = col_admins.find_one({"user_id": str(uid)})
+                # Check Admin snapshot
+                admin_doc = access_snapshot.admin_doc(uid)
                 
                 # If user is admin, check specific permission
                 if admin_doc:
@@ -660,8 +701,7 @@ def get_main_menu(user_id=None):
             pass
         elif is_admin(user_id):
             # Fetch specific permissions
-            admin_doc = col_admins.find_one({"user_id": user_id})
-            if not admin_doc: admin_doc = col_admins.find_one({"user_id": str(user_id)})
+            admin_doc = access_snapshot.admin_doc(user_id)
             
             if admin_doc:
                 allowed_keys = set(admin_doc.get("permissions", DEFAULT_PERMISSIONS))
@@ -734,17 +774,88 @@ def _natural_sort_key(doc):
             for part in re.split(r'(\d+)', code)]
 
 
+LIBRARY_INDEX_TTL = int(os.getenv("LIBRARY_INDEX_TTL", 300))  # safety rebuild (s) for writes made outside bot4
+
+
+class LibraryIndex:
+    """
+    Ordered, de-duplicated view of pdf_library (newest document per code).
+
+    Built with one $group aggregation and kept in memory in both orders the
+    UI uses — recency (timestamp desc) and natural code order — so paging and
+    numeric index lookups are list slices/indexing and code lookups are dict
+    hits. Every write to col_pdfs calls invalidate(); the next read rebuilds.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._dirty = True
+        self._built_at = 0.0
+        self._recent = []     # newest first
+        self._natural = []    # PF9 < PF10 < PF11
+        self._by_code = {}
+        self._natural_pos = {}
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _ensure(self):
+        if not self._dirty and (time.time() - self._built_at) < self.ttl:
+            return
+        if col_pdfs is None:
+            self._recent, self._natural, self._by_code, self._natural_pos = [], [], {}, {}
+            return
+        self._dirty = False   # cleared first: a write during the rebuild re-marks it
+        try:
+            docs = list(col_pdfs.aggregate([
+                {"$match": {"code": {"$nin": [None, ""]}}},
+                {"$sort": {"timestamp": -1}},
+                {"$group": {"_id": "$code", "doc": {"$first": "$$ROOT"}}},
+                {"$replaceRoot": {"newRoot": "$doc"}},
+                {"$sort": {"timestamp": -1, "_id": -1}},
+            ], allowDiskUse=True))
+        except Exception:
+            self._dirty = True
+            raise
+        natural = sorted(docs, key=_natural_sort_key)
+        self._recent = docs
+        self._natural = natural
+        self._by_code = {d["code"]: d for d in docs}
+        self._natural_pos = {d["code"]: i for i, d in enumerate(natural)}
+        self._built_at = time.time()
+
+    def recent(self) -> list:
+        """Unique docs, newest first. Shared list — slice it, don't mutate it."""
+        self._ensure()
+        return self._recent
+
+    def natural(self) -> list:
+        """Unique docs in natural code order. Shared list — slice it, don't mutate it."""
+        self._ensure()
+        return self._natural
+
+    def get(self, code: str):
+        self._ensure()
+        return self._by_code.get(code)
+
+    def natural_index(self, code: str):
+        """1-based position of `code` in natural order, or None."""
+        self._ensure()
+        pos = self._natural_pos.get(code)
+        return None if pos is None else pos + 1
+
+
+library_index = LibraryIndex(LIBRARY_INDEX_TTL)
+
+
 def _get_unique_docs():
     """Returns all PDF documents sorted by timestamp, keeping only the newest for each code."""
-    raw_docs = list(col_pdfs.find().sort("timestamp", -1))
-    seen = set()
-    unique_docs = []
-    for d in raw_docs:
-        c = d.get('code')
-        if c and c not in seen:
-            seen.add(c)
-            unique_docs.append(d)
-    return unique_docs
+    return library_index.recent()
+
+
+def _get_natural_docs():
+    """Same unique documents in natural code order (consistent library indices)."""
+    return library_index.natural()
 
 
 def _sanitize_code(raw: str) -> str:
@@ -770,89 +881,218 @@ def _fetch_drive_pdf_meta(service, link: str):
     return meta
 
 
-def _sync_drive_folder_to_db(limit: int = 2000) -> dict:
-    """
-    Import PDFs from Google Drive folder tree into MongoDB (upsert by code).
-    Code is derived from file name without .pdf.
-    """
-    if col_pdfs is None:
-        return {"added": 0, "updated": 0, "skipped": 0, "reason": "db_unavailable"}
-    if not PARENT_FOLDER_ID:
-        return {"added": 0, "updated": 0, "skipped": 0, "reason": "parent_folder_missing"}
+DRIVE_SYNC_FIELDS = "id,name,mimeType,parents,webViewLink,modifiedTime,trashed"
+DRIVE_SYNC_BATCH = 500          # UpdateOne ops per bulk_write
+DRIVE_SYNC_STATE_ID = "drive_sync"
 
-    service = get_drive_service()
-    added = 0
-    updated = 0
-    skipped = 0
-    queue = [PARENT_FOLDER_ID]
+
+def _drive_sync_payload(f: dict):
+    """Drive file resource → pdf_library fields, or None when it is not an importable PDF."""
+    if f.get("mimeType") != "application/pdf":
+        return None
+    name = (f.get("name") or "").strip()
+    if not name.lower().endswith(".pdf"):
+        return None
+    code = _sanitize_code(name[:-4])
+    if not code:
+        return None
+    return {
+        "code": code,
+        "link": (f.get("webViewLink") or "").strip(),
+        "drive_file_id": f.get("id"),
+        "drive_name": name,
+        "drive_modified": f.get("modifiedTime"),
+        "timestamp": now_local(),
+        "source": "drive_sync",
+    }
+
+
+def _drive_sync_flush(ops: list, stats: dict):
+    if not ops:
+        return
+    res = col_pdfs.bulk_write(ops, ordered=False)
+    library_index.invalidate()
+    stats["added"] += res.upserted_count
+    stats["updated"] += res.modified_count
+    ops.clear()
+
+
+def _drive_sync_upsert(f: dict, known: dict, ops: list, stats: dict) -> bool:
+    """Queue an upsert for `f` unless it is not a PDF or its modifiedTime is unchanged. Returns True if queued."""
+    payload = _drive_sync_payload(f)
+    if payload is None:
+        stats["skipped"] += 1
+        return False
+    prev = known.get(payload["code"])
+    if prev and prev == (payload["drive_file_id"], payload["drive_modified"]):
+        stats["unchanged"] += 1
+        return False
+    known[payload["code"]] = (payload["drive_file_id"], payload["drive_modified"])
+    ops.append(pymongo.UpdateOne({"code": payload["code"]}, {"$set": payload}, upsert=True))
+    if len(ops) >= DRIVE_SYNC_BATCH:
+        _drive_sync_flush(ops, stats)
+    return True
+
+
+def _drive_sync_known(codes=None) -> dict:
+    """code → (drive_file_id, drive_modified) for every library entry (or just `codes`), in one projected read."""
+    query = {} if codes is None else {"code": {"$in": list(codes)}}
+    return {
+        d["code"]: (d.get("drive_file_id"), d.get("drive_modified"))
+        for d in col_pdfs.find(query, {"_id": 0, "code": 1, "drive_file_id": 1, "drive_modified": 1})
+        if d.get("code")
+    }
+
+
+def _drive_full_scan(service, limit: int, stats: dict):
+    """Breadth-first walk of PARENT_FOLDER_ID. Returns (folder IDs seen, whether the walk completed)."""
+    known = _drive_sync_known()
+    ops = []
+    queue = deque([PARENT_FOLDER_ID])
     seen_folders = set()
+    queued = 0
 
-    while queue and (added + updated) < limit:
-        folder_id = queue.pop(0)
+    while queue and queued < limit:
+        folder_id = queue.popleft()
         if folder_id in seen_folders:
             continue
         seen_folders.add(folder_id)
 
         page_token = None
-        while True:
+        while queued < limit:
             resp = service.files().list(
                 q=f"'{folder_id}' in parents and trashed=false",
-                pageSize=200,
+                pageSize=1000,
                 pageToken=page_token,
-                fields="nextPageToken, files(id,name,mimeType,webViewLink,modifiedTime)",
+                fields=f"nextPageToken, files({DRIVE_SYNC_FIELDS})",
                 supportsAllDrives=True,
                 includeItemsFromAllDrives=True,
             ).execute()
 
             for f in resp.get("files", []):
-                mime = f.get("mimeType", "")
-                if mime == "application/vnd.google-apps.folder":
+                if f.get("mimeType") == "application/vnd.google-apps.folder":
                     queue.append(f.get("id"))
                     continue
+                if _drive_sync_upsert(f, known, ops, stats):
+                    queued += 1
+                    if queued >= limit:
+                        break
 
-                if mime != "application/pdf":
-                    skipped += 1
-                    continue
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                break
 
-                name = (f.get("name") or "").strip()
-                if not name.lower().endswith(".pdf"):
-                    skipped += 1
-                    continue
+    _drive_sync_flush(ops, stats)
+    return seen_folders | set(queue), queued < limit
 
-                code = _sanitize_code(name[:-4])
-                if not code:
-                    skipped += 1
-                    continue
 
-                payload = {
-                    "code": code,
-                    "link": (f.get("webViewLink") or "").strip(),
-                    "drive_file_id": f.get("id"),
-                    "drive_name": name,
-                    "drive_modified": f.get("modifiedTime"),
-                    "timestamp": now_local(),
-                    "source": "drive_sync",
-                }
-
-                existing = col_pdfs.find_one({"code": code})
-                if existing:
-                    col_pdfs.update_one({"_id": existing["_id"]}, {"$set": payload})
-                    updated += 1
-                else:
-                    col_pdfs.insert_one(payload)
-                    added += 1
+def _drive_incremental_sync(service, token: str, folder_ids: set, stats: dict) -> str:
+    """Replay the Drive changes feed from `token`. Returns the next start page token."""
+    known = {}
+    ops = []
+    page_token = token
+    while True:
+        resp = service.changes().list(
+            pageToken=page_token,
+            pageSize=1000,
+            spaces="drive",
+            fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({DRIVE_SYNC_FIELDS}))",
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+        ).execute()
 
-                if (added + updated) >= limit:
-                    break
+        files = []
+        for change in resp.get("changes", []):
+            f = change.get("file") or {}
+            if change.get("removed") or f.get("trashed"):
+                stats["removed"] += 1   # library records are kept; Drive removals are only counted
+                continue
+            if not folder_ids.intersection(f.get("parents") or []):
+                continue                # outside the PARENT_FOLDER_ID tree
+            if f.get("mimeType") == "application/vnd.google-apps.folder":
+                folder_ids.add(f.get("id"))
+                continue
+            files.append(f)
 
-            if (added + updated) >= limit:
-                break
+        # Only this page's codes are looked up, not the whole library
+        codes = {p["code"] for p in map(_drive_sync_payload, files) if p} - known.keys()
+        if codes:
+            known.update(_drive_sync_known(codes))
+        for f in files:
+            _drive_sync_upsert(f, known, ops, stats)
 
-            page_token = resp.get("nextPageToken")
-            if not page_token:
-                break
+        if resp.get("newStartPageToken"):
+            _drive_sync_flush(ops, stats)
+            return resp["newStartPageToken"]
+        page_token = resp.get("nextPageToken")
+
+
+def _sync_drive_folder_to_db(limit: int = 2000, full: bool = False) -> dict:
+    """
+    Import PDFs from Google Drive folder tree into MongoDB (upsert by code).
+    Code is derived from file name without .pdf.
 
-    return {"added": added, "updated": updated, "skipped": skipped, "reason": "done"}
+    Incremental by default: replays the Drive changes feed from the page token
+    stored in bot4_state. Without a token (first run), with `full=True`, or when
+    the token is rejected it falls back to a full breadth-first scan. Files whose
+    modifiedTime did not change are skipped; writes go out in bulk_write batches.
+    """
+    stats = {"added": 0, "updated": 0, "skipped": 0, "unchanged": 0, "removed": 0, "mode": "full", "reason": "done"}
+    if col_pdfs is None:
+        return {**stats, "reason": "db_unavailable"}
+    if not PARENT_FOLDER_ID:
+        return {**stats, "reason": "parent_folder_missing"}
+
+    service = get_drive_service()
+    state = (col_bot4_state.find_one({"_id": DRIVE_SYNC_STATE_ID}) if col_bot4_state is not None else None) or {}
+    token = state.get("page_token")
+    folder_ids = set(state.get("folder_ids") or [])
+
+    next_token = None
+    if token and folder_ids and not full:
+        try:
+            stats["mode"] = "incremental"
+            next_token = _drive_incremental_sync(service, token, folder_ids, stats)
+        except HttpError as e:
+            logging.warning(f"Drive changes token rejected ({e}) — falling back to full scan")
+            stats["mode"] = "full"
+            next_token = None
+
+    if next_token is None:
+        # Take the token BEFORE scanning so edits made during the scan are replayed next time
+        next_token = service.changes().getStartPageToken(supportsAllDrives=True).execute().get("startPageToken")
+        folder_ids, complete = _drive_full_scan(service, limit, stats)
+        if not complete:
+            next_token = None   # hit `limit` — the next run must scan again, not replay changes
+            stats["reason"] = "limit"
+
+    if col_bot4_state is not None:
+        now = datetime.now()
+        update = {"page_token": next_token, "folder_ids": sorted(folder_ids), "last_sync": now, "last_mode": stats["mode"]}
+        if stats["mode"] == "full":
+            update["last_full_scan"] = now
+        col_bot4_state.update_one({"_id": DRIVE_SYNC_STATE_ID}, {"$set": update}, upsert=True)
+    return stats
+
+
+async def drive_sync_task():
+    """Periodic incremental Drive → library sync (DRIVE_SYNC_INTERVAL_MINUTES, 0 = off)."""
+    if DRIVE_SYNC_INTERVAL_MINUTES <= 0 or not PARENT_FOLDER_ID:
+        return
+    print(f"🔄 Drive sync: every {DRIVE_SYNC_INTERVAL_MINUTES} min (incremental)")
+    while True:
+        await asyncio.sleep(DRIVE_SYNC_INTERVAL_MINUTES * 60)
+        if not (DRIVE_FAKE_DIR or os.path.exists(CREDENTIALS_FILE)):
+            continue
+        try:
+            res = await asyncio.to_thread(_sync_drive_folder_to_db)
+            if res.get("added") or res.get("updated"):
+                logging.info(
+                    f"Drive sync ({res['mode']}): +{res['added']} / ~{res['updated']} / "
+                    f"unchanged {res['unchanged']} / skip {res['skipped']}"
+                )
+        except Exception as e:
+            logging.error(f"Drive sync task error: {e}")
 
 def get_formatted_file_list(docs, limit=30, start_index=1):
     """Generates a clean, consistent HTML list of files with indices and hyperlinks."""
@@ -1034,73 +1274,124 @@ async def auto_janitor():
 # ==========================================
 # 📦 INSTANT BACKUP SYSTEM
 # ==========================================
-def generate_system_backup():
-    """Generates a comprehensive snapshot of the system."""
+# Snapshots stream straight from MongoDB cursors to disk: one document in
+# memory at a time, written through a buffered (optionally gzip) file, so
+# memory stays flat however large the library grows.
+SNAPSHOT_BATCH = 500   # cursor batch size
+
+
+def _snapshot_sections():
+    """(section key, collection) in the order every JSON backup uses."""
+    return [
+        ("pdfs", col_pdfs),
+        ("trash", col_trash),
+        ("locked", col_locked),
+        ("trash_locked", col_trash_locked),
+        ("admins", col_admins),
+        ("banned", col_banned),
+    ]
+
+
+def _iter_docs(collection, projection=None, sort=None):
+    if collection is None:
+        return
+    cursor = collection.find({}, projection, batch_size=SNAPSHOT_BATCH)
+    if sort:
+        cursor = cursor.sort(sort)
+    yield from cursor
+
+
+def _open_snapshot(target):
+    """Path ("*.gz" → gzip) or an already-open text stream (e.g. io.StringIO)."""
+    if not isinstance(target, str):
+        return contextlib.nullcontext(target)
+    if target.endswith(".gz"):
+        return gzip.open(target, "wt", encoding="utf-8")
+    return open(target, "w", encoding="utf-8", buffering=1 << 16)
+
+
+def write_json_snapshot(target, header: dict) -> dict:
+    """
+    Stream a restore-compatible JSON backup — `header` keys followed by one
+    array per collection — document by document. Returns {section: count}.
+    """
+    counts = {}
+    sections = _snapshot_sections()
+    with _open_snapshot(target) as f:
+        f.write("{\n")
+        for key, value in header.items():
+            f.write(f"    {json.dumps(key)}: {json.dumps(value, default=str)},\n")
+        for i, (key, collection) in enumerate(sections):
+            f.write(f"    {json.dumps(key)}: [")
+            n = 0
+            for doc in _iter_docs(collection, {"_id": 0}):
+                f.write(",\n        " if n else "\n        ")
+                f.write(json.dumps(doc, default=str, ensure_ascii=False))
+                n += 1
+            f.write("\n    ]" if n else "]")
+            f.write(",\n" if i < len(sections) - 1 else "\n")
+            counts[key] = n
+        f.write("}\n")
+    return counts
+
+
+def generate_system_backup(target=None):
+    """Generates a comprehensive snapshot of the system (streamed; see write_json_snapshot for JSON)."""
     try:
         now = now_local()
         timestamp = now.strftime('%b %d, %Y  ·  %I:%M %p')
         date_str  = now.strftime('%Y-%m-%d')
-        month_str = now.strftime('%B_%Y')         # e.g. February_2026
-        filename = f"MSANODE_BACKUP_{date_str}.txt"
-        
-        # 1. Header
-        content = (
-            f"🛡 MSANODE SYSTEM BACKUP\n"
-            f"📅 Generated: {timestamp}\n"
-            f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-        )
-        
-        # 2. PDF Library
-        pdfs = list(col_pdfs.find().sort("_id", -1))
-        content += f"📚 PDF LIBRARY ({len(pdfs)} Files)\n"
-        content += f"----------------------------------------\n"
-        if pdfs:
-            for p in pdfs:
-                 code = p.get('code', 'N/A')
-                 link = p.get('link', 'N/A')
-                 views = p.get('views', 0)
-                 content += f"[{code}] Views:{views} | Link: {link}\n"
-        else:
-            content += "No PDFs found.\n"
-        content += "\n"
-        
-        # 3. Admins
-        admins = list(col_admins.find())
-        content += f"👥 ADMIN ROSTER ({len(admins)} Users)\n"
-        content += f"----------------------------------------\n"
-        if admins:
-            for a in admins:
-                uid = a.get('user_id')
-                role = a.get('role', 'Admin')
+        filename = target or f"MSANODE_BACKUP_{date_str}.txt"
+        rule = "----------------------------------------\n"
+
+        with _open_snapshot(filename) as f:
+            # 1. Header
+            f.write(
+                f"🛡 MSANODE SYSTEM BACKUP\n"
+                f"📅 Generated: {timestamp}\n"
+                f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            )
+
+            # 2. PDF Library
+            pdf_total = col_pdfs.count_documents({})
+            f.write(f"📚 PDF LIBRARY ({pdf_total} Files)\n{rule}")
+            n = 0
+            for p in _iter_docs(col_pdfs, {"code": 1, "link": 1, "views": 1}, sort=[("_id", -1)]):
+                f.write(f"[{p.get('code', 'N/A')}] Views:{p.get('views', 0)} | Link: {p.get('link', 'N/A')}\n")
+                n += 1
+            if not n:
+                f.write("No PDFs found.\n")
+            f.write("\n")
+
+            # 3. Admins
+            admin_total = col_admins.count_documents({})
+            f.write(f"👥 ADMIN ROSTER ({admin_total} Users)\n{rule}")
+            n = 0
+            for a in _iter_docs(col_admins, {"user_id": 1, "role": 1, "locked": 1}):
                 locked = "LOCKED" if a.get('locked') else "Active"
-                content += f"ID: {uid} | Role: {role} | Status: {locked}\n"
-        else:
-             content += "No Admins found.\n"
-        content += "\n"
-        
-        # 4. Banned Users
-        try:
-            banned = list(col_banned.find()) if col_banned is not None else []
-        except Exception as e:
-            logging.error(f"Failed to fetch banned users: {e}")
-            banned = []
-        content += f"🚫 BLACKLISTED USERS ({len(banned)} Users)\n"
-        content += f"----------------------------------------\n"
-        if banned:
-             for b in banned:
-                 uid = b.get('user_id')
-                 reason = b.get('reason', 'N/A')
-                 content += f"ID: {uid} | Reason: {reason}\n"
-        else:
-             content += "No Banned users.\n"
-             
-        content += "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-        content += "💎 END OF REPORT | MSANODE SYSTEMS"
-        
-        # Write to temp file
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(content)
-            
+                f.write(f"ID: {a.get('user_id')} | Role: {a.get('role', 'Admin')} | Status: {locked}\n")
+                n += 1
+            if not n:
+                f.write("No Admins found.\n")
+            f.write("\n")
+
+            # 4. Banned Users
+            try:
+                banned_total = col_banned.count_documents({}) if col_banned is not None else 0
+                f.write(f"🚫 BLACKLISTED USERS ({banned_total} Users)\n{rule}")
+                n = 0
+                for b in _iter_docs(col_banned, {"user_id": 1, "reason": 1}):
+                    f.write(f"ID: {b.get('user_id')} | Reason: {b.get('reason', 'N/A')}\n")
+                    n += 1
+                if not n:
+                    f.write("No Banned users.\n")
+            except Exception as e:
+                logging.error(f"Failed to fetch banned users: {e}")
+                f.write("No Banned users.\n")
+
+            f.write("\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n")
+            f.write("💎 END OF REPORT | MSANODE SYSTEMS")
+
         return filename
     except Exception as e:
         logging.error(f"Backup Gen Error: {e}")
@@ -1122,7 +1413,7 @@ async def start(message: types.Message, state: FSMContext):
         if user_id == OWNER_ID:
             greeting = "💎 <b>MSA NODE BOT 4</b>\nAt your command, Master."
         else:
-            admin_doc = col_admins.find_one({"user_id": user_id}) or col_admins.find_one({"user_id": str(user_id)})
+            admin_doc = access_snapshot.admin_doc(user_id)
             role = admin_doc.get("role", "Authorized Admin") if admin_doc else "Authorized Admin"
             name = message.from_user.full_name
             greeting = (
@@ -1149,6 +1440,7 @@ async def start(message: types.Message, state: FSMContext):
             try:
                 if col_banned is not None:
                     col_banned.insert_one({"user_id": user_id, "reason": "Auto-Ban: Spamming /start", "timestamp": datetime.now()})
+                    access_snapshot.mark_banned(user_id)
             except Exception as e:
                 logging.error(f"Auto-ban insert failed: {e}")
             try: await bot.send_message(OWNER_ID, f"🚨 <b>AUTO-BANNED</b> `{user_id}` — spamming /start.", parse_mode="HTML")
@@ -1382,47 +1674,21 @@ async def _safe_send_document(user_id, file, caption, parse_mode="HTML", max_ret
     raise RuntimeError(f"send_document to {user_id} failed after {max_retries} attempts")
 
 
-def _encrypt_pdf(filepath: str) -> None:
+PDF_OWNER_PASSWORD = "MSANODEVault@2025!"
+
+
+def _pdf_encryption() -> "StandardEncryption":
     """
-    Re-writes the PDF at `filepath` with AES-256 encryption:
+    Encryption applied by reportlab while the blueprint is built (single pass):
     - User password  = "" (empty) — anyone can OPEN the PDF freely
     - Owner password = secret    — only owner can change restrictions
-    - Restrictions   : COPY and EXTRACT text disabled
-    Falls back silently if pypdf is unavailable or encryption fails.
+    - Restrictions   : COPY / MODIFY / ANNOTATE disabled, printing allowed
     """
-    try:
-        from pypdf import PdfReader, PdfWriter
-        from pypdf.generic import NameObject
-
-        reader = PdfReader(filepath)
-        writer = PdfWriter()
-        for page in reader.pages:
-            writer.add_page(page)
-
-        # Copy all metadata from source
-        if reader.metadata:
-            writer.add_metadata(dict(reader.metadata))
-
-        # Encrypt: allow_printing=True, allow_copying=False
-        writer.encrypt(
-            user_password="",
-            owner_password="MSANODEVault@2025!",
-            use_128bit=False,   # use AES-256
-            permissions_flag=4,  # 4 = print only; no extract/copy
-        )
-
-        tmp = filepath + ".enc"
-        with open(tmp, "wb") as f:
-            writer.write(f)
-
-        # Atomically replace original
-        os.replace(tmp, filepath)
-        logging.info(f"PDF encrypted (copy-restricted): {filepath}")
-
-    except ImportError:
-        logging.warning("pypdf not available — skipping PDF encryption")
-    except Exception as e:
-        logging.warning(f"PDF encryption failed (PDF still usable): {e}")
+    return StandardEncryption(
+        "", ownerPassword=PDF_OWNER_PASSWORD,
+        canPrint=1, canModify=0, canCopy=0, canAnnotate=0,
+        strength=128,
+    )
 
 
 async def finalize_pdf(user_id, state):
@@ -1434,38 +1700,46 @@ async def finalize_pdf(user_id, state):
 
     filename = f"{code}.pdf"
     try:
-        # Generate PDF
-        await asyncio.to_thread(create_goldmine_pdf, script, filename)
-
-        # Encrypt: disable copy/extract while keeping PDF freely openable
-        await asyncio.to_thread(_encrypt_pdf, filename)
+        # Generate + encrypt (copy/extract disabled, freely openable) in one pass, in memory
+        job = await pdf_render_service.render(script, filename, code=code)
+        pdf_bytes = job["pdf"]
 
         # Upload to Google Drive
         link = ""
-        if os.path.exists(CREDENTIALS_FILE):
+        if DRIVE_FAKE_DIR or os.path.exists(CREDENTIALS_FILE):
             try:
-                link = await asyncio.to_thread(upload_to_drive, filename)
+                link = await asyncio.to_thread(upload_to_drive, filename, pdf_bytes)
             except Exception as drive_err:
                 logging.warning(f"Drive upload failed for {code}: {drive_err}")
         else:
             logging.warning("credentials.json not found — skipping Drive upload.")
 
-        # Save to MongoDB atomically (no delete/insert loss window)
+        # Save to MongoDB atomically (no delete/insert loss window). The Drive
+        # revision fields describe the new file, so the delivery-cache key a
+        # library fetch computes matches the one seeded below.
+        drive_id = _extract_drive_id(link)
+        revision_unset = {"drive_modified": ""}
+        if not drive_id:
+            revision_unset["drive_file_id"] = ""
         col_pdfs.update_one(
             {"code": code},
             {"$set": {
                 "code": code,
                 "link": link,
                 "timestamp": datetime.now(),
-                "source": "generated"
-            }},
+                "source": "generated",
+                **({"drive_file_id": drive_id} if drive_id else {})
+            }, "$unset": revision_unset},
             upsert=True
         )
+        _tg_file_drop_code(code)  # the previous PDF's file_ids must not be served again
+        library_index.invalidate()
         DAILY_STATS_BOT4["pdfs_generated"] += 1
         asyncio.create_task(_persist_stats())
 
-        # Deliver PDF file in background — waits out flood ban, won't block bot
+        # Deliver PDF from memory in background — waits out flood ban, won't block bot
         _filename_snap = filename
+        _bytes_snap = pdf_bytes
         _link_snap = link
         _code_snap = code
 
@@ -1478,17 +1752,19 @@ async def finalize_pdf(user_id, state):
             if _link_snap:
                 _caption += f"🔗 <a href='{_link_snap}'>Drive Link</a>"
             try:
-                await _safe_send_document(
-                    user_id, FSInputFile(_filename_snap),
+                sent = await _safe_send_document(
+                    user_id, BufferedInputFile(_bytes_snap, filename=_filename_snap),
                     caption=_caption, parse_mode="HTML"
                 )
+                # Seed the delivery cache so the first library fetch skips Drive too
+                _cache_doc = {"code": _code_snap, "link": _link_snap}
+                if sent and sent.document and _tg_file_key(_cache_doc):
+                    await asyncio.to_thread(
+                        _tg_file_put, _cache_doc, _tg_file_key(_cache_doc),
+                        sent.document.file_id, max(1, len(_bytes_snap) // 1024)
+                    )
             except Exception as _de:
                 logging.warning(f"PDF delivery failed for {_code_snap}: {_de}")
-            finally:
-                await asyncio.sleep(2)
-                if os.path.exists(_filename_snap):
-                    try: os.remove(_filename_snap)
-                    except: pass
 
         asyncio.create_task(_deliver_file())
 
@@ -1514,7 +1790,7 @@ async def show_library(message: types.Message, state: FSMContext):
 
     try:
         if col_pdfs is not None and col_pdfs.count_documents({}) == 0:
-            sync_result = await asyncio.to_thread(_sync_drive_folder_to_db)
+            sync_result = await asyncio.to_thread(_sync_drive_folder_to_db, full=True)
             if sync_result.get("added", 0) or sync_result.get("updated", 0):
                 await message.answer(
                     f"🔄 Drive sync complete: +{sync_result.get('added',0)} / ~{sync_result.get('updated',0)}"
@@ -1545,7 +1821,7 @@ async def handle_library_logic(message: types.Message, state: FSMContext):
             await state.update_data(lib_mode="display", page=0)
             await render_library_page(message, state, page=0)
         elif text == "🔍 SEARCH":
-            docs = sorted(_get_unique_docs(), key=_natural_sort_key)  # natural sort by code
+            docs = _get_natural_docs()  # natural sort by code
             list_lines = get_formatted_file_list(docs, limit=30)
             # Truncate at whole-line boundaries to avoid cutting through HTML tags
             safe_lines = []
@@ -1582,7 +1858,7 @@ async def handle_library_logic(message: types.Message, state: FSMContext):
 
 async def render_library_page(message, state, page):
     limit = 20
-    docs = sorted(_get_unique_docs(), key=_natural_sort_key)
+    docs = _get_natural_docs()
     total_docs = len(docs)
     max_page = max(0, (total_docs - 1) // limit)
     page = max(0, min(page, max_page))
@@ -1620,14 +1896,14 @@ async def handle_library_search(message: types.Message, state: FSMContext):
     if text == "⬅️ BACK":
         await show_library(message, state)
         return
-    all_docs = sorted(_get_unique_docs(), key=_natural_sort_key)  # natural sort = consistent index
+    all_docs = _get_natural_docs()  # natural sort = consistent index
     doc = None
     if text.isdigit():
         idx = int(text)
         if 1 <= idx <= len(all_docs):
             doc = all_docs[idx - 1]
     if not doc:
-        doc = next((d for d in all_docs if d.get('code') == text), None)
+        doc = library_index.get(text)
     if doc:
         code = doc.get('code')
         link = doc.get('link', '')
@@ -1687,6 +1963,7 @@ async def storage_info(message: types.Message):
             latest_date = latest_ts.strftime("%b %d, %Y  %I:%M %p") if latest_ts else "—"
         except: latest_code = "?"; latest_date = "?"
         health    = "🟢 Excellent" if t_mongo < 150 else ("🟡 Degraded" if t_mongo < 500 else "🔴 Critical")
+        rstats    = pdf_render_service.stats()
         scan_time = time.time() - start_t
         msg = (
             f"📊 <b>STORAGE ANALYTICS — LIVE</b>\n"
@@ -1705,7 +1982,15 @@ async def storage_info(message: types.Message):
             f"📈 <b>SESSION</b>\n"
             f"• PDFs gen: <code>{DAILY_STATS_BOT4['pdfs_generated']}</code>  "
             f"Links: <code>{DAILY_STATS_BOT4['links_retrieved']}</code>  "
-            f"Errors: <code>{DAILY_STATS_BOT4['errors']}</code>\n"
+            f"Errors: <code>{DAILY_STATS_BOT4['errors']}</code>\n\n"
+            f"⚙️ <b>RENDER SERVICE</b>\n"
+            f"• Mode: <code>{rstats['mode']}</code> × <code>{rstats['workers']}</code>  "
+            f"In-flight: <code>{rstats['in_flight']}</code>  Queued: <code>{rstats['queued']}</code>\n"
+            f"• Jobs: <code>{rstats['completed']}</code> ok / <code>{rstats['failed']}</code> failed\n"
+            f"• Avg: wait <code>{rstats['avg_wait_ms']:.0f}ms</code> · render <code>{rstats['avg_render_ms']:.0f}ms</code> · "
+            f"total <code>{rstats['avg_total_ms']:.0f}ms</code>\n"
+            f"• Delivery cache: <code>{tg_file_cache_stats['hits']}</code> hits / "
+            f"<code>{tg_file_cache_stats['misses']}</code> Drive fetches\n"
             f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
             f"{'✅ <b>ALL SYSTEMS OPERATIONAL</b>' if t_mongo < 500 else '⚠️ <b>HIGH LATENCY DETECTED</b>'}"
         )
@@ -1791,20 +2076,11 @@ async def handle_backup_json(message: types.Message):
     try:
         now_ts = now_local()
         date_label = now_ts.strftime("%Y-%m-%d")
-        data = {
+        filename = f"MSANODE_DUMP_{date_label}.json"
+        counts = await asyncio.to_thread(write_json_snapshot, filename, {
             "backup_type":  "manual_json",
             "generated_at": now_ts.strftime("%b %d, %Y  ·  %I:%M %p"),
-            "pdfs":         list(col_pdfs.find({}, {"_id": 0}))         if col_pdfs         is not None else [],
-            "trash":        list(col_trash.find({}, {"_id": 0}))        if col_trash        is not None else [],
-            "locked":       list(col_locked.find({}, {"_id": 0}))       if col_locked       is not None else [],
-            "trash_locked": list(col_trash_locked.find({}, {"_id": 0})) if col_trash_locked is not None else [],
-            "admins":       list(col_admins.find({}, {"_id": 0}))       if col_admins       is not None else [],
-            "banned":       list(col_banned.find({}, {"_id": 0}))       if col_banned       is not None else [],
-        }
-
-        filename = f"MSANODE_DUMP_{date_label}.json"
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, default=str)
+        })
 
         # Save dedup-safe metadata record
         try:
@@ -1814,11 +2090,11 @@ async def handle_backup_json(message: types.Message):
                 {"$set": {
                     "date":          date_label,
                     "type":          "json_dump",
-                    "pdf_count":     len(data["pdfs"]),
-                    "admin_count":   len(data["admins"]),
-                    "banned_count":  len(data["banned"]),
-                    "trash_count":   len(data["trash"]),
-                    "locked_count":  len(data["locked"]),
+                    "pdf_count":     counts["pdfs"],
+                    "admin_count":   counts["admins"],
+                    "banned_count":  counts["banned"],
+                    "trash_count":   counts["trash"],
+                    "locked_count":  counts["locked"],
                     "created_at":    now_ts
                 }},
                 upsert=True
@@ -1831,11 +2107,11 @@ async def handle_backup_json(message: types.Message):
             f"━━━━━━━━━━━━━━━━━━━━\n"
             f"📅 <b>Generated:</b> <code>{now_ts.strftime('%b %d, %Y  ·  %I:%M %p')}</code>\n\n"
             f"📊 <b>CONTENTS</b>\n"
-            f"• 📚 Active PDFs: <code>{len(data['pdfs'])}</code>\n"
-            f"• 🗑 Recycle Bin: <code>{len(data['trash'])}</code>\n"
-            f"• 🔒 Locked PDFs: <code>{len(data['locked'])}</code>\n"
-            f"• 👥 Admins: <code>{len(data['admins'])}</code>\n"
-            f"• 🚫 Banned: <code>{len(data['banned'])}</code>\n\n"
+            f"• 📚 Active PDFs: <code>{counts['pdfs']}</code>\n"
+            f"• 🗑 Recycle Bin: <code>{counts['trash']}</code>\n"
+            f"• 🔒 Locked PDFs: <code>{counts['locked']}</code>\n"
+            f"• 👥 Admins: <code>{counts['admins']}</code>\n"
+            f"• 🚫 Banned: <code>{counts['banned']}</code>\n\n"
             f"💾 <b>Storage:</b> MongoDB Atlas\n"
             f"━━━━━━━━━━━━━━━━━━━━\n"
             f"⚠️ <i>Keep this file safe — full bot restore data.</i>"
@@ -1996,6 +2272,8 @@ def _apply_bot4_restore(section_docs):
         total_upserted += upserted
         total_errors += errors
 
+    library_index.invalidate()
+    access_snapshot.invalidate()
     return results, total_upserted, total_errors
 
 
@@ -2491,8 +2769,14 @@ def _normalize_input_text(text: str) -> str:
     return text
 
 
-def create_goldmine_pdf(text, filename):
-    """Creates PDF in S19 professional format with full Unicode support (₹, €, £, etc.)"""
+def create_goldmine_pdf(text, filename, output=None, encrypt=None):
+    """Creates PDF in S19 professional format with full Unicode support (₹, €, £, etc.)
+
+    `filename` names the document (metadata / code). The PDF is written to `output`
+    (a path or binary file object such as BytesIO) or to `filename` when omitted.
+    `encrypt` is passed straight to reportlab so encryption happens during the build.
+    """
+    _load_pdf_stack()
 
     # ── Step 0: Normalise mobile / cross-platform copy-paste artefacts ────────
     text = _normalize_input_text(text)
@@ -2693,12 +2977,13 @@ def create_goldmine_pdf(text, filename):
 
     # Setup document
     doc = SimpleDocTemplate(
-        filename,
+        output if output is not None else filename,
         pagesize=letter,
         leftMargin=0.75*inch,
         rightMargin=0.75*inch,
         topMargin=0.75*inch,
-        bottomMargin=0.75*inch
+        bottomMargin=0.75*inch,
+        encrypt=encrypt,
     )
     # ── Enhancement 4: PDF Metadata ──────────────────────────
     _code_from_file = os.path.splitext(os.path.basename(filename))[0]
@@ -2983,8 +3268,171 @@ def create_goldmine_pdf(text, filename):
     doc.build(story, onFirstPage=draw_canvas_extras, onLaterPages=draw_canvas_extras)
 
 
+# ==========================================
+# ⚙️ PDF RENDER SERVICE (process pool)
+# ==========================================
+# create_goldmine_pdf is pure CPU work (regex preprocessing, reportlab layout,
+# encryption). Through asyncio.to_thread it would still hold
+# the GIL, so several admins generating at once stall the event loop. Jobs run
+# instead in a pool of forked worker processes that register the Unicode fonts
+# once at start-up; the bot process only awaits the result.
+PDF_RENDER_WORKERS = max(1, int(os.getenv("PDF_RENDER_WORKERS", min(4, os.cpu_count() or 1))))
+PDF_RENDER_TIMEOUT = int(os.getenv("PDF_RENDER_TIMEOUT", 300))  # seconds per job
+
+
+def _render_worker_init():
+    """Pool initializer — runs once in every worker process."""
+    _load_pdf_stack()
+
+
+def _render_worker_ping():
+    return os.getpid()
+
+
+def _render_pdf_job(script: str, filename: str) -> dict:
+    """Render one encrypted blueprint into memory. Runs inside a worker; returns bytes + timings."""
+    started = time.time()
+    _load_pdf_stack()
+    buf = io.BytesIO()
+    create_goldmine_pdf(script, filename, output=buf, encrypt=_pdf_encryption())
+    pdf = buf.getvalue()
+    return {
+        "pid": os.getpid(),
+        "started": started,
+        "render_ms": (time.time() - started) * 1000,
+        "size": len(pdf),
+        "pdf": pdf,
+    }
+
+
+class PdfRenderService:
+    """Process-pool PDF renderer with per-job timing (falls back to threads where fork is unavailable)."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.mode = "thread"
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.recent_jobs = deque(maxlen=20)
+        self._pool = None
+
+    def start(self):
+        if self._pool is not None:
+            return
+        if HOSTED:
+            # A forked worker would copy every hosted bot's memory and threads
+            print("ℹ️ PDF render service: hosted by main.py — rendering in threads")
+            return
+        if "fork" not in multiprocessing.get_all_start_methods():
+            # spawn would re-import this whole module (DB connect, bot setup) in every worker
+            print("⚠️ PDF render service: fork unavailable — rendering in threads")
+            return
+        try:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_render_worker_init,
+            )
+            # With fork, the first submit launches every worker — do it now, not on the first job.
+            # Workers load reportlab in their initializer, overlapping the rest of startup.
+            self._pool.submit(_render_worker_ping).add_done_callback(self._on_warm)
+            self.mode = "process"
+        except Exception as e:
+            logging.warning(f"PDF render pool unavailable ({e}) — rendering in threads")
+            self._pool = None
+            self.mode = "thread"
+
+    def _on_warm(self, fut):
+        if fut.cancelled() or fut.exception():
+            logging.warning(f"PDF render workers failed to warm up ({fut.exception() if not fut.cancelled() else 'cancelled'})")
+        else:
+            print(f"✅ PDF render service: {self.workers} warm worker process(es)")
+
+    def shutdown(self, kill: bool = False):
+        if self._pool is not None:
+            if kill:
+                # A timed-out job keeps its worker busy forever; shutdown() alone would not stop it
+                for proc in list((getattr(self._pool, "_processes", None) or {}).values()):
+                    with contextlib.suppress(Exception):
+                        proc.terminate()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def render(self, script: str, filename: str, code: str = "") -> dict:
+        """Queue one render job and wait for it. Returns the job record (timings + "pdf" bytes)."""
+        job = {"code": code, "queued_at": time.time()}
+        self.in_flight += 1
+        try:
+            if self._pool is not None:
+                try:
+                    loop = asyncio.get_running_loop()
+                    timing = await asyncio.wait_for(
+                        loop.run_in_executor(self._pool, _render_pdf_job, script, filename),
+                        timeout=PDF_RENDER_TIMEOUT,
+                    )
+                except asyncio.TimeoutError:
+                    logging.warning(f"PDF render {code} exceeded {PDF_RENDER_TIMEOUT}s — restarting workers")
+                    self.shutdown(kill=True)
+                    self.start()
+                    raise
+                except BrokenProcessPool:
+                    logging.warning("PDF render pool broken — restarting workers")
+                    self.shutdown()
+                    self.start()
+                    timing = await asyncio.to_thread(_render_pdf_job, script, filename)
+            else:
+                timing = await asyncio.to_thread(_render_pdf_job, script, filename)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        finished = time.time()
+        job.update(timing)
+        job["wait_ms"] = max(0.0, (timing["started"] - job["queued_at"]) * 1000)
+        job["total_ms"] = (finished - job["queued_at"]) * 1000
+        job_record = {k: v for k, v in job.items() if k != "pdf"}  # keep bytes out of history
+        self.completed += 1
+        self.recent_jobs.append(job_record)
+        logging.info(
+            f"PDF render {code}: wait {job['wait_ms']:.0f}ms · render+encrypt {job['render_ms']:.0f}ms · "
+            f"total {job['total_ms']:.0f}ms · {job['size'] // 1024}KB ({self.mode}, pid {job['pid']})"
+        )
+        return job
+
+    def stats(self) -> dict:
+        jobs = list(self.recent_jobs)
+        avg = lambda key: (sum(j[key] for j in jobs) / len(jobs)) if jobs else 0.0
+        return {
+            "mode": self.mode,
+            "workers": self.workers if self.mode == "process" else 1,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - (self.workers if self.mode == "process" else 1)),
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": avg("wait_ms"),
+            "avg_render_ms": avg("render_ms"),
+            "avg_total_ms": avg("total_ms"),
+        }
+
+
+pdf_render_service = PdfRenderService(PDF_RENDER_WORKERS)
+
+
+_fake_drive = None
+
+
 def get_drive_service():
     """Authenticate and return a Google Drive service object."""
+    global _fake_drive
+    _load_drive_stack()
+    if DRIVE_FAKE_DIR:
+        if _fake_drive is None:  # one shared instance → one index + lock across threads
+            from drive_fake import FakeDriveService
+            _fake_drive = FakeDriveService(DRIVE_FAKE_DIR, DRIVE_FAKE_LATENCY_MS)
+        return _fake_drive
     creds = None
     if os.path.exists(TOKEN_FILE):
         with open(TOKEN_FILE, 'rb') as t:
@@ -3036,37 +3484,201 @@ def _ensure_drive_folder(service, folder_name, parent_id=None):
         print(f"◈ Drive: Created folder '{folder_name}'")
         return folder.get('id')
 
-def upload_to_drive(filename):
-    """Upload a PDF to a YEAR/MONTH sub-folder structure inside PARENT_FOLDER_ID."""
+# ── Folder-ID cache: "<root>/<YEAR>/<MONTH>" → Drive folder ID ────────────
+# Kept in memory and persisted in bot4_state so restarts skip the list() lookups.
+_drive_folder_cache: dict = {}
+_drive_folder_lock = threading.Lock()
+
+
+def _drive_folder_key(path: str) -> str:
+    # Stand-in folder IDs must never leak into the real cache
+    return f"drive_folder:{'fake:' if DRIVE_FAKE_DIR else ''}{path}"
+
+
+def _drive_folder_cache_get(path: str):
+    folder_id = _drive_folder_cache.get(path)
+    if folder_id or col_bot4_state is None:
+        return folder_id
+    try:
+        rec = col_bot4_state.find_one({"_id": _drive_folder_key(path)})
+    except Exception:
+        rec = None
+    if rec and rec.get("folder_id"):
+        folder_id = rec["folder_id"]
+        _drive_folder_cache[path] = folder_id
+    return folder_id
+
+
+def _drive_folder_cache_put(path: str, folder_id: str):
+    _drive_folder_cache[path] = folder_id
+    if col_bot4_state is None:
+        return
+    try:
+        col_bot4_state.update_one(
+            {"_id": _drive_folder_key(path)},
+            {"$set": {"folder_id": folder_id, "updated_at": datetime.now()}},
+            upsert=True
+        )
+    except Exception as e:
+        logging.warning(f"Drive folder cache persist failed for {path}: {e}")
+
+
+def _drive_folder_cache_drop(path: str):
+    """Forget `path` and every sub-path (e.g. after the folder was deleted on Drive)."""
+    for key in [k for k in _drive_folder_cache if k == path or k.startswith(path + "/")]:
+        _drive_folder_cache.pop(key, None)
+    if col_bot4_state is None:
+        return
+    try:
+        col_bot4_state.delete_many({"_id": {"$regex": f"^{re.escape(_drive_folder_key(path))}(/|$)"}})
+    except Exception as e:
+        logging.warning(f"Drive folder cache drop failed for {path}: {e}")
+
+
+def _resolve_drive_folder(service, parts, root_id=None):
+    """Walk YEAR/MONTH-style `parts` under `root_id`, hitting Drive only for uncached levels."""
+    parent_id = root_id
+    path = root_id or "root"
+    for name in parts:
+        path = f"{path}/{name}"
+        folder_id = _drive_folder_cache_get(path)
+        if not folder_id:
+            with _drive_folder_lock:  # two uploads must not both create "FEBRUARY"
+                folder_id = _drive_folder_cache_get(path) or _ensure_drive_folder(service, name, parent_id)
+                _drive_folder_cache_put(path, folder_id)
+        parent_id = folder_id
+    return parent_id, path
+
+
+# ── Resumable chunked upload ──────────────────────────────────────────────
+def _resumable_upload(service, source, metadata):
+    """
+    Upload `source` (binary file object) in DRIVE_UPLOAD_CHUNK_MB chunks.
+    Network errors / 5xx / 429 resume from the last byte Drive acknowledged
+    instead of re-sending the whole file.
+    """
+    media = MediaIoBaseUpload(
+        source, mimetype='application/pdf',
+        chunksize=DRIVE_UPLOAD_CHUNK_MB * 1024 * 1024, resumable=True
+    )
+    request = service.files().create(
+        body=metadata, media_body=media,
+        fields='id, webViewLink', supportsAllDrives=True
+    )
+    response = None
+    failures = 0
+    while response is None:
+        try:
+            _progress, response = request.next_chunk()
+            failures = 0
+        except (HttpError, OSError) as e:
+            status = int(getattr(getattr(e, "resp", None), "status", 0) or 0)
+            if isinstance(e, HttpError) and status < 500 and status != 429:
+                raise
+            failures += 1
+            if failures > DRIVE_UPLOAD_RETRIES:
+                raise
+            wait = min(30, 2 ** failures)
+            logging.warning(f"Drive upload chunk failed ({e}) — resuming in {wait}s [{failures}/{DRIVE_UPLOAD_RETRIES}]")
+            time.sleep(wait)
+    return response
+
+
+# ── Batched "anyone with link can view" grants ────────────────────────────
+_drive_public_queue: list = []   # file IDs still waiting for a public-read permission
+_drive_public_lock = threading.Lock()
+
+
+def _grant_public_read(service, file_ids) -> set:
+    """
+    Queue `file_ids` for public read access and flush the whole queue as
+    batch requests (100 per HTTP call). Concurrent uploads coalesce into one
+    batch; failed grants stay queued and are retried on the next flush.
+    Returns the IDs granted by this flush.
+    """
+    with _drive_public_lock:
+        pending = list(dict.fromkeys(_drive_public_queue + list(file_ids)))
+        _drive_public_queue.clear()
+
+    granted = set()
+    failed = []
+
+    def _on_result(request_id, _response, exception):
+        if exception is not None:
+            failed.append(request_id)
+            logging.warning(f"Drive permission failed for {request_id}: {exception}")
+        else:
+            granted.add(request_id)
+
+    for i in range(0, len(pending), 100):
+        chunk = pending[i:i + 100]
+        batch = service.new_batch_http_request(callback=_on_result)
+        for file_id in chunk:
+            batch.add(
+                service.permissions().create(
+                    fileId=file_id, body={'type': 'anyone', 'role': 'reader'},
+                    fields='id', supportsAllDrives=True
+                ),
+                request_id=file_id
+            )
+        try:
+            batch.execute()
+        except Exception as e:
+            logging.warning(f"Drive permission batch failed: {e}")
+            failed.extend(f for f in chunk if f not in granted and f not in failed)
+
+    if failed:
+        with _drive_public_lock:
+            _drive_public_queue.extend(failed)
+    return granted
+
+
+def upload_to_drive(filename, data=None):
+    """Upload a PDF to a YEAR/MONTH sub-folder structure inside PARENT_FOLDER_ID.
+
+    When `data` (PDF bytes) is given it is streamed from memory and `filename` is only the Drive name.
+    Folder IDs come from the cache, the upload is resumable and the public-read grant is batched.
+    """
     try:
         service = get_drive_service()
         
         # 1. Get Root (PARENT_FOLDER_ID from env, or Root of Drive if None)
         root_id = PARENT_FOLDER_ID if PARENT_FOLDER_ID else None
         
-        # 2. Ensure YEAR Folder (e.g. "2026")
+        # 2+3. Resolve YEAR / MONTH folders (e.g. "2026/FEBRUARY") — cached after first use
         year_str = datetime.now().strftime('%Y')
-        year_folder_id = _ensure_drive_folder(service, year_str, root_id)
-        
-        # 3. Ensure MONTH Folder (e.g. "FEBRUARY")
         month_str = datetime.now().strftime('%B').upper()
-        month_folder_id = _ensure_drive_folder(service, month_str, year_folder_id)
+        month_folder_id, month_path = _resolve_drive_folder(service, [year_str, month_str], root_id)
         
         # 4. Upload File to Month Folder
         print(f"◈ Uploading to: {year_str}/{month_str}")
-        media = MediaIoBaseUpload(io.FileIO(filename, 'rb'), mimetype='application/pdf')
         file_metadata = {'name': filename, 'parents': [month_folder_id]}
-        
-        file = service.files().create(
-            body=file_metadata, media_body=media,
-            fields='id, webViewLink', supportsAllDrives=True
-        ).execute()
-
-        # 5. Make Public
-        service.permissions().create(
-            fileId=file.get('id'),
-            body={'type': 'anyone', 'role': 'reader'}
-        ).execute()
+        try:
+            source = io.BytesIO(data) if data is not None else io.FileIO(filename, 'rb')
+            file = _resumable_upload(service, source, file_metadata)
+        except HttpError as e:
+            if int(getattr(e.resp, "status", 0) or 0) != 404:
+                raise
+            # Cached folder was deleted on Drive — forget it, re-resolve once
+            logging.warning(f"Drive folder {month_path} vanished — refreshing folder cache")
+            _drive_folder_cache_drop((root_id or "root") + f"/{year_str}")
+            month_folder_id, _ = _resolve_drive_folder(service, [year_str, month_str], root_id)
+            file_metadata['parents'] = [month_folder_id]
+            source = io.BytesIO(data) if data is not None else io.FileIO(filename, 'rb')
+            file = _resumable_upload(service, source, file_metadata)
+
+        # 5. Make Public (batched with any grants still pending). A link nobody
+        #    can open is a failed upload, so retry before handing it out.
+        file_id = file.get('id')
+        for attempt in range(1, DRIVE_UPLOAD_RETRIES + 2):
+            if file_id in _grant_public_read(service, [file_id]):
+                break
+            if attempt > DRIVE_UPLOAD_RETRIES:
+                # Still queued: the next flush keeps trying, but no link goes out
+                raise RuntimeError(f"public-read grant for {file_id} failed {attempt} times")
+            wait = min(30, 2 ** attempt)
+            logging.warning(f"Drive public-read grant failed for {file_id} — retrying in {wait}s [{attempt}/{DRIVE_UPLOAD_RETRIES}]")
+            time.sleep(wait)
 
         return file.get('webViewLink', '')
         
@@ -3076,6 +3688,288 @@ def upload_to_drive(filename):
         return ""
 
 
+# ==========================================
+# 📨 TELEGRAM FILE_ID DELIVERY CACHE
+# ==========================================
+# The first time a library PDF is sent, Telegram returns a file_id for it.
+# Repeat deliveries of the same Drive revision reuse that file_id — no Drive
+# download, no re-upload. Entries are keyed by (code, Drive revision) so an
+# edited file on Drive simply misses and is cached again. file_ids are only
+# valid for the bot that uploaded them, so this cache is bot4's alone.
+tg_file_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _tg_file_version(doc: dict):
+    """Drive revision marker: modifiedTime when synced, else the Drive file ID."""
+    return doc.get("drive_modified") or doc.get("drive_file_id") or _extract_drive_id(doc.get("link", ""))
+
+
+def _tg_file_key(doc: dict):
+    code, version = doc.get("code"), _tg_file_version(doc)
+    return f"{code}|{version}" if code and version else None
+
+
+def _tg_file_get(key: str):
+    if col_tg_files is None or not key:
+        return None
+    try:
+        return col_tg_files.find_one({"_id": key})
+    except Exception:
+        return None
+
+
+def _tg_file_put(doc: dict, key: str, file_id: str, size_kb: int):
+    if col_tg_files is None or not key or not file_id:
+        return
+    try:
+        col_tg_files.update_one(
+            {"_id": key},
+            {"$set": {"code": doc.get("code"), "version": _tg_file_version(doc),
+                      "file_id": file_id, "size_kb": size_kb, "cached_at": datetime.now()}},
+            upsert=True
+        )
+        # Older revisions of this code can never be hit again
+        col_tg_files.delete_many({"code": doc.get("code"), "_id": {"$ne": key}})
+    except Exception as e:
+        logging.warning(f"file_id cache write failed for {key}: {e}")
+
+
+def _tg_file_drop_code(code: str):
+    if col_tg_files is None or not code:
+        return
+    try:
+        col_tg_files.delete_many({"code": code})
+    except Exception as e:
+        logging.warning(f"file_id cache drop failed for {code}: {e}")
+
+
+def _tg_file_drop(key: str):
+    if col_tg_files is None or not key:
+        return
+    try:
+        col_tg_files.delete_one({"_id": key})
+    except Exception:
+        pass
+
+
+def _download_drive_pdf(drive_file_id: str) -> bytes:
+    svc = get_drive_service()
+    request = svc.files().get_media(fileId=drive_file_id)
+    buf = io.BytesIO()
+    downloader = MediaIoBaseDownload(buf, request)
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+    return buf.getvalue()
+
+
+async def _deliver_library_pdf(message: types.Message, doc: dict, caption_for) -> str:
+    """
+    Send a library PDF to the chat of `message`. `caption_for(size_kb)` builds the caption.
+    Uses the cached Telegram file_id when the Drive revision is unchanged, otherwise
+    downloads from Drive, sends from memory and caches the returned file_id.
+    Returns "cache" or "drive". Raises on download/send failure.
+    """
+    key = _tg_file_key(doc)
+    cached = await asyncio.to_thread(_tg_file_get, key)
+    if cached:
+        try:
+            await message.answer_document(
+                cached["file_id"], caption=caption_for(cached.get("size_kb", 1)), parse_mode="HTML"
+            )
+            tg_file_cache_stats["hits"] += 1
+            return "cache"
+        except TelegramBadRequest as e:
+            # file_id no longer accepted — forget it and fall back to Drive
+            logging.warning(f"Cached file_id rejected for {doc.get('code')}: {e}")
+            await asyncio.to_thread(_tg_file_drop, key)
+
+    tg_file_cache_stats["misses"] += 1
+    drive_file_id = doc.get("drive_file_id") or _extract_drive_id(doc.get("link", ""))
+    if not drive_file_id:
+        raise ValueError("Cannot parse Drive link")
+    raw = await asyncio.to_thread(_download_drive_pdf, drive_file_id)
+    size_kb = max(1, len(raw) // 1024)
+    sent = await message.answer_document(
+        BufferedInputFile(raw, filename=f"{doc.get('code')}.pdf"),
+        caption=caption_for(size_kb), parse_mode="HTML"
+    )
+    if sent and sent.document:
+        await asyncio.to_thread(_tg_file_put, doc, key, sent.document.file_id, size_kb)
+    return "drive"
+
+
+# ==========================================
+# 📦 BULK RETRIEVAL PIPELINE
+# ==========================================
+# Range requests run as a three-stage pipeline instead of download→send→sleep
+# per file: cached file_ids skip Drive entirely, up to BULK_FETCH_CONCURRENCY
+# Drive downloads run ahead of the sender (bounded look-ahead window so memory
+# stays flat), and a single sender delivers in range order, paced to
+# BULK_SEND_INTERVAL and honouring Telegram flood waits. ZIP mode packs the
+# whole range into as few archives as Telegram's upload limit allows; each
+# archive is sent as soon as the next file would overflow it, so only one is
+# ever held in memory.
+BULK_FETCH_CONCURRENCY = max(1, int(os.getenv("BULK_FETCH_CONCURRENCY", 4)))
+BULK_SEND_INTERVAL     = float(os.getenv("BULK_SEND_INTERVAL", 0.5))   # seconds between sends to one chat
+BULK_ZIP_MAX_MB        = int(os.getenv("BULK_ZIP_MAX_MB", 45))         # Telegram bot upload limit is 50 MB
+
+
+def _bulk_caption(code: str):
+    return lambda size_kb: f"📄 <b>{code}.pdf</b>  ·  <code>{size_kb} KB</code>"
+
+
+async def _bulk_send(send, attempts: int = 5):
+    """Run one Telegram send coroutine factory, waiting out flood control."""
+    for attempt in range(attempts):
+        try:
+            return await send()
+        except TelegramRetryAfter as e:
+            logging.warning(f"Bulk delivery flood control: waiting {e.retry_after}s [{attempt+1}/{attempts}]")
+            await asyncio.sleep(e.retry_after + 1)
+    raise RuntimeError("flood control did not clear")
+
+
+async def _bulk_pdf_pipeline(message: types.Message, docs: list, as_zip: bool = False) -> dict:
+    """Deliver `docs` as PDFs (or ZIP parts). Returns per-stage counters and timings."""
+    stats = {
+        "files": len(docs), "delivered": 0, "cached": 0, "fetched": 0, "failed": 0,
+        "bytes": 0, "fetch_busy": 0.0, "send_busy": 0.0, "started": time.time(),
+    }
+    fetch_slots = asyncio.Semaphore(BULK_FETCH_CONCURRENCY)
+
+    async def _fetch(doc):
+        if not as_zip:
+            cached = await asyncio.to_thread(_tg_file_get, _tg_file_key(doc))
+            if cached:
+                return "cache", cached
+        drive_file_id = doc.get("drive_file_id") or _extract_drive_id(doc.get("link", ""))
+        if not drive_file_id:
+            raise ValueError("Cannot parse Drive link")
+        async with fetch_slots:
+            t = time.time()
+            raw = await asyncio.to_thread(_download_drive_pdf, drive_file_id)
+            stats["fetch_busy"] += time.time() - t
+        stats["fetched"] += 1
+        stats["bytes"] += len(raw)
+        return "drive", raw
+
+    # Bounded look-ahead: at most 2× the fetch concurrency in flight / buffered
+    window = BULK_FETCH_CONCURRENCY * 2
+    pending = deque()
+    upcoming = iter(docs)
+
+    def _refill():
+        while len(pending) < window:
+            doc = next(upcoming, None)
+            if doc is None:
+                return
+            pending.append((doc, asyncio.create_task(_fetch(doc))))
+
+    zip_part = None         # (BytesIO, ZipFile, [codes]) being filled
+    zip_sent = 0
+    zip_limit = BULK_ZIP_MAX_MB * 1024 * 1024
+    last_send = 0.0
+
+    async def _paced(send):
+        nonlocal last_send
+        gap = BULK_SEND_INTERVAL - (time.time() - last_send)
+        if gap > 0:
+            await asyncio.sleep(gap)
+        t = time.time()
+        try:
+            return await _bulk_send(send)
+        finally:
+            last_send = time.time()
+            stats["send_busy"] += last_send - t
+
+    async def _flush_zip(split: bool):
+        """Close, send and drop the current ZIP part."""
+        nonlocal zip_part, zip_sent
+        buf, zf, codes = zip_part
+        zip_part = None
+        zf.close()
+        data = buf.getvalue()
+        buf.close()
+        zip_sent += 1
+        suffix = f"_part{zip_sent}" if split else ""
+        fname = f"MSANODE_{codes[0]}-{codes[-1]}{suffix}.zip"
+        try:
+            await _paced(lambda: message.answer_document(
+                BufferedInputFile(data, filename=fname),
+                caption=f"🗜 <b>{len(codes)} PDFs</b>  ·  <code>{len(data) // 1024} KB</code>", parse_mode="HTML"
+            ))
+            stats["delivered"] += len(codes)
+        except Exception as e:
+            stats["failed"] += len(codes)
+            await message.answer(f"❌ <b>{fname}</b> failed: <code>{e}</code>", parse_mode="HTML")
+
+    _refill()
+    try:
+        while pending:
+            doc, task = pending.popleft()
+            _refill()
+            code = doc.get("code", "")
+            try:
+                kind, payload = await task
+                if as_zip:
+                    if zip_part is not None and zip_part[0].tell() + len(payload) > zip_limit:
+                        await _flush_zip(split=True)
+                    if zip_part is None:
+                        buf = io.BytesIO()
+                        zip_part = (buf, zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED), [])  # PDFs are already compressed
+                    zip_part[1].writestr(f"{code}.pdf", payload)
+                    zip_part[2].append(code)
+                    continue
+                if kind == "cache":
+                    try:
+                        await _paced(lambda: message.answer_document(
+                            payload["file_id"], caption=_bulk_caption(code)(payload.get("size_kb", 1)), parse_mode="HTML"
+                        ))
+                        stats["cached"] += 1
+                    except TelegramBadRequest:
+                        await asyncio.to_thread(_tg_file_drop, _tg_file_key(doc))
+                        await _paced(lambda: _deliver_library_pdf(message, doc, _bulk_caption(code)))
+                else:
+                    size_kb = max(1, len(payload) // 1024)
+                    sent = await _paced(lambda: message.answer_document(
+                        BufferedInputFile(payload, filename=f"{code}.pdf"),
+                        caption=_bulk_caption(code)(size_kb), parse_mode="HTML"
+                    ))
+                    if sent and sent.document:
+                        await asyncio.to_thread(_tg_file_put, doc, _tg_file_key(doc), sent.document.file_id, size_kb)
+                stats["delivered"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                link = doc.get("link", "")
+                await message.answer(
+                    f"❌ <b>{code}</b> failed: <code>{e}</code>\n🔗 <a href='{link}'>Open on Drive</a>",
+                    parse_mode="HTML", disable_web_page_preview=False
+                )
+    finally:
+        for _doc, task in pending:
+            task.cancel()
+
+    if zip_part is not None:
+        await _flush_zip(split=zip_sent > 0)
+
+    stats["elapsed"] = time.time() - stats["started"]
+    return stats
+
+
+def _bulk_report(stats: dict, as_zip: bool) -> str:
+    elapsed = max(stats["elapsed"], 0.001)
+    mb = stats["bytes"] / (1024 * 1024)
+    fetch_busy = max(stats["fetch_busy"], 0.001)
+    return (
+        f"✅ <b>Delivered {stats['delivered']}/{stats['files']} PDFs{' as ZIP' if as_zip else ''}.</b>\n"
+        f"⏱ <code>{elapsed:.1f}s</code> total · <code>{stats['delivered'] / elapsed:.1f}</code> files/s\n"
+        f"📥 Drive: <code>{stats['fetched']}</code> files · <code>{mb:.1f} MB</code> · "
+        f"<code>{mb / fetch_busy:.1f} MB/s</code> per stream (×{BULK_FETCH_CONCURRENCY} parallel)\n"
+        f"📤 Telegram: <code>{stats['send_busy']:.1f}s</code> sending · "
+        f"<code>{stats['cached']}</code> from file_id cache"
+        + (f" · <code>{stats['failed']}</code> failed" if stats["failed"] else "")
+    )
 
 
 def _extract_drive_id(link: str):
@@ -3331,6 +4225,7 @@ async def save_new_code(message: types.Message, state: FSMContext):
         {"_id": ObjectId(doc_id)},
         {"$set": {"code": new_code, "filename": new_code}}
     )
+    library_index.invalidate()
     drive_note = ""
     if old_link:
         drive_ok = await asyncio.to_thread(_drive_rename_file, old_link, new_code)
@@ -3406,7 +4301,7 @@ async def handle_mode_selection(message: types.Message, state: FSMContext):
     count = col_pdfs.count_documents({})
     if count == 0:
         try:
-            sync_result = await asyncio.to_thread(_sync_drive_folder_to_db)
+            sync_result = await asyncio.to_thread(_sync_drive_folder_to_db, full=True)
             count = col_pdfs.count_documents({})
             if count > 0:
                 await message.answer(
@@ -3570,6 +4465,7 @@ async def add_pdf_links(message: types.Message, state: FSMContext):
             inserted += 1
         except Exception as e:
             await message.answer(f"⚠️ Failed to add {item['code']}: {e}")
+    library_index.invalidate()
 
     await message.answer(
         f"✅ <b>ADD COMPLETE</b>\nInserted: <code>{inserted}</code>/<code>{len(prepared)}</code>",
@@ -3625,7 +4521,9 @@ async def handle_retrieval_method_selection(message: types.Message, state: FSMCo
             f"{list_text}\n\n"
             "🔢 <b>BULK RETRIEVAL MODE</b>\n"
             "Enter the index range of PDFs you need (e.g., `1-5`, `10-20`).\n"
-            "Index 1 = Newest PDF.",
+            "Index 1 = Newest PDF."
+            + ("\nAdd <code>ZIP</code> (e.g. <code>1-20 ZIP</code>) to receive one archive."
+               if data.get("retrieval_mode") == "pdf" else ""),
             reply_markup=ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True),
             parse_mode="HTML", disable_web_page_preview=True
         )
@@ -3746,41 +4644,21 @@ async def fetch_link(message: types.Message, state: FSMContext):
                 )
                 return
             code_clean = doc_for_pdf.get('code', text)
-            fname = f"{code_clean}.pdf"
-            tmp_path = fname
 
             try:
-                def _download_drive_file():
-                    svc = get_drive_service()
-                    request = svc.files().get_media(fileId=file_id)
-                    buf = io.BytesIO()
-                    downloader = MediaIoBaseDownload(buf, request)
-                    done = False
-                    while not done:
-                        _, done = downloader.next_chunk()
-                    buf.seek(0)
-                    return buf.read()
-
-                raw_bytes = await asyncio.to_thread(_download_drive_file)
-                with open(tmp_path, 'wb') as f:
-                    f.write(raw_bytes)
-
-                size_kb = max(1, len(raw_bytes) // 1024)
-                await wait_msg.delete()
-                await message.answer_document(
-                    FSInputFile(tmp_path, filename=fname),
-                    caption=(
+                await _deliver_library_pdf(
+                    message, doc_for_pdf,
+                    lambda size_kb: (
                         f"📄 <b>{code_clean}.pdf</b>\n"
                         f"━━━━━━━━━━━━━━━━━━━━\n"
                         f"📦 <code>{size_kb} KB</code>  ·  "
                         f"🕐 <code>{now_local().strftime('%b %d, %Y  ·  %I:%M %p')}</code>"
-                    ),
-                    parse_mode="HTML"
+                    )
                 )
+                await wait_msg.delete()
                 DAILY_STATS_BOT4["links_retrieved"] += 1
                 asyncio.create_task(_persist_stats())
             except Exception as e:
-                import logging
                 logging.error(f"Drive download failed for {file_id}: {e}")
                 await wait_msg.edit_text(
                     f"❌ <b>Download Failed</b>\n"
@@ -3788,10 +4666,6 @@ async def fetch_link(message: types.Message, state: FSMContext):
                     f"🔗 <a href='{link}'>Open on Drive instead</a>",
                     parse_mode="HTML", disable_web_page_preview=False
                 )
-            finally:
-                import os
-                try: os.remove(tmp_path)
-                except: pass
                 
         else:
             drive_link = doc.get('link', '').strip()
@@ -3846,6 +4720,10 @@ async def process_bulk_range(message: types.Message, state: FSMContext):
         return
     
     try:
+        # Optional "ZIP" suffix packs a PDF range into archives ("1-20 ZIP")
+        as_zip = text.endswith("ZIP")
+        if as_zip:
+            text = text[:-3].strip()
         # Parse "1-5" or just "1"
         if "-" in text:
             start_idx, end_idx = map(int, text.split('-'))
@@ -3890,50 +4768,13 @@ async def process_bulk_range(message: types.Message, state: FSMContext):
         
         if mode == 'pdf':
             # === BULK PDF MODE ===
-            await message.answer(f"📦 **BULK DOWNLOAD INITIATED ({len(selected_docs)} files)...**\nPlease wait.")
+            await message.answer(
+                f"📦 **BULK DOWNLOAD INITIATED ({len(selected_docs)} files{', ZIP' if as_zip else ''})...**\nPlease wait."
+            )
             
-            count = 0
-            for doc in selected_docs:
-                code = doc.get('code', '')
-                link = doc.get('link', '')
-                fname = f"{code}.pdf"
-                fid_match = re.search(r'/file/d/([^/?\s]+)', link)
-                if not fid_match:
-                    await message.answer(f"⚠️ <b>{code}</b>: Cannot parse Drive link — skipped.", parse_mode="HTML")
-                    continue
-                fid = fid_match.group(1)
-                try:
-                    def _dl(file_id=fid):
-                        svc = get_drive_service()
-                        req = svc.files().get_media(fileId=file_id)
-                        buf = io.BytesIO()
-                        dl = MediaIoBaseDownload(buf, req)
-                        done = False
-                        while not done:
-                            _, done = dl.next_chunk()
-                        buf.seek(0)
-                        return buf.read()
-                    raw = await asyncio.to_thread(_dl)
-                    with open(fname, 'wb') as wf:
-                        wf.write(raw)
-                    size_kb = max(1, len(raw) // 1024)
-                    await message.answer_document(
-                        FSInputFile(fname, filename=fname),
-                        caption=f"📄 <b>{code}.pdf</b>  ·  <code>{size_kb} KB</code>",
-                        parse_mode="HTML"
-                    )
-                    count += 1
-                    await asyncio.sleep(0.5)
-                except Exception as e:
-                    await message.answer(
-                        f"❌ <b>{code}</b> failed: <code>{e}</code>\n🔗 <a href='{link}'>Open on Drive</a>",
-                        parse_mode="HTML", disable_web_page_preview=False
-                    )
-                finally:
-                    try: os.remove(fname)
-                    except: pass
-
-            await message.answer(f"✅ <b>Delivered {count}/{len(selected_docs)} PDFs.</b>", parse_mode="HTML")
+            stats = await _bulk_pdf_pipeline(message, selected_docs, as_zip=as_zip)
+            count = stats["delivered"]
+            await message.answer(_bulk_report(stats, as_zip), parse_mode="HTML")
             DAILY_STATS_BOT4["links_retrieved"] += count
             asyncio.create_task(_persist_stats())
             
@@ -4277,6 +5118,7 @@ async def execute_deletion_final(message: types.Message, state: FSMContext):
                 doc['deleted_at'] = datetime.now()
                 col_trash.insert_one(doc)
                 col_pdfs.delete_one({"_id": doc['_id']})
+            library_index.invalidate()
 
             for i in range(0, len(links_to_delete), 15):
                 chunk = list(links_to_delete)[i:i+15]
@@ -4318,6 +5160,7 @@ async def execute_deletion_final(message: types.Message, state: FSMContext):
                 col_trash.insert_one(doc)
                 col_pdfs.delete_one({"_id": doc['_id']})
                 moved_count += 1
+        library_index.invalidate()
 
         for i in range(0, len(links_to_delete), 15):
             chunk = list(links_to_delete)[i:i+15]
@@ -4459,6 +5302,13 @@ async def nuke_execution(message: types.Message, state: FSMContext):
                     x = coll.delete_many({})
                     db_count += x.deleted_count
                 except: pass
+        library_index.invalidate()
+        # The changes feed only replays recent edits; the next sync must rescan Drive
+        if col_bot4_state is not None:
+            try:
+                col_bot4_state.delete_one({"_id": DRIVE_SYNC_STATE_ID})
+            except Exception as e:
+                logging.warning(f"Could not reset Drive sync state: {e}")
 
         # 2. Local cache wipe
         await status_msg.edit_text("🔥 <b>STEP 2/2: Sterilizing Local PDF Cache...</b>", parse_mode="HTML")
@@ -4611,7 +5461,8 @@ async def perform_bot4_diagnosis(message: types.Message):
         f"• {drive_status}\n\n"
 
         f"💻 <b>HOST SYSTEM</b>\n"
-        f"• Filesystem: {fs_status}\n\n"
+        f"• Filesystem: {fs_status}\n"
+        f"• Telegram queue: <code>{governor_summary(BOT_TOKEN)}</code>\n\n"
 
         f"📈 <b>SESSION STATS</b>\n"
         f"• 📄 PDFs Generated: <code>{DAILY_STATS_BOT4['pdfs_generated']}</code>\n"
@@ -4764,16 +5615,14 @@ async def _send_role_welcome_message(uid, role, name):
         logging.warning(f"Could not send role message to {uid}: {e}")
 
 def _admin_doc_by_id(uid):
-    """Find admin doc by int or str user_id."""
-    doc = col_admins.find_one({"user_id": uid})
-    if not doc:
-        doc = col_admins.find_one({"user_id": str(uid)})
-    return doc
+    """Admin doc by int or str user_id (served from access_snapshot)."""
+    return access_snapshot.admin_doc(uid)
 
 def _update_admin_field(uid, field, value):
     res = col_admins.update_one({"user_id": uid}, {"$set": {field: value}})
     if res.matched_count == 0:
         col_admins.update_one({"user_id": str(uid)}, {"$set": {field: value}})
+    access_snapshot.invalidate()
 
 def update_admin_perms(user_id, perms):
     _update_admin_field(user_id, "permissions", perms)
@@ -4868,6 +5717,7 @@ async def process_add_admin(message: types.Message, state: FSMContext):
         "added_by": message.from_user.id,
         "timestamp": now_local()
     })
+    access_snapshot.invalidate()
     display = f"👤 {name} (<code>{new_id}</code>)" if name else f"<code>{new_id}</code>"
     await message.answer(
         f"✅ <b>ADMIN ADDED</b>\n"
@@ -4888,7 +5738,7 @@ async def process_add_admin(message: types.Message, state: FSMContext):
 @dp.message(F.text == "➖ REMOVE ADMIN")
 async def remove_admin_btn(message: types.Message, state: FSMContext):
     if not is_admin(message.from_user.id): return
-    admins = list(col_admins.find())
+    admins = access_snapshot.admins()
     if not admins:
         await message.answer("⚠️ No admins registered."); return
     markup, _, page, max_page = _admin_select_keyboard(admins, page=0, include_status=True)
@@ -4911,7 +5761,7 @@ async def process_remove_admin(message: types.Message, state: FSMContext):
     if text in ("⬅️ PREV PAGE", "➡️ NEXT PAGE"):
         data = await state.get_data()
         page = data.get("rm_page", 0) + (1 if "NEXT" in text else -1)
-        admins = list(col_admins.find())
+        admins = access_snapshot.admins()
         markup, _, page, _ = _admin_select_keyboard(admins, page=page, include_status=True)
         await state.update_data(rm_page=page)
         await message.answer(f"📋 Page {page + 1}", reply_markup=markup, parse_mode="HTML")
@@ -4924,6 +5774,7 @@ async def process_remove_admin(message: types.Message, state: FSMContext):
     res = col_admins.delete_one({"user_id": uid})
     if res.deleted_count == 0:
         col_admins.delete_one({"user_id": str(uid)})
+    access_snapshot.invalidate()
     await message.answer(
         f"🗑 <b>ADMIN REMOVED</b>\n"
         f"<code>{uid}</code> has been demoted successfully.",
@@ -4946,7 +5797,7 @@ async def list_admins_btn(message: types.Message, state: FSMContext):
 async def _send_admin_list_page(message, page: int):
     """Paginated admin roster — 10 per page, prev/next when needed."""
     PAGE_SIZE = 10
-    admins = list(col_admins.find())
+    admins = access_snapshot.admins()
     total = len(admins)
     total_pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
     page = max(0, min(page, total_pages - 1))
@@ -5021,7 +5872,7 @@ async def admin_list_pagination_handler(message: types.Message, state: FSMContex
 async def permissions_entry(message: types.Message, state: FSMContext):
     if message.from_user.id != OWNER_ID:
         await message.answer("⛔ <b>OWNER ONLY.</b>", parse_mode="HTML"); return
-    admins = list(col_admins.find())
+    admins = access_snapshot.admins()
     if not admins:
         await message.answer("⚠️ No admins to configure."); return
     markup, _, page, _ = _admin_select_keyboard(admins, page=0, include_status=True)
@@ -5044,7 +5895,7 @@ async def permissions_admin_select(message: types.Message, state: FSMContext):
     if text in ("⬅️ PREV PAGE", "➡️ NEXT PAGE"):
         data = await state.get_data()
         page = data.get("perm_page", 0) + (1 if "NEXT" in text else -1)
-        admins = list(col_admins.find())
+        admins = access_snapshot.admins()
         markup, _, page, _ = _admin_select_keyboard(admins, page=page, include_status=True)
         await state.update_data(perm_page=page)
         await message.answer(f"📋 Page {page + 1}", reply_markup=markup, parse_mode="HTML")
@@ -5129,7 +5980,7 @@ async def process_perm_toggle(message: types.Message, state: FSMContext):
 async def roles_entry(message: types.Message, state: FSMContext):
     if message.from_user.id != OWNER_ID:
         await message.answer("⛔ <b>OWNER ONLY.</b>", parse_mode="HTML"); return
-    admins = list(col_admins.find())
+    admins = access_snapshot.admins()
     if not admins:
         await message.answer("⚠️ No admins found."); return
     markup, _, _, _ = _admin_select_keyboard(admins, page=0, include_status=True)
@@ -5152,7 +6003,7 @@ async def roles_admin_select(message: types.Message, state: FSMContext):
     if text in ("⬅️ PREV PAGE", "➡️ NEXT PAGE"):
         data = await state.get_data()
         page = data.get("role_page", 0) + (1 if "NEXT" in text else -1)
-        admins = list(col_admins.find())
+        admins = access_snapshot.admins()
         markup, _, page, _ = _admin_select_keyboard(admins, page=page, include_status=True)
         await state.update_data(role_page=page)
         await message.answer(f"📋 Page {page + 1}", reply_markup=markup, parse_mode="HTML")
@@ -5281,6 +6132,7 @@ async def owner_pw_confirm(message: types.Message, state: FSMContext):
         col_admins.delete_one({"user_id": target_id})
         col_admins.delete_one({"user_id": str(target_id)})
     except: pass
+    access_snapshot.invalidate()
     try:
         await bot.send_message(
             target_id,
@@ -5308,7 +6160,7 @@ async def owner_pw_confirm(message: types.Message, state: FSMContext):
 async def lock_entry(message: types.Message, state: FSMContext):
     if message.from_user.id != OWNER_ID:
         await message.answer("⛔ <b>OWNER ONLY.</b>", parse_mode="HTML"); return
-    admins = list(col_admins.find())
+    admins = access_snapshot.admins()
     if not admins:
         await message.answer("⚠️ No admins found."); return
     markup, _, _, _ = _admin_select_keyboard(admins, page=0, include_status=True)
@@ -5330,7 +6182,7 @@ async def lock_admin_select(message: types.Message, state: FSMContext):
     if text in ("⬅️ PREV PAGE", "➡️ NEXT PAGE"):
         data = await state.get_data()
         page = data.get("lock_page", 0) + (1 if "NEXT" in text else -1)
-        admins = list(col_admins.find())
+        admins = access_snapshot.admins()
         markup, _, page, _ = _admin_select_keyboard(admins, page=page, include_status=True)
         await state.update_data(lock_page=page)
         await message.answer(f"📋 Page {page + 1}", reply_markup=markup, parse_mode="HTML")
@@ -5450,6 +6302,7 @@ async def process_manual_ban(message: types.Message, state: FSMContext):
             "reason": f"Manual ban by admin {message.from_user.id}",
             "timestamp": now_local()
         })
+        access_snapshot.invalidate()
     except Exception as e:
         await message.answer(f"❌ Failed: <code>{e}</code>", parse_mode="HTML"); return
     if message.from_user.id != OWNER_ID:
@@ -5507,6 +6360,7 @@ async def process_unban(message: types.Message, state: FSMContext):
         res = col_banned.delete_one({"user_id": target_id})
         if res.deleted_count == 0:
             col_banned.delete_one({"user_id": str(target_id)})
+        access_snapshot.invalidate()
         await message.answer(
             f"✅ <b>UNBANNED</b>\n"
             f"<code>{target_id}</code> removed from blacklist.",
@@ -5583,9 +6437,12 @@ async def show_terminal(message: types.Message):
         resize_keyboard=True
     )
 
-    if not LOG_BUFFER:
+    all_logs = terminal_lines()
+    if not all_logs:
         await message.answer(
-            "💻 <b>LIVE TERMINAL</b>\n━━━━━━━━━━━━━━━━━━━━\n<i>No logs captured yet.</i>",
+            "💻 <b>LIVE TERMINAL</b>\n━━━━━━━━━━━━━━━━━━━━\n"
+            + ("<i>Capture is off while hosted by main.py — see the host's logs.</i>" if HOSTED
+               else "<i>No logs captured yet.</i>"),
             parse_mode="HTML", reply_markup=kb
         )
         return
@@ -5593,7 +6450,7 @@ async def show_terminal(message: types.Message):
     import html as _html
 
     now_str  = now_local().strftime("%b %d, %Y  ·  %I:%M:%S %p")
-    buf_size = len(LOG_BUFFER)
+    buf_size = len(all_logs)
 
     # Build header + footer — measure their char cost
     header = (
@@ -5614,7 +6471,6 @@ async def show_terminal(message: types.Message):
     MAX_CONTENT = 4096 - len(header) - len(footer) - 50
 
     # Take last lines, newest at bottom; trim to fit
-    all_logs = list(LOG_BUFFER)
     safe_lines = []
     total = 0
     for line in reversed(all_logs):
@@ -6130,26 +6986,18 @@ async def monthly_backup():
 
             # ── JSON DUMP ────────────────────────────────────
             json_filename = f"MSANODE_MONTHLY_{date_label}.json"
-            data = {
+            counts = await asyncio.to_thread(write_json_snapshot, json_filename, {
                 "backup_type":  "monthly",
                 "month":        month_label,
                 "month_key":    month_key,
                 "generated_at": fire_now.strftime("%b %d, %Y  ·  %I:%M %p"),
-                "pdfs":         list(col_pdfs.find({}, {"_id": 0}))         if col_pdfs         is not None else [],
-                "admins":       list(col_admins.find({}, {"_id": 0}))       if col_admins       is not None else [],
-                "banned":       list(col_banned.find({}, {"_id": 0}))       if col_banned       is not None else [],
-                "trash":        list(col_trash.find({}, {"_id": 0}))        if col_trash        is not None else [],
-                "locked":       list(col_locked.find({}, {"_id": 0}))       if col_locked       is not None else [],
-                "trash_locked": list(col_trash_locked.find({}, {"_id": 0})) if col_trash_locked is not None else [],
-            }
-            with open(json_filename, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, default=str)
+            })
 
             caption = (
                 f"📅 <b>MONTHLY AUTO-BACKUP · {month_label}</b>\n"
                 f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
                 f"📆 <b>Date:</b> {fire_now.strftime('%b %d, %Y  ·  %I:%M %p')}\n"
-                f"📊 <b>PDFs:</b> {len(data['pdfs'])} | <b>Admins:</b> {len(data['admins'])} | <b>Banned:</b> {len(data['banned'])}\n"
+                f"📊 <b>PDFs:</b> {counts['pdfs']} | <b>Admins:</b> {counts['admins']} | <b>Banned:</b> {counts['banned']}\n"
                 f"💾 <b>Storage:</b> MongoDB Atlas\n"
                 f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
                 f"✅ <i>All data for {month_label} secured.</i>"
@@ -6172,7 +7020,7 @@ async def monthly_backup():
                         "month_key": month_key,
                         "month":     month_label,
                         "date":      fire_now,
-                        "pdf_count": len(data["pdfs"]),
+                        "pdf_count": counts["pdfs"],
                     }},
                     upsert=True
                 )
@@ -6239,25 +7087,17 @@ async def weekly_backup():
             # JSON dump
             date_label = fire_now.strftime("%Y-%m-%d")
             json_filename = f"MSANODE_WEEKLY_{date_label}.json"
-            data = {
+            counts = await asyncio.to_thread(write_json_snapshot, json_filename, {
                 "backup_type": "weekly",
                 "week_key": week_key,
                 "generated_at": fire_now.strftime("%b %d, %Y  ·  %I:%M %p"),
-                "pdfs":         list(col_pdfs.find({}, {"_id": 0}))         if col_pdfs         is not None else [],
-                "admins":       list(col_admins.find({}, {"_id": 0}))       if col_admins       is not None else [],
-                "banned":       list(col_banned.find({}, {"_id": 0}))       if col_banned       is not None else [],
-                "trash":        list(col_trash.find({}, {"_id": 0}))        if col_trash        is not None else [],
-                "locked":       list(col_locked.find({}, {"_id": 0}))       if col_locked       is not None else [],
-                "trash_locked": list(col_trash_locked.find({}, {"_id": 0})) if col_trash_locked is not None else [],
-            }
-            with open(json_filename, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, default=str)
+            })
 
             caption = (
                 f"🗓️ <b>WEEKLY AUTO-BACKUP</b>\n"
                 f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
                 f"📆 <b>Date:</b> {fire_now.strftime('%a %b %d, %Y  ·  %I:%M %p')}\n"
-                f"📊 <b>PDFs:</b> {len(data['pdfs'])} | <b>Admins:</b> {len(data['admins'])} | <b>Banned:</b> {len(data['banned'])}\n"
+                f"📊 <b>PDFs:</b> {counts['pdfs']} | <b>Admins:</b> {counts['admins']} | <b>Banned:</b> {counts['banned']}\n"
                 f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
                 f"✅ <i>Weekly snapshot secured.</i>"
             )
@@ -6330,6 +7170,7 @@ async def _migrate_permissions():
                 count += 1
         
         if count > 0:
+            access_snapshot.invalidate()
             print(f"🔄 Migrated {count} admins: Added 'elite_help' permission.")
     except Exception as e:
         print(f"⚠️ Migration Error: {e}")
@@ -6343,7 +7184,10 @@ async def start_web_server(dp: Dispatcher, bot: Bot):
     - In webhook mode: registers Telegram webhook handler at _WEBHOOK_PATH.
     - Always exposes GET / and GET /health for Render's port scanner.
     Returns the AppRunner so main() can call runner.cleanup() on shutdown.
+    Hosted by main.py there is no server of our own: returns None.
     """
+    if HOSTED:
+        return None
     app = web.Application()
 
     async def health_handler(request):
@@ -6416,6 +7260,10 @@ def run_health_server():
 
 
 async def main():
+    # ── 0. Warm PDF render workers (fork early, before background threads pile up) ──
+    pdf_render_service.start()
+    boot.background("indexes", startup_db_maintenance)
+
     # ── 1. Network startup (retry until Telegram responds) ──────────────────
     while True:
         try:
@@ -6426,12 +7274,15 @@ async def main():
             print(f"⚠️ Network Startup Error: {e}. Retrying in 5s...")
             await asyncio.sleep(5)
 
+    boot.mark("telegram auth")
+
     # ── 2. Background tasks ──────────────────────────────────────────────────
     asyncio.create_task(auto_janitor())
     asyncio.create_task(system_guardian())
     asyncio.create_task(reset_daily_stats())
     asyncio.create_task(strict_daily_report())
     asyncio.create_task(auto_health_monitor())
+    asyncio.create_task(drive_sync_task())
     
     # ── NEW: Unified weekly backup (stores in DB, no delivery) ──
     if weekly_backup_scheduler:
@@ -6469,7 +7320,7 @@ async def main():
     # If DB library is empty but Drive already has PDFs, auto-import them.
     try:
         if col_pdfs is not None and col_pdfs.count_documents({}) == 0:
-            sync_result = await asyncio.to_thread(_sync_drive_folder_to_db)
+            sync_result = await asyncio.to_thread(_sync_drive_folder_to_db, full=True)
             print(
                 f"🔄 Drive sync on boot: +{sync_result.get('added',0)} / ~{sync_result.get('updated',0)} / skip {sync_result.get('skipped',0)}"
             )
@@ -6477,6 +7328,7 @@ async def main():
         logging.warning(f"Startup Drive sync failed: {_sync_err}")
 
     print("💎 MSANODE BOT 4 ONLINE")
+    boot.mark("startup tasks")
 
     # ── 4. ONLINE notification (awaited directly — never silently lost) ──────
     boot_time = now_local().strftime('%I:%M %p · %b %d, %Y')
@@ -6508,15 +7360,17 @@ async def main():
             await bot.set_webhook(_WEBHOOK_URL)
             print(f"✅ Webhook set: {_WEBHOOK_URL}")
             web_runner = await start_web_server(dp, bot)
+            boot.ready()
             # Stay alive — aiohttp handles incoming Telegram updates
             await asyncio.Event().wait()
         else:
             # ── POLLING MODE (local dev fallback) ────────────────────────────
             print("ℹ️ No RENDER_EXTERNAL_URL — using polling (local dev mode)")
             web_runner = await start_web_server(dp, bot)
+            boot.ready()
             while True:
                 try:
-                    await dp.start_polling(bot, skip_updates=True)
+                    await dp.start_polling(bot, skip_updates=True, handle_signals=not HOSTED)
                     print("⚠️ Polling loop returned. Restarting in 5s...")
                     await asyncio.sleep(5)
                 except asyncio.CancelledError:
@@ -6527,6 +7381,7 @@ async def main():
     finally:
         if web_runner:
             await web_runner.cleanup()
+        pdf_render_service.shutdown()
         # ── 6. OFFLINE notification (awaited in finally — fires before loop closes) ──
         _off_time = now_local().strftime('%I:%M %p · %b %d, %Y')
         _offline_msg = (
@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
-print("[TRACE] Python execution started")
+# Per-phase startup timings: set STARTUP_PROFILE=1 (see boot_profile.py)
+from boot_profile import BootProfiler
+boot = BootProfiler("bot5")
+
 import os
-print("[TRACE] os imported")
 import threading
-print("[TRACE] threading imported")
 from aiohttp import web
-print("[TRACE] aiohttp imported")
 
 # HEALTH SERVER (Copied from working BOT 4 pattern)
 def run_health_server():
@@ -14,25 +14,24 @@ def run_health_server():
         app = web.Application()
         app.router.add_get('/', lambda r: web.Response(text="BOT 5 SINGULARITY V5 ACTIVE"))
         port = int(os.environ.get("PORT", 10000))
-        print(f"[TRACE] Health server binding to port {port}")
+        print(f"[OK] Health server binding to port {port}")
         web.run_app(app, host='0.0.0.0', port=port, handle_signals=False)
     except Exception as e:
         print(f"[ERROR] Health Server Error: {e}")
 
-print("[OK] Step 1: Basic imports done")
+boot.mark("basic imports")
 
 # ==============================================================
-# NOW IMPORT EVERYTHING ELSE (these imports may block/take time)
+# NOW IMPORT EVERYTHING ELSE
 # ==============================================================
-print("[WAIT] Step 2: Starting heavy imports...")
-import asyncio, html, time, pytz, logging, random, io, psutil, re
-print("[OK] Step 3: asyncio imports done")
+# google.genai is not imported here: it is the slowest import and only the
+# generation path needs it (see _load_genai).
+import asyncio, html, time, pytz, logging, random, io, psutil, re, hashlib
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from google import genai
-print("[OK] Step 4: google.genai imported")
-from google.genai import types as ai_types
+boot.mark("stdlib imports")
 from aiogram import Bot, Dispatcher, types, F
-print("[OK] Step 5: aiogram imported")
+boot.mark("aiogram")
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -41,9 +40,29 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeybo
 from aiogram.enums import ParseMode
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.jobstores.mongodb import MongoDBJobStore
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 import pymongo
 import sys
-print("[OK] Step 6: All imports completed")
+import atexit
+from index_migrations import IndexRegistry
+from hosting import HOSTED, telegram_session
+from mongo_client import get_client, pool_summary
+from telegram_governor import governor_summary
+boot.mark("imports")
+
+genai = None
+ai_types = None
+
+
+def _load_genai():
+    """Import google.genai on first use."""
+    global genai, ai_types
+    if genai is None:
+        from google import genai as _genai
+        from google.genai import types as _ai_types
+        ai_types = _ai_types
+        genai = _genai
 
 # Force UTF-8 stdout (Windows compatibility - skip on Linux)
 try:
@@ -71,9 +90,13 @@ CHANNEL_ID = int(os.getenv("MAIN_CHANNEL_ID", 0))
 IST = pytz.timezone('Asia/Kolkata')
 # Initialize bot and dispatcher
 client = None
-bot = Bot(token=BOT_TOKEN) if BOT_TOKEN else None
+bot = Bot(token=BOT_TOKEN, session=telegram_session()) if BOT_TOKEN else None
 dp = Dispatcher(storage=MemoryStorage())
-scheduler = AsyncIOScheduler(timezone=IST)
+dp.update.outer_middleware(boot.first_update_middleware)
+# Missed runs collapse into one catch-up run if still within the grace window
+SCHED_MISFIRE_GRACE = int(os.getenv("SCHED_MISFIRE_GRACE", 900))  # seconds
+SCHED_JOB_DEFAULTS = {"coalesce": True, "max_instances": 1, "misfire_grace_time": SCHED_MISFIRE_GRACE}
+scheduler = AsyncIOScheduler(timezone=IST, job_defaults=SCHED_JOB_DEFAULTS)
 
 # Database globals - initialized by connect_db() function
 db_client = None
@@ -82,33 +105,158 @@ col_vault = None
 col_system = None
 col_history = None
 col_api = None
+col_warm = None
+col_fired = None
 
 def connect_db():
     """Connect to MongoDB with timeout - matching bot4 pattern"""
-    global db_client, db, col_vault, col_system, col_history, col_api
+    global db_client, db, col_vault, col_system, col_history, col_api, col_warm, col_fired
     try:
-        db_client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        db_client = get_client(MONGO_URI, app="bot5")
         db = db_client["Singularity_V5_Final"]
         col_vault = db["vault"]
         col_system = db["system_stats"]
         col_history = db["history_log"]
         col_api = db["api_ledger"]
+        col_warm = db["warm_pool"]
+        col_fired = db["fired_index"]
         db_client.server_info()  # Test connection
+        boot.background("indexes", ensure_indexes)
         print("[OK] Database Connected")
         return True
     except Exception as e:
         print(f"[ERROR] DB Connect Error: {e}")
         return False
 
-print("[OK] Step 7: Attempting database connection...")
+
+def ensure_indexes():
+    """Runs in a background thread; only new or changed indexes are built (index_migrations)."""
+    indexes = IndexRegistry(db, "bot5")
+    indexes.index(col_warm, [("slot", 1), ("created_at", 1)])
+    indexes.index(col_fired, "bands")
+    # Changing FIRED_INDEX_RETENTION_DAYS changes the spec, so the TTL index is rebuilt
+    indexes.index(col_fired, "created_at", replace=True,
+                  expireAfterSeconds=int(os.getenv("FIRED_INDEX_RETENTION_DAYS", 365)) * 86400)
+    indexes.index(col_history, [("timestamp", -1)])  # latest breach id on every generation
+    indexes.expect(col_history, "timestamp")
+    indexes.apply()
+
+
 # Initialize database connection (non-blocking - errors logged but don't crash)
 try:
     connect_db()
-    print("[OK] Step 8: Database connection attempted")
 except Exception as e:
     print(f"[WARN] Database connection failed (bot will continue): {e}")
+boot.mark("mongo")
+
+# ==========================================
+# ⏱️ PERSISTENT SCHEDULER (MONGODB JOB STORE)
+# ==========================================
+# Locked schedules live in MongoDB so a restart/redeploy restores them in one
+# bulk load. Job functions are stored as "bot5:<name>" references; the alias
+# below makes that resolve to this module however the bot was launched.
+sys.modules.setdefault("bot5", sys.modules[__name__])
+SCHED_JOBS_COLLECTION = os.getenv("SCHED_JOBS_COLLECTION", "scheduler_jobs")
+SCHED_T60_MISFIRE_GRACE = int(os.getenv("SCHED_T60_MISFIRE_GRACE", 3000)) # T-60 is useful until shortly before T-0
+SCHED_MISSED_KEEP = int(os.getenv("SCHED_MISSED_KEEP", 50))
+# "started" is set when the scheduler starts; runs due before it are startup catch-up
+SCHED_EVENTS = {"caught_up": 0, "missed": 0, "missed_recent": deque(maxlen=SCHED_MISSED_KEEP), "errors": 0, "started": None}
+SCHED_PERSISTENT = False
+
+
+def attach_job_store():
+    """Use the MongoDB job store when the database is reachable, else keep the in-memory default."""
+    global SCHED_PERSISTENT
+    if SCHED_PERSISTENT:
+        return True  # already attached (main() re-run by the main.py supervisor)
+    if db_client is None or db is None:
+        return False
+    try:
+        db_client.admin.command("ping")
+        scheduler.add_jobstore(
+            MongoDBJobStore(database=db.name, collection=SCHED_JOBS_COLLECTION, client=db_client),
+            "default"
+        )
+        SCHED_PERSISTENT = True
+    except Exception as e:
+        console_out(f"[WARN] Job store unavailable, schedules will not survive restart: {e}")
+    return SCHED_PERSISTENT
+
+
+def schedule_job_id(sch_id, kind, t_str):
+    """Deterministic job id so re-registering a schedule replaces instead of duplicating."""
+    return f"{sch_id}_{kind}_{datetime.strptime(t_str, '%I:%M %p').strftime('%H%M')}"
+
+
+def schedule_jobs():
+    """Group locked T-60/T-0 jobs by schedule id."""
+    schedules = {}
+    for job in scheduler.get_jobs():
+        if job.id == "daily_summary" or not job.args:
+            continue
+        schedules.setdefault(job.args[0], []).append(job)
+    return schedules
+
+
+def remove_schedule(sch_id):
+    """Drop every job of a schedule from the (persistent) store, plus its staged content."""
+    jobs = schedule_jobs().get(sch_id, [])
+    for job in jobs:
+        scheduler.remove_job(job.id)
+    PENDING_FIRE.pop(sch_id, None)
+    return len(jobs)
+
+
+def new_schedule_id():
+    taken = {job.id.split("_T")[0] for job in scheduler.get_jobs()}
+    while True:
+        sch_id = f"SCH_{random.randint(100,999)}"
+        if sch_id not in taken:
+            return sch_id
+
+
+def _sched_listener(event):
+    if event.code == EVENT_JOB_MISSED:
+        SCHED_EVENTS["missed"] += 1
+        SCHED_EVENTS["missed_recent"].append((event.job_id, event.scheduled_run_time))
+    elif event.code == EVENT_JOB_ERROR:
+        SCHED_EVENTS["errors"] += 1
+    elif (event.job_id != "daily_summary" and SCHED_EVENTS["started"]
+          and event.scheduled_run_time < SCHED_EVENTS["started"]):
+        SCHED_EVENTS["caught_up"] += 1
+
+
+async def schedule_reconcile_report(boot_started):
+    """After startup catch-up settles, tell the owner what was restored, replayed and dropped."""
+    await asyncio.sleep(10)
+    jobs = scheduler.get_jobs()
+    schedules = schedule_jobs()
+    upcoming = sorted((j.next_run_time, j.id) for j in jobs if j.next_run_time)
+    paused = [j.id for j in jobs if j.next_run_time is None]
+    missed = list(SCHED_EVENTS["missed_recent"])
+
+    lines = [
+        "♻️ <b>SCHEDULE RECONCILIATION</b>",
+        "━━━━━━━━━━━━━━━━━━━━",
+        f"💾 Store: <code>{'MongoDB/' + SCHED_JOBS_COLLECTION if SCHED_PERSISTENT else 'MEMORY (not persistent)'}</code>",
+        f"📥 Restored: <code>{len(schedules)}</code> schedules / <code>{len(jobs)}</code> jobs "
+        f"in <code>{int((time.time() - boot_started) * 1000)}ms</code>",
+        f"⏩ Caught up (coalesced): <code>{SCHED_EVENTS['caught_up']}</code>",
+        f"⏭️ Missed beyond grace: <code>{SCHED_EVENTS['missed']}</code>",
+    ]
+    for job_id, run_time in missed[:10]:
+        lines.append(f"  • <code>{job_id}</code> @ {run_time.astimezone(IST).strftime('%d %b %I:%M %p')}")
+    if paused:
+        lines.append(f"⏸️ Paused: <code>{', '.join(paused[:10])}</code>")
+    if upcoming:
+        nxt_time, nxt_id = upcoming[0]
+        lines.append(f"⏭ Next: <code>{nxt_id}</code> @ {nxt_time.astimezone(IST).strftime('%d %b %I:%M %p')}")
+    console_out(f"♻️ Scheduler reconciled: {len(schedules)} schedules, {len(jobs)} jobs, {SCHED_EVENTS['missed']} missed")
+    try:
+        await bot.send_message(OWNER_ID, "\n".join(lines), parse_mode=ParseMode.HTML)
+    except Exception as e:
+        console_out(f"[WARN] Reconciliation report failed: {e}")
 
-print("[OK] Step 9: Loading configuration...")
 
 # DATABASE CONFIG IDS
 DB_ID_MODELS = "bot5_models"
@@ -128,7 +276,7 @@ PENDING_FIRE = {}
 PROMPT_INDEX = 0  # Sequential prompt picker - cycles through all prompts
 
 # ENTERPRISE FEATURES
-FIRED_CONTENT_HASHES = set()  # Duplicate detection - stores hashes of fired content
+DUP_THRESHOLD = float(os.getenv("DUP_THRESHOLD", 0.4))  # Near-duplicate similarity (0-1) that blocks a fire; /dupe to change
 DAILY_STATS = {"breaches_fired": 0, "scheduled_fired": 0, "duplicates_blocked": 0, "errors": 0}
 
 # ==========================================
@@ -385,32 +533,179 @@ def fix_html_tags(text):
     
     return text
 
-async def increment_api_count_in_db():
-    try:
-        col_api.update_one({"_id": "global_ledger"}, {"$inc": {"usage": 1}}, upsert=True)
-    except Exception as e: console_out(f"Ledger Sync Error: {e}")
+# --- ENTERPRISE: DUPLICATE DETECTION (NEAR-DUPLICATE INDEX) ---
+# MinHash signatures over content words + links, bucketed with LSH bands.
+# Template boilerplate (the fixed lines of get_system_prompt) is ignored so
+# only the actual resources count. Signatures persist in MongoDB; the most
+# recent FIRED_INDEX_HOT live in an in-memory LRU with band postings.
+FIRED_INDEX_PERMS = 64
+FIRED_INDEX_ROWS = 2  # rows per LSH band -> 32 bands, near-certain recall above 0.3 similarity
+FIRED_INDEX_HOT = int(os.getenv("FIRED_INDEX_HOT", 2000))
+FIRED_INDEX_RETENTION_DAYS = int(os.getenv("FIRED_INDEX_RETENTION_DAYS", 365))
+_MINHASH_PRIME = (1 << 61) - 1
+# Derived from fixed seeds so signatures stay comparable across restarts
+_MINHASH_PARAMS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MINHASH_PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MINHASH_PRIME)
+    for i in range(FIRED_INDEX_PERMS)
+]
+
+
+def _content_shingles(content):
+    links = set(re.findall(r'href="([^"]+)"', content))
+    text = html.unescape(re.sub(r'<[^>]+>', ' ', content)).lower()
+    words = {w for w in re.findall(r"[a-z0-9][a-z0-9$+.'-]*", text) if len(w) > 2}
+    return words | {u.lower().rstrip("/") for u in links}
+
+
+_TEMPLATE_SHINGLES = None
+
+
+def _content_features(content):
+    global _TEMPLATE_SHINGLES
+    if _TEMPLATE_SHINGLES is None:
+        _TEMPLATE_SHINGLES = _content_shingles(get_system_prompt())
+    feats = _content_shingles(content) - _TEMPLATE_SHINGLES
+    return feats or {content.strip()[:500]}
+
+
+def _minhash(features):
+    hashes = [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "big") for f in features]
+    return [min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in _MINHASH_PARAMS]
+
+
+def _lsh_bands(sig):
+    bands = []
+    for i in range(0, FIRED_INDEX_PERMS, FIRED_INDEX_ROWS):
+        v = 0
+        for x in sig[i:i + FIRED_INDEX_ROWS]:
+            v = (v * 0x9E3779B97F4A7C15 + x) & 0xFFFFFFFFFFFFFFFF
+        bands.append(((i << 56) ^ v) & 0x7FFFFFFFFFFFFFFF)  # fits a signed int64 for MongoDB
+    return bands
+
 
-# --- ENTERPRISE: DUPLICATE DETECTION ---
 def get_content_hash(content):
-    """Generate hash of content for duplicate detection"""
-    import hashlib
-    # Use first 500 chars to avoid hash collisions on truncated content
-    return hashlib.md5(content[:500].encode()).hexdigest()
+    """Exact-match key over the normalized text"""
+    norm = " ".join(html.unescape(re.sub(r'<[^>]+>', ' ', content)).lower().split())
+    return hashlib.md5(norm.encode()).hexdigest()
+
+
+def _sig_similarity(a, b):
+    """Fraction of equal MinHash slots, an estimate of Jaccard similarity."""
+    return sum(1 for x, y in zip(a, b) if x == y) / FIRED_INDEX_PERMS
+
+
+class FiredIndex:
+    """Persistent near-duplicate index with an in-memory LRU of recent signatures."""
+
+    def __init__(self):
+        self.hot = OrderedDict()   # content_hash -> signature
+        self.postings = {}         # band -> set(content_hash)
+        self.stored = 0            # docs in MongoDB (for cold fallback decisions)
+        self.stats = {"checks": 0, "exact": 0, "near": 0, "cold_queries": 0, "last_score": 0.0}
+
+    def _remember(self, key, sig):
+        if key in self.hot:
+            self.hot.move_to_end(key)
+            return
+        self.hot[key] = sig
+        for band in _lsh_bands(sig):
+            self.postings.setdefault(band, set()).add(key)
+        while len(self.hot) > FIRED_INDEX_HOT:
+            old_key, old_sig = self.hot.popitem(last=False)
+            for band in _lsh_bands(old_sig):
+                bucket = self.postings.get(band)
+                if bucket:
+                    bucket.discard(old_key)
+                    if not bucket:
+                        del self.postings[band]
+
+    def load(self):
+        """Warm the LRU from MongoDB (most recent first)."""
+        if col_fired is None:
+            return 0
+        try:
+            self.stored = col_fired.estimated_document_count()
+            docs = list(col_fired.find({}, {"sig": 1}).sort("created_at", -1).limit(FIRED_INDEX_HOT))
+            for doc in reversed(docs):
+                self._remember(doc["_id"], doc["sig"])
+        except Exception as e:
+            console_out(f"[WARN] Fired index load failed: {e}")
+        return len(self.hot)
+
+    def check(self, content):
+        """(similarity, matched_hash) of the closest fired post, (0.0, None) if none."""
+        self.stats["checks"] += 1
+        key = get_content_hash(content)
+        if key in self.hot:
+            self.hot.move_to_end(key)
+            self.stats["exact"] += 1
+            return 1.0, key
+        sig = _minhash(_content_features(content))
+        bands = _lsh_bands(sig)
+        candidates = set()
+        for band in bands:
+            candidates |= self.postings.get(band, set())
+
+        best, best_key = 0.0, None
+        for cand in candidates:
+            score = _sig_similarity(sig, self.hot[cand])
+            if score > best:
+                best, best_key = score, cand
+        if best_key:
+            self.hot.move_to_end(best_key)
+
+        # Older posts that fell out of the LRU are still in MongoDB; only ask
+        # when the hot set has no match, and only promote cold docs that match
+        if best < DUP_THRESHOLD and self.stored > len(self.hot) and col_fired is not None:
+            try:
+                self.stats["cold_queries"] += 1
+                best_sig = None
+                for doc in col_fired.find({"bands": {"$in": bands}, "_id": {"$nin": list(candidates)}}, {"sig": 1}).limit(50):
+                    score = _sig_similarity(sig, doc["sig"])
+                    if score > best:
+                        best, best_key, best_sig = score, doc["_id"], doc["sig"]
+                if best_sig is not None and best >= DUP_THRESHOLD:
+                    self._remember(best_key, best_sig)
+            except Exception as e:
+                console_out(f"[WARN] Fired index cold lookup failed: {e}")
+        self.stats["last_score"] = best
+        return best, best_key
+
+    def add(self, content):
+        key = get_content_hash(content)
+        sig = _minhash(_content_features(content))
+        self._remember(key, sig)
+        if col_fired is not None:
+            try:
+                res = col_fired.update_one(
+                    {"_id": key},
+                    {"$set": {"sig": sig, "bands": _lsh_bands(sig), "created_at": datetime.now(),
+                              "preview": re.sub(r'<[^>]+>', '', content)[:120]}},
+                    upsert=True
+                )
+                if res.upserted_id is not None:
+                    self.stored += 1
+            except Exception as e:
+                console_out(f"[WARN] Fired index persist failed: {e}")
+
+
+fired_index = FiredIndex()
+
 
 def is_duplicate(content):
-    """Check if content has already been fired"""
-    content_hash = get_content_hash(content)
-    if content_hash in FIRED_CONTENT_HASHES:
+    """Check if content (or a near-duplicate of it) has already been fired"""
+    score, match = fired_index.check(content)
+    if score >= DUP_THRESHOLD:
+        if score < 1.0:
+            fired_index.stats["near"] += 1
+        console_out(f"🚫 Duplicate match {match[:8]} (similarity {score:.2f} >= {DUP_THRESHOLD:.2f})")
         return True
     return False
 
 def mark_as_fired(content):
     """Mark content as fired to prevent duplicates"""
-    content_hash = get_content_hash(content)
-    FIRED_CONTENT_HASHES.add(content_hash)
-    # Keep only last 100 hashes to prevent memory bloat
-    if len(FIRED_CONTENT_HASHES) > 100:
-        FIRED_CONTENT_HASHES.pop()
+    fired_index.add(content)
 
 def persist_daily_stats():
     """Persist current daily stats to database"""
@@ -427,6 +722,7 @@ def persist_daily_stats():
 async def send_daily_summary():
     """Send daily stats report to owner at 8:40 AM IST every day"""
     global DAILY_STATS
+    await usage_ledger.flush()
     
     # Save stats to database before reset (override if exists to prevent duplicates)
     if col_system is not None:
@@ -441,6 +737,9 @@ async def send_daily_summary():
                     "errors": DAILY_STATS['errors'],
                     "prompts_used": PROMPT_INDEX,
                     "api_usage": API_USAGE_COUNT,
+                    "quota_day": usage_ledger.day,
+                    "requests_today": usage_ledger.requests(),
+                    "tokens_today": usage_ledger.tokens(),
                     "timestamp": datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S')
                 }},
                 upsert=True
@@ -459,6 +758,11 @@ async def send_daily_summary():
         f"❌ <b>Errors:</b> {DAILY_STATS['errors']}\n"
         f"📋 <b>Prompts Used:</b> {PROMPT_INDEX}/{len(CLOUD_PROMPT_PACK)}\n"
         f"🔑 <b>API Usage:</b> {API_USAGE_COUNT}\n"
+        f"📒 <b>Quota Day {usage_ledger.day}:</b> {usage_ledger.requests()} req / {usage_ledger.tokens()} tokens\n"
+        + "".join(
+            f"   • {html.escape(m)} {hint}: {c['requests']} req, {c['input_tokens']}↓/{c['output_tokens']}↑ tok\n"
+            for m, hint, c in usage_ledger.breakdown()[:6]
+        ) +
         f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
         f"💎 <i>Bot 5 - SINGULARITY V5.0</i>"
     )
@@ -513,6 +817,393 @@ MODEL_SPECS = {
 }
 TOTAL_TOKENS = 0
 
+# ==========================================
+# 🧭 GEMINI ROUTER (KEY x MODEL HEALTH)
+# ==========================================
+# One long-lived client per key plus health stats per key, per model and
+# per (key, model) pair. Failing routes are parked behind circuit breakers
+# so a generation only pays for routes that can plausibly answer.
+ROUTER_FAIL_THRESHOLD = int(os.getenv("ROUTER_FAIL_THRESHOLD", 3))      # transient failures before a breaker opens
+ROUTER_BASE_COOLDOWN = int(os.getenv("ROUTER_BASE_COOLDOWN", 30))       # seconds, doubles on repeated trips
+ROUTER_QUOTA_COOLDOWN = int(os.getenv("ROUTER_QUOTA_COOLDOWN", 60))     # 429 per-minute limits
+ROUTER_AUTH_COOLDOWN = int(os.getenv("ROUTER_AUTH_COOLDOWN", 1800))     # 403 / invalid key
+ROUTER_MAX_COOLDOWN = int(os.getenv("ROUTER_MAX_COOLDOWN", 3600))
+ROUTER_LATENCY_REF_MS = int(os.getenv("ROUTER_LATENCY_REF_MS", 20000))  # latency at which the score penalty maxes out
+GEMINI_FAKE = os.getenv("GEMINI_FAKE", "").lower() in ("1", "true", "yes")
+GEMINI_FAKE_LATENCY_MS = int(os.getenv("GEMINI_FAKE_LATENCY_MS", 50))
+GEMINI_QUOTA_TZ = pytz.timezone("America/Los_Angeles")  # Gemini daily quotas reset at midnight Pacific
+
+
+def classify_gemini_error(err_str):
+    """Map a generate_content exception text to quota / auth / model / transient."""
+    if "429" in err_str or "ResourceExhausted" in err_str or "RESOURCE_EXHAUSTED" in err_str:
+        return "quota"
+    if "403" in err_str or "API_KEY" in err_str or "PERMISSION_DENIED" in err_str:
+        return "auth"
+    if "400" in err_str or "INVALID_ARGUMENT" in err_str or "NOT_FOUND" in err_str or "404" in err_str:
+        return "model"
+    return "transient"
+
+
+def _seconds_to_quota_reset():
+    now = datetime.now(GEMINI_QUOTA_TZ)
+    reset = (now + timedelta(days=1)).replace(hour=0, minute=0, second=5, microsecond=0)
+    return max(60, (reset - now).total_seconds())
+
+
+class RouteHealth:
+    """Rolling health of one key, model or (key, model) route."""
+
+    __slots__ = ("ok", "fail", "rate", "latency_ms", "streak", "trips",
+                 "open_until", "reason", "last_error", "last_ok")
+
+    def __init__(self):
+        self.ok = 0
+        self.fail = 0
+        self.rate = 1.0          # EWMA success rate, optimistic for unseen routes
+        self.latency_ms = 0.0    # EWMA latency of successful calls
+        self.streak = 0          # consecutive failures
+        self.trips = 0           # consecutive breaker openings (drives backoff)
+        self.open_until = 0.0
+        self.reason = ""
+        self.last_error = ""
+        self.last_ok = 0.0
+
+    def is_open(self, now):
+        return self.open_until > now
+
+    def success(self, latency_ms):
+        self.ok += 1
+        self.rate = self.rate * 0.8 + 0.2
+        self.latency_ms = latency_ms if not self.latency_ms else self.latency_ms * 0.7 + latency_ms * 0.3
+        self.streak = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.reason = ""
+        self.last_ok = time.time()
+
+    def failure(self, err_str):
+        self.fail += 1
+        self.rate *= 0.8
+        self.streak += 1
+        self.last_error = err_str[:200]
+
+    def trip(self, reason, cooldown, now):
+        cooldown = min(cooldown * (2 ** self.trips), max(cooldown, ROUTER_MAX_COOLDOWN))
+        self.trips += 1
+        self.open_until = now + cooldown
+        self.reason = reason
+        return cooldown
+
+
+class GeminiRouter:
+    """Health-scored (key, model) route planner with circuit breakers."""
+
+    def __init__(self):
+        self._clients = {}
+        self.keys = {}
+        self.models = {}
+        self.pairs = {}
+
+    # --- clients ---
+    def client_for(self, key):
+        cli = self._clients.get(key)
+        if cli is None:
+            if GEMINI_FAKE:
+                from gemini_fake import FakeGeminiClient
+                cli = FakeGeminiClient(key, GEMINI_FAKE_LATENCY_MS)
+            else:
+                _load_genai()
+                cli = genai.Client(api_key=key)
+            self._clients[key] = cli
+        return cli
+
+    def forget_key(self, key):
+        self._clients.pop(key, None)
+        self.keys.pop(key, None)
+        for pair in [p for p in self.pairs if p[0] == key]:
+            del self.pairs[pair]
+
+    def forget_model(self, model):
+        self.models.pop(model, None)
+        for pair in [p for p in self.pairs if p[1] == model]:
+            del self.pairs[pair]
+
+    def reset(self):
+        """Close every breaker (owner override); clients are kept."""
+        self.keys.clear()
+        self.models.clear()
+        self.pairs.clear()
+
+    def _get(self, table, ident):
+        h = table.get(ident)
+        if h is None:
+            h = table[ident] = RouteHealth()
+        return h
+
+    # --- planning ---
+    def plan(self, keys, models, preferred_model=None, preferred_key=None):
+        """
+        Ordered [(key_index, key, model)] of routes whose breakers are closed.
+        Score blends pair/key/model success rate with a latency penalty; the
+        owner's selected model and the last good key get a stickiness bonus.
+        """
+        now = time.time()
+        routes = []
+        for k_idx, key in enumerate(keys):
+            kh = self.keys.get(key)
+            if kh and kh.is_open(now):
+                continue
+            for m_idx, model in enumerate(models):
+                mh = self.models.get(model)
+                if mh and mh.is_open(now):
+                    continue
+                ph = self.pairs.get((key, model))
+                if ph and ph.is_open(now):
+                    continue
+                score = (ph.rate if ph else 1.0) * (kh.rate if kh else 1.0) * (mh.rate if mh else 1.0)
+                if ph and ph.latency_ms:
+                    score -= 0.2 * min(ph.latency_ms / ROUTER_LATENCY_REF_MS, 1.0)
+                if model == preferred_model:
+                    score += 0.5
+                if key == preferred_key:
+                    score += 0.25
+                routes.append((-score, m_idx, k_idx, key, model))
+        routes.sort()
+        return [(k_idx, key, model) for _, _, k_idx, key, model in routes]
+
+    def is_parked(self, key, model):
+        """True while the key's, the model's or the pair's breaker is open."""
+        now = time.time()
+        return any(h is not None and h.is_open(now)
+                   for h in (self.keys.get(key), self.models.get(model), self.pairs.get((key, model))))
+
+    def next_reopen(self):
+        """Seconds until the earliest open breaker half-opens (0 if none)."""
+        now = time.time()
+        waits = [h.open_until - now for t in (self.keys, self.models, self.pairs) for h in t.values() if h.is_open(now)]
+        return int(min(waits)) if waits else 0
+
+    # --- feedback ---
+    def record_success(self, key, model, latency_ms):
+        for h in (self._get(self.keys, key), self._get(self.models, model), self._get(self.pairs, (key, model))):
+            h.success(latency_ms)
+
+    def record_failure(self, key, model, err_str):
+        """Update stats, open the breaker the failure kind implicates. Returns the kind."""
+        kind = classify_gemini_error(err_str)
+        now = time.time()
+        kh = self._get(self.keys, key)
+        mh = self._get(self.models, model)
+        ph = self._get(self.pairs, (key, model))
+        ph.failure(err_str)
+
+        if kind == "auth":
+            kh.failure(err_str)
+            secs = kh.trip("auth", ROUTER_AUTH_COOLDOWN, now)
+            console_out(f"🧭 Key ...{key[-4:]} parked {int(secs)}s (auth)")
+        elif kind == "quota":
+            # Free-tier quotas are per key per model; a daily cap stays shut until reset
+            if "PerDay" in err_str or "per day" in err_str.lower():
+                secs = ph.trip("quota/day", _seconds_to_quota_reset(), now)
+            else:
+                secs = ph.trip("quota", ROUTER_QUOTA_COOLDOWN, now)
+            console_out(f"🧭 Route ...{key[-4:]}/{model} parked {int(secs)}s ({ph.reason})")
+        elif kind == "model":
+            mh.failure(err_str)
+            mh.trip("model", ROUTER_MAX_COOLDOWN, now)
+        else:
+            kh.failure(err_str)
+            if ph.streak >= ROUTER_FAIL_THRESHOLD:
+                secs = ph.trip("errors", ROUTER_BASE_COOLDOWN, now)
+                console_out(f"🧭 Route ...{key[-4:]}/{model} parked {int(secs)}s ({ph.streak} errors)")
+            if kh.streak >= ROUTER_FAIL_THRESHOLD * 2:
+                kh.trip("errors", ROUTER_BASE_COOLDOWN, now)
+        return kind
+
+    # --- reporting ---
+    def key_status(self, key):
+        h = self.keys.get(key)
+        now = time.time()
+        if h and h.is_open(now):
+            return f"⛔ {h.reason} {int(h.open_until - now)}s"
+        pairs = [(m, p) for (k, m), p in self.pairs.items() if k == key]
+        parked = sum(1 for _, p in pairs if p.is_open(now))
+        if parked:
+            return f"🟡 {parked} model(s) parked"
+        return "🟢 ok" if h else "⚪ unused"
+
+    def summary_lines(self, keys):
+        lines = []
+        for i, key in enumerate(keys):
+            h = self.keys.get(key)
+            lat = f"{int(h.latency_ms)}ms" if h and h.latency_ms else "-"
+            rate = f"{int(h.rate * 100)}%" if h else "-"
+            lines.append(f"K{i+1}: {self.key_status(key)} | ok {rate} | {lat}")
+        return lines
+
+
+gemini_router = GeminiRouter()
+
+# ==========================================
+# 📒 USAGE LEDGER (KEY x MODEL x DAY)
+# ==========================================
+# Requests and input/output tokens are accumulated in memory per quota day
+# (Pacific, when Gemini RPD resets), API key fingerprint and model, then
+# flushed to api_ledger in one bulk_write. Today's counters also drive RPD-aware
+# routing and capacity warnings.
+USAGE_FLUSH_INTERVAL = int(os.getenv("USAGE_FLUSH_INTERVAL", 30))  # seconds
+USAGE_FLUSH_BATCH = int(os.getenv("USAGE_FLUSH_BATCH", 25))        # pending requests that trigger an early flush
+
+
+def key_fingerprint(key):
+    """Stable, non-reversible id for an API key (raw keys never reach the ledger)."""
+    return hashlib.sha1(key.encode()).hexdigest()[:10]
+
+
+def quota_day():
+    return datetime.now(GEMINI_QUOTA_TZ).strftime("%Y-%m-%d")
+
+
+class UsageLedger:
+    FIELDS = ("requests", "errors", "input_tokens", "output_tokens")
+
+    def __init__(self):
+        self.day = quota_day()
+        self.today = {}      # (key_id, model) -> counters for self.day
+        self.pending = {}    # (day, key_id, model) -> counter deltas not yet in MongoDB
+        self.hints = {}      # key_id -> "...abcd"
+        self.pending_requests = 0
+        self.flushes = 0
+        self._flushing = False
+
+    def _roll(self):
+        day = quota_day()
+        if day != self.day:
+            self.day = day
+            self.today = {}
+
+    def _bump(self, key, model, **delta):
+        self._roll()
+        key_id = key_fingerprint(key)
+        self.hints[key_id] = f"...{key[-4:]}"
+        cur = self.today.setdefault((key_id, model), dict.fromkeys(self.FIELDS, 0))
+        pend = self.pending.setdefault((self.day, key_id, model), dict.fromkeys(self.FIELDS, 0))
+        for field, value in delta.items():
+            cur[field] += value
+            pend[field] += value
+
+    def record(self, key, model, input_tokens=0, output_tokens=0):
+        self._bump(key, model, requests=1, input_tokens=input_tokens, output_tokens=output_tokens)
+        self.pending_requests += 1
+        if self.pending_requests >= USAGE_FLUSH_BATCH and not self._flushing:
+            asyncio.create_task(self.flush())
+
+    def record_error(self, key, model):
+        self._bump(key, model, errors=1)
+
+    # --- queries (today, in memory) ---
+    def requests(self, key=None, model=None):
+        self._roll()
+        key_id = key_fingerprint(key) if key else None
+        return sum(c["requests"] for (k, m), c in self.today.items()
+                   if (key_id is None or k == key_id) and (model is None or m == model))
+
+    def tokens(self, model=None):
+        self._roll()
+        return sum(c["input_tokens"] + c["output_tokens"] for (k, m), c in self.today.items() if model is None or m == model)
+
+    def at_limit(self, key, model):
+        rpd = MODEL_SPECS.get(model, {}).get("rpd")
+        return bool(rpd) and self.requests(key, model) >= rpd
+
+    def busiest_key(self, model):
+        """(requests, key_hint) of the key with the most requests on `model` today."""
+        self._roll()
+        per_key = [(c["requests"], self.hints.get(k, k)) for (k, m), c in self.today.items() if m == model]
+        return max(per_key) if per_key else (0, "-")
+
+    def breakdown(self):
+        """Today's [(model, key_hint, counters)] sorted by requests."""
+        self._roll()
+        rows = [(m, self.hints.get(k, k), c) for (k, m), c in self.today.items()]
+        return sorted(rows, key=lambda r: -r[2]["requests"])
+
+    # --- persistence ---
+    def load(self):
+        """Seed today's counters after a restart."""
+        if col_api is None:
+            return 0
+        try:
+            for doc in col_api.find({"type": "usage", "day": self.day}):
+                self.hints[doc["key_id"]] = doc.get("key_hint", doc["key_id"])
+                self.today[(doc["key_id"], doc["model"])] = {f: doc.get(f, 0) for f in self.FIELDS}
+        except Exception as e:
+            console_out(f"[WARN] Usage ledger load failed: {e}")
+        return len(self.today)
+
+    def _write(self, batch):
+        ops = []
+        total_req = total_tok = 0
+        for (day, key_id, model), delta in batch.items():
+            ops.append(pymongo.UpdateOne(
+                {"_id": f"{day}|{key_id}|{model}"},
+                {"$inc": delta,
+                 "$set": {"type": "usage", "day": day, "key_id": key_id, "key_hint": self.hints.get(key_id, ""),
+                          "model": model, "updated_at": datetime.now()}},
+                upsert=True
+            ))
+            total_req += delta["requests"]
+            total_tok += delta["input_tokens"] + delta["output_tokens"]
+        if total_req or total_tok:
+            ops.append(pymongo.UpdateOne({"_id": "global_ledger"}, {"$inc": {"usage": total_req, "tokens": total_tok}}, upsert=True))
+        if ops:
+            col_api.bulk_write(ops, ordered=False)
+
+    def _take(self):
+        batch, self.pending = self.pending, {}
+        self.pending_requests = 0
+        return batch
+
+    def _restore(self, batch):
+        for ident, delta in batch.items():
+            pend = self.pending.setdefault(ident, dict.fromkeys(self.FIELDS, 0))
+            for field, value in delta.items():
+                pend[field] += value
+
+    async def flush(self):
+        if col_api is None or not self.pending or self._flushing:
+            return
+        self._flushing = True
+        batch = self._take()
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.flushes += 1
+        except Exception as e:
+            self._restore(batch)
+            console_out(f"[WARN] Usage ledger flush failed (kept {len(batch)} rows): {e}")
+        finally:
+            self._flushing = False
+
+    def flush_sync(self):
+        """Best-effort flush at interpreter exit."""
+        if col_api is None or not self.pending:
+            return
+        try:
+            self._write(self._take())
+        except Exception as e:
+            print(f"[WARN] Usage ledger exit flush failed: {e}")
+
+
+usage_ledger = UsageLedger()
+atexit.register(usage_ledger.flush_sync)
+
+
+async def usage_ledger_task():
+    while True:
+        await asyncio.sleep(USAGE_FLUSH_INTERVAL)
+        await usage_ledger.flush()
+
 # 🧠 ORACLE PROMPT ENGINE (CHIMERA PROTOCOL V2)
 # ==========================================
 def get_system_prompt():
@@ -579,250 +1270,179 @@ def get_system_prompt():
     💬 More drops incoming. Stay connected.
     """
 
+def record_breach(clean_content, model_id):
+    """Assign the next BRH number, log it to history_log and return the admin preview."""
+    new_num = 1
+    if col_history is not None:
+        last_breach = col_history.find_one(sort=[("timestamp", -1)])
+        if last_breach and "breach_num" in last_breach:
+            new_num = last_breach["breach_num"] + 1
+
+    breach_id = f"BRH {new_num}"
+    final_content = clean_content + f"\n\n🆔 <b>ID: {breach_id}</b>\n\nClick FIRE to deploy (ID hidden in public post)."
+
+    if col_history is not None:
+        col_history.insert_one({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "model": model_id,
+            "breach_id": breach_id,
+            "breach_num": new_num,
+            "content": clean_content[:200] + "...",
+            "full_content": final_content
+        })
+    return final_content
+
 async def generate_content(prompt):
-    global CURRENT_API_INDEX, GEMINI_KEY, client, API_USAGE_COUNT, TOTAL_TOKENS, CURRENT_MODEL_INDEX, MODEL_POOL, col_history, col_system, col_api
-    
+    """Generate a post and assign its breach ID. Returns (public, admin, type)."""
+    clean_content, model_id, c_type = await generate_draft(prompt)
+    if c_type == "CRITICAL_ERROR":
+        return clean_content, model_id, c_type
+    return clean_content, record_breach(clean_content, model_id), c_type
+
+async def generate_draft(prompt):
+    """
+    Model call only: route, fail over and account usage, but leave history_log
+    and breach numbering alone. Returns (content, model_id, type); on failure
+    the first two items are the error text.
+    """
+    global CURRENT_API_INDEX, GEMINI_KEY, client, API_USAGE_COUNT, TOTAL_TOKENS, CURRENT_MODEL_INDEX, MODEL_POOL, col_system, col_api
+
     # 0. SANITY CHECK: If pool empty, restore defaults
     if not MODEL_POOL:
         console_out("[WARN] MODEL_POOL empty, restoring defaults...")
         MODEL_POOL.extend(DEFAULT_MODELS)
         if col_system is not None:
             col_system.update_one({"_id": DB_ID_MODELS}, {"$set": {"list": MODEL_POOL}}, upsert=True)
-    
+
     if not API_KEY_POOL:
         console_out("[WARN] API_KEY_POOL empty!")
         return "[ERROR] No API keys available", "[ERROR] No API keys available", "CRITICAL_ERROR"
 
     # Prepare Prompt
     system_instruction = get_system_prompt()
-    
-    # LOGIC: ITERATE KEYS -> ITERATE MODELS (Failover)
+    _load_genai()
+
+    # ROUTE PLAN: healthy (key, model) pairs, best first.
+    # The owner's selected model and the last good key are preferred while healthy;
+    # keys/models/pairs behind an open breaker are skipped without a network call.
+    models_to_try = [normalize_model_name(m) for m in MODEL_POOL] or ["gemini-2.0-flash-exp", "gemini-1.5-pro"]
+    preferred_model = models_to_try[CURRENT_MODEL_INDEX] if CURRENT_MODEL_INDEX < len(models_to_try) else None
+    preferred_key = API_KEY_POOL[CURRENT_API_INDEX] if CURRENT_API_INDEX < len(API_KEY_POOL) else None
+    routes = gemini_router.plan(API_KEY_POOL, models_to_try, preferred_model, preferred_key)
+    # Routes that already used their RPD today (per the usage ledger) go last
+    routes.sort(key=lambda r: usage_ledger.at_limit(r[1], r[2]))
     max_keys = len(API_KEY_POOL)
-    keys_tried_count = 0
-    
-    # Start with the cached index
-    temp_key_idx = CURRENT_API_INDEX
-    
-    while keys_tried_count < max_keys:
-        # 1. Select and Init Key
-        if not API_KEY_POOL:
-             break
-             
-        current_key = API_KEY_POOL[temp_key_idx]
-        
+    failures = []
+
+    for key_idx, current_key, model_id in routes:
+        # Model may have been self-healed out of the pool by an earlier route, and a
+        # failure earlier in this call may have parked the key, model or pair
+        if model_id not in models_to_try or gemini_router.is_parked(current_key, model_id):
+            continue
         try:
-            client = genai.Client(api_key=current_key)
+            route_client = gemini_router.client_for(current_key)
         except Exception as e:
-            # Key invalid format? Skip.
-            keys_tried_count += 1
-            temp_key_idx = (temp_key_idx + 1) % max_keys
+            # Key invalid format? Park it.
+            gemini_router.record_failure(current_key, model_id, f"API_KEY client init: {e}")
             continue
-            
-        # 2. ITERATE ALL MODELS FOR THIS KEY
-        # CRITICAL FIX: Start from CURRENT_MODEL_INDEX and wrap around
-        # Example: If user selected Model 3 (index 2) and there are 7 models:
-        #   Try order: Model 3, 4, 5, 6, 7, 1, 2
-        # This ensures:
-        #   - Selected model is tried FIRST
-        #   - ALL models are tried once (wrap around)
-        #   - Only then switch to next API key
-        if MODEL_POOL and CURRENT_MODEL_INDEX < len(MODEL_POOL):
-            # Reorder models to prioritize user's selection
-            models_to_try = MODEL_POOL[CURRENT_MODEL_INDEX:] + MODEL_POOL[:CURRENT_MODEL_INDEX]
-        else:
-            models_to_try = list(MODEL_POOL)
-        
-        # If pool empty, try defaults?
-        if not models_to_try:
-             models_to_try = ["gemini-2.0-flash-exp", "gemini-1.5-pro"]
-        
-        models_tried_count = 0
-        max_models = len(models_to_try)
-        temp_model_idx = 0
-        
-        while temp_model_idx < max_models:
-            model_id = models_to_try[temp_model_idx]
-            
-            # CRITICAL: Normalize model name to prevent 400 errors
-            model_id = normalize_model_name(model_id)
-            
-            try:
-                # CRITICAL: Show which model/API is being tried BEFORE generation
+
+        started = time.monotonic()
+        try:
+            # Network Retry Loop
+            response = None
+            network_retries = 2
+            for net_attempt in range(network_retries):
                 try:
-                    await bot.send_message(
-                        OWNER_ID,
-                        f"🔄 <b>GENERATING BREACH...</b>\n"
-                        f"🔑 API Key: <code>{temp_key_idx + 1}/{len(API_KEY_POOL)}</code>\n"
-                        f"🧠 Model: <code>{model_id}</code>\n"
-                        f"📊 Attempt: <code>{temp_model_idx + 1}/{max_models}</code>",
-                        parse_mode=ParseMode.HTML
-                    )
-                except: pass
-                
-                # Network Retry Loop
-                response = None
-                network_retries = 2
-                for net_attempt in range(network_retries):
-                    try:
-                        response = await client.aio.models.generate_content(
-                            model=model_id,
-                            contents=[prompt],
-                            config=ai_types.GenerateContentConfig(
-                                system_instruction=system_instruction,
-                                temperature=0.7,
-                                max_output_tokens=5000  # Increased to prevent truncation
-                            )
+                    response = await route_client.aio.models.generate_content(
+                        model=model_id,
+                        contents=[prompt],
+                        config=ai_types.GenerateContentConfig(
+                            system_instruction=system_instruction,
+                            temperature=0.7,
+                            max_output_tokens=5000  # Increased to prevent truncation
                         )
-                        break 
-                    except Exception as net_err:
-                        err_str = str(net_err)
-                        if "429" in err_str or "403" in err_str or "API_KEY" in err_str or "ResourceExhausted" in err_str or "400" in err_str or "INVALID_ARGUMENT" in err_str:
-                             raise net_err 
-                        
-                        if net_attempt < network_retries - 1:
-                            await asyncio.sleep(1)
-                            continue
-                        raise net_err 
-
-                if response and response.text:
-                    # SUCCESS!
-                    content = response.text
-                    
-                    # Update Globals
-                    CURRENT_API_INDEX = temp_key_idx
-                    # Find model index in global pool to update CURRENT_MODEL_INDEX
-                    if model_id in MODEL_POOL:
-                        CURRENT_MODEL_INDEX = MODEL_POOL.index(model_id)
-                        # Persist to database
-                        if col_system is not None:
-                            col_system.update_one(
-                                {"_id": "config"},
-                                {"$set": {"current_model_index": CURRENT_MODEL_INDEX}},
-                                upsert=True
-                            )
-                    GEMINI_KEY = current_key
-                    
-                    # Metrics & DB Update
-                    API_USAGE_COUNT += 1
-                    try:
-                        t_count = len(content) // 4
-                        try:
-                            if hasattr(response, 'usage_metadata'):
-                                t_count = response.usage_metadata.total_token_count
-                        except: pass
-                        TOTAL_TOKENS += t_count
-                        
-                        if col_api is not None:
-                            col_api.update_one(
-                                {"_id": "global_ledger"}, 
-                                {"$set": {"usage": API_USAGE_COUNT, "tokens": TOTAL_TOKENS}}, 
-                                upsert=True
-                            )
-                            col_api.update_one(
-                                {"_id": f"key_{temp_key_idx + 1}"},
-                                {"$set": {"status": "ACTIVE", "last_success": datetime.now().strftime("%Y-%m-%d %I:%M:%S %p")}},
-                                upsert=True
-                            )
-                    except: pass
-                    
-                    # Parse Content & Breach ID
-                    clean_content = content.replace("```html", "").replace("```", "").strip()
-                    
-                    today_str = datetime.now(IST).strftime("%d%m")
-                    
-                    # FIX: Check if collection is None instead of boolean check
-                    new_num = 1
-                    if col_history is not None:
-                        last_breach = col_history.find_one(sort=[("timestamp", -1)])
-                        if last_breach and "breach_num" in last_breach:
-                            new_num = last_breach["breach_num"] + 1
-                    
-                    breach_id = f"BRH {new_num}"
-                    final_content = clean_content + f"\n\n🆔 <b>ID: {breach_id}</b>\n\nClick FIRE to deploy (ID hidden in public post)."
-                    
-                    if col_history is not None:
-                        col_history.insert_one({
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "model": model_id,
-                            "breach_id": breach_id,
-                            "breach_num": new_num,
-                            "content": clean_content[:200] + "...",
-                            "full_content": final_content
-                        })
-                
-                    return clean_content, final_content, "AI Directive"
+                    )
+                    break
+                except Exception as net_err:
+                    if classify_gemini_error(str(net_err)) != "transient":
+                        raise net_err
+
+                    if net_attempt < network_retries - 1:
+                        await asyncio.sleep(1)
+                        continue
+                    raise net_err
+
+            if not (response and response.text):
+                raise RuntimeError("Empty response")
+
+            # SUCCESS!
+            latency_ms = (time.monotonic() - started) * 1000
+            gemini_router.record_success(current_key, model_id, latency_ms)
+            content = response.text
+            console_out(f"🧭 Generated via Key {key_idx + 1} / {model_id} in {int(latency_ms)}ms ({len(failures)} failover)")
+
+            # Update Globals
+            CURRENT_API_INDEX = key_idx
+            client = route_client
+            # Find model index in global pool to update CURRENT_MODEL_INDEX
+            if model_id in MODEL_POOL and MODEL_POOL.index(model_id) != CURRENT_MODEL_INDEX:
+                CURRENT_MODEL_INDEX = MODEL_POOL.index(model_id)
+                # Persist to database
+                if col_system is not None:
+                    col_system.update_one(
+                        {"_id": "config"},
+                        {"$set": {"current_model_index": CURRENT_MODEL_INDEX}},
+                        upsert=True
+                    )
+            GEMINI_KEY = current_key
 
+            # Metrics: counted in memory, flushed to api_ledger in batches
+            API_USAGE_COUNT += 1
+            try:
+                usage = getattr(response, 'usage_metadata', None)
+                in_tok = getattr(usage, 'prompt_token_count', 0) or 0
+                out_tok = getattr(usage, 'candidates_token_count', 0) or 0
+                t_count = getattr(usage, 'total_token_count', 0) or (in_tok + out_tok) or len(content) // 4
+                TOTAL_TOKENS += t_count
+                usage_ledger.record(current_key, model_id, in_tok, out_tok or max(0, t_count - in_tok))
             except Exception as e:
-                # FAILURE HANDLING
-                err_str = str(e)
-                
-                fail_reason = "Error"
-                if "429" in err_str or "ResourceExhausted" in err_str: fail_reason = "RateLimited"
-                if "403" in err_str or "API_KEY" in err_str: fail_reason = "InvalidKey"
-                
-                # SELF-HEALING: Auto-remove broken models (400/404)
-                if "400" in err_str or "INVALID_ARGUMENT" in err_str or "NOT_FOUND" in err_str:
-                    try:
-                        # Remove ALL instances from GLOBAL pool
-                        if model_id in MODEL_POOL:
-                            # Filter out ALL occurrences
-                            MODEL_POOL = [m for m in MODEL_POOL if m != model_id]
-                            
-                            # Persist Removal
-                            if col_system is not None:
-                                col_system.update_one({"_id": DB_ID_MODELS}, {"$set": {"list": MODEL_POOL}})
-                                
-                            await bot.send_message(
-                                OWNER_ID, 
-                                f"🗑️ <b>AUTO-REMOVED INVALID MODEL:</b> {model_id}\nReason: {fail_reason}",
-                                parse_mode=ParseMode.HTML
-                            )
-                    except Exception as ex:
-                        console_out(f"Self-heal error: {ex}")
-
-                # 1. ALWAYS REPORT THE FAILURE FOR THIS SPECIFIC MODEL
-                model_attempt = temp_model_idx + 1
-                total_models = len(models_to_try)
-                
+                console_out(f"[WARN] Usage accounting failed: {e}")
+
+            # Parse Content
+            clean_content = content.replace("```html", "").replace("```", "").strip()
+            return clean_content, model_id, "AI Directive"
+
+        except Exception as e:
+            # FAILURE HANDLING: feed the router, log locally, move to the next route
+            err_str = str(e)
+            kind = gemini_router.record_failure(current_key, model_id, err_str)
+            if kind != "quota":
+                usage_ledger.record_error(current_key, model_id)
+            failures.append(f"K{key_idx + 1}/{model_id}: {kind}")
+            console_out(f"[WARN] {kind.upper()} on Key {key_idx + 1} / {model_id}: {err_str[:120]}")
+
+            # SELF-HEALING: Auto-remove broken models (400/404)
+            if kind == "model":
                 try:
-                    await bot.send_message(
-                        OWNER_ID,
-                        f"[WARN] <b>{fail_reason.upper()}: {model_id}</b>\n"
-                        f"🔢 Attempt: {model_attempt}/{total_models}\n"
-                        f"📝 Details: {html.escape(err_str)[:100]}",
-                        parse_mode=ParseMode.HTML
-                    )
-                    await asyncio.sleep(0.5) 
-                except: pass
-                
-                # 2. IF WE HAVE MORE MODELS, REPORT SWITCHING
-                if temp_model_idx < total_models - 1:
-                     try:
-                         await bot.send_message(
+                    models_to_try = [m for m in models_to_try if m != model_id]
+                    # Remove ALL instances from GLOBAL pool
+                    if model_id in MODEL_POOL:
+                        # Filter out ALL occurrences
+                        MODEL_POOL = [m for m in MODEL_POOL if m != model_id]
+
+                        # Persist Removal
+                        if col_system is not None:
+                            col_system.update_one({"_id": DB_ID_MODELS}, {"$set": {"list": MODEL_POOL}})
+
+                        await bot.send_message(
                             OWNER_ID,
-                            f"🔄 Switching to next available model on Key {temp_key_idx + 1}...",
+                            f"🗑️ <b>AUTO-REMOVED INVALID MODEL:</b> {model_id}\nReason: {html.escape(err_str)[:100]}",
                             parse_mode=ParseMode.HTML
                         )
-                         await asyncio.sleep(0.5)
-                     except: pass
-                
-                # Try next model
-                models_tried_count += 1
-                temp_model_idx += 1
-                await asyncio.sleep(1)
-                continue
-        
-        # If we reach here, it means ALL MODELS failed for `current_key`
-        keys_tried_count += 1
-        
-        if keys_tried_count < max_keys:
-             await bot.send_message(
-                OWNER_ID, 
-                f"🚫 <b>KEY {temp_key_idx+1} EXHAUSTED.</b>\n🔀 Switching to Key {(temp_key_idx + 1) % max_keys + 1}...", 
-                parse_mode=ParseMode.HTML
-             )
-             temp_key_idx = (temp_key_idx + 1) % max_keys
-             
+                except Exception as ex:
+                    console_out(f"Self-heal error: {ex}")
+            continue
+
     # EMERGENCY FALLBACK: If we are here, everything failed.
     # Check if we removed all models?
     if not MODEL_POOL:
@@ -831,17 +1451,20 @@ async def generate_content(prompt):
         # Persist restoration
         if col_system is not None:
              col_system.update_one({"_id": DB_ID_MODELS}, {"$set": {"list": MODEL_POOL}})
-        
+
         # Retry recursively ONCE
-        return await generate_content(prompt)
-        
+        return await generate_draft(prompt)
+
     # DEAD END / TOTAL FAILURE
+    reopen = gemini_router.next_reopen()
     err_msg = (
         f"⛔ <b>SYSTEM CRITICAL FAILURE</b>\n"
         f"All {max_keys} Keys & Models Exhausted.\n"
-        f"Request Manual Intervention."
+        + (f"Next route reopens in ~{reopen}s.\n" if reopen else "")
+        + "Request Manual Intervention."
     )
-    await notify_error("CRITICAL: All API Keys Exhausted", f"All {max_keys} keys failed on all models.")
+    tried = "; ".join(failures[-8:]) or "all routes parked by circuit breakers"
+    await notify_error("CRITICAL: All API Keys Exhausted", f"{len(failures)} route(s) failed this call. {tried}")
     return err_msg, err_msg, "CRITICAL_ERROR"
 
 # ==========================================
@@ -1038,19 +1661,197 @@ async def back_main(cb: types.CallbackQuery, state: FSMContext):
         [KeyboardButton(text="🛡 SCAN"), KeyboardButton(text="📢 BROADCAST")]
     ], resize_keyboard=True))
 
+# ==========================================
+# 🔋 WARM POOL (PRE-GENERATED SCHEDULE CONTENT)
+# ==========================================
+# Scheduled fires read ready content from MongoDB instead of calling the LLM
+# at fire time. The pool is filled during off-peak hours within a share of the
+# active model's RPD (MODEL_SPECS) and a daily token budget; outside off-peak
+# only an empty slot that fires soon is topped up.
+WARM_POOL_DEPTH = int(os.getenv("WARM_POOL_DEPTH", 2))                       # ready items per schedule slot
+WARM_POOL_OFFPEAK_HOURS = os.getenv("WARM_POOL_OFFPEAK_HOURS", "1-6")        # IST hour range, inclusive
+WARM_POOL_INTERVAL = int(os.getenv("WARM_POOL_INTERVAL", 300))               # seconds between refill passes
+WARM_POOL_RPD_SHARE = float(os.getenv("WARM_POOL_RPD_SHARE", 0.5))           # share of model RPD the pool may use
+WARM_POOL_TOKEN_BUDGET = int(os.getenv("WARM_POOL_TOKEN_BUDGET", 250000))    # tokens per day
+WARM_POOL_URGENT_MINUTES = int(os.getenv("WARM_POOL_URGENT_MINUTES", 90))
+WARM_POOL_MAX_AGE_HOURS = int(os.getenv("WARM_POOL_MAX_AGE_HOURS", 72))
+
+warm_pool_stats = {"day": "", "requests": 0, "tokens": 0, "served": 0, "misses": 0, "failed": 0}
+
+
+def _warm_pool_offpeak(now=None):
+    now = now or datetime.now(IST)
+    try:
+        start, end = (int(x) for x in WARM_POOL_OFFPEAK_HOURS.split("-"))
+    except ValueError:
+        start, end = 1, 6
+    if start <= end:
+        return start <= now.hour <= end
+    return now.hour >= start or now.hour <= end
+
+
+def _warm_pool_roll_day():
+    today = datetime.now(IST).strftime("%Y-%m-%d")
+    if warm_pool_stats["day"] != today:
+        warm_pool_stats.update(day=today, requests=0, tokens=0, served=0, misses=0, failed=0)
+
+
+def _warm_pool_budget():
+    """(requests_left, tokens_left) for today's pre-generation."""
+    _warm_pool_roll_day()
+    model_id = MODEL_POOL[CURRENT_MODEL_INDEX] if CURRENT_MODEL_INDEX < len(MODEL_POOL) else ""
+    rpd = MODEL_SPECS.get(model_id, {}).get("rpd", 1500)
+    return (int(rpd * WARM_POOL_RPD_SHARE) - warm_pool_stats["requests"],
+            WARM_POOL_TOKEN_BUDGET - warm_pool_stats["tokens"])
+
+
+def _warm_pool_pace():
+    """Seconds between pre-generations: half the active model's RPM."""
+    model_id = MODEL_POOL[CURRENT_MODEL_INDEX] if CURRENT_MODEL_INDEX < len(MODEL_POOL) else ""
+    rpm = MODEL_SPECS.get(model_id, {}).get("rpm", 10)
+    return max(2.0, 120.0 / max(rpm, 1))
+
+
+def _warm_pool_slots():
+    """{slot_id: next_fire_datetime} for every scheduled T-0 job."""
+    slots = {}
+    for job in scheduler.get_jobs():
+        if getattr(job.func, "__name__", "") != "t0_execution" or not job.args:
+            continue
+        slot, nxt = job.args[0], getattr(job, "next_run_time", None)
+        if slot not in slots or (nxt and (slots[slot] is None or nxt < slots[slot])):
+            slots[slot] = nxt
+    return slots
+
+
+def warm_pool_counts():
+    if col_warm is None:
+        return {}
+    try:
+        return {d["_id"]: d["n"] for d in col_warm.aggregate([{"$group": {"_id": "$slot", "n": {"$sum": 1}}}])}
+    except Exception as e:
+        console_out(f"[WARN] Warm pool count failed: {e}")
+        return {}
+
+
+def warm_pool_take(slot):
+    """
+    Pop the oldest fresh item for `slot` (falling back to any slot's item).
+    Items that are stale or already fired are discarded. Returns a
+    PENDING_FIRE-shaped dict or None.
+    """
+    if col_warm is None:
+        return None
+    cutoff = datetime.now() - timedelta(hours=WARM_POOL_MAX_AGE_HOURS)
+    try:
+        col_warm.delete_many({"created_at": {"$lt": cutoff}})
+        for query in ({"slot": slot}, {}):
+            while True:
+                doc = col_warm.find_one_and_delete(query, sort=[("created_at", 1)])
+                if not doc:
+                    break
+                if is_duplicate(doc["public"]):
+                    continue
+                _warm_pool_roll_day()
+                warm_pool_stats["served"] += 1
+                console_out(f"🔋 Warm pool served {slot} (item from {doc.get('slot')}, model {doc.get('model')})")
+                # No breach ID yet: claim_breach() assigns it when the post fires
+                return {"public": doc["public"],
+                        "admin": doc["public"] + "\n\n🆔 <b>ID: assigned on fire</b>\n\nClick FIRE to deploy (ID hidden in public post).",
+                        "fired": False, "type": doc.get("type", "AI Directive"),
+                        "model": doc.get("model", ""), "breach_pending": True}
+    except Exception as e:
+        console_out(f"[WARN] Warm pool take failed: {e}")
+    _warm_pool_roll_day()
+    warm_pool_stats["misses"] += 1
+    return None
+
+
+def claim_breach(job_data):
+    """Give a warm-pool item its breach ID once it actually fires."""
+    if job_data.get("breach_pending"):
+        job_data["breach_pending"] = False
+        job_data["admin"] = record_breach(job_data["public"], job_data.get("model", ""))
+
+
+async def warm_pool_fill(slot):
+    """Generate one item into `slot`. Returns False when the budget is spent or generation failed."""
+    req_left, tok_left = _warm_pool_budget()
+    if req_left <= 0 or tok_left <= 0:
+        return False
+    prompt = get_next_prompt()
+    tokens_before = TOTAL_TOKENS
+    public_content, model_id, c_type = await generate_draft(prompt)
+    warm_pool_stats["requests"] += 1
+    warm_pool_stats["tokens"] += max(0, TOTAL_TOKENS - tokens_before)
+    if "Error" in c_type or "CRITICAL" in c_type or len(public_content.strip()) < 50:
+        warm_pool_stats["failed"] += 1
+        return False
+    col_warm.insert_one({
+        "slot": slot,
+        "public": public_content,
+        "type": c_type,
+        "prompt": prompt,
+        "model": model_id,
+        "created_at": datetime.now()
+    })
+    return True
+
+
+async def warm_pool_task():
+    """Background refill loop for the warm pool."""
+    await asyncio.sleep(60)
+    while True:
+        try:
+            if col_warm is not None:
+                slots = _warm_pool_slots()
+                counts = warm_pool_counts()
+                offpeak = _warm_pool_offpeak()
+                now = datetime.now(IST)
+                # Soonest-firing slots first so a tight budget goes where it matters
+                order = sorted(slots, key=lambda s: slots[s] or now + timedelta(days=365))
+                for slot in order:
+                    have = counts.get(slot, 0)
+                    if offpeak:
+                        want = WARM_POOL_DEPTH
+                    else:
+                        nxt = slots[slot]
+                        urgent = nxt is not None and nxt - now <= timedelta(minutes=WARM_POOL_URGENT_MINUTES)
+                        want = 1 if urgent else 0
+                    stop = False
+                    while have < want:
+                        if not await warm_pool_fill(slot):
+                            stop = True
+                            break
+                        have += 1
+                        await asyncio.sleep(_warm_pool_pace())
+                    if stop:
+                        break
+        except Exception as e:
+            console_out(f"[WARN] Warm pool task error: {e}")
+        await asyncio.sleep(WARM_POOL_INTERVAL)
+
+
 # --- BUTTON 2: SCHEDULE (T-60 Remind Logic) ---
 async def t60_preflight(job_id, fire_time):
     # Capacity Check
     model_id = MODEL_POOL[CURRENT_MODEL_INDEX]
     limit = MODEL_SPECS.get(model_id, {}).get("rpd", 1500)
-    usage = API_USAGE_COUNT
+    # RPD is per key: warn when the busiest key on this model is near its cap
+    usage, key_hint = usage_ledger.busiest_key(model_id)
     
     cap_warning = ""
     if usage >= (limit * 0.9):
-        cap_warning = f"\n[WARN] <b>CAPACITY CRITICAL:</b> {usage}/{limit} RPD used."
+        cap_warning = f"\n[WARN] <b>CAPACITY CRITICAL:</b> {usage}/{limit} RPD used on key {key_hint} ({usage_ledger.requests(model=model_id)} across all keys)."
 
-    public_content, admin_content, c_type = await generate_content(get_next_prompt())
-    PENDING_FIRE[job_id] = {"public": public_content, "admin": admin_content, "fired": False, "type": c_type}
+    # Prefer pre-generated content; only generate live when the pool is dry
+    ready = warm_pool_take(job_id)
+    if ready:
+        PENDING_FIRE[job_id] = ready
+        public_content, admin_content, c_type = ready["public"], ready["admin"], ready["type"]
+    else:
+        public_content, admin_content, c_type = await generate_content(get_next_prompt())
+        PENDING_FIRE[job_id] = {"public": public_content, "admin": admin_content, "fired": False, "type": c_type}
     
     # Notify Admin with ADMIN preview (has ID)
     status_icon = "[ERROR] ERROR" if "Error" in c_type or "CRITICAL" in c_type else "[OK] READY"
@@ -1062,9 +1863,13 @@ async def t0_execution(job_id):
     global DAILY_STATS
     
     try:
-        # CRITICAL FIX: If T-60 didn't run, generate proper content
+        # If T-60 didn't run, serve from the warm pool before falling back to live generation
+        if job_id not in PENDING_FIRE:
+            ready = warm_pool_take(job_id)
+            if ready:
+                PENDING_FIRE[job_id] = ready
         if job_id not in PENDING_FIRE:
-            console_out(f"⚡ IMMEDIATE FIRE: {job_id} (T-60 skipped, generating now...)")
+            console_out(f"⚡ IMMEDIATE FIRE: {job_id} (T-60 skipped, warm pool empty, generating now...)")
             try:
                 public_content, admin_content, c_type = await generate_content(get_next_prompt())
                 PENDING_FIRE[job_id] = {"public": public_content, "admin": admin_content, "fired": False, "type": c_type}
@@ -1142,6 +1947,22 @@ async def t0_execution(job_id):
             if job_id in PENDING_FIRE: del PENDING_FIRE[job_id]
             return
         
+        # GATEKEEPER: hand the checked content to the owner instead of auto-posting
+        if GATEKEEPER_ENABLED:
+            kb = InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="[START] APPROVE & PUBLISH", callback_data="gate_approve"),
+                InlineKeyboardButton(text="[ERROR] DISCARD", callback_data="gate_discard")
+            ]])
+            await bot.send_message(
+                OWNER_ID,
+                f"🛡️ <b>SCHEDULED POST REVIEW</b>\n\n{public_content}",
+                parse_mode=ParseMode.HTML,
+                reply_markup=kb
+            )
+            claim_breach(job_data)
+            console_out(f"🛡️ {job_id} sent to gatekeeper review")
+            return
+        
         # ALL CHECKS PASSED - FIRE!
         try:
             # Send to main channel
@@ -1158,6 +1979,7 @@ async def t0_execution(job_id):
             # Mark as fired
             mark_as_fired(public_content)
             PENDING_FIRE[job_id]["fired"] = True
+            claim_breach(job_data)
             DAILY_STATS["scheduled_fired"] += 1
             persist_daily_stats()
             
@@ -1311,6 +2133,66 @@ async def toggle_day(cb: types.CallbackQuery, state: FSMContext):
     await state.update_data(selected_days=sel)
     await cb.message.edit_reply_markup(reply_markup=await get_days_kb(sel))
 
+@dp.message(Command("dupe"))
+async def cmd_dupe(message: types.Message):
+    """/dupe shows the near-duplicate index; /dupe 0.5 sets the blocking similarity."""
+    global DUP_THRESHOLD
+    if message.from_user.id != OWNER_ID: return
+    parts = message.text.split()
+    if len(parts) > 1:
+        try:
+            value = float(parts[1])
+            if not 0.1 <= value <= 1.0:
+                raise ValueError
+        except ValueError:
+            await message.answer("[ERROR] Use a similarity between 0.1 and 1.0, e.g. <code>/dupe 0.5</code>", parse_mode=ParseMode.HTML)
+            return
+        DUP_THRESHOLD = value
+        if col_system is not None:
+            col_system.update_one({"_id": "config"}, {"$set": {"dup_threshold": DUP_THRESHOLD}}, upsert=True)
+    st = fired_index.stats
+    await message.answer(
+        f"🧬 <b>DUPLICATE GUARD</b>\n"
+        f"━━━━━━━━━━━━━━━━━━━━\n"
+        f"Threshold: <code>{DUP_THRESHOLD:.2f}</code> similarity\n"
+        f"Indexed: <code>{fired_index.stored}</code> stored / <code>{len(fired_index.hot)}</code> hot\n"
+        f"Checks: <code>{st['checks']}</code> | exact: <code>{st['exact']}</code> | near: <code>{st['near']}</code>\n"
+        f"Last score: <code>{st['last_score']:.2f}</code>\n\n"
+        f"<i>Lower = stricter (catches looser paraphrases). /dupe 0.5 to change.</i>",
+        parse_mode=ParseMode.HTML
+    )
+
+def _schedules_view():
+    schedules = schedule_jobs()
+    if not schedules:
+        return "🗓 <b>LOCKED SCHEDULES</b>\n━━━━━━━━━━━━━━━━━━━━\nNone. Use 🗓 SCHEDULE to lock one.", None
+    lines = ["🗓 <b>LOCKED SCHEDULES</b>", "━━━━━━━━━━━━━━━━━━━━"]
+    buttons = []
+    for sch_id, jobs in sorted(schedules.items()):
+        times = sorted({j.args[1] for j in jobs if len(j.args) > 1})
+        runs = [j.next_run_time for j in jobs if j.next_run_time]
+        nxt = min(runs).astimezone(IST).strftime('%d %b %I:%M %p') if runs else "paused"
+        lines.append(f"• <code>{sch_id}</code> — {', '.join(times) or '?'} (next {nxt})")
+        buttons.append([InlineKeyboardButton(text=f"🗑️ {sch_id}", callback_data=f"unsched_{sch_id}")])
+    return "\n".join(lines), InlineKeyboardMarkup(inline_keyboard=buttons)
+
+@dp.message(Command("schedules"))
+async def cmd_schedules(message: types.Message):
+    """/schedules lists locked schedules with a remove button each."""
+    if message.from_user.id != OWNER_ID: return
+    text, kb = _schedules_view()
+    await message.answer(text, reply_markup=kb, parse_mode=ParseMode.HTML)
+
+@dp.callback_query(F.data.startswith("unsched_"))
+async def unschedule_handler(cb: types.CallbackQuery):
+    if cb.from_user.id != OWNER_ID: return
+    sch_id = cb.data[len("unsched_"):]
+    removed = remove_schedule(sch_id)
+    console_out(f"🗑️ Schedule {sch_id} removed ({removed} jobs)")
+    await cb.answer(f"{sch_id}: {removed} jobs removed" if removed else f"{sch_id} not found")
+    text, kb = _schedules_view()
+    await cb.message.edit_text(text, reply_markup=kb, parse_mode=ParseMode.HTML)
+
 @dp.message(Command("gatekeeper"))
 async def cmd_gatekeeper(message: types.Message):
      # Shortcut command
@@ -1422,7 +2304,7 @@ async def sched_decision(cb: types.CallbackQuery, state: FSMContext):
     await execute_lock(cb.message, state, data)
 
 async def execute_lock(message, state, data):
-    sch_id = f"SCH_{random.randint(100,999)}"
+    sch_id = new_schedule_id()
     day_names = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
     # Provide default if missing (safety)
     active_days = data.get('selected_days', [])
@@ -1441,10 +2323,12 @@ async def execute_lock(message, state, data):
         
         # 1. T-60 Warning
         t60_hour = (t_obj.hour - 1) % 24
-        scheduler.add_job(t60_preflight, CronTrigger(day_of_week=cron_days, hour=t60_hour, minute=t_obj.minute, month=s_month, year=s_year), args=[sch_id, t_str])
+        scheduler.add_job("bot5:t60_preflight", CronTrigger(day_of_week=cron_days, hour=t60_hour, minute=t_obj.minute, month=s_month, year=s_year), args=[sch_id, t_str],
+                          id=schedule_job_id(sch_id, "T60", t_str), replace_existing=True, misfire_grace_time=SCHED_T60_MISFIRE_GRACE)
         
         # 2. T-0 Execution
-        scheduler.add_job(t0_execution, CronTrigger(day_of_week=cron_days, hour=t_obj.hour, minute=t_obj.minute, month=s_month, year=s_year), args=[sch_id])
+        scheduler.add_job("bot5:t0_execution", CronTrigger(day_of_week=cron_days, hour=t_obj.hour, minute=t_obj.minute, month=s_month, year=s_year), args=[sch_id],
+                          id=schedule_job_id(sch_id, "T0", t_str), replace_existing=True)
     
     # Report
     model_id = MODEL_POOL[CURRENT_MODEL_INDEX]
@@ -1491,6 +2375,7 @@ async def execute_lock(message, state, data):
         f"🕒 <b>TIMES:</b> <code>{', '.join(timings)}</code>\n"
         f"🗓 <b>DAYS:</b> <code>{cron_days.upper()}</code>\n"
         f"🔁 <b>CYCLE:</b> <code>{period}</code>\n"
+        f"💾 <b>STORE:</b> <code>{'MONGODB (survives restart)' if SCHED_PERSISTENT else 'MEMORY'}</code>\n"
         f"━━━━━━━━━━━━━━━━━━━━\n"
         f"<b>📊 SUSTAINABILITY REPORT</b>\n"
         f"• Status: <b>{status}</b> ({daily_load}/{limit} RPD)\n"
@@ -1499,7 +2384,7 @@ async def execute_lock(message, state, data):
         f"• Total Reqs: <code>{total_reqs:,}</code>\n"
         f"• Exp. Breaches: {breach_str}\n"
         f"━━━━━━━━━━━━━━━━━━━━\n"
-        f"[OK] <i>PROTOCOL ACTIVE.</i>"
+        f"[OK] <i>PROTOCOL ACTIVE.</i> /schedules to list or remove."
     )
     
     if isinstance(message, types.Message):
@@ -1684,7 +2569,7 @@ async def api_menu(message: types.Message, state: FSMContext):
     for i, k in enumerate(API_KEY_POOL):
         masked = f"{k[:4]}...{k[-4:]}" if len(k) > 10 else "INVALID"
         marker = "[OK]" if i == CURRENT_API_INDEX else "🔹"
-        dash.append(f"{marker} <code>{i+1}</code> | {masked}")
+        dash.append(f"{marker} <code>{i+1}</code> | {masked} | {gemini_router.key_status(k)}")
     
     dash.append(f"\nActive Key: <b>{cur_key[:6]}...</b>")
     
@@ -1745,9 +2630,9 @@ async def api_select(message: types.Message, state: FSMContext):
     if 0 <= idx < len(API_KEY_POOL):
         CURRENT_API_INDEX = idx
         GEMINI_KEY = API_KEY_POOL[idx]
-        # Re-init client
+        # Re-use the router's long-lived client for this key
         try:
-            client = genai.Client(api_key=GEMINI_KEY)
+            client = gemini_router.client_for(GEMINI_KEY)
             await message.answer(f"[OK] <b>KEY SWITCHED:</b> Key {idx+1}", parse_mode=ParseMode.HTML)
         except Exception as e:
             await message.answer(f"[WARN] <b>KEY ERROR:</b> {e}", parse_mode=ParseMode.HTML)
@@ -1781,7 +2666,7 @@ async def api_add_save(message: types.Message, state: FSMContext):
         if not GEMINI_KEY and API_KEY_POOL:
             GEMINI_KEY = API_KEY_POOL[0]
             try:
-                client = genai.Client(api_key=GEMINI_KEY)
+                client = gemini_router.client_for(GEMINI_KEY)
             except: pass
 
         # PERSISTENCE: Save to DB (Separate Doc)
@@ -1809,6 +2694,8 @@ async def del_model_handler(cb: types.CallbackQuery):
         idx = int(action)
         if 0 <= idx < len(MODEL_POOL):
             removed = MODEL_POOL.pop(idx)
+            if removed not in MODEL_POOL:
+                gemini_router.forget_model(removed)
             
             # Adjustment of index if needed? 
             # If we deleted current model, reset to 0
@@ -1852,6 +2739,8 @@ async def del_key_handler(cb: types.CallbackQuery):
         idx = int(action)
         if 0 <= idx < len(API_KEY_POOL):
             removed = API_KEY_POOL.pop(idx)
+            if removed not in API_KEY_POOL:
+                gemini_router.forget_key(removed)
             
             global CURRENT_API_INDEX, GEMINI_KEY, client
             if CURRENT_API_INDEX >= len(API_KEY_POOL):
@@ -1859,7 +2748,7 @@ async def del_key_handler(cb: types.CallbackQuery):
                 
             if API_KEY_POOL:
                  GEMINI_KEY = API_KEY_POOL[CURRENT_API_INDEX]
-                 client = genai.Client(api_key=GEMINI_KEY)
+                 client = gemini_router.client_for(GEMINI_KEY)
             
             # PERSIST
             if col_system is not None:
@@ -1918,12 +2807,20 @@ async def cmd_scan(message: types.Message):
         
         f"<b>🤖 NERVE CENTER</b>\n"
         f"ACTIVE PROTOCOLS: <code>{jobs}</code>\n"
-        f"PENDING FIRES: <code>{pending}</code>\n\n"
+        f"PENDING FIRES: <code>{pending}</code>\n"
+        f"WARM POOL: <code>{sum(warm_pool_counts().values())} ready | {warm_pool_stats['served']} served / {warm_pool_stats['misses']} missed today</code>\n"
+        f"DB POOL: <code>{html.escape(pool_summary())}</code>\n"
+        f"TG QUEUE: <code>{html.escape(governor_summary(BOT_TOKEN))}</code>\n\n"
         
         f"<b>🧠 NEURAL METRICS ({MODEL_POOL[CURRENT_MODEL_INDEX]})</b>\n"
         f"TOKENS GENERATED: <code>{TOTAL_TOKENS}</code>\n"
-        f"DAILY REQUESTS: <code>{API_USAGE_COUNT} / {MODEL_SPECS.get(MODEL_POOL[CURRENT_MODEL_INDEX], {}).get('rpd', '?')}</code>\n"
-        f"RPM LIMIT: <code>{MODEL_SPECS.get(MODEL_POOL[CURRENT_MODEL_INDEX], {}).get('rpm', '?')}</code>\n"
+        f"TOTAL REQUESTS: <code>{API_USAGE_COUNT}</code>\n"
+        f"DAILY REQUESTS: <code>{usage_ledger.requests(model=MODEL_POOL[CURRENT_MODEL_INDEX])} / {MODEL_SPECS.get(MODEL_POOL[CURRENT_MODEL_INDEX], {}).get('rpd', '?')} per key</code>\n"
+        f"DAILY TOKENS: <code>{usage_ledger.tokens()}</code>\n"
+        f"RPM LIMIT: <code>{MODEL_SPECS.get(MODEL_POOL[CURRENT_MODEL_INDEX], {}).get('rpm', '?')}</code>\n\n"
+        
+        f"<b>🧭 ROUTER</b>\n"
+        + "\n".join(f"<code>{html.escape(l)}</code>" for l in gemini_router.summary_lines(API_KEY_POOL)) + "\n"
         f"━━━━━━━━━━━━━━━━━━━━\n"
         f"[OK] <i>SYSTEM OPTIMAL</i>"
     )
@@ -2216,39 +3113,6 @@ async def fire_exec(cb: types.CallbackQuery, state: FSMContext):
              await cb.message.edit_text(f"[WARN] <b>DEPLOY FAIL:</b> {e}", parse_mode=ParseMode.HTML)
 
 
-async def t0_execution(job_id):
-    # Scheduled Job Logic
-    # 1. Generate based on schedule directive
-    # Fetch job details? (Simplification: Use generic prompt or topic from job?)
-    # Assuming jobs stored in PENDING_FIRE or just generic "Daily Post"?
-    # The existing code probably has prompt logic.
-    # Looking at original code, t0_execution received job_id.
-    
-    # Retrieve job metadata
-    # ... (Assumption: job contains topic/prompt)
-    prompt = "Generate high-value tech content." # Default fallback if not found
-    
-    content, status = await generate_content(prompt)
-    
-    if status == "CRITICAL_ERROR":
-        await bot.send_message(OWNER_ID, f"[WARN] SCHEDULE FAILED: {content}")
-        return
-
-    # LOGIC BRANCH: GATEKEEPER
-    if GATEKEEPER_ENABLED:
-        kb = InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="[START] APPROVE & PUBLISH", callback_data="gate_approve"),
-            InlineKeyboardButton(text="[ERROR] DISCARD", callback_data="gate_discard")
-        ]])
-        await bot.send_message(
-            OWNER_ID, 
-            f"🛡️ <b>SCHEDULED POST REVIEW</b>\n\n{content}", 
-            parse_mode=ParseMode.HTML, 
-            reply_markup=kb
-        )
-    else:
-        await bot.send_message(CHANNEL_ID, content, parse_mode=ParseMode.HTML)
-
 @dp.callback_query(F.data == "gate_approve")
 async def gate_approve_handler(cb: types.CallbackQuery):
     # Extract content from the review message
@@ -2284,10 +3148,12 @@ async def gate_discard_handler(cb: types.CallbackQuery):
 
 @dp.callback_query(F.data.startswith("confirm_"))
 async def manual_fire_confirm(cb: types.CallbackQuery):
-    job_id = cb.data.split("_")[1]
+    job_id = cb.data.split("_", 1)[1]
     if job_id in PENDING_FIRE and not PENDING_FIRE[job_id]["fired"]:
-        await bot.send_message(CHANNEL_ID, PENDING_FIRE[job_id]["content"], parse_mode=ParseMode.HTML)
+        await bot.send_message(CHANNEL_ID, PENDING_FIRE[job_id]["public"], parse_mode=ParseMode.HTML)
+        mark_as_fired(PENDING_FIRE[job_id]["public"])
         PENDING_FIRE[job_id]["fired"] = True
+        claim_breach(PENDING_FIRE[job_id])
         await cb.message.edit_text("[START] MANUAL FIRE SUCCESSFUL.")
     await cb.answer()
 
@@ -2295,14 +3161,16 @@ async def manual_fire_confirm(cb: types.CallbackQuery):
 # [START] SUPREME BOOTLOADER
 # ==========================================
 async def main():
-    global API_USAGE_COUNT, CURRENT_MODEL_INDEX
+    global API_USAGE_COUNT, CURRENT_MODEL_INDEX, TOTAL_TOKENS
     try:
         if col_system is not None:
              # Load Gatekeeper
              conf = col_system.find_one({"_id": "config"})
              if conf:
-                 global GATEKEEPER_ENABLED, MODEL_POOL, API_KEY_POOL, GEMINI_KEY, client, CURRENT_API_INDEX
+                 global GATEKEEPER_ENABLED, MODEL_POOL, API_KEY_POOL, GEMINI_KEY, CURRENT_API_INDEX
                  GATEKEEPER_ENABLED = conf.get("gatekeeper", False)
+                 global DUP_THRESHOLD
+                 DUP_THRESHOLD = conf.get("dup_threshold", DUP_THRESHOLD)
                  
                  # ======================================================
                  # DATABASE-DRIVEN MODEL POOL LOADING
@@ -2353,18 +3221,13 @@ async def main():
                      else:
                          console_out("[ERROR] CRITICAL: No API keys available!")
                  
-                 # Initialize client with first available key from DB
+                 # Gemini clients (and google.genai itself) are created on the first
+                 # generation by gemini_router.client_for, not here
                  if API_KEY_POOL:
-                     client = genai.Client(api_key=API_KEY_POOL[0])
-                     console_out(f"[OK] CLIENT INITIALIZED with Key #{CURRENT_API_INDEX + 1}")
+                     console_out(f"[OK] {len(API_KEY_POOL)} API keys ready, starting at Key #{CURRENT_API_INDEX + 1}")
                  else:
                      console_out("[ERROR] CLIENT INIT FAILED: No keys in Database")
                      CURRENT_API_INDEX = 0
-                     try: 
-                         client = genai.Client(api_key=GEMINI_KEY)
-                         console_out(f"[OK] Gemini client initialized with Key 1/{len(API_KEY_POOL)}")
-                     except Exception as e:
-                         console_out(f"[WARN] Failed to init client: {e}")
                  
                  # ======================================================
                  # LOAD SAVED MODEL INDEX
@@ -2386,6 +3249,7 @@ async def main():
                 API_USAGE_COUNT = ledger.get("usage", 0)
                 TOTAL_TOKENS = ledger.get("tokens", 0)
                 console_out(f"📊 API Stats loaded: {API_USAGE_COUNT} requests, {TOTAL_TOKENS} tokens")
+            console_out(f"📒 Usage ledger: {usage_ledger.load()} key/model rows for quota day {usage_ledger.day}")
         
         # Load current daily stats from database (in case of restart mid-day)
         if col_system is not None:
@@ -2397,32 +3261,53 @@ async def main():
                 DAILY_STATS["errors"] = current_stats.get("errors", 0)
                 console_out(f"📊 Daily stats loaded: Breaches={DAILY_STATS['breaches_fired']}, Scheduled={DAILY_STATS['scheduled_fired']}, Errors={DAILY_STATS['errors']}")
         
+        # NEAR-DUPLICATE INDEX: warm the LRU from MongoDB
+        console_out(f"🧬 Fired index loaded: {fired_index.load()} signatures (threshold {DUP_THRESHOLD:.2f})")
+        
+        boot.mark("restore state")
+
+        # PERSISTENT SCHEDULES: restore locked jobs from MongoDB in one load
+        boot_started = time.time()
+        if attach_job_store():
+            console_out(f"💾 Scheduler job store: MongoDB ({SCHED_JOBS_COLLECTION})")
+        
         # ENTERPRISE: Daily Summary Report at 8:40 AM IST
-        scheduler.add_job(send_daily_summary, 'cron', hour=8, minute=40, timezone=IST, id="daily_summary", replace_existing=True)
+        scheduler.add_job("bot5:send_daily_summary", 'cron', hour=8, minute=40, timezone=IST, id="daily_summary", replace_existing=True)
         console_out("📊 Daily Summary scheduled for 8:40 AM IST")
         
-        scheduler.start()
+        # A supervised restart re-runs main() with the scheduler already going
+        if not scheduler.running:
+            scheduler.add_listener(_sched_listener, EVENT_JOB_MISSED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+            SCHED_EVENTS["started"] = datetime.now(IST)
+            scheduler.start()
+            asyncio.create_task(schedule_reconcile_report(boot_started))
+        
+        asyncio.create_task(usage_ledger_task())
+        
+        # Pre-generate scheduled content off-peak so T-0 is a DB read
+        asyncio.create_task(warm_pool_task())
+        console_out(f"🔋 Warm pool active (depth {WARM_POOL_DEPTH}, off-peak {WARM_POOL_OFFPEAK_HOURS} IST)")
         
         await bot.send_message(OWNER_ID, f"[SYSTEM] SINGULARITY v5.0 ONLINE\n🛡️ Gatekeeper: {'ON' if GATEKEEPER_ENABLED else 'OFF'}\n📊 Daily Summary: 8:40 AM")
         console_out("[SHUTDOWN] SYSTEM FULLY ARMED. POLLING...")
-        await dp.start_polling(bot)
+        boot.ready()
+        await dp.start_polling(bot, handle_signals=not HOSTED)
     except Exception as e:
         console_out(f"💥 CRITICAL BOT ERROR: {e}")
+        # Under main.py the supervisor reports and restarts the crash
+        if HOSTED:
+            raise
         # Keep running even if bot crashes
         while True: 
             await asyncio.sleep(3600)
 
 if __name__ == "__main__":
     print("[START] STARTING SINGULARITY V5")
-    print("[OK] Step 10: Starting health server thread...")
     
-    # Start health server in separate thread (bot4 pattern)
+    # Start health server in separate thread (bot4 pattern); it binds on its own,
+    # main() does not need to wait for it
     threading.Thread(target=run_health_server, daemon=True).start()
-    
-    print("[OK] Step 11: Health server thread started, waiting 1 second...")
-    import time
-    time.sleep(1)  # Give health server time to bind
-    print("[OK] Step 12: Starting main bot loop...")
+    boot.mark("handlers")
     
     try:
         asyncio.run(main())
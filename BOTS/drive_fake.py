@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Offline stand-in for the Google Drive v3 endpoints bot4 uses (files,
+permissions, changes, batch).
+
+bot4 routes get_drive_service() here when DRIVE_FAKE_DIR is set. Metadata and
+the change log live in <dir>/index.json, file content in <dir>/<id>.bin.
+Every execute / upload chunk / batch sleeps `latency_ms` to model one
+round-trip and bumps `calls`, so upload and sync paths can be timed and
+compared without credentials or network (see bench/bench_drive_upload.py).
+`fail_grants` makes the next N permission grants fail with a 500.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaUploadProgress
+
+
+class _FakeDriveRequest:
+    def __init__(self, drive, fn):
+        self._drive = drive
+        self._fn = fn
+
+    def execute(self, num_retries=0):
+        self._drive._round_trip()
+        return self._fn()
+
+
+class _FakeDriveUpload:
+    """Resumable media upload: one round-trip per chunk, file committed on the last one."""
+
+    def __init__(self, drive, body, media, fields):
+        self._drive = drive
+        self._body = body
+        self._media = media
+        self._offset = 0
+        self._chunks = []
+
+    def next_chunk(self, num_retries=0):
+        self._drive._round_trip()
+        size = self._media.size()
+        chunk = self._media.getbytes(self._offset, self._media.chunksize())
+        self._chunks.append(chunk)
+        self._offset += len(chunk)
+        if size is not None and self._offset < size:
+            return MediaUploadProgress(self._offset, size), None
+        return None, self._drive._store(self._body, b"".join(self._chunks))
+
+    def execute(self, num_retries=0):
+        response = None
+        while response is None:
+            _progress, response = self.next_chunk()
+        return response
+
+
+class _FakeDriveBatch:
+    def __init__(self, drive, callback):
+        self._drive = drive
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, request_id=None, callback=None):
+        self._requests.append((request, request_id or str(len(self._requests)), callback or self._callback))
+
+    def execute(self):
+        self._drive._round_trip()  # whole batch = one HTTP call
+        for request, request_id, callback in self._requests:
+            try:
+                response, exc = request._fn(), None
+            except Exception as e:
+                response, exc = None, e
+            if callback:
+                callback(request_id, response, exc)
+
+
+class _FakeDriveFiles:
+    def __init__(self, drive):
+        self._d = drive
+
+    def list(self, q="", pageSize=100, pageToken=None, fields=None, **_kw):
+        return _FakeDriveRequest(self._d, lambda: self._d._list(q, pageSize, pageToken))
+
+    def create(self, body=None, media_body=None, fields=None, **_kw):
+        if media_body is not None:
+            if media_body.resumable():
+                return _FakeDriveUpload(self._d, body, media_body, fields)
+            return _FakeDriveRequest(self._d, lambda: self._d._store(body, media_body.getbytes(0, media_body.size())))
+        return _FakeDriveRequest(self._d, lambda: self._d._store(body, None))
+
+    def get(self, fileId=None, fields=None, **_kw):
+        return _FakeDriveRequest(self._d, lambda: dict(self._d._meta(fileId)))
+
+    def update(self, fileId=None, body=None, **_kw):
+        return _FakeDriveRequest(self._d, lambda: self._d._update(fileId, body or {}))
+
+    def delete(self, fileId=None, **_kw):
+        return _FakeDriveRequest(self._d, lambda: self._d._delete(fileId))
+
+
+class _FakeDrivePermissions:
+    def __init__(self, drive):
+        self._d = drive
+
+    def create(self, fileId=None, body=None, **_kw):
+        return _FakeDriveRequest(self._d, lambda: self._d._grant(fileId, body or {}))
+
+
+class _FakeDriveChanges:
+    def __init__(self, drive):
+        self._d = drive
+
+    def getStartPageToken(self, **_kw):
+        return _FakeDriveRequest(self._d, lambda: {"startPageToken": str(len(self._d._changes))})
+
+    def list(self, pageToken=None, pageSize=100, **_kw):
+        return _FakeDriveRequest(self._d, lambda: self._d._list_changes(pageToken, pageSize))
+
+
+class FakeDriveService:
+    """Local-directory Drive v3 stand-in. Metadata + change log live in index.json, content in <id>.bin."""
+
+    FOLDER_MIME = "application/vnd.google-apps.folder"
+
+    def __init__(self, root_dir: str, latency_ms: int = 0):
+        self.root_dir = root_dir
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+        self.fail_grants = 0
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(root_dir, "index.json")
+        os.makedirs(root_dir, exist_ok=True)
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        self._files = saved.get("files", {})
+        self._changes = saved.get("changes", [])   # file IDs in modification order
+
+    # ── Drive-shaped surface ──
+    def files(self):
+        return _FakeDriveFiles(self)
+
+    def permissions(self):
+        return _FakeDrivePermissions(self)
+
+    def changes(self):
+        return _FakeDriveChanges(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeDriveBatch(self, callback)
+
+    # ── Internals ──
+    def _round_trip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _now(self) -> str:
+        t = time.time()
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int(t * 1000) % 1000:03d}Z"
+
+    def _save(self):
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": self._files, "changes": self._changes}, f)
+        os.replace(tmp, self._index_path)
+
+    def _not_found(self, file_id):
+        return HttpError(type("Resp", (), {"status": 404, "reason": "Not Found"})(), f"File not found: {file_id}".encode())
+
+    def _meta(self, file_id):
+        meta = self._files.get(file_id)
+        if meta is None:
+            raise self._not_found(file_id)
+        return meta
+
+    def _store(self, body, content):
+        body = dict(body or {})
+        with self._lock:
+            for parent in body.get("parents", []):
+                if parent not in self._files:
+                    raise self._not_found(parent)
+            file_id = f"fake{len(self._files) + 1:07d}{os.urandom(3).hex()}"
+            meta = {
+                "id": file_id,
+                "name": body.get("name", ""),
+                "mimeType": body.get("mimeType") or ("application/pdf" if content is not None else ""),
+                "parents": body.get("parents", []),
+                "modifiedTime": self._now(),
+                "webViewLink": f"https://drive.google.com/file/d/{file_id}/view",
+                "trashed": False,
+                "permissions": [],
+            }
+            self._files[file_id] = meta
+            self._changes.append(file_id)
+            if content is not None:
+                with open(os.path.join(self.root_dir, f"{file_id}.bin"), "wb") as f:
+                    f.write(content)
+            self._save()
+        return {"id": file_id, "webViewLink": meta["webViewLink"]}
+
+    def _update(self, file_id, body):
+        with self._lock:
+            meta = self._meta(file_id)
+            meta.update({k: v for k, v in body.items() if k in ("name", "trashed")})
+            meta["modifiedTime"] = self._now()
+            self._changes.append(file_id)
+            self._save()
+        return {"id": file_id}
+
+    def _delete(self, file_id):
+        with self._lock:
+            self._meta(file_id)
+            self._files.pop(file_id, None)
+            self._changes.append(file_id)
+            try:
+                os.remove(os.path.join(self.root_dir, f"{file_id}.bin"))
+            except OSError:
+                pass
+            self._save()
+        return None
+
+    def _grant(self, file_id, body):
+        with self._lock:
+            if self.fail_grants > 0:
+                self.fail_grants -= 1
+                raise HttpError(type("Resp", (), {"status": 500, "reason": "Backend Error"})(), b"Internal Error")
+            self._meta(file_id).setdefault("permissions", []).append(body)
+            self._save()
+        return {"id": f"perm-{file_id}"}
+
+    def _list_changes(self, page_token, page_size):
+        try:
+            start = int(page_token)
+        except (TypeError, ValueError):
+            raise HttpError(type("Resp", (), {"status": 400, "reason": "Bad Request"})(), b"Invalid pageToken")
+        with self._lock:
+            ids = self._changes[start:start + page_size]
+            changes = []
+            for file_id in ids:
+                meta = self._files.get(file_id)
+                if meta is None:
+                    changes.append({"fileId": file_id, "removed": True})
+                else:
+                    changes.append({"fileId": file_id, "removed": False,
+                                    "file": {k: v for k, v in meta.items() if k != "permissions"}})
+            result = {"changes": changes}
+            if start + page_size < len(self._changes):
+                result["nextPageToken"] = str(start + page_size)
+            else:
+                result["newStartPageToken"] = str(len(self._changes))
+        return result
+
+    def _list(self, q, page_size, page_token):
+        name = re.search(r"name\s*=\s*'((?:[^'\\]|\\.)*)'", q or "")
+        mime = re.search(r"mimeType\s*=\s*'([^']*)'", q or "")
+        parent = re.search(r"'([^']+)'\s+in\s+parents", q or "")
+        with self._lock:
+            matches = [
+                m for m in self._files.values()
+                if not m.get("trashed")
+                and (not name or m["name"] == name.group(1).replace("\\'", "'"))
+                and (not mime or m["mimeType"] == mime.group(1))
+                and (not parent or parent.group(1) in m.get("parents", []))
+            ]
+        start = int(page_token or 0)
+        page = [{k: v for k, v in m.items() if k != "permissions"} for m in matches[start:start + page_size]]
+        result = {"files": page}
+        if start + page_size < len(matches):
+            result["nextPageToken"] = str(start + page_size)
+        return result
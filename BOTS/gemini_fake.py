@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Offline stand-in for the google-genai client bot5's GeminiRouter drives.
+
+bot5 builds these instead of genai.Client when GEMINI_FAKE=1. Each call
+sleeps `latency_ms` and counts itself, and the key / model names choose the
+failure, so router failover and circuit breakers can be exercised without
+keys or network (see bench/bench_gemini_router.py).
+"""
+import asyncio
+import html
+
+
+class _FakeGeminiResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = self
+        self.prompt_token_count = 0
+        self.candidates_token_count = len(text) // 4
+        self.total_token_count = len(text) // 4
+
+
+class FakeGeminiClient:
+    """
+    Offline stand-in for genai.Client (bot5 with GEMINI_FAKE=1).
+    Behaviour is driven by the key / model names so failover can be exercised:
+      key contains 'dead'  -> 403 API_KEY_INVALID
+      key contains 'quota' -> 429 RESOURCE_EXHAUSTED
+      key contains 'slow'  -> 10x latency
+      model contains 'missing' -> 404 NOT_FOUND
+    """
+
+    def __init__(self, api_key, latency_ms=50):
+        self.api_key = api_key
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self.aio = self
+        self.models = self
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        delay = self.latency
+        if "slow" in self.api_key:
+            delay *= 10
+        await asyncio.sleep(delay)
+        if "dead" in self.api_key:
+            raise RuntimeError("403 PERMISSION_DENIED. API_KEY_INVALID (fake)")
+        if "quota" in self.api_key:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED. Quota exceeded for GenerateRequestsPerMinute (fake)")
+        if "missing" in model:
+            raise RuntimeError(f"404 NOT_FOUND. models/{model} is not found (fake)")
+        prompt = contents[0] if contents else ""
+        text = (
+            f"🚀 <b>FAKE BREACH ({model})</b>\n\n"
+            f"✨ <i>{html.escape(str(prompt))[:200]}</i>\n\n"
+            + "\n".join(f"🥇 <b>Resource {i}</b>\n🔗 <a href=\"https://example.com/{i}\">→ Claim Now</a>" for i in range(1, 6))
+        )
+        resp = _FakeGeminiResponse(text)
+        resp.prompt_token_count = (len(str(prompt)) + len(getattr(config, "system_instruction", "") or "")) // 4
+        resp.total_token_count = resp.prompt_token_count + resp.candidates_token_count
+        return resp
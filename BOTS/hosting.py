@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Process-level wiring for bots hosted by main.py.
+
+Each bot still runs on its own (`python bot1.py`). main.py can also host any
+subset of them in one process; it sets MSANODE_HOSTED=1 before importing the
+bots. In that mode a bot leaves the web server (health + webhook routes) and
+signal handling to the host, and every Bot gets a Telegram session backed by
+one shared aiohttp ClientSession, so all tokens share a single connector.
+MongoDB sharing needs nothing here: mongo_client caches clients per URI.
+
+Hosted or not, every session goes through the outbound rate governor
+(telegram_governor.py).
+"""
+import os
+
+from aiogram.client.session.aiohttp import AiohttpSession
+
+from telegram_governor import rate_governor
+
+HOSTED = os.getenv("MSANODE_HOSTED", "0") == "1"
+TELEGRAM_CONNECTOR_LIMIT = int(os.getenv("TELEGRAM_CONNECTOR_LIMIT", 100))  # sockets shared by all hosted bots
+
+_shared_http = None
+shared_sessions = 0
+
+
+class SharedAiohttpSession(AiohttpSession):
+    """Telegram session whose ClientSession (and connector) is shared process-wide."""
+
+    async def create_session(self):
+        global _shared_http
+        if _shared_http is None or _shared_http.closed:
+            _shared_http = await super().create_session()
+        return _shared_http
+
+    async def close(self):
+        # Bots close their session on shutdown; the host closes the shared one last
+        pass
+
+
+def telegram_session():
+    """Session for a new Bot: shared when hosted, aiogram's default otherwise; always rate governed."""
+    global shared_sessions
+    if HOSTED:
+        shared_sessions += 1
+        session = SharedAiohttpSession(limit=TELEGRAM_CONNECTOR_LIMIT)
+    else:
+        session = AiohttpSession()
+    session.middleware(rate_governor)
+    return session
+
+
+def connector_stats():
+    return {
+        "sessions": shared_sessions,
+        "limit": TELEGRAM_CONNECTOR_LIMIT,
+        "open": _shared_http is not None and not _shared_http.closed,
+    }
+
+
+async def close_shared_session():
+    if _shared_http is not None and not _shared_http.closed:
+        await _shared_http.close()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Versioned index migrations shared by the MSANODE bots.
+
+Each bot declares its indexes (plus one-shot drops and data steps) on an
+IndexRegistry. `apply()` reads what this bot already applied from the
+`index_migrations` collection in one query and only touches entries that are
+new, whose spec changed, or whose index no longer exists (dropped collection
+after a data reset, manual drop_index). A normal restart costs that query
+plus one listIndexes per collection.
+Hot query shapes declared with `expect()` are checked against the live
+indexes afterwards and reported when nothing supports them.
+"""
+import hashlib
+import time
+from datetime import datetime
+
+from pymongo.errors import OperationFailure
+
+MIGRATIONS_COLLECTION = "index_migrations"
+_CONFLICT_CODES = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+def _normalize_keys(keys):
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    return [(k, d) for k, d in keys]
+
+
+def _default_name(keys):
+    return "_".join(f"{k}_{d}" for k, d in keys)
+
+
+def _spec_hash(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()[:12]
+
+
+class IndexRegistry:
+    def __init__(self, db, owner):
+        self.db = db
+        self.owner = owner
+        self.entries = []      # ordered: indexes, drops and steps run in declaration order
+        self.expectations = [] # (collection, fields)
+        self.last_report = {}
+
+    # --- declaration ---
+    # Collections may be given as names or pymongo Collection objects
+    def index(self, collection, keys, name=None, version=1, prepare=None, replace=False, **options):
+        """
+        Declare an index. `prepare` runs right before it is (re)built, e.g. a
+        dedupe pass. `replace` lets this spec overwrite a conflicting index of
+        the same name even if this bot never built it (legacy TTLs).
+        """
+        collection = getattr(collection, "name", collection)
+        keys = _normalize_keys(keys)
+        name = name or _default_name(keys)
+        self.entries.append({
+            "kind": "index", "collection": collection, "name": name, "keys": keys,
+            "options": options, "prepare": prepare, "replace": replace,
+            "hash": _spec_hash(collection, keys, sorted(options.items()), version),
+        })
+
+    def drop(self, collection, name, version=1):
+        """One-shot removal of a legacy index."""
+        collection = getattr(collection, "name", collection)
+        self.entries.append({
+            "kind": "drop", "collection": collection, "name": name,
+            "hash": _spec_hash("drop", collection, name, version),
+        })
+
+    def step(self, name, fn, version=1):
+        """One-shot data migration; bump `version` to run it again."""
+        self.entries.append({
+            "kind": "step", "collection": "", "name": name, "fn": fn,
+            "hash": _spec_hash("step", name, version),
+        })
+
+    def expect(self, collection, *fields):
+        """Declare a hot query shape; the first field is the one that must be indexed."""
+        collection = getattr(collection, "name", collection)
+        self.expectations.append((collection, fields))
+
+    # --- execution ---
+    def _record_id(self, entry):
+        return f"{self.owner}:{entry['kind']}:{_label(entry)}"
+
+    def _build(self, entry, owned):
+        col = self.db[entry["collection"]]
+        try:
+            col.create_index(entry["keys"], name=entry["name"], **entry["options"])
+            return "applied"
+        except OperationFailure as e:
+            if e.code not in _CONFLICT_CODES:
+                raise
+            if not owned:
+                # Someone else (another bot, or a manual build) owns this spec — report, don't fight
+                print(f"⚠️ [INDEX] {self.owner}: {entry['collection']}.{entry['name']} conflicts with an existing index: {e}")
+                return "conflict"
+        # Our own spec changed since the last build (or replace=True): swap it
+        col.drop_index(entry["name"])
+        col.create_index(entry["keys"], name=entry["name"], **entry["options"])
+        return "applied"
+
+    def _live_indexes(self, collection, cache):
+        """index_information() of `collection`, read once per apply(); None when unreadable."""
+        if collection not in cache:
+            try:
+                cache[collection] = self.db[collection].index_information()
+            except Exception as e:
+                print(f"⚠️ [INDEX] {self.owner}: cannot read indexes of {collection}: {e}")
+                cache[collection] = None
+        return cache[collection]
+
+    def apply(self):
+        """Apply new/changed/missing entries, then audit hot queries. Returns a stats dict."""
+        started = time.time()
+        meta = self.db[MIGRATIONS_COLLECTION]
+        done = {d["_id"]: d for d in meta.find({"owner": self.owner}, {"hash": 1, "status": 1})}
+        stats = {"applied": 0, "skipped": 0, "rebuilt": 0, "conflicts": 0, "failed": 0}
+        live = {}
+
+        for entry in self.entries:
+            rec_id = self._record_id(entry)
+            previous = done.get(rec_id)
+            conflicted = previous is not None and previous.get("status") == "conflict"
+            if previous and previous.get("hash") == entry["hash"]:
+                if conflicted:
+                    stats["conflicts"] += 1  # reported when first seen; the other index still owns the keys
+                    continue
+                if entry["kind"] != "index":
+                    stats["skipped"] += 1
+                    continue
+                existing = self._live_indexes(entry["collection"], live)
+                if existing is None or entry["name"] in existing:
+                    stats["skipped"] += 1
+                    continue
+                stats["rebuilt"] += 1  # recorded as applied but gone from the collection
+            t0 = time.time()
+            try:
+                if entry["kind"] == "index":
+                    if entry["prepare"]:
+                        entry["prepare"]()
+                    status = self._build(entry, owned=(previous is not None and not conflicted) or entry["replace"])
+                    live.pop(entry["collection"], None)
+                elif entry["kind"] == "drop":
+                    try:
+                        self.db[entry["collection"]].drop_index(entry["name"])
+                    except OperationFailure:
+                        pass  # already gone
+                    status = "applied"
+                else:
+                    entry["fn"]()
+                    status = "applied"
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"⚠️ [INDEX] {self.owner}: {entry['kind']} {_label(entry)} failed: {e}")
+                continue  # not recorded → retried next boot
+            stats["conflicts" if status == "conflict" else "applied"] += 1
+            meta.update_one(
+                {"_id": rec_id},
+                {"$set": {"owner": self.owner, "kind": entry["kind"], "collection": entry["collection"],
+                          "name": entry["name"], "hash": entry["hash"], "status": status,
+                          "ms": int((time.time() - t0) * 1000), "applied_at": datetime.now()}},
+                upsert=True
+            )
+            if status == "applied":
+                print(f"✅ [INDEX] {self.owner}: {entry['kind']} {_label(entry)} "
+                      f"({int((time.time() - t0) * 1000)}ms)")
+
+        stats["missing"] = self.audit(live)
+        stats["ms"] = int((time.time() - started) * 1000)
+        self.last_report = stats
+        print(f"🔍 [INDEX] {self.owner}: {stats['applied']} applied ({stats['rebuilt']} rebuilt), {stats['skipped']} up to date, "
+              f"{stats['conflicts']} conflicts, {stats['failed']} failed, "
+              f"{len(stats['missing'])} unsupported hot queries ({stats['ms']}ms)")
+        return stats
+
+    def audit(self, live=None):
+        """[(collection, fields)] for every declared hot query with no supporting index."""
+        missing = []
+        by_collection = {}
+        live = {} if live is None else live
+        for collection, fields in self.expectations:
+            by_collection.setdefault(collection, []).append(fields)
+        for collection, shapes in by_collection.items():
+            info = self._live_indexes(collection, live)
+            if info is None:
+                continue
+            indexes = [spec["key"] for spec in info.values()]
+            for fields in shapes:
+                if not any(_supports(keys, fields) for keys in indexes):
+                    missing.append((collection, fields))
+                    print(f"⚠️ [INDEX] {self.owner}: hot query on {collection} ({', '.join(fields)}) "
+                          f"has no supporting index — collection scan")
+        try:
+            self.db[MIGRATIONS_COLLECTION].update_one(
+                {"_id": f"{self.owner}:audit"},
+                {"$set": {"owner": self.owner, "kind": "audit", "checked_at": datetime.now(),
+                          "missing": [f"{c}({', '.join(f)})" for c, f in missing]}},
+                upsert=True
+            )
+        except Exception:
+            pass
+        return missing
+
+
+def _label(entry):
+    return f"{entry['collection']}.{entry['name']}" if entry["collection"] else entry["name"]
+
+
+def _supports(index_keys, fields):
+    """True when the index's key prefix uses only query fields and includes the hot one."""
+    prefix = []
+    for key, _direction in index_keys:
+        if key not in fields:
+            break
+        prefix.append(key)
+    return fields[0] in prefix
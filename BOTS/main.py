@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+MSANODE orchestrator: host any subset of bot1-bot5 in one process.
+
+    python main.py                  # every bot in HOSTED_BOTS (default: all five)
+    python main.py bot1 bot3        # just these
+
+Each bot keeps working standalone (`python bot1.py`); this runner is the
+alternative for plans where one interpreter per bot costs too much RSS.
+Hosted bots share:
+  - one event loop, with per-bot supervision (a crashed bot is restarted with
+    backoff and its tasks are cancelled, the others keep running);
+  - one MongoClient (mongo_client caches per URI);
+  - one aiohttp connector for all Telegram traffic (hosting.telegram_session);
+  - one web server on $PORT: /health, /metrics, /<bot>/health and every
+    bot's webhook route.
+
+/metrics reports what sharing costs and saves: RSS per imported bot against
+the interpreter + library base every standalone process pays, event loop lag
+(how long a ready callback waits - one bot's blocking work delays all
+others) and per-bot update handling latency.
+"""
+import os
+import sys
+
+os.environ["MSANODE_HOSTED"] = "1"  # read by hosting.py when the bots import it
+
+import asyncio
+import contextvars
+import importlib
+import signal
+import time
+import traceback
+import weakref
+from collections import deque
+
+import psutil
+
+ALL_BOTS = ("bot1", "bot2", "bot3", "bot4", "bot5")
+HOSTED_BOTS = os.getenv("HOSTED_BOTS", ",".join(ALL_BOTS))
+PORT = int(os.getenv("PORT", 8080))
+RESTART_BASE_DELAY = int(os.getenv("BOT_RESTART_BASE_DELAY", 5))   # seconds, doubled per consecutive crash
+RESTART_MAX_DELAY = int(os.getenv("BOT_RESTART_MAX_DELAY", 300))
+LOOP_LAG_INTERVAL = 0.5                                            # seconds between loop lag probes
+METRICS_LOG_INTERVAL = int(os.getenv("METRICS_LOG_INTERVAL", 900))  # seconds; 0 disables the periodic log line
+
+# Bot-level /health handlers worth exposing under /<bot>/health
+BOT_HEALTH_HANDLERS = {
+    "bot1": "_health_handler",
+    "bot2": "_health_handler_bot10",
+    "bot3": "health_check_endpoint",
+}
+
+_process = psutil.Process(os.getpid())
+_current_bot = contextvars.ContextVar("current_bot", default=None)
+
+
+def rss_mb():
+    return round(_process.memory_info().rss / 1024 / 1024, 1)
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1], 2)}
+
+
+class HostedBot:
+    """One bot module running under supervision."""
+
+    def __init__(self, name, module, import_mb):
+        self.name = name
+        self.module = module
+        self.import_mb = import_mb
+        self.tasks = weakref.WeakSet()  # every task spawned while running this bot
+        self.state = "loaded"
+        self.restarts = 0
+        self.last_error = None
+        self.started = None
+        self.updates = 0
+        self.update_ms = deque(maxlen=500)
+        module.dp.update.outer_middleware(self.time_update)
+
+    async def time_update(self, handler, event, data):
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.updates += 1
+            self.update_ms.append((time.perf_counter() - started) * 1000)
+
+    def cancel_tasks(self):
+        current = asyncio.current_task()
+        for task in list(self.tasks):
+            if task is not current and not task.done():
+                task.cancel()
+
+    async def run(self):
+        _current_bot.set(self.name)  # inherited by every task main() creates
+        crashes = 0
+        while True:
+            self.state = "running"
+            self.started = time.time()
+            try:
+                await self.module.main()
+                self.state = "stopped"
+                print(f"✅ [{self.name}] main() returned, not restarting")
+                return
+            except asyncio.CancelledError:
+                self.state = "stopped"
+                raise
+            except Exception as e:
+                # An unauthorized token will not fix itself by restarting
+                if type(e).__name__ == "TelegramUnauthorizedError":
+                    self.state = "failed"
+                    self.last_error = f"unauthorized token: {e}"
+                    print(f"❌ [{self.name}] {self.last_error}")
+                    return
+                crashes = crashes + 1 if time.time() - self.started < RESTART_MAX_DELAY else 1
+                self.restarts += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.state = "restarting"
+                print(f"💥 [{self.name}] crashed: {self.last_error}\n{traceback.format_exc()}")
+            finally:
+                self.cancel_tasks()
+            delay = min(RESTART_MAX_DELAY, RESTART_BASE_DELAY * 2 ** (crashes - 1))
+            print(f"🔁 [{self.name}] restarting in {delay}s (restart #{self.restarts})")
+            await asyncio.sleep(delay)
+
+    def metrics(self):
+        return {
+            "state": self.state,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "uptime_s": int(time.time() - self.started) if self.started and self.state == "running" else 0,
+            "tasks": sum(1 for t in self.tasks if not t.done()),
+            "import_mb": self.import_mb,
+            "updates": self.updates,
+            "update_ms": _percentiles(self.update_ms),
+        }
+
+
+class Host:
+    def __init__(self, names):
+        self.names = names
+        self.bots = {}
+        self.failed = {}  # name -> import error
+        self.loop_lag_ms = deque(maxlen=1200)
+        self.started = time.time()
+        self.memory = {}
+
+    # ── Loading ──────────────────────────────────────────────────────────────
+    def load(self):
+        """Import the bots, recording what each adds to RSS."""
+        from mongo_client import get_client
+        # Libraries every standalone bot imports anyway: their RSS is part of the
+        # per-process base, not of any one bot
+        import aiogram, aiohttp, pymongo  # noqa: F401
+        uri = os.getenv("MONGO_URI")
+        if uri:
+            get_client(uri, app="msanode-main")
+        self.memory["base_mb"] = rss_mb()
+
+        tokens = {}
+        for name in self.names:
+            before = rss_mb()
+            try:
+                module = importlib.import_module(name)
+            except (Exception, SystemExit) as e:
+                self.failed[name] = f"{type(e).__name__}: {e}"
+                print(f"❌ [{name}] failed to load: {self.failed[name]}")
+                continue
+            if getattr(module, "bot", None) is None:
+                self.failed[name] = "no bot token configured"
+                print(f"❌ [{name}] not hosted: no bot token configured")
+                continue
+            token = module.bot.token
+            if token in tokens:
+                self.failed[name] = f"same token as {tokens[token]}"
+                print(f"❌ [{name}] not hosted: uses the same token as {tokens[token]}")
+                continue
+            tokens[token] = name
+            self.bots[name] = HostedBot(name, module, round(rss_mb() - before, 1))
+            print(f"📦 [{name}] loaded (+{self.bots[name].import_mb} MB)")
+
+        loaded = list(self.bots.values())
+        self.memory["hosted_mb"] = rss_mb()
+        # Standalone, every bot pays the base again on top of its own share
+        self.memory["standalone_estimate_mb"] = round(
+            len(loaded) * self.memory["base_mb"] + sum(b.import_mb for b in loaded), 1)
+        self.memory["saved_estimate_mb"] = round(self.memory["standalone_estimate_mb"] - self.memory["hosted_mb"], 1)
+        print(f"🧮 RSS after loading {len(loaded)} bot(s): {self.memory['hosted_mb']} MB "
+              f"(standalone estimate {self.memory['standalone_estimate_mb']} MB, "
+              f"saving ~{self.memory['saved_estimate_mb']} MB)")
+
+    # ── Metrics ──────────────────────────────────────────────────────────────
+    async def probe_loop_lag(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.loop_lag_ms.append(max(0.0, (time.perf_counter() - t0 - LOOP_LAG_INTERVAL) * 1000))
+
+    def metrics(self):
+        from mongo_client import pool_stats
+        from hosting import connector_stats
+        from telegram_governor import governor_stats
+        return {
+            "uptime_s": int(time.time() - self.started),
+            "rss_mb": rss_mb(),
+            "memory": self.memory,
+            "loop_lag_ms": _percentiles(self.loop_lag_ms),
+            "bots": {name: b.metrics() for name, b in self.bots.items()},
+            "failed": self.failed,
+            "mongo_pool": pool_stats(),
+            "telegram_connector": connector_stats(),
+            "telegram_queue": governor_stats(),
+        }
+
+    async def log_metrics(self):
+        while METRICS_LOG_INTERVAL > 0:
+            await asyncio.sleep(METRICS_LOG_INTERVAL)
+            m = self.metrics()
+            per_bot = ", ".join(f"{n} p95 {b['update_ms']['p95']}ms/{b['updates']}" for n, b in m["bots"].items())
+            print(f"📈 rss {m['rss_mb']} MB | loop lag p95 {m['loop_lag_ms']['p95']}ms "
+                  f"max {m['loop_lag_ms']['max']}ms | {per_bot}")
+
+    # ── Web server ───────────────────────────────────────────────────────────
+    async def start_web(self):
+        from aiohttp import web
+        from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+        async def health(request):
+            states = {name: b.state for name, b in self.bots.items()}
+            ok = bool(states) and all(s == "running" for s in states.values())
+            return web.json_response({"status": "ok" if ok else "degraded", "bots": states, "failed": self.failed},
+                                     status=200 if ok else 503)
+
+        async def metrics(request):
+            return web.json_response(self.metrics())
+
+        app = web.Application()
+        app.router.add_get("/", health)
+        app.router.add_get("/health", health)
+        app.router.add_get("/metrics", metrics)
+        for name, hosted in self.bots.items():
+            module = hosted.module
+            handler = getattr(module, BOT_HEALTH_HANDLERS.get(name, ""), None)
+            if handler:
+                app.router.add_get(f"/{name}/health", handler)
+            if getattr(module, "_WEBHOOK_URL", ""):
+                SimpleRequestHandler(dispatcher=module.dp, bot=module.bot).register(app, path=module._WEBHOOK_PATH)
+                setup_application(app, module.dp, bot=module.bot)
+                print(f"🔗 [{name}] webhook route registered")
+
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", PORT).start()
+        print(f"🌐 Host web server on port {PORT} (/health, /metrics)")
+        return runner
+
+    # ── Run ──────────────────────────────────────────────────────────────────
+    async def serve(self):
+        from hosting import close_shared_session
+        loop = asyncio.get_running_loop()
+
+        def task_factory(loop, coro, **kwargs):
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+            ctx = kwargs.get("context")
+            name = ctx.get(_current_bot) if ctx is not None else _current_bot.get()
+            if name in self.bots:
+                self.bots[name].tasks.add(task)
+            return task
+
+        loop.set_task_factory(task_factory)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C arrives as KeyboardInterrupt instead
+
+        runner = await self.start_web()
+        probes = [asyncio.create_task(self.probe_loop_lag()), asyncio.create_task(self.log_metrics())]
+        supervisors = [asyncio.create_task(b.run(), name=f"supervisor:{n}") for n, b in self.bots.items()]
+        print(f"🚀 Hosting {', '.join(self.bots) or 'no bots'} in one process")
+        try:
+            await stop.wait()
+        finally:
+            print("🛑 Stopping hosted bots...")
+            for task in supervisors:
+                task.cancel()
+            # Bots send their shutdown notices from finally blocks: keep the shared session open until they finish
+            await asyncio.gather(*supervisors, return_exceptions=True)
+            for hosted in self.bots.values():
+                hosted.cancel_tasks()
+            for task in probes:
+                task.cancel()
+            await runner.cleanup()
+            await close_shared_session()
+            print("✅ Host shutdown complete")
+
+
+def parse_bots(argv):
+    names = argv or [n.strip() for n in HOSTED_BOTS.split(",") if n.strip()]
+    unknown = [n for n in names if n not in ALL_BOTS]
+    if unknown:
+        sys.exit(f"Unknown bot(s): {', '.join(unknown)} (expected any of {', '.join(ALL_BOTS)})")
+    return list(dict.fromkeys(names))
+
+
+if __name__ == "__main__":
+    host = Host(parse_bots(sys.argv[1:]))
+    host.load()
+    if not host.bots:
+        sys.exit("No bot could be loaded")
+    try:
+        asyncio.run(host.serve())
+    except KeyboardInterrupt:
+        print("⚠️ Host stopped by user (Ctrl+C)")
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Shared MongoDB client factory for the MSANODE bots.
+
+Every bot connects to the same Atlas cluster, so the client options live here
+instead of in each bot: pool sizing, timeouts, retryable reads/writes, wire
+compression and the read preference per workload. Clients are cached per URI,
+so bots hosted in one process share a single pool.
+
+Pool checkout waits are recorded by `PoolMetrics`; `pool_stats()` and
+`pool_summary()` expose them so connection starvation (e.g. during
+broadcasts) shows up in health views.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import pymongo
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 2))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", 60000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000))  # give up on a checkout after this
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+MONGO_HEARTBEAT_MS = int(os.getenv("MONGO_HEARTBEAT_MS", 30000))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+MONGO_ANALYTICS_MAX_STALENESS = int(os.getenv("MONGO_ANALYTICS_MAX_STALENESS", 120))  # seconds; Atlas minimum is 90
+MONGO_SLOW_CHECKOUT_MS = int(os.getenv("MONGO_SLOW_CHECKOUT_MS", 100))
+
+# Read preference per workload. Operational reads stay on the primary (they
+# must see the write that just happened); dashboards, leaderboards and other
+# aggregate reports may lag a little and are pushed to secondaries.
+WORKLOADS = {
+    "primary": pymongo.ReadPreference.PRIMARY,
+    "analytics": SecondaryPreferred(max_staleness=MONGO_ANALYTICS_MAX_STALENESS),
+}
+
+
+def _available_compressors():
+    """Requested compressors whose client library is installed (zlib is stdlib)."""
+    modules = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+    found = []
+    for name in (c.strip() for c in MONGO_COMPRESSORS.split(",")):
+        if name not in modules:
+            continue
+        try:
+            __import__(modules[name])
+            found.append(name)
+        except ImportError:
+            pass
+    return found
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters, with checkout wait times for starvation tracking."""
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.waits_ms = deque(maxlen=window)  # recent checkout waits
+        self.checkouts = 0
+        self.failed = 0
+        self.slow = 0
+        self.waiting = 0
+        self.checked_out = 0
+        self.open = 0
+        self.cleared = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+        with self.lock:
+            self.waiting += 1
+
+    def _waited_ms(self, event):
+        duration = getattr(event, "duration", None)  # seconds, pymongo >= 4.7
+        if duration is not None:
+            return duration * 1000
+        started = getattr(self.local, "started", None)
+        return (time.perf_counter() - started) * 1000 if started else 0.0
+
+    def connection_checked_out(self, event):
+        waited = self._waited_ms(event)
+        with self.lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_ms += waited
+            self.max_wait_ms = max(self.max_wait_ms, waited)
+            self.waits_ms.append(waited)
+            if waited >= MONGO_SLOW_CHECKOUT_MS:
+                self.slow += 1
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited_ms(event)
+        with self.lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.failed += 1
+            self.waits_ms.append(waited)
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open = max(0, self.open - 1)
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.cleared += 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+
+    def snapshot(self):
+        with self.lock:
+            waits = sorted(self.waits_ms)
+            checkouts = self.checkouts
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "open": self.open,
+                "in_use": self.checked_out,
+                "waiting": self.waiting,
+                "checkouts": checkouts,
+                "failed_checkouts": self.failed,
+                "slow_checkouts": self.slow,
+                "avg_wait_ms": round(self.total_wait_ms / checkouts, 2) if checkouts else 0.0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 2),
+                "pool_cleared": self.cleared,
+            }
+
+
+pool_metrics = PoolMetrics()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_options(app="msanode", **overrides):
+    options = {
+        "appname": app,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "heartbeatFrequencyMS": MONGO_HEARTBEAT_MS,
+        "retryWrites": True,
+        "retryReads": True,
+        "w": "majority",
+        "event_listeners": [pool_metrics],
+    }
+    compressors = _available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    options.update(overrides)
+    return options
+
+
+def get_client(uri, app="msanode", fresh=False, **overrides):
+    """
+    Shared MongoClient for `uri`. `fresh=True` replaces the cached client
+    (auto-heal reconnects); the caller is responsible for closing the old one.
+    """
+    key = (uri, tuple(sorted(overrides.items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None or fresh:
+            client = pymongo.MongoClient(uri, **client_options(app, **overrides))
+            _clients[key] = client
+        return client
+
+
+def workload(target, name):
+    """`target` (database or collection) with the read preference of workload `name`."""
+    return target.with_options(read_preference=WORKLOADS[name])
+
+
+def analytics(target):
+    """Shortcut for read-heavy reports that tolerate replication lag."""
+    return workload(target, "analytics")
+
+
+def pool_stats():
+    stats = pool_metrics.snapshot()
+    stats["compressors"] = _available_compressors()
+    return stats
+
+
+def pool_summary():
+    """One-line pool status for health messages."""
+    s = pool_stats()
+    return (f"{s['in_use']}/{s['open']} in use (max {s['max_pool_size']}), {s['waiting']} waiting, "
+            f"checkout avg {s['avg_wait_ms']}ms p95 {s['p95_wait_ms']}ms max {s['max_wait_ms']}ms, "
+            f"{s['slow_checkouts']} slow / {s['failed_checkouts']} failed, "
+            f"wire {'+'.join(s['compressors']) or 'none'}")
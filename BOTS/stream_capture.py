@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Live terminal capture for bot4's /terminal view.
+
+`install()` tees stdout/stderr into LOG_BUFFER. Lines are stored raw as
+(epoch, text); the "[hh:mm:ss]" stamp is only formatted when the terminal
+view reads them (terminal_lines()). bench/bench_stream_logger.py measures
+the write path against the original per-write flush.
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+LOG_BUFFER = deque(maxlen=50)
+
+
+class StreamLogger:
+    """Tees stdout/stderr into LOG_BUFFER with buffered pass-through to the real stream.
+
+    print() issues several write() calls per line; they are joined at newlines
+    for LOG_BUFFER and, when `batched`, the original stream is written/flushed
+    in batches — every FLUSH_LINES lines or FLUSH_INTERVAL seconds (background
+    flusher) — instead of a write+flush syscall pair per fragment. flush() from
+    callers such as logging.StreamHandler is then advisory; drain() forces it.
+    Unbatched streams (stderr) are written straight through.
+    """
+    FLUSH_INTERVAL = 0.5
+    FLUSH_LINES = 32
+
+    def __init__(self, original, batched=True):
+        self.original = original
+        self.batched = batched
+        self._pending = []
+        self._partial = ""
+        self._lines = 0
+        self._lock = threading.Lock()
+
+    def write(self, message):
+        if not message:
+            return 0
+        now = time.time()
+        with self._lock:
+            self._pending.append(message)
+            if "\n" in message:
+                *lines, self._partial = (self._partial + message).split("\n")
+                for line in lines:
+                    line = line.strip()
+                    if line:
+                        LOG_BUFFER.append((now, line))
+                self._lines += len(lines)
+                due = self._lines >= self.FLUSH_LINES
+            else:
+                self._partial += message
+                due = False
+        if due or not self.batched:
+            self.drain()
+        return len(message)
+
+    def flush(self):
+        if not self.batched:
+            self.drain()
+        # batched: the flusher thread drains within FLUSH_INTERVAL
+
+    def drain(self):
+        with self._lock:
+            if not self._pending:
+                return
+            data = "".join(self._pending)
+            self._pending.clear()
+            self._lines = 0
+            try:
+                self.original.write(data)
+                self.original.flush()
+            except Exception:
+                pass
+
+    def __getattr__(self, name):
+        # encoding, isatty, fileno, reconfigure … behave like the real stream
+        if name == "original":
+            raise AttributeError(name)
+        return getattr(self.original, name)
+
+
+def terminal_lines(limit: int = None) -> list:
+    """LOG_BUFFER rendered as "[hh:mm:ss AM] text", oldest first (stamps formatted here, not on write)."""
+    entries = list(LOG_BUFFER)
+    if limit is not None:
+        entries = entries[-limit:]
+    stamps = {}
+    out = []
+    for ts, text in entries:
+        sec = int(ts)
+        stamp = stamps.get(sec)
+        if stamp is None:
+            stamp = stamps[sec] = datetime.fromtimestamp(sec).strftime('%I:%M:%S %p')
+        out.append(f"[{stamp}] {text}")
+    return out
+
+
+def _stream_flusher():
+    while True:
+        time.sleep(StreamLogger.FLUSH_INTERVAL)
+        for stream in (sys.stdout, sys.stderr):
+            if isinstance(stream, StreamLogger):
+                stream.drain()
+
+
+def _streams_after_fork_child():
+    """A forked child (PDF render pool) may inherit a capture lock the flusher held
+    mid-write, and it has no flusher thread or atexit of its own. Give it fresh
+    locks and write through line by line; what the parent had pending stays the
+    parent's to flush."""
+    for stream in (sys.stdout, sys.stderr):
+        if isinstance(stream, StreamLogger):
+            stream._lock = threading.Lock()
+            stream._pending.clear()
+            stream._lines = 0
+            stream.FLUSH_LINES = 1
+
+
+def install():
+    """Redirect this process's stdout/stderr into the capture (idempotent)."""
+    if isinstance(sys.stdout, StreamLogger):
+        return
+    sys.stdout = StreamLogger(sys.stdout)
+    sys.stderr = StreamLogger(sys.stderr, batched=False)  # tracebacks must not sit in a buffer
+    threading.Thread(target=_stream_flusher, name="stream-flusher", daemon=True).start()
+    if hasattr(os, "register_at_fork"):  # POSIX only; Windows never forks
+        os.register_at_fork(after_in_child=_streams_after_fork_child)
+    atexit.register(sys.stdout.drain)
+    atexit.register(sys.stderr.drain)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Outbound Telegram rate governor, installed on every bot's aiogram session.
+
+All requests of one bot token pass through a single `Governor`, whichever
+code path (broadcast, dashboard refresh, report) sends them and however many
+Bot objects share that token. Messages are paced by a global token bucket
+and, for message-producing methods only, a per-chat bucket (private chats
+~1/s, groups and channels ~20/min), so a burst is queued instead of sent into
+a flood ban. Reads and chat-admin calls (getChatMember, banChatMember, ...)
+only take from the global bucket. A `retry_after` from
+Telegram pauses the whole token; the request is then retried once the pause
+is over (up to TG_RETRY_ATTEMPTS), unless the pause is longer than
+TG_RETRY_AFTER_MAX, in which case it is raised to the caller as before.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", 25))          # messages/second per token (Telegram allows ~30)
+TG_GLOBAL_BURST = int(os.getenv("TG_GLOBAL_BURST", 30))
+TG_PRIVATE_RATE = float(os.getenv("TG_PRIVATE_RATE", 1))        # messages/second per private chat
+TG_PRIVATE_BURST = int(os.getenv("TG_PRIVATE_BURST", 4))
+TG_GROUP_RATE = float(os.getenv("TG_GROUP_PER_MIN", 20)) / 60   # groups and channels
+TG_GROUP_BURST = int(os.getenv("TG_GROUP_BURST", 3))
+TG_RETRY_AFTER_MAX = int(os.getenv("TG_RETRY_AFTER_MAX", 60))   # longer flood waits are raised, not waited out
+TG_RETRY_ATTEMPTS = int(os.getenv("TG_RETRY_ATTEMPTS", 3))
+
+# Never queued or paused: long polling and webhook setup must keep working during a flood wait
+UNGOVERNED_METHODS = {"getUpdates", "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo", "close", "logOut"}
+CHAT_BUCKET_IDLE_SECS = 120  # per-chat buckets unused this long are dropped
+# Methods that put a message into a chat and so count against Telegram's per-chat limits
+CHAT_PACED_PREFIXES = ("send", "edit")
+CHAT_PACED_METHODS = {"copyMessage", "copyMessages", "forwardMessage", "forwardMessages"}
+CHAT_UNPACED_METHODS = {"sendChatAction"}
+
+
+def paces_chat(api_method):
+    """True when `api_method` should also wait on the per-chat bucket."""
+    if api_method in CHAT_UNPACED_METHODS:
+        return False
+    return api_method in CHAT_PACED_METHODS or api_method.startswith(CHAT_PACED_PREFIXES)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.used = self.updated
+
+    def reserve(self):
+        """Take one token; seconds the caller must wait before using it (reservations queue up FIFO)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = self.used = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Governor:
+    """Rate state for one bot token."""
+
+    def __init__(self, bot_id):
+        self.bot_id = bot_id
+        self.bucket = TokenBucket(TG_GLOBAL_RATE, TG_GLOBAL_BURST)
+        self.chats = {}
+        self.paused_until = 0.0
+        self.queued = 0
+        self.max_queued = 0
+        self.sent = 0
+        self.throttled = 0
+        self.retry_after_events = 0
+        self.waits_ms = deque(maxlen=500)  # waits of throttled requests
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            if len(self.chats) > 5000:
+                cutoff = time.monotonic() - CHAT_BUCKET_IDLE_SECS
+                self.chats = {k: b for k, b in self.chats.items() if b.used > cutoff}
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(TG_PRIVATE_RATE, TG_PRIVATE_BURST) if private else TokenBucket(TG_GROUP_RATE, TG_GROUP_BURST)
+            self.chats[chat_id] = bucket
+        return bucket
+
+    async def _wait_pause(self, method):
+        remaining = self.paused_until - time.monotonic()
+        if remaining > TG_RETRY_AFTER_MAX:
+            raise TelegramRetryAfter(method=method, message="Flood control (token paused by rate governor)",
+                                     retry_after=int(remaining) + 1)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    async def acquire(self, method, chat_id, per_chat=True):
+        started = time.monotonic()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            if chat_id is not None and per_chat:
+                delay = self._chat_bucket(chat_id).reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+            await self._wait_pause(method)
+            delay = self.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            self.queued -= 1
+        waited = (time.monotonic() - started) * 1000
+        if waited >= 1:
+            self.throttled += 1
+            self.waits_ms.append(waited)
+
+    def pause(self, seconds):
+        self.retry_after_events += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        waits = sorted(self.waits_ms)
+        return {
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0,
+            "max_wait_ms": round(waits[-1], 1) if waits else 0.0,
+            "retry_after_events": self.retry_after_events,
+            "paused_for_s": max(0, round(self.paused_until - time.monotonic(), 1)),
+            "chats_tracked": len(self.chats),
+        }
+
+
+_governors = {}
+
+
+def governor_for(token):
+    bot_id = token.split(":", 1)[0]
+    governor = _governors.get(bot_id)
+    if governor is None:
+        governor = _governors[bot_id] = Governor(bot_id)
+    return governor
+
+
+class RateGovernorMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        if method.__api_method__ in UNGOVERNED_METHODS:
+            return await make_request(bot, method)
+        governor = governor_for(bot.token)
+        chat_id = getattr(method, "chat_id", None)
+        per_chat = paces_chat(method.__api_method__)
+        for attempt in range(TG_RETRY_ATTEMPTS):
+            await governor.acquire(method, chat_id, per_chat)
+            try:
+                result = await make_request(bot, method)
+                governor.sent += 1
+                return result
+            except TelegramRetryAfter as e:
+                governor.pause(e.retry_after)
+                if e.retry_after > TG_RETRY_AFTER_MAX or attempt == TG_RETRY_ATTEMPTS - 1:
+                    raise
+                print(f"⏳ Telegram flood wait {e.retry_after}s on bot {governor.bot_id} ({method.__api_method__}), queued: {governor.queued}")
+
+
+rate_governor = RateGovernorMiddleware()
+
+
+def governor_stats():
+    """{bot_id: stats} for every token seen in this process."""
+    return {bot_id: g.stats() for bot_id, g in _governors.items()}
+
+
+def governor_summary(token):
+    s = governor_for(token).stats()
+    return (f"{s['queued']} queued (max {s['max_queued']}), {s['throttled']}/{s['sent']} throttled, "
+            f"wait p95 {s['p95_wait_ms']}ms, {s['retry_after_events']} flood waits"
+            + (f", paused {s['paused_for_s']}s" if s["paused_for_s"] else ""))